@@ -91,8 +91,8 @@ Current Inventory ({len(products)} products):
 {product_summary}
 """
     
-    # Build messages
-    messages = conversation_history or []
+    # Build messages (a copy: the caller's history is left as it was)
+    messages = list(conversation_history or [])
     messages.append({
         "role": "user",
         "content": f"{message}\n\n[Context: {context}]"
@@ -216,7 +216,7 @@ Available Products:
 {product_list}
 """
     
-    messages = conversation_history or []
+    messages = list(conversation_history or [])
     messages.append({
         "role": "user", 
         "content": f"{message}\n\n[Store inventory: {context}]"
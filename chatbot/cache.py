@@ -1,163 +1,972 @@
 """
-Redis-backed caching for KOFA backend.
-Uses Heroku Redis for persistent, shared caching with instant invalidation.
-Falls back to in-memory cache if Redis is unavailable.
+Two-tier caching for KOFA backend.
+
+L1: a per-process LRU, bounded by entry count and total bytes, with TTL expiry.
+L2: Redis (Heroku Redis), shared by all workers, when REDIS_URL is set.
+
+Reads try L1 first and only go over the network on an L1 miss; L2 hits are
+copied into L1. With Redis up, L1 entries live for a short per-prefix lifetime
+so other workers' writes show up quickly; without Redis, L1 is the whole cache.
+TTLs and L1 lifetimes are configured per key prefix in CACHE_POLICIES.
+
+Invalidation is by tag, never by scanning keys. Values are cached under
+logical tags (e.g. orders_tag(vendor_id)); each tag has a generation counter
+that is part of the stored key, so invalidating a tag just increments its
+counter and old entries become unreachable and age out by TTL/LRU.
+
+get_or_load() coalesces misses: concurrent callers share one loader call,
+and a short Redis lock lets one worker load while the others wait for it.
+It can also serve a value past its TTL while one background task refreshes
+it (stale-while-revalidate).
+
+Values are stored as compact binary (see cache_codec); sizes for the L1 byte
+bound are the encoded sizes.
 """
+import asyncio
+import dataclasses
+import hashlib
+import inspect
+import json
+import math
 import os
 import time
-import json
 import logging
-from typing import Any, Optional, Dict
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Optional, Dict, Iterable, List, Tuple
 from functools import wraps
 
-logger = logging.getLogger(__name__)
+from .cache_codec import CodecError, default_codec
 
-# Try to connect to Redis
-_redis_client = None
-_redis_available = False
+logger = logging.getLogger(__name__)
 
 try:
     import redis
-    redis_url = os.getenv('REDIS_URL')
-    if redis_url:
-        _redis_client = redis.from_url(redis_url, decode_responses=True)
-        # Test connection
-        _redis_client.ping()
-        _redis_available = True
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis = None
+    redis_asyncio = None
+
+# Redis connects lazily on first use, so a slow or missing Redis never delays startup
+REDIS_URL = os.getenv('REDIS_URL')
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '20'))
+REDIS_TIMEOUT_SECONDS = 2
+REDIS_HEALTH_CHECK_SECONDS = 30
+# After a connection failure, run on L1 alone this long before trying again
+REDIS_RETRY_SECONDS = 30
+
+_redis_client = None      # sync client, for sync callers
+_async_redis = None       # asyncio client with a connection pool, for the request path
+_async_redis_loop = None
+_redis_available = False
+_redis_retry_at = 0.0
+
+
+# ========== POLICIES ==========
+
+DEFAULT_TTL_SECONDS = 60
+# How long an L1 copy is trusted when Redis is the shared source of truth
+DEFAULT_L1_TTL_SECONDS = 5
+
+# Per-prefix overrides: {prefix: (ttl_seconds, l1_ttl_seconds)}; longest prefix wins.
+# An explicit ttl_seconds passed to set_cache still takes precedence over the ttl here.
+CACHE_POLICIES: Dict[str, Tuple[int, int]] = {
+    "orders:": (60, 5),
+    # Profit/loss totals for closed periods never change; late writes bump a tag
+    "pnl:": (30 * 24 * 3600, 60),
+}
+
+L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "5000"))
+L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+# Generation counters live in Redis under this prefix (one small key per tag)
+TAG_KEY_PREFIX = "cache:gen:"
+# Implicit tag on every key; invalidate_cache() with no arguments bumps it
+ALL_TAG = "*"
+# Generations read from Redis are trusted locally this long, the same
+# staleness bound as L1 copies; this worker's own bumps apply immediately
+TAG_GENERATION_TTL_SECONDS = DEFAULT_L1_TTL_SECONDS
+
+
+def orders_tag(vendor_id: str) -> str:
+    return f"orders:{vendor_id}"
+
+
+def vendor_products_tag(vendor_id: str) -> str:
+    return f"vendor:{vendor_id}:products"
+
+
+def _policy_for(key: str) -> Tuple[int, int]:
+    best = None
+    for prefix in CACHE_POLICIES:
+        if key.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return CACHE_POLICIES[best] if best is not None else (DEFAULT_TTL_SECONDS, DEFAULT_L1_TTL_SECONDS)
+
+
+# ========== L1: bounded in-process LRU ==========
+
+class LRUCache:
+    """
+    In-process LRU bounded by entry count and (serialized) byte size.
+
+    Entries expire by TTL; expired entries are dropped when read and by a
+    periodic purge, so unread keys don't accumulate.
+    """
+
+    PURGE_INTERVAL_SECONDS = 30
+
+    def __init__(self, max_entries: int = L1_MAX_ENTRIES, max_bytes: int = L1_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # {key: (value, expires_at, size)}; order = least to most recently used
+        self._data: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._bytes = 0
+        self._last_purge = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """(True, value) on a hit, (False, None) on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry[1] <= now:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def set(self, key: str, value: Any, ttl_seconds: float, size: int):
+        if size > self.max_bytes or ttl_seconds <= 0:
+            self.delete(key)
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, now + ttl_seconds, size)
+            self._bytes += size
+            if now - self._last_purge >= self.PURGE_INTERVAL_SECONDS:
+                self._purge_expired(now)
+            # Evict least recently used until both bounds hold
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key: str):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _purge_expired(self, now: float):
+        expired = [k for k, (_, expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._last_purge = now
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+_l1 = LRUCache()
+
+# Serializer + compression for values stored in Redis
+_codec = default_codec()
+
+# L2 (Redis) counters
+_l2_stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+# {tag: (generation, trusted_until)}
+_generations: Dict[str, Tuple[int, float]] = {}
+_generations_lock = threading.Lock()
+
+
+# ========== REDIS CONNECTION ==========
+
+def _client_options() -> dict:
+    return {
+        'socket_connect_timeout': REDIS_TIMEOUT_SECONDS,
+        'socket_timeout': REDIS_TIMEOUT_SECONDS,
+        'health_check_interval': REDIS_HEALTH_CHECK_SECONDS,
+    }
+
+
+def _may_connect() -> bool:
+    return redis is not None and bool(REDIS_URL) and time.time() >= _redis_retry_at
+
+
+def _mark_connected():
+    global _redis_available
+    if not _redis_available:
         logger.info("Redis cache connected successfully")
-except Exception as e:
-    logger.warning(f"Redis not available, using in-memory cache: {e}")
+    _redis_available = True
+
+
+def _on_redis_error(action: str, e: Exception):
+    """Count the error; on connection trouble, fall back to L1 until the retry window passes."""
+    global _redis_available, _redis_retry_at
+    _l2_stats['errors'] += 1
+    logger.warning(f"Redis {action} failed: {e}")
+    if redis is not None and isinstance(e, (redis.ConnectionError, redis.TimeoutError)):
+        _redis_available = False
+        _redis_retry_at = time.time() + REDIS_RETRY_SECONDS
+
+
+def _sync_redis():
+    """Sync client, connecting on first use; None while Redis is unavailable."""
+    global _redis_client
+    if _redis_client is not None and _redis_available:
+        return _redis_client
+    if not _may_connect():
+        return None
+    try:
+        client = redis.from_url(REDIS_URL, **_client_options())
+        client.ping()
+    except Exception as e:
+        _on_redis_error("connect", e)
+        return None
+    _redis_client = client
+    _mark_connected()
+    return client
+
+
+async def _async_client():
+    """Pooled asyncio client for the running loop, connecting on first use; None while Redis is unavailable."""
+    global _async_redis, _async_redis_loop
+    loop = asyncio.get_running_loop()
+    if _async_redis is not None and _redis_available and _async_redis_loop in (None, loop):
+        return _async_redis
+    if not _may_connect():
+        return None
+    try:
+        client = redis_asyncio.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, **_client_options())
+        await client.ping()
+    except Exception as e:
+        _on_redis_error("connect", e)
+        return None
+    _async_redis, _async_redis_loop = client, loop
+    _mark_connected()
+    return client
+
+
+async def close_cache():
+    """Close Redis connections (app shutdown)."""
+    global _redis_client, _async_redis, _async_redis_loop, _redis_available
+    if _async_redis is not None:
+        try:
+            await _async_redis.aclose()
+        except Exception as e:
+            logger.warning(f"Closing Redis pool failed: {e}")
+    if _redis_client is not None:
+        _redis_client.close()
+    _redis_client = _async_redis = _async_redis_loop = None
     _redis_available = False
 
-# Fallback in-memory cache
-_memory_cache: Dict[str, Dict[str, Any]] = {}
 
+# ========== TAG GENERATIONS ==========
+
+def _cached_generations(tags: List[str]) -> Tuple[Dict[str, int], List[str]]:
+    """Generations we can trust locally, and the tags that need a Redis lookup."""
+    now = time.time()
+    known = {}
+    stale = []
+    with _generations_lock:
+        for tag in tags:
+            entry = _generations.get(tag)
+            if entry is not None and (not _redis_available or entry[1] > now):
+                known[tag] = entry[0]
+            else:
+                stale.append(tag)
+    return known, stale
+
+
+def _remember_generations(generations: Dict[str, int]):
+    trusted_until = time.time() + TAG_GENERATION_TTL_SECONDS
+    with _generations_lock:
+        for tag, generation in generations.items():
+            _generations[tag] = (int(generation), trusted_until)
+
+
+def _last_known_generations(tags: List[str]) -> Dict[str, int]:
+    return {tag: _generations.get(tag, (0, 0))[0] for tag in tags}
+
+
+def _all_tags(tags: Iterable[str]) -> List[str]:
+    return [ALL_TAG] + sorted(set(tags))
+
+
+def _join_generations(key: str, tags: List[str], known: Dict[str, int]) -> str:
+    return f"{key}#{'.'.join(str(known[tag]) for tag in tags)}"
+
+
+def _versioned_key(key: str, tags: Iterable[str] = ()) -> str:
+    """Storage key: the logical key plus the generations of its tags."""
+    all_tags = _all_tags(tags)
+    known, stale = _cached_generations(all_tags)
+    if stale:
+        fetched = _last_known_generations(stale)
+        client = _sync_redis()
+        if client is not None:
+            try:
+                values = client.mget([TAG_KEY_PREFIX + tag for tag in stale])
+                fetched = {tag: int(value or 0) for tag, value in zip(stale, values)}
+            except Exception as e:
+                _on_redis_error("tag lookup", e)
+        _remember_generations(fetched)
+        known.update(fetched)
+    return _join_generations(key, all_tags, known)
+
+
+async def _versioned_key_async(key: str, tags: Iterable[str] = ()) -> str:
+    """Async _versioned_key()."""
+    all_tags = _all_tags(tags)
+    known, stale = _cached_generations(all_tags)
+    if stale:
+        fetched = _last_known_generations(stale)
+        client = await _async_client()
+        if client is not None:
+            try:
+                values = await client.mget([TAG_KEY_PREFIX + tag for tag in stale])
+                fetched = {tag: int(value or 0) for tag, value in zip(stale, values)}
+            except Exception as e:
+                _on_redis_error("tag lookup", e)
+        _remember_generations(fetched)
+        known.update(fetched)
+    return _join_generations(key, all_tags, known)
 
-def get_cache(key: str) -> Optional[Any]:
-    """Get value from cache if not expired."""
-    if _redis_available:
+
+def _bump_locally(tags: Iterable[str]):
+    # No Redis (or it failed): at least this worker stops serving old values
+    with _generations_lock:
+        current = _last_known_generations(list(tags))
+    _remember_generations({tag: generation + 1 for tag, generation in current.items()})
+
+
+def invalidate_tags(*tags: str):
+    """Invalidate every value cached under any of these tags (O(1) per tag)."""
+    if not tags:
+        return
+    client = _sync_redis()
+    if client is not None:
         try:
-            value = _redis_client.get(key)
-            if value:
-                return json.loads(value)
+            pipe = client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(TAG_KEY_PREFIX + tag)
+            _remember_generations(dict(zip(tags, pipe.execute())))
+            return
         except Exception as e:
-            logger.warning(f"Redis get failed: {e}")
-    
-    # Fallback to memory cache
-    if key in _memory_cache:
-        entry = _memory_cache[key]
-        if time.time() < entry['expires']:
-            return entry['value']
-        else:
-            del _memory_cache[key]
+            _on_redis_error("tag invalidation", e)
+    _bump_locally(tags)
+
+
+async def invalidate_tags_async(*tags: str):
+    """Async invalidate_tags()."""
+    if not tags:
+        return
+    client = await _async_client()
+    if client is not None:
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(TAG_KEY_PREFIX + tag)
+                _remember_generations(dict(zip(tags, await pipe.execute())))
+            return
+        except Exception as e:
+            _on_redis_error("tag invalidation", e)
+    _bump_locally(tags)
+
+
+# ========== CACHE API ==========
+
+def _from_l2(policy_key: str, key: str, raw, remaining) -> Optional[Any]:
+    """Decode a Redis hit and keep a short-lived L1 copy, bounded by the key's remaining TTL."""
+    if not raw:
+        _l2_stats['misses'] += 1
+        return None
+    try:
+        value = _codec.decode(raw)
+    except CodecError as e:
+        _l2_stats['errors'] += 1
+        logger.warning(f"Undecodable cache entry {key}: {e}")
+        return None
+    _l2_stats['hits'] += 1
+    l1_ttl = _policy_for(policy_key)[1]
+    if remaining and remaining > 0:
+        l1_ttl = min(l1_ttl, remaining)
+    _l1.set(key, value, l1_ttl, len(raw))
+    return value
+
+
+def _encode_for_set(policy_key: str, key: str, value: Any, ttl_seconds: Optional[float]):
+    """(redis_ttl, l1_ttl, raw) for a write, or None if the value can't be cached."""
+    policy_ttl, l1_ttl = _policy_for(policy_key)
+    ttl = ttl_seconds if ttl_seconds is not None else policy_ttl
+    try:
+        raw = _codec.encode(value)
+    except CodecError as e:
+        logger.warning(f"Not caching {key}: {e}")
+        return None
+    return ttl, l1_ttl, raw
+
+
+def _redis_ttl(ttl: float) -> int:
+    # Redis TTLs are whole seconds
+    return max(1, math.ceil(ttl))
+
+
+def get_cache(key: str, tags: Iterable[str] = ()) -> Optional[Any]:
+    """Get value from cache if not expired (L1, then Redis)."""
+    policy_key = key
+    key = _versioned_key(key, tags)
+    hit, value = _l1.get(key)
+    if hit:
+        return value
+
+    client = _sync_redis()
+    if client is not None:
+        try:
+            # Value and remaining TTL in one round trip
+            raw, remaining = client.pipeline(transaction=False).get(key).ttl(key).execute()
+            return _from_l2(policy_key, key, raw, remaining)
+        except Exception as e:
+            _on_redis_error("get", e)
+    return None
+
+
+async def _get_versioned_async(policy_key: str, key: str) -> Optional[Any]:
+    hit, value = _l1.get(key)
+    if hit:
+        return value
+
+    client = await _async_client()
+    if client is not None:
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                raw, remaining = await pipe.get(key).ttl(key).execute()
+            return _from_l2(policy_key, key, raw, remaining)
+        except Exception as e:
+            _on_redis_error("get", e)
     return None
 
 
-def set_cache(key: str, value: Any, ttl_seconds: int = 60):
-    """Set value in cache with TTL."""
-    if _redis_available:
+async def get_cache_async(key: str, tags: Iterable[str] = ()) -> Optional[Any]:
+    """Async get_cache(): doesn't block the event loop on Redis."""
+    return await _get_versioned_async(key, await _versioned_key_async(key, tags))
+
+
+async def get_many(keys: Iterable[str], tags: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Cached values for several keys sharing the same tags, in at most one
+    Redis round trip. Returns {key: value} for the keys that hit.
+    """
+    found = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        versioned = await _versioned_key_async(key, tags)
+        hit, value = _l1.get(versioned)
+        if hit:
+            found[key] = value
+        else:
+            missing.append((key, versioned))
+
+    client = await _async_client() if missing else None
+    if client is not None:
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for _, versioned in missing:
+                    pipe.get(versioned).ttl(versioned)
+                results = await pipe.execute()
+            for i, (key, versioned) in enumerate(missing):
+                value = _from_l2(key, versioned, results[2 * i], results[2 * i + 1])
+                if value is not None:
+                    found[key] = value
+        except Exception as e:
+            _on_redis_error("get_many", e)
+    return found
+
+
+def set_cache(key: str, value: Any, ttl_seconds: int = None, tags: Iterable[str] = ()):
+    """
+    Set value in cache with TTL (per-prefix policy when ttl_seconds is None).
+
+    Pass the same tags to get_cache; invalidate_tags() on any of them drops the value.
+    """
+    policy_key = key
+    key = _versioned_key(key, tags)
+    encoded = _encode_for_set(policy_key, key, value, ttl_seconds)
+    if encoded is None:
+        return
+    ttl, l1_ttl, raw = encoded
+
+    client = _sync_redis()
+    if client is not None:
         try:
-            _redis_client.setex(key, ttl_seconds, json.dumps(value, default=str))
+            client.setex(key, _redis_ttl(ttl), raw)
+            _l1.set(key, value, min(ttl, l1_ttl), len(raw))
             return
         except Exception as e:
-            logger.warning(f"Redis set failed: {e}")
-    
-    # Fallback to memory cache
-    _memory_cache[key] = {
-        'value': value,
-        'expires': time.time() + ttl_seconds
-    }
+            _on_redis_error("set", e)
 
+    # L1 is the only tier: keep for the full TTL
+    _l1.set(key, value, ttl, len(raw))
 
-def invalidate_cache(key: str = None, prefix: str = None):
-    """Invalidate specific key or all keys with prefix. INSTANT with Redis!"""
-    global _memory_cache
-    
-    if _redis_available:
+
+async def _set_versioned_async(policy_key: str, key: str, value: Any, ttl_seconds: Optional[float]):
+    encoded = _encode_for_set(policy_key, key, value, ttl_seconds)
+    if encoded is None:
+        return
+    ttl, l1_ttl, raw = encoded
+
+    client = await _async_client()
+    if client is not None:
         try:
-            if key:
-                _redis_client.delete(key)
-            elif prefix:
-                # Find all keys with prefix and delete them
-                keys = _redis_client.keys(f"{prefix}*")
-                if keys:
-                    _redis_client.delete(*keys)
-            else:
-                _redis_client.flushdb()
+            await client.setex(key, _redis_ttl(ttl), raw)
+            _l1.set(key, value, min(ttl, l1_ttl), len(raw))
             return
         except Exception as e:
-            logger.warning(f"Redis invalidate failed: {e}")
-    
-    # Fallback to memory cache
-    if key:
-        _memory_cache.pop(key, None)
-    elif prefix:
-        keys_to_delete = [k for k in _memory_cache if k.startswith(prefix)]
-        for k in keys_to_delete:
-            del _memory_cache[k]
+            _on_redis_error("set", e)
+
+    _l1.set(key, value, ttl, len(raw))
+
+
+async def set_cache_async(key: str, value: Any, ttl_seconds: int = None, tags: Iterable[str] = ()):
+    """Async set_cache()."""
+    await _set_versioned_async(key, await _versioned_key_async(key, tags), value, ttl_seconds)
+
+
+async def set_many(items: Dict[str, Any], ttl_seconds: int = None, tags: Iterable[str] = ()):
+    """Cache several values sharing the same TTL and tags in one Redis round trip."""
+    writes = []
+    for key, value in items.items():
+        versioned = await _versioned_key_async(key, tags)
+        encoded = _encode_for_set(key, versioned, value, ttl_seconds)
+        if encoded is not None:
+            writes.append((versioned, value, encoded))
+
+    client = await _async_client() if writes else None
+    if client is not None:
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for versioned, _, (ttl, _, raw) in writes:
+                    pipe.setex(versioned, _redis_ttl(ttl), raw)
+                await pipe.execute()
+            for versioned, value, (ttl, l1_ttl, raw) in writes:
+                _l1.set(versioned, value, min(ttl, l1_ttl), len(raw))
+            return
+        except Exception as e:
+            _on_redis_error("set_many", e)
+
+    for versioned, value, (ttl, _, raw) in writes:
+        _l1.set(versioned, value, ttl, len(raw))
+
+
+def invalidate_cache(key: str = None, tags: Iterable[str] = ()):
+    """
+    Invalidate one key (cached under these tags), or with no key every value
+    under the tags. With no arguments, invalidate everything this cache holds.
+    """
+    if key is None:
+        invalidate_tags(*(tags or (ALL_TAG,)))
+        return
+
+    key = _versioned_key(key, tags)
+    _l1.delete(key)
+    client = _sync_redis()
+    if client is not None:
+        try:
+            client.delete(key)
+        except Exception as e:
+            _on_redis_error("invalidate", e)
+
+
+async def invalidate_cache_async(key: str = None, tags: Iterable[str] = ()):
+    """Async invalidate_cache()."""
+    if key is None:
+        await invalidate_tags_async(*(tags or (ALL_TAG,)))
+        return
+
+    key = await _versioned_key_async(key, tags)
+    _l1.delete(key)
+    client = await _async_client()
+    if client is not None:
+        try:
+            await client.delete(key)
+        except Exception as e:
+            _on_redis_error("invalidate", e)
+
+
+# ========== SINGLE-FLIGHT LOADING ==========
+
+# The cross-worker load lock lapses after this, in case its holder dies
+LOAD_LOCK_SECONDS = 10
+# How long other workers wait for the lock holder's value before loading themselves
+LOAD_WAIT_SECONDS = 5
+LOAD_POLL_SECONDS = 0.05
+LOCK_KEY_PREFIX = "cache:lock:"
+
+# Delete the lock only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# In-flight loads by storage key, shared by concurrent callers in this process
+_inflight: Dict[str, asyncio.Future] = {}
+# Background refreshes, referenced so they aren't garbage collected mid-flight
+_background: set = set()
+
+_load_stats = {'loads': 0, 'coalesced': 0, 'lock_waits': 0, 'stale_served': 0}
+
+
+async def get_or_load(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl_seconds: int = None,
+    tags: Iterable[str] = (),
+    stale_seconds: int = None
+) -> Any:
+    """
+    Cached value for key, calling `await loader()` at most once per miss.
+
+    With stale_seconds, a value past its TTL is still served for that long
+    while one background task refreshes it. Keys used this way must only be
+    read through get_or_load, since they are stored with their freshness.
+    """
+    versioned = await _versioned_key_async(key, tuple(tags))
+    cached_value = await _get_versioned_async(key, versioned)
+    if cached_value is not None:
+        if stale_seconds is None:
+            return cached_value
+        fresh_until, value = cached_value
+        if time.time() >= fresh_until:
+            _load_stats['stale_served'] += 1
+            _refresh_in_background(key, versioned, loader, ttl_seconds, stale_seconds)
+        return value
+
+    return await _load_once(key, versioned, loader, ttl_seconds, stale_seconds, wait=True)
+
+
+def _load_once(key, versioned, loader, ttl_seconds, stale_seconds, wait) -> Awaitable[Any]:
+    """Join this process's in-flight load for the key, or start one."""
+    pending = _inflight.get(versioned)
+    if pending is None or pending.get_loop() is not asyncio.get_running_loop():
+        pending = asyncio.ensure_future(_load(key, versioned, loader, ttl_seconds, stale_seconds, wait))
+        _inflight[versioned] = pending
+        pending.add_done_callback(
+            lambda done: _inflight.pop(versioned, None) if _inflight.get(versioned) is done else None
+        )
     else:
-        _memory_cache = {}
+        _load_stats['coalesced'] += 1
+    return asyncio.shield(pending)
+
 
+def _refresh_in_background(key, versioned, loader, ttl_seconds, stale_seconds):
+    if versioned in _inflight:
+        return
+    task = asyncio.ensure_future(_load_once(key, versioned, loader, ttl_seconds, stale_seconds, wait=False))
+    _background.add(task)
 
-def cached(ttl_seconds: int = 60, key_prefix: str = ""):
-    """Decorator to cache function results."""
+    def _done(done):
+        _background.discard(done)
+        if not done.cancelled() and done.exception() is not None:
+            logger.warning(f"Background refresh of {key} failed: {done.exception()}")
+
+    task.add_done_callback(_done)
+
+
+async def _load(key, versioned, loader, ttl_seconds, stale_seconds, wait):
+    lock_key = LOCK_KEY_PREFIX + versioned
+    token = await _acquire_load_lock(lock_key)
+    if token is None:
+        # Another worker is loading; a background refresh just leaves it to them
+        if not wait:
+            return None
+        _load_stats['lock_waits'] += 1
+        value = await _wait_for_value(key, versioned, stale_seconds)
+        if value is not None:
+            return value
+
+    try:
+        _load_stats['loads'] += 1
+        value = await loader()
+        if value is not None:
+            if stale_seconds is None:
+                await _set_versioned_async(key, versioned, value, ttl_seconds)
+            else:
+                ttl = ttl_seconds if ttl_seconds is not None else _policy_for(key)[0]
+                await _set_versioned_async(key, versioned, [time.time() + ttl, value], ttl + stale_seconds)
+        return value
+    finally:
+        if token:
+            await _release_load_lock(lock_key, token)
+
+
+async def _wait_for_value(key, versioned, stale_seconds):
+    deadline = time.monotonic() + LOAD_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOAD_POLL_SECONDS)
+        cached_value = await _get_versioned_async(key, versioned)
+        if cached_value is not None:
+            return cached_value if stale_seconds is None else cached_value[1]
+    return None
+
+
+async def _acquire_load_lock(lock_key: str) -> Optional[str]:
+    """Lock token, "" when there's no Redis to coordinate with, None if another worker holds it."""
+    client = await _async_client()
+    if client is None:
+        return ""
+    token = uuid.uuid4().hex
+    try:
+        if await client.set(lock_key, token, nx=True, px=LOAD_LOCK_SECONDS * 1000):
+            return token
+        return None
+    except Exception as e:
+        _on_redis_error("load lock", e)
+        return ""
+
+
+async def _release_load_lock(lock_key: str, token: str):
+    client = await _async_client()
+    if client is None:
+        return
+    try:
+        await client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+    except Exception as e:
+        _on_redis_error("load unlock", e)
+
+
+# ========== @cached KEYS ==========
+
+# Argument parts longer than this are replaced by a digest
+MAX_KEY_ARGS_LENGTH = 128
+
+# Per-function counters: {namespace: {'hits': n, 'misses': n}}
+_function_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-ready form of a key argument that's identical for equal values."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=lambda v: json.dumps(v, sort_keys=True))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, "model_dump"):
+        return _canonical(value.model_dump())
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _canonical(dataclasses.asdict(value))
+    # Default reprs embed memory addresses, so they'd never hit
+    raise TypeError(
+        f"Can't build a stable cache key from {type(value).__name__}; "
+        f"pass key= to @cached to select the arguments that matter"
+    )
+
+
+class CacheKeyBuilder:
+    """
+    Builds "<namespace>:<args>" keys for one decorated function.
+
+    key selects what goes into the key: None for every argument except
+    self/cls, a sequence of argument names, or a callable taking the
+    function's arguments and returning the value to key on.
+    """
+
+    def __init__(self, func, namespace: str, key=None):
+        self.namespace = namespace
+        self.signature = inspect.signature(func)
+        params = list(self.signature.parameters)
+        self.skip = params[0] if params and params[0] in ("self", "cls") else None
+        if key is not None and not callable(key):
+            key = tuple(key)
+            unknown = [name for name in key if name not in self.signature.parameters]
+            if unknown:
+                raise ValueError(f"@cached key= names unknown arguments of {func.__qualname__}: {unknown}")
+        self.key = key
+
+    def __call__(self, *args, **kwargs) -> str:
+        if callable(self.key):
+            if self.skip:
+                args = args[1:]
+            selected = self.key(*args, **kwargs)
+        else:
+            bound = self.signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            names = self.key if self.key is not None else [n for n in arguments if n != self.skip]
+            selected = {name: arguments[name] for name in names}
+
+        part = json.dumps(_canonical(selected), sort_keys=True, separators=(",", ":"))
+        if len(part) > MAX_KEY_ARGS_LENGTH:
+            part = "h:" + hashlib.blake2b(part.encode(), digest_size=16).hexdigest()
+        return f"{self.namespace}:{part}"
+
+
+def _count_call(namespace: str, hit: bool):
+    counters = _function_stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+    counters['hits' if hit else 'misses'] += 1
+
+
+def cached(
+    ttl_seconds: int = 60,
+    key_prefix: str = "",
+    tags: Iterable[str] = (),
+    single_flight: bool = False,
+    stale_seconds: int = None,
+    key=None,
+    namespace: str = None
+):
+    """
+    Decorator to cache function results.
+
+    Keys are "<key_prefix><namespace>:<args>": namespace defaults to the
+    function's module and qualified name, args are the canonical JSON of the
+    arguments picked by key (see CacheKeyBuilder), hashed when long. self/cls
+    is never part of the key, so methods share entries across instances.
+    The key builder is exposed as the wrapper's cache_key(*args, **kwargs).
+
+    For async functions, single_flight=True coalesces concurrent misses and
+    stale_seconds enables stale-while-revalidate (implies single_flight).
+    """
+    tags = tuple(tags)
     def decorator(func):
+        name = f"{key_prefix}{namespace or f'{func.__module__}.{func.__qualname__}'}"
+        build_key = CacheKeyBuilder(func, name, key)
+
         @wraps(func)
         async def async_wrapper(*args, **kwargs):
-            cache_key = f"{key_prefix}{func.__name__}:{str(args)}:{str(kwargs)}"
+            cache_key = build_key(*args, **kwargs)
             
-            cached_value = get_cache(cache_key)
+            if single_flight or stale_seconds is not None:
+                ran = []
+
+                async def load():
+                    ran.append(True)
+                    return await func(*args, **kwargs)
+
+                result = await get_or_load(cache_key, load, ttl_seconds, tags, stale_seconds)
+                # Coalesced callers didn't run the function either, so they count as hits
+                _count_call(name, hit=not ran)
+                return result
+            
+            cached_value = await get_cache_async(cache_key, tags)
+            _count_call(name, hit=cached_value is not None)
             if cached_value is not None:
                 return cached_value
             
             result = await func(*args, **kwargs)
-            set_cache(cache_key, result, ttl_seconds)
+            await set_cache_async(cache_key, result, ttl_seconds, tags)
             return result
         
         @wraps(func)
         def sync_wrapper(*args, **kwargs):
-            cache_key = f"{key_prefix}{func.__name__}:{str(args)}:{str(kwargs)}"
+            cache_key = build_key(*args, **kwargs)
             
-            cached_value = get_cache(cache_key)
+            cached_value = get_cache(cache_key, tags)
+            _count_call(name, hit=cached_value is not None)
             if cached_value is not None:
                 return cached_value
             
             result = func(*args, **kwargs)
-            set_cache(cache_key, result, ttl_seconds)
+            set_cache(cache_key, result, ttl_seconds, tags)
             return result
         
-        import asyncio
-        if asyncio.iscoroutinefunction(func):
-            return async_wrapper
-        return sync_wrapper
+        wrapper = async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
+        wrapper.cache_key = build_key
+        return wrapper
     
     return decorator
 
 
+def _function_hit_rates() -> Dict[str, dict]:
+    rates = {}
+    for name, counters in list(_function_stats.items()):
+        calls = counters['hits'] + counters['misses']
+        rates[name] = dict(counters, hit_rate=round(counters['hits'] / calls, 4) if calls else 0.0)
+    return rates
+
+
 def get_cache_stats() -> dict:
-    """Get cache statistics."""
-    if _redis_available:
+    """Get cache statistics: hit/miss/eviction counters for each tier."""
+    stats = {
+        'backend': 'redis' if _redis_available else 'memory',
+        'l1': _l1.stats(),
+        'l2': dict(_l2_stats, connected=_redis_available),
+        'tags': len(_generations),
+        'single_flight': dict(_load_stats),
+        'codec': {'serializer': _codec.serializer, 'compression': _codec.compression},
+        'functions': _function_hit_rates(),
+    }
+    stats['total_keys'] = stats['l1']['entries']
+
+    client = _sync_redis()
+    if client is not None:
         try:
-            info = _redis_client.info()
-            return {
-                'backend': 'redis',
-                'connected': True,
-                'used_memory': info.get('used_memory_human', 'unknown'),
-                'total_keys': _redis_client.dbsize()
-            }
+            info = client.info()
+            stats['l2']['used_memory'] = info.get('used_memory_human', 'unknown')
+            stats['total_keys'] = client.dbsize()
         except Exception:
-            pass
-    
-    now = time.time()
-    valid = sum(1 for entry in _memory_cache.values() if entry['expires'] > now)
-    
-    return {
-        'backend': 'memory',
-        'total_keys': len(_memory_cache),
-        'valid_keys': valid
-    }
+            stats['l2']['connected'] = False
+
+    return stats
 
 
 def is_redis_available() -> bool:
     """Check if Redis is available."""
     return _redis_available
+
+
+def redis_client():
+    """The shared sync Redis client for other Redis-backed stores; None while Redis is unavailable."""
+    return _sync_redis()
+
+
+async def async_redis_client():
+    """The shared pooled asyncio Redis client for other Redis-backed stores; None while Redis is unavailable."""
+    return await _async_client()
+
+
+def report_redis_error(action: str, e: Exception):
+    """Record a Redis failure seen by another store, so all users of the connection back off together."""
+    _on_redis_error(action, e)
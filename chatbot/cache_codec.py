@@ -0,0 +1,147 @@
+"""
+Binary codecs for cached values.
+
+Every encoded value starts with one header byte: 0x80 | serializer << 3 | compression.
+Entries written before codecs existed are plain JSON text, which always starts
+with an ASCII byte (< 0x80), so they still decode. Decoding reads the header,
+not the current settings, so changing CACHE_CODEC or CACHE_COMPRESSION never
+breaks entries already in Redis.
+
+Serializers: orjson (default when installed), msgpack, json.
+Compression: zstd (default when installed), zlib, none; applied only to
+payloads of at least CACHE_COMPRESS_MIN_BYTES. Without zstd the default is
+none: zlib shrinks catalogs ~3x but costs more CPU than the JSON it replaces
+(see scripts/bench_cache_codec.py), so it is opt-in for memory-bound Redis.
+"""
+import json
+import logging
+import os
+import zlib
+from typing import Any, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HEADER_FLAG = 0x80
+
+SERIALIZER_IDS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSION_IDS = {"none": 0, "zlib": 1, "zstd": 2}
+_SERIALIZER_NAMES = {v: k for k, v in SERIALIZER_IDS.items()}
+_COMPRESSION_NAMES = {v: k for k, v in COMPRESSION_IDS.items()}
+
+COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))
+ZLIB_LEVEL = 1
+ZSTD_LEVEL = 3
+
+# Same output as json.dumps(..., default=str) for the types we cache:
+# datetimes go through str(), int dict keys become strings
+_ORJSON_OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+class CodecError(Exception):
+    """Raised when a cached value can't be encoded or decoded."""
+
+
+def _available_serializer(name: str) -> bool:
+    return name == "json" or (name == "orjson" and orjson is not None) or (name == "msgpack" and msgpack is not None)
+
+
+def _available_compression(name: str) -> bool:
+    return name in ("none", "zlib") or (name == "zstd" and zstandard is not None)
+
+
+class CacheCodec:
+    """Encodes values to header-tagged bytes and back."""
+
+    def __init__(self, serializer: str = "auto", compression: str = "auto", compress_min_bytes: int = COMPRESS_MIN_BYTES):
+        if serializer == "auto":
+            serializer = "orjson" if orjson is not None else "json"
+        if compression == "auto":
+            compression = "zstd" if zstandard is not None else "none"
+        if serializer not in SERIALIZER_IDS or not _available_serializer(serializer):
+            logger.warning(f"Cache serializer {serializer!r} not available, using json")
+            serializer = "json"
+        if compression not in COMPRESSION_IDS or not _available_compression(compression):
+            # Like the auto default: zlib costs more CPU than it saves unless asked for
+            logger.warning(f"Cache compression {compression!r} not available, using none")
+            compression = "none"
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_min_bytes = compress_min_bytes
+        self._zstd_compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if compression == "zstd" else None
+
+    def encode(self, value: Any) -> bytes:
+        payload = _serialize(self.serializer, value)
+        compression = "none"
+        if self.compression != "none" and len(payload) >= self.compress_min_bytes:
+            compression = self.compression
+            if compression == "zstd":
+                payload = self._zstd_compressor.compress(payload)
+            else:
+                payload = zlib.compress(payload, ZLIB_LEVEL)
+        header = HEADER_FLAG | SERIALIZER_IDS[self.serializer] << 3 | COMPRESSION_IDS[compression]
+        return bytes((header,)) + payload
+
+    def decode(self, raw: Union[bytes, str]) -> Any:
+        if isinstance(raw, str):
+            return json.loads(raw)
+        if not raw or raw[0] < HEADER_FLAG:
+            # Written before codecs: plain JSON text
+            return json.loads(raw)
+
+        header = raw[0]
+        serializer = _SERIALIZER_NAMES.get((header >> 3) & 0x0F)
+        compression = _COMPRESSION_NAMES.get(header & 0x07)
+        if serializer is None or compression is None:
+            raise CodecError(f"Unknown cache header byte 0x{header:02x}")
+        if not _available_serializer(serializer) or not _available_compression(compression):
+            raise CodecError(f"Cache entry needs {serializer}/{compression}, which isn't installed")
+
+        # No copy of a multi-megabyte payload just to drop the header
+        payload = memoryview(raw)[1:]
+        if compression == "zstd":
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        elif compression == "zlib":
+            payload = zlib.decompress(payload)
+        return _deserialize(serializer, payload)
+
+
+def _serialize(serializer: str, value: Any) -> bytes:
+    try:
+        if serializer == "orjson":
+            return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS)
+        if serializer == "msgpack":
+            return msgpack.packb(value, default=str, use_bin_type=True)
+        return json.dumps(value, default=str).encode()
+    except (TypeError, ValueError, OverflowError) as e:
+        raise CodecError(f"Can't encode cache value with {serializer}: {e}")
+
+
+def _deserialize(serializer: str, payload: bytes) -> Any:
+    if serializer == "orjson":
+        return orjson.loads(payload)
+    if serializer == "msgpack":
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+    return json.loads(bytes(payload))
+
+
+def default_codec() -> CacheCodec:
+    return CacheCodec(
+        os.getenv("CACHE_CODEC", "auto").lower(),
+        os.getenv("CACHE_COMPRESSION", "auto").lower()
+    )
@@ -0,0 +1,142 @@
+"""
+Versioned per-vendor catalog snapshot.
+
+Dashboard, widget, low-stock, AI brain and product-list reads all need the
+vendor's whole catalog. Instead of each running its own full table load, they
+share one in-process snapshot per vendor. Every write through InventoryManager
+bumps the vendor's version number, which drops the snapshot so the next read
+reloads it once. Snapshots also expire after SNAPSHOT_MAX_AGE_SECONDS so
+writes made by other workers are picked up.
+
+Services that derive data from the catalog (e.g. low-stock counters) can
+add_listener() to hear about every write.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how stale a snapshot can be when another worker wrote
+SNAPSHOT_MAX_AGE_SECONDS = 60
+
+
+class CatalogSnapshot:
+    """One vendor's products at one catalog version. Treat as read-only."""
+
+    __slots__ = ("user_id", "version", "products", "loaded_at")
+
+    def __init__(self, user_id: str, version: int, products: Tuple[dict, ...]):
+        self.user_id = user_id
+        self.version = version
+        self.products = products
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.products)
+
+
+class CatalogStore:
+    """Per-vendor snapshots with monotonically increasing version numbers."""
+
+    def __init__(self, max_age_seconds: int = SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._clock = itertools.count(1)
+        self._versions: Dict[str, int] = {}
+        self._snapshots: Dict[str, CatalogSnapshot] = {}
+        # One loader at a time per vendor, so a burst of reads costs one query
+        self._load_locks: Dict[str, threading.Lock] = {}
+        # In-flight async loads, shared by concurrent requests on the event loop
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._listeners: List[Callable[[str], None]] = []
+
+    def version(self, user_id: str) -> int:
+        """Current catalog version for a vendor (0 until its first write)."""
+        return self._versions.get(user_id, 0)
+
+    def peek(self, user_id: str) -> Optional[CatalogSnapshot]:
+        """The vendor's snapshot if one is loaded, current and fresh."""
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            return None
+        if snapshot.version != self.version(user_id):
+            return None
+        if time.time() - snapshot.loaded_at > self.max_age_seconds:
+            return None
+        return snapshot
+
+    def get(self, user_id: str, loader: Callable[[], Iterable[dict]]) -> CatalogSnapshot:
+        """Get the vendor's snapshot, calling loader() to build it on a miss."""
+        snapshot = self.peek(user_id)
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(user_id, threading.Lock())
+
+        with load_lock:
+            # Another thread may have loaded it while we waited
+            snapshot = self.peek(user_id)
+            if snapshot is not None:
+                return snapshot
+
+            version = self.version(user_id)
+            return self._store(user_id, version, loader())
+
+    async def get_async(
+        self, user_id: str, loader: Callable[[], Awaitable[Iterable[dict]]]
+    ) -> CatalogSnapshot:
+        """Async get(): concurrent misses on the event loop await one load."""
+        snapshot = self.peek(user_id)
+        if snapshot is not None:
+            return snapshot
+
+        pending = self._pending.get(user_id)
+        if pending is None or pending.get_loop() is not asyncio.get_running_loop():
+            pending = asyncio.ensure_future(self._load_async(user_id, loader))
+            self._pending[user_id] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(user_id, None))
+        return await asyncio.shield(pending)
+
+    async def _load_async(self, user_id: str, loader) -> CatalogSnapshot:
+        version = self.version(user_id)
+        return self._store(user_id, version, await loader())
+
+    def _store(self, user_id: str, version: int, products: Iterable[dict]) -> CatalogSnapshot:
+        snapshot = CatalogSnapshot(user_id, version, tuple(products))
+        with self._lock:
+            # A write landed mid-load: serve what we read, but don't keep it
+            if self.version(user_id) == version:
+                self._snapshots[user_id] = snapshot
+        return snapshot
+
+    def bump(self, user_id: str) -> int:
+        """Record a catalog write: advance the version and drop the snapshot."""
+        with self._lock:
+            version = next(self._clock)
+            self._versions[user_id] = version
+            self._snapshots.pop(user_id, None)
+        for listener in self._listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.warning(f"Catalog write listener failed for {user_id}: {e}")
+        return version
+
+    def add_listener(self, listener: Callable[[str], None]):
+        """Call listener(user_id) after every bump, on the writing thread; keep it cheap."""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def clear(self):
+        """Drop every snapshot (versions keep increasing)."""
+        with self._lock:
+            self._snapshots.clear()
+
+
+# Singleton instance
+catalog_store = CatalogStore()
@@ -15,6 +15,30 @@ class Settings(BaseSettings):
     # Application
     order_reservation_minutes: int = 15
     min_stock_threshold: int = 1
+    low_stock_threshold: int = 5
+    
+    # Cache warm-up for the most active vendors (interval 0 = only at startup)
+    warmup_vendors: int = 50
+    warmup_concurrency: int = 4
+    warmup_interval_minutes: int = 0
+    
+    # Dashboard/widget counters are recomputed from orders and products this often
+    counters_reconcile_minutes: int = 15
+    
+    # Chat sessions idle this long are dropped; beyond the cap the least recently used go first
+    conversation_ttl_minutes: int = 30
+    conversation_max_sessions: int = 200_000
+    
+    # Where chat sessions, vendor bot state and usage counters live: "memory" (this
+    # worker only) or "redis" (shared by all workers); empty = redis when REDIS_URL is set
+    state_backend: str = ""
+    
+    # Business AI history sent to the model (estimated tokens); idle conversations expire
+    business_ai_history_tokens: int = 1200
+    business_ai_history_ttl_hours: int = 24
+    
+    # Responses to idempotent requests and webhook deliveries are kept this long
+    idempotency_ttl_hours: int = 24
     
     # Gemini AI (optional - for enhanced chatbot features)
     gemini_api_key: str = ""
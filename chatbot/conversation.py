@@ -1,75 +1,315 @@
 """
 Conversation state management for smart multi-turn chatbot.
 Tracks context so the bot remembers what products were discussed.
+
+States are kept compact so memory stays flat however many customers message
+us: ConversationState uses __slots__ and keeps product summaries (id, name,
+price, stock, a short image URL and a few voice tags) as tuples instead of full product dicts,
+which can carry descriptions and base64 images. Summary strings are interned,
+so customers looking at the same products share one copy of them.
+
+ConversationManager holds states in access order (least recently used
+first). With one TTL for everybody that order is also expiry order, so idle
+sessions are evicted by popping from the front - O(1) per eviction, no heap
+or scan - on every access, and by a background sweeper (start()/stop()) so
+they also go when nobody is messaging. A hard cap evicts the least recently
+used session when a new one would exceed it.
+
+With a shared state store (several workers), states live in the store
+instead, as one hash per customer with the session TTL on the key:
+get_state() loads it and save_state() writes it back after each message
+(get_state_async() / save_state_async() in async handlers).
 """
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Any, FrozenSet, Mapping, Tuple
+from types import MappingProxyType
+from datetime import datetime
+
+from .config import settings
+from .state_store import state_store
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps of idle sessions
+SWEEP_INTERVAL_SECONDS = 60
+
+# (id, name, price_ngn, stock_level, image_url, voice_tags)
+ProductSummary = Tuple[str, str, float, int, Optional[str], Tuple[str, ...]]
+# Voice tags kept per summary, enough for "the red one" style selections
+MAX_SUMMARY_TAGS = 5
+
+
+def _tags(voice_tags) -> Tuple[str, ...]:
+    return _shared_tags(tuple(str(tag) for tag in (voice_tags or ())[:MAX_SUMMARY_TAGS]))
+
+
+@lru_cache(maxsize=4096)
+def _shared_tags(tags: Tuple[str, ...]) -> Tuple[str, ...]:
+    """One tuple per distinct tag list, so sessions showing the same product share it."""
+    return tuple(sys.intern(tag) for tag in tags)
+
+
+def summarize_product(product: dict) -> ProductSummary:
+    """The fields the chat flow needs from a product (inline data: images are dropped)."""
+    image_url = product.get("image_url") or None
+    if image_url and image_url.startswith("data:"):
+        image_url = None
+    return (
+        sys.intern(str(product.get("id", ""))),
+        sys.intern(str(product.get("name", ""))),
+        product.get("price_ngn", 0),
+        product.get("stock_level", 0),
+        sys.intern(image_url) if image_url else None,
+        _tags(product.get("voice_tags"))
+    )
+
+
+def _summary_from_list(values: list) -> ProductSummary:
+    # States saved before voice tags were kept have five values
+    product_id, name, price_ngn, stock_level, image_url, *voice_tags = values
+    return (
+        sys.intern(product_id), sys.intern(name), price_ngn, stock_level,
+        sys.intern(image_url) if image_url else None, _tags(voice_tags[0] if voice_tags else ())
+    )
+
+
+def _product_dict(summary: ProductSummary) -> dict:
+    product_id, name, price_ngn, stock_level, image_url, voice_tags = summary
+    return {"id": product_id, "name": name, "price_ngn": price_ngn, "stock_level": stock_level,
+            "image_url": image_url, "voice_tags": list(voice_tags)}
 
 
 class ConversationState:
     """Tracks conversation context for a user."""
     
+    __slots__ = ("_products", "_current", "awaiting_selection", "last_query", "pending_order_id", "_updated")
+    
     def __init__(self):
-        self.last_products: List[dict] = []  # Products from last search
-        self.current_product: Optional[dict] = None  # Currently selected product
+        self._products: Tuple[ProductSummary, ...] = ()  # Products from last search
+        self._current: Optional[ProductSummary] = None  # Currently selected product
         self.awaiting_selection: bool = False  # Waiting for user to pick from list
         self.last_query: str = ""
-        self.last_updated: datetime = datetime.now()
+        self.pending_order_id: Optional[str] = None  # Unpaid order awaiting "I paid"
+        self._updated: float = time.time()
+    
+    @property
+    def last_products(self) -> List[dict]:
+        """Product summaries from the last search, as dicts."""
+        return [_product_dict(summary) for summary in self._products]
+    
+    @property
+    def current_product(self) -> Optional[dict]:
+        """Summary of the selected product, as a dict."""
+        return _product_dict(self._current) if self._current else None
     
-    def is_expired(self, timeout_minutes: int = 30) -> bool:
+    @current_product.setter
+    def current_product(self, product: Optional[dict]):
+        self._current = summarize_product(product) if product else None
+    
+    @property
+    def last_updated(self) -> datetime:
+        return datetime.fromtimestamp(self._updated)
+    
+    def touch(self, now: float = None):
+        self._updated = now if now is not None else time.time()
+    
+    def is_expired(self, timeout_minutes: int = 30, now: float = None) -> bool:
         """Check if conversation has expired due to inactivity."""
-        return datetime.now() - self.last_updated > timedelta(minutes=timeout_minutes)
+        return (now if now is not None else time.time()) - self._updated > timeout_minutes * 60
     
     def reset(self):
         """Reset conversation state."""
-        self.last_products = []
-        self.current_product = None
+        self._products = ()
+        self._current = None
         self.awaiting_selection = False
         self.last_query = ""
-        self.last_updated = datetime.now()
+        self.touch()
     
     def set_products(self, products: List[dict], query: str):
         """Store products from a search."""
-        self.last_products = products
+        self._products = tuple(summarize_product(p) for p in products)
         self.last_query = query
         self.awaiting_selection = len(products) > 1
-        self.current_product = products[0] if len(products) == 1 else None
-        self.last_updated = datetime.now()
+        self._current = self._products[0] if len(products) == 1 else None
+        self.touch()
     
     def select_product(self, product: dict):
         """Select a specific product."""
         self.current_product = product
         self.awaiting_selection = False
-        self.last_updated = datetime.now()
+        self.touch()
+    
+    def to_fields(self) -> Dict[str, str]:
+        """Encode as short hash fields for a state store, leaving out defaults."""
+        fields = {"t": f"{self._updated:.0f}"}
+        if self._products:
+            fields["p"] = json.dumps(self._products, separators=(",", ":"))
+        if self._current:
+            # Usually one of the listed products: store its index, not a copy
+            index = self._products.index(self._current) if self._current in self._products else -1
+            fields["c"] = str(index) if index >= 0 else json.dumps(self._current, separators=(",", ":"))
+        if self.awaiting_selection:
+            fields["a"] = "1"
+        if self.last_query:
+            fields["q"] = self.last_query
+        if self.pending_order_id:
+            fields["o"] = self.pending_order_id
+        return fields
+    
+    @classmethod
+    def from_fields(cls, fields: Mapping[str, str]) -> "ConversationState":
+        """Decode a state written by to_fields()."""
+        state = cls()
+        state._products = tuple(_summary_from_list(p) for p in json.loads(fields.get("p") or "[]"))
+        current = fields.get("c")
+        if current:
+            state._current = (
+                _summary_from_list(json.loads(current)) if current.startswith("[") else state._products[int(current)]
+            )
+        state.awaiting_selection = fields.get("a") == "1"
+        state.last_query = fields.get("q", "")
+        state.pending_order_id = fields.get("o")
+        state._updated = float(fields.get("t") or time.time())
+        return state
 
 
 class ConversationManager:
-    """Manages conversation states for all users."""
+    """Manages conversation states for all users, with idle expiry and a size cap."""
     
-    def __init__(self):
-        self._states: Dict[str, ConversationState] = {}
+    def __init__(self, ttl_minutes: int = None, max_sessions: int = None, store=None):
+        self.ttl_minutes = ttl_minutes or settings.conversation_ttl_minutes
+        self.max_sessions = max_sessions or settings.conversation_max_sessions
+        # Only a shared store is used; a process-local one would just copy _states
+        self.store = store if store is not None and store.shared else None
+        self._lock = threading.Lock()
+        # {user_id: state}, least recently used first
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self._evicted = {"expired": 0, "capacity": 0}
+        self._sweep_task: Optional[asyncio.Task] = None
     
     def get_state(self, user_id: str) -> ConversationState:
         """Get or create conversation state for a user."""
-        if user_id not in self._states:
-            self._states[user_id] = ConversationState()
-        
-        state = self._states[user_id]
-        
-        # Reset if expired
-        if state.is_expired():
-            state.reset()
-        
+        now = time.time()
+        if self.store is not None:
+            fields = self.store.get_fields(self._key(user_id))
+            state = ConversationState.from_fields(fields) if fields else ConversationState()
+            state.touch(now)
+            return state
+        with self._lock:
+            self._evict_expired(now)
+            state = self._states.get(user_id)
+            if state is not None and state.is_expired(self.ttl_minutes, now):
+                # Touched after a later session, so not at the front yet
+                del self._states[user_id]
+                self._evicted["expired"] += 1
+                state = None
+            if state is None:
+                state = self._states[user_id] = ConversationState()
+                while len(self._states) > self.max_sessions:
+                    self._states.popitem(last=False)
+                    self._evicted["capacity"] += 1
+            else:
+                self._states.move_to_end(user_id)
+            state.touch(now)
+            return state
+    
+    def save_state(self, user_id: str, state: ConversationState):
+        """Write a state back to a shared store (states held in memory are already live)."""
+        if self.store is not None:
+            self.store.set_fields(self._key(user_id), state.to_fields(), ttl_seconds=self.ttl_minutes * 60, replace=True)
+    
+    async def get_state_async(self, user_id: str) -> ConversationState:
+        """get_state() for async handlers: a shared store is read without blocking the loop."""
+        if self.store is None:
+            return self.get_state(user_id)
+        fields = await self.store.get_fields_async(self._key(user_id))
+        state = ConversationState.from_fields(fields) if fields else ConversationState()
+        state.touch(time.time())
         return state
     
+    async def save_state_async(self, user_id: str, state: ConversationState):
+        """save_state() for async handlers."""
+        if self.store is not None:
+            await self.store.set_fields_async(
+                self._key(user_id), state.to_fields(), ttl_seconds=self.ttl_minutes * 60, replace=True
+            )
+    
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"conv:{user_id}"
+    
+    def _evict_expired(self, now: float) -> int:
+        evicted = 0
+        while self._states:
+            oldest = next(iter(self._states.values()))
+            if not oldest.is_expired(self.ttl_minutes, now):
+                break
+            self._states.popitem(last=False)
+            evicted += 1
+        self._evicted["expired"] += evicted
+        return evicted
+    
+    def sweep(self, now: float = None) -> int:
+        """Evict every idle session now. Returns the number evicted."""
+        with self._lock:
+            return self._evict_expired(now if now is not None else time.time())
+    
+    async def _run_sweeper(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                evicted = self.sweep()
+                if evicted:
+                    logger.debug(f"Evicted {evicted} idle chat sessions")
+            except Exception as e:
+                logger.error(f"Chat session sweep failed: {e}")
+    
+    def start(self, interval_seconds: float = SWEEP_INTERVAL_SECONDS):
+        """Evict idle sessions on the running event loop, without waiting for traffic."""
+        if self.store is not None:
+            # The shared store expires sessions itself
+            return
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.get_running_loop().create_task(self._run_sweeper(interval_seconds))
+    
+    async def stop(self):
+        """Cancel the sweeper."""
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            try:
+                await self._sweep_task
+            except asyncio.CancelledError:
+                pass
+            self._sweep_task = None
+    
     def clear_state(self, user_id: str):
         """Clear state for a user."""
-        if user_id in self._states:
-            self._states[user_id].reset()
+        if self.store is not None:
+            self.store.delete(self._key(user_id))
+        with self._lock:
+            self._states.pop(user_id, None)
+    
+    def __len__(self) -> int:
+        return len(self._states)
+    
+    def stats(self) -> dict:
+        return {
+            "backend": "shared" if self.store is not None else "memory",
+            "sessions": len(self._states),
+            "max_sessions": self.max_sessions,
+            "evicted": dict(self._evicted)
+        }
 
 
 # Global conversation manager instance
-conversation_manager = ConversationManager()
+conversation_manager = ConversationManager(store=state_store)
 
 
 # =============================================================================
@@ -133,18 +373,41 @@ def expand_query_with_synonyms(query: str) -> List[str]:
     return expanded_terms
 
 
+def build_synonym_table(synonyms: Dict[str, List[str]]) -> Mapping[str, FrozenSet[str]]:
+    """
+    Precompute every word's synonym set, in both directions.
+
+    A word maps to itself, its own synonyms, and - for every entry that lists
+    it as a synonym - that entry's key and sibling synonyms. Replaces the
+    reverse scan get_all_synonyms used to do over PRODUCT_SYNONYMS per call.
+    """
+    table: Dict[str, set] = {}
+    for key, values in synonyms.items():
+        key = key.lower()
+        values = [v.lower() for v in values]
+        table.setdefault(key, {key}).update(values)
+        for value in values:
+            table.setdefault(value, {value}).add(key)
+            table[value].update(values)
+    return MappingProxyType({word: frozenset(words) for word, words in table.items()})
+
+
+# Frozen word -> synonym-set map, built once at import
+_SYNONYM_TABLE = build_synonym_table(PRODUCT_SYNONYMS)
+
+
+def reload_synonyms():
+    """Rebuild the synonym table after PRODUCT_SYNONYMS has been changed."""
+    global _SYNONYM_TABLE
+    _SYNONYM_TABLE = build_synonym_table(PRODUCT_SYNONYMS)
+
+
+def get_synonym_table() -> Mapping[str, FrozenSet[str]]:
+    """Get the global word -> synonym-set map."""
+    return _SYNONYM_TABLE
+
+
 def get_all_synonyms(word: str) -> List[str]:
-    """Get all synonyms for a word."""
+    """Get all synonyms for a word (O(1) lookup in the precomputed table)."""
     word_lower = word.lower()
-    synonyms = [word_lower]
-    
-    if word_lower in PRODUCT_SYNONYMS:
-        synonyms.extend(PRODUCT_SYNONYMS[word_lower])
-    
-    # Also check if this word is a synonym of something else
-    for key, values in PRODUCT_SYNONYMS.items():
-        if word_lower in values and key not in synonyms:
-            synonyms.append(key)
-            synonyms.extend([v for v in values if v not in synonyms])
-    
-    return list(set(synonyms))
+    return list(_SYNONYM_TABLE.get(word_lower, (word_lower,)))
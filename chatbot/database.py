@@ -1,4 +1,9 @@
 import os
+import asyncio
+import logging
+import ssl
+from contextlib import asynccontextmanager
+from typing import Any, Callable, TypeVar
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -26,6 +31,13 @@ if DB_TYPE == "mysql":
     
     conn_str = f"mysql+pymysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_database}?ssl_verify_cert=false"
     
+    # Async driver for the request path (aiomysql takes SSL as a context, not a URL flag)
+    async_conn_str = f"mysql+aiomysql://{mysql_user}:{mysql_password}@{mysql_host}:{mysql_port}/{mysql_database}"
+    _ssl_context = ssl.create_default_context()
+    _ssl_context.check_hostname = False
+    _ssl_context.verify_mode = ssl.CERT_NONE  # Same as ssl_verify_cert=false above
+    async_connect_args = {"ssl": _ssl_context}
+    
 else:
     # ===== SQL Server Configuration =====
     server = os.getenv("DB_SERVER", "kofa-server-bane.database.windows.net")
@@ -35,6 +47,11 @@ else:
     port = os.getenv("DB_PORT", "1433")
     
     conn_str = f'mssql+pymssql://{username}:{password}@{server}:{port}/{database}'
+    
+    # Async driver for the request path
+    odbc_driver = os.getenv("DB_ODBC_DRIVER", "ODBC Driver 18 for SQL Server").replace(" ", "+")
+    async_conn_str = f"mssql+aioodbc://{username}:{password}@{server}:{port}/{database}?driver={odbc_driver}"
+    async_connect_args = {}
 
 # PERFORMANCE: Connection pooling
 engine = create_engine(
@@ -50,3 +67,89 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+
+# ========== ASYNC ENGINE (FastAPI request path) ==========
+# Same database and pool settings through an asyncio driver, so a slow query
+# doesn't block the event loop for every other in-flight request.
+# Scripts and background jobs keep using the sync engine above.
+logger = logging.getLogger(__name__)
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(
+        async_conn_str,
+        connect_args=async_connect_args,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=1800,
+        pool_timeout=10,
+        echo=False
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+except Exception as e:
+    # Driver (aiomysql / aioodbc) or greenlet missing: endpoints fall back to
+    # running the sync session in a worker thread
+    logger.warning(f"Async database engine unavailable, using thread pool: {e}")
+    async_engine = None
+    AsyncSessionLocal = None
+
+T = TypeVar("T")
+
+
+@asynccontextmanager
+async def get_async_session():
+    """
+    Async session with commit/rollback handling.
+    
+    Usage:
+        async with get_async_session() as db:
+            result = await db.execute(select(Product))
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is not available")
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def run_db(fn: Callable[..., T], *args: Any, commit: bool = False, **kwargs: Any) -> T:
+    """
+    Run fn(db, *args, **kwargs) without blocking the event loop.
+    
+    With the async engine, fn gets a sync-style Session bound to an
+    AsyncSession (run_sync), so every query goes through the asyncio driver.
+    Without it, fn runs on a regular SessionLocal in a worker thread.
+    fn should return plain data (dicts/values), not ORM objects.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.run_sync(fn, *args, **kwargs)
+                if commit:
+                    await db.commit()
+                return result
+            except Exception:
+                await db.rollback()
+                raise
+
+    def _run_in_thread():
+        db = SessionLocal()
+        try:
+            result = fn(db, *args, **kwargs)
+            if commit:
+                db.commit()
+            return result
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return await asyncio.to_thread(_run_in_thread)
@@ -0,0 +1,198 @@
+"""
+Batch fuzzy string scoring.
+
+Scores one query against a whole array of candidate strings in a single call
+using rapidfuzz's native cdist kernel, instead of calling fuzzywuzzy once per
+pair from a Python loop. Scores are rounded to integers on the same 0-100
+scale fuzzywuzzy uses, so existing thresholds (> 70, // 4, // 5) keep working.
+
+ratio() is identical to fuzzywuzzy's. partial_ratio() uses rapidfuzz's
+optimal-alignment variant, which can score a little higher than fuzzywuzzy's
+matching-block heuristic when the best alignment isn't one of those blocks.
+
+Falls back to fuzzywuzzy pair by pair if rapidfuzz/numpy are not installed.
+
+RatioIndex answers "which of these words score at least N against this one"
+with BK-trees over Indel distance (the edit distance behind ratio), so only
+the words the trees can't rule out are scored.
+"""
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from rapidfuzz import fuzz as _rf_fuzz, process as _rf_process
+    from rapidfuzz.distance import Indel as _rf_indel
+    _BATCH_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"rapidfuzz/numpy not available, using per-pair fuzzywuzzy: {e}")
+    _BATCH_AVAILABLE = False
+
+
+def _cdist(queries: Sequence[str], choices: Sequence[str], scorer, workers: int):
+    """Run rapidfuzz cdist and round to fuzzywuzzy-style integer scores."""
+    matrix = _rf_process.cdist(
+        queries, choices, scorer=scorer, dtype=np.float32, workers=workers
+    )
+    return np.rint(matrix).astype(np.int32)
+
+
+def ratio_scores(query: str, choices: Sequence[str], workers: int = 1):
+    """
+    fuzz.ratio of query against every choice.
+
+    Returns an integer array (a list without numpy) aligned with choices.
+    """
+    if not choices:
+        return []
+    if _BATCH_AVAILABLE:
+        return _cdist([query], choices, _rf_fuzz.ratio, workers)[0]
+
+    from fuzzywuzzy import fuzz
+    return [fuzz.ratio(query, choice) for choice in choices]
+
+
+def partial_ratio_scores(query: str, choices: Sequence[str], workers: int = 1):
+    """
+    fuzz.partial_ratio of query against every choice.
+
+    Returns an integer array (a list without numpy) aligned with choices.
+    """
+    if not choices:
+        return []
+    if _BATCH_AVAILABLE:
+        return _cdist([query], choices, _rf_fuzz.partial_ratio, workers)[0]
+
+    from fuzzywuzzy import fuzz
+    return [fuzz.partial_ratio(query, choice) for choice in choices]
+
+
+def any_ratio_at_least(queries: Sequence[str], choices: Sequence[str], threshold: int) -> bool:
+    """True if fuzz.ratio of any query/choice pair reaches threshold."""
+    if not queries or not choices:
+        return False
+    if _BATCH_AVAILABLE:
+        return bool((_cdist(queries, choices, _rf_fuzz.ratio, 1) >= threshold).any())
+
+    from fuzzywuzzy import fuzz
+    return any(fuzz.ratio(q, c) >= threshold for q in queries for c in choices)
+
+
+def first_above_per_group(scores, threshold: int, offsets: List[int]) -> List[int]:
+    """
+    For scores of a flattened list of groups, find each group's first score above threshold.
+
+    offsets[i]:offsets[i + 1] is the slice of scores belonging to group i.
+    Returns the winning score per group, or 0 when no score clears threshold.
+    """
+    result = []
+    for start, end in zip(offsets, offsets[1:]):
+        best = 0
+        for i in range(start, end):
+            if scores[i] > threshold:
+                best = int(scores[i])
+                break
+        result.append(best)
+    return result
+
+
+def indel_distance(a: str, b: str) -> int:
+    """Insertions plus deletions turning a into b: len(a) + len(b) - 2 * LCS(a, b)."""
+    if _BATCH_AVAILABLE:
+        return _rf_indel.distance(a, b)
+    previous = [0] * (len(b) + 1)
+    for ch in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if ch == other else max(previous[j + 1], current[j]))
+        previous = current
+    return len(a) + len(b) - 2 * previous[-1]
+
+
+def ratio_from_distance(distance: int, total_length: int) -> int:
+    """fuzz.ratio (rounded like ratio_scores) of two strings with this Indel distance and combined length."""
+    if total_length == 0:
+        return 100
+    return round(100 * (total_length - distance) / total_length)
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Indel distance.
+
+    Indel distance is a metric, so for a node at distance d from the query
+    only children whose edge distance is within d +/- radius can hold a
+    match; whole subtrees are skipped without being scored.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        # node: (word, {edge distance: child node})
+        self._root: Optional[Tuple[str, Dict[int, tuple]]] = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if self._root is None:
+            self._root = (word, {})
+            return
+        node = self._root
+        while True:
+            distance = indel_distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, query: str, radius: int) -> List[Tuple[str, int]]:
+        """Words within radius of query, with their distances."""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        distance_to = _rf_indel.distance if _BATCH_AVAILABLE else indel_distance
+        while stack:
+            word, children = stack.pop()
+            distance = distance_to(query, word)
+            if distance <= radius:
+                found.append((word, distance))
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class RatioIndex:
+    """
+    A fixed word list indexed for "which words have fuzz.ratio >= threshold
+    with this one" lookups.
+
+    ratio >= threshold means distance <= (1 - (threshold - 0.5) / 100) * (len(a) + len(b)),
+    and distance is at least the length difference, so only words within a
+    length band can match. Words are kept in one BK-tree per length: lengths
+    outside the band are skipped outright, and each tree in it is searched
+    with the radius its length allows.
+    """
+
+    def __init__(self, words: Iterable[str], threshold: int):
+        self.threshold = threshold
+        self._slack = (100.5 - threshold) / 100
+        self._trees: Dict[int, BKTree] = {}
+        for word in dict.fromkeys(words):
+            self._trees.setdefault(len(word), BKTree()).add(word)
+
+    def matches(self, query: str) -> List[str]:
+        """Words whose fuzz.ratio with query is at least the threshold."""
+        found = []
+        for length, tree in self._trees.items():
+            total = len(query) + length
+            radius = int(self._slack * total)
+            if abs(len(query) - length) > radius:
+                continue
+            found.extend(
+                word for word, distance in tree.search(query, radius)
+                if ratio_from_distance(distance, total) >= self.threshold
+            )
+        return found
@@ -1,7 +1,19 @@
-"""Intent recognition for customer messages."""
+"""
+Intent recognition for customer messages.
+
+recognize() runs one Aho-Corasick pass over the message that finds every
+keyword list (and every other phrase the rules test for) with an exact
+substring match. Only intents without an exact match, and only as far down
+the priority order as the message gets, fall back to fuzzy matching of its
+words, which looks each distinct word up once in BK-trees of all keywords
+and remembers which intents it is close to.
+"""
 from enum import Enum
-from typing import Optional
-from fuzzywuzzy import fuzz
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional, Union
+from .fuzzy import RatioIndex, any_ratio_at_least
+from .keyword_automaton import KeywordAutomaton
+from .preprocess import PreprocessedMessage, preprocess
 
 
 class Intent(str, Enum):
@@ -53,73 +65,118 @@ class IntentRecognizer:
         "delivery", "when will", "how long", "where my order"
     ]
     
-    def __init__(self, fuzzy_threshold: int = 70):
+    # Other phrases the rules in recognize() look for (exact substrings only)
+    PRODUCT_INDICATORS = ['canvas', 'shoe', 'shirt', 'bag', 'jeans', 'charger',
+                          'trouser', 'joggers', 'polo', 'packing', 'sneakers']
+    HOW_QUESTIONS = ['how do', 'how to', 'what can']
+    # A purchase confirmation wins over a help request
+    CONFIRMATION_WORDS = ['yes', 'okay', 'ok', 'sure', 'proceed', 'buy now']
+    # Words that indicate actual purchase, not inquiry about purchase
+    CLEAR_PURCHASE_SIGNALS = ['yes', 'okay', 'ok', 'sure', 'buy', 'buy now', 'purchase', 'purchase it',
+                              'i\'ll take it', 'proceed', 'send link', 'make i pay',
+                              'i go pay', 'i dey buy', 'gimme', 'abeg sell me']
+    
+    def __init__(self, fuzzy_threshold: int = 70, fuzzy_cache_size: int = 4096):
         """
         Initialize the intent recognizer.
         
         Args:
             fuzzy_threshold: Minimum fuzzy match score (0-100) to consider a match
+            fuzzy_cache_size: Distinct words whose fuzzy matches are remembered
         """
         self.fuzzy_threshold = fuzzy_threshold
+        # Keyword lists matched exactly or fuzzily, by the intent they signal
+        fuzzy_groups = {
+            Intent.HELP: self.HELP_KEYWORDS,
+            Intent.PRICE_INQUIRY: self.PRICE_KEYWORDS,
+            Intent.AVAILABILITY_CHECK: self.AVAILABILITY_KEYWORDS,
+            Intent.PAYMENT_CONFIRMATION: self.PAYMENT_CONFIRMATION_KEYWORDS,
+            Intent.ORDER_STATUS: self.ORDER_STATUS_KEYWORDS,
+            Intent.GREETING: self.GREETING_KEYWORDS,
+        }
+        self._automaton = KeywordAutomaton({
+            **fuzzy_groups,
+            "product": self.PRODUCT_INDICATORS,
+            "how": self.HOW_QUESTIONS,
+            "confirmation": self.CONFIRMATION_WORDS,
+            "purchase_signal": self.CLEAR_PURCHASE_SIGNALS,
+            "want": ['i want', 'i wan'],
+            "buy": ['buy'],
+        })
+        self._keyword_intents: Dict[str, set] = {}
+        for intent, keywords in fuzzy_groups.items():
+            for keyword in keywords:
+                self._keyword_intents.setdefault(keyword, set()).add(intent)
+        self._keyword_index = RatioIndex(self._keyword_intents, fuzzy_threshold)
+        self._fuzzy_intents = lru_cache(maxsize=fuzzy_cache_size)(self._word_fuzzy_intents)
+    
+    def _word_fuzzy_intents(self, word: str) -> FrozenSet[Intent]:
+        """Intents with a keyword whose fuzz.ratio with word reaches the threshold."""
+        return frozenset(
+            intent
+            for keyword in self._keyword_index.matches(word)
+            for intent in self._keyword_intents[keyword]
+        )
     
-    def recognize(self, message: str) -> Intent:
+    def recognize(self, message: Union[str, PreprocessedMessage]) -> Intent:
         """
         Recognize the intent from a message.
         
         Args:
-            message: The customer's message text
+            message: The customer's message text, or the preprocessed message
             
         Returns:
             The recognized intent
         """
-        message_lower = message.lower().strip()
-        
-        # Product indicators - presence suggests product inquiry
-        product_indicators = ['canvas', 'shoe', 'shirt', 'bag', 'jeans', 'charger', 
-                             'trouser', 'joggers', 'polo', 'packing', 'sneakers']
-        has_product_mention = any(word in message_lower for word in product_indicators)
+        message = preprocess(message)
+        # Every keyword list and phrase that occurs exactly, in one pass
+        found = self._automaton.groups_in(message.normalized)
+        fuzzy_found = None
+        
+        def matches(intent: Intent) -> bool:
+            nonlocal fuzzy_found
+            if intent in found:
+                return True
+            if fuzzy_found is None:
+                # Intents any word is close to, looked up once per message
+                fuzzy_found = frozenset().union(*map(self._fuzzy_intents, message.tokens))
+            return intent in fuzzy_found
         
         # Check for help requests early - especially "how do/how to" questions
         # These should take priority over purchase intent
-        is_question_about_how = 'how do' in message_lower or 'how to' in message_lower or 'what can' in message_lower
-        if is_question_about_how or self._matches_keywords(message_lower, self.HELP_KEYWORDS):
+        if "how" in found or matches(Intent.HELP):
             # But if it seems like a purchase confirmation, let purchase take precedence
-            if not any(word in message_lower for word in ['yes', 'okay', 'ok', 'sure', 'proceed', 'buy now']):
+            if "confirmation" not in found:
                 return Intent.HELP
         
         # Check purchase intent (most specific action) - but only for clear purchase signals
-        # Words that indicate actual purchase, not inquiry about purchase
-        clear_purchase_signals = ['yes', 'okay', 'ok', 'sure', 'buy', 'buy now', 'purchase', 'purchase it', 
-                                  'i\'ll take it', 'proceed', 'send link', 'make i pay', 
-                                  'i go pay', 'i dey buy', 'gimme', 'abeg sell me']
-        if any(signal in message_lower for signal in clear_purchase_signals):
+        if "purchase_signal" in found:
             return Intent.PURCHASE
         
         # Check "I want to buy" patterns (intent to purchase)
-        if 'i want' in message_lower or 'i wan' in message_lower:
-            if 'buy' in message_lower:
-                return Intent.PURCHASE
+        if "want" in found and "buy" in found:
+            return Intent.PURCHASE
         
         # Check for price inquiry (specific)
-        if self._matches_keywords(message_lower, self.PRICE_KEYWORDS):
+        if matches(Intent.PRICE_INQUIRY):
             return Intent.PRICE_INQUIRY
         
         # Check for availability
-        if self._matches_keywords(message_lower, self.AVAILABILITY_KEYWORDS):
+        if matches(Intent.AVAILABILITY_CHECK):
             return Intent.AVAILABILITY_CHECK
         
         # Check for payment confirmation
-        if self._matches_keywords(message_lower, self.PAYMENT_CONFIRMATION_KEYWORDS):
+        if matches(Intent.PAYMENT_CONFIRMATION):
             return Intent.PAYMENT_CONFIRMATION
         
         # Check for order status
-        if self._matches_keywords(message_lower, self.ORDER_STATUS_KEYWORDS):
+        if matches(Intent.ORDER_STATUS):
             return Intent.ORDER_STATUS
         
         # Check for greetings LAST (least specific)
         # But only if there are NO product-related terms
-        if self._matches_keywords(message_lower, self.GREETING_KEYWORDS):
-            if not has_product_mention:
+        if matches(Intent.GREETING):
+            if "product" not in found:
                 return Intent.GREETING
             else:
                 # Likely availability check with casual greeting
@@ -127,66 +184,41 @@ class IntentRecognizer:
         
         return Intent.UNKNOWN
     
-    def _matches_keywords(self, message: str, keywords: list[str]) -> bool:
+    def _matches_keywords(self, message: Union[str, PreprocessedMessage], keywords: list[str]) -> bool:
         """
         Check if message matches any of the keywords using fuzzy matching.
         
+        (recognize() gets the same answer for its own keyword lists from the
+        automaton and the keyword index; this is for arbitrary lists.)
+        
         Args:
-            message: The message to check
+            message: The message to check (lowercased), or the preprocessed message
             keywords: List of keywords to match against
             
         Returns:
             True if any keyword matches
         """
-        for keyword in keywords:
-            # Direct substring match
-            if keyword in message:
-                return True
-            
-            # Fuzzy match for individual words
-            words = message.split()
-            for word in words:
-                if fuzz.ratio(word, keyword) >= self.fuzzy_threshold:
-                    return True
+        if isinstance(message, PreprocessedMessage):
+            text, words = message.normalized, message.tokens
+        else:
+            text, words = message, message.split()
         
-        return False
+        # Direct substring match
+        if any(keyword in text for keyword in keywords):
+            return True
+        
+        # Fuzzy match for individual words - every word against every keyword in one batch
+        return any_ratio_at_least(words, keywords, self.fuzzy_threshold)
     
-    def extract_product_query(self, message: str) -> Optional[str]:
+    def extract_product_query(self, message: Union[str, PreprocessedMessage]) -> Optional[str]:
         """
         Extract product name/description from message.
         
         Args:
-            message: The customer's message
+            message: The customer's message, or the preprocessed message
             
         Returns:
             Extracted product query or None
         """
-        message_lower = message.lower().strip()
-        
-        # Nigerian English filler words to remove
-        nigerian_fillers = [
-            "abeg", "oya", "na", "wetin", "dey", "fit", "una", "am", "e", "o",
-            "that", "this", "my", "brother", "sister", "hope", "you", "me", "I",
-            "wan", "make", "for", "be", "go", "don"
-        ]
-        
-        # Combine all filters
-        all_filters = set(
-            ["the", "a", "an", "?", ".", ",", "!", "get", "need", "have"] +
-            nigerian_fillers
-        )
-        
-        words = message_lower.split()
-        product_words = []
-        
-        for word in words:
-            # Clean punctuation
-            clean_word = word.strip("?.,!")
-            # Keep if not a filter word and meaningful length
-            if clean_word not in all_filters and len(clean_word) > 1:
-                product_words.append(clean_word)
-        
-        if product_words:
-            return " ".join(product_words)
-        
-        return None
+        # Punctuation, filler words (Nigerian English included) and single letters removed
+        return preprocess(message).product_query
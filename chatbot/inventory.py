@@ -1,11 +1,21 @@
 """Inventory management with Azure SQL backend using SQLAlchemy."""
 from dataclasses import dataclass, field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Callable, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import or_, func, update
 from contextlib import contextmanager
-from .database import SessionLocal
+from .database import SessionLocal, run_db
 from .models import Product as ProductModel, User as UserModel
+from .search_index import (
+    ProductSearchIndex, get_search_index, peek_search_index, score_product, fuzzy_bonuses,
+    MIN_RESULT_SCORE
+)
+from .fuzzy import ratio_scores
+from .preprocess import PreprocessedMessage, preprocess
+from .catalog import CatalogSnapshot, catalog_store
+from .services.synonyms import synonym_service
+from .services.stock_holds import stock_hold_ledger
+import asyncio
 import uuid
 import json
 import logging
@@ -40,6 +50,34 @@ class Order:
     payment_ref: Optional[str] = None
 
 
+class StockReservationError(Exception):
+    """Raised when a stock reservation cannot be made; nothing was reserved."""
+
+    def __init__(self, message: str, product_id: str = ""):
+        super().__init__(message)
+        self.product_id = product_id
+
+
+class ProductNotFoundError(StockReservationError):
+    """A requested product does not exist for this vendor."""
+
+    def __init__(self, product_id: str):
+        super().__init__(f"Product {product_id} not found", product_id)
+
+
+class InsufficientStockError(StockReservationError):
+    """A requested product does not have enough stock."""
+
+    def __init__(self, product_id: str, product_name: str, available: int, requested: int):
+        super().__init__(
+            f"Insufficient stock for {product_name}. Available: {available}, Requested: {requested}",
+            product_id
+        )
+        self.product_name = product_name
+        self.available = available
+        self.requested = requested
+
+
 class InventoryManager:
     """
     Manages product inventory using Azure SQL with SQLAlchemy.
@@ -77,6 +115,20 @@ class InventoryManager:
         finally:
             db.close()
 
+    @contextmanager
+    def _write_session(self):
+        """
+        Session for writes to this vendor's products.
+
+        Bumps the catalog version once the transaction is over (committed or
+        not), so the next read reloads the shared snapshot.
+        """
+        try:
+            with self._get_db_session() as db:
+                yield db
+        finally:
+            catalog_store.bump(self.user_id)
+
     def _log_debug(self, message: str, data: dict = None):
         """Log debug information to the debug log file."""
         try:
@@ -169,7 +221,7 @@ class InventoryManager:
                 "image_url": None
             }
 
-        with self._get_db_session() as db:
+        with self._write_session() as db:
             # Create SQLAlchemy model
             # Serialize voice_tags to JSON string for SQL Server
             voice_tags_json = json.dumps(product_data["voice_tags"]) if product_data["voice_tags"] else None
@@ -190,7 +242,10 @@ class InventoryManager:
             db.flush()
             db.refresh(product)
 
-            return self._model_to_dict(product)
+            result = self._model_to_dict(product)
+
+        self._reindex_product(result)
+        return result
 
     def search_product(self, query: str) -> Optional[Product]:
         """
@@ -272,17 +327,24 @@ class InventoryManager:
 
             return None
 
+    def _get_product(self, db: Session, product_id: str) -> Optional[dict]:
+        product = db.query(ProductModel).filter(
+            ProductModel.id == product_id,
+            ProductModel.user_id == self.user_id
+        ).first()
+
+        if product:
+            return self._model_to_dict(product)
+        return None
+
     def get_product_by_id(self, product_id: str) -> Optional[dict]:
         """Get a product by its ID."""
         with self._get_db_session() as db:
-            product = db.query(ProductModel).filter(
-                ProductModel.id == product_id,
-                ProductModel.user_id == self.user_id
-            ).first()
+            return self._get_product(db, product_id)
 
-            if product:
-                return self._model_to_dict(product)
-            return None
+    async def get_product_by_id_async(self, product_id: str) -> Optional[dict]:
+        """Async get_product_by_id() for the request path."""
+        return await run_db(self._get_product, product_id)
 
     def check_stock(self, product_id: str) -> int:
         """Check the stock level for a product by ID."""
@@ -309,7 +371,7 @@ class InventoryManager:
         })
         # #endregion
 
-        with self._get_db_session() as db:
+        with self._write_session() as db:
             try:
                 # Use SQLAlchemy ORM to find and update the product
                 from .models import Product as ProductModel
@@ -383,9 +445,158 @@ class InventoryManager:
         finally:
             self._close_db()
 
+    @staticmethod
+    def _merge_quantities(items: List[Tuple[str, int]]) -> Dict[str, int]:
+        """Combine repeated product IDs into one quantity each, keeping first-seen order."""
+        merged: Dict[str, int] = {}
+        for product_id, quantity in items:
+            merged[str(product_id)] = merged.get(str(product_id), 0) + int(quantity)
+        return merged
+
+    def reserve_items(
+        self,
+        items: List[Tuple[str, int]],
+        validate: Optional[Callable[[dict], None]] = None
+    ) -> Dict[str, dict]:
+        """
+        Atomically reserve stock for several products in ONE transaction.
+
+        Locks every requested row with a single SELECT ... FOR UPDATE, then
+        decrements each with a conditional UPDATE (stock_level >= quantity), so
+        concurrent orders can never oversell. Either every item is reserved and
+        committed, or nothing is. Stock held for unpaid chatbot orders
+        (see services.stock_holds) counts as unavailable.
+
+        Args:
+            items: [(product_id, quantity), ...]; repeated IDs are combined
+            validate: Optional check run on each locked product (as a dict)
+                before any stock changes; raising from it aborts the reservation
+
+        Returns:
+            {product_id: product dict with the post-reservation stock_level}
+
+        Raises:
+            ProductNotFoundError / InsufficientStockError (nothing is reserved)
+        """
+        quantities = self._merge_quantities(items)
+        if not quantities:
+            return {}
+
+        with self._write_session() as db:
+            return self._reserve_in_session(db, quantities, validate)
+
+    async def reserve_items_async(
+        self,
+        items: List[Tuple[str, int]],
+        validate: Optional[Callable[[dict], None]] = None
+    ) -> Dict[str, dict]:
+        """Async reserve_items() for the request path; same all-or-nothing semantics."""
+        quantities = self._merge_quantities(items)
+        if not quantities:
+            return {}
+
+        try:
+            return await run_db(self._reserve_in_session, quantities, validate, commit=True)
+        finally:
+            catalog_store.bump(self.user_id)
+
+    def _reserve_in_session(
+        self,
+        db: Session,
+        quantities: Dict[str, int],
+        validate: Optional[Callable[[dict], None]]
+    ) -> Dict[str, dict]:
+        rows = db.query(ProductModel).filter(
+            ProductModel.user_id == self.user_id,
+            ProductModel.id.in_(list(quantities))
+        ).with_for_update().all()
+        by_id = {str(p.id): p for p in rows}
+        # Stock held by unpaid chatbot orders (on any worker) is not for sale
+        held = stock_hold_ledger.held_in_session(db, list(quantities))
+
+        # Validate everything before touching any stock
+        products = {}
+        for product_id, quantity in quantities.items():
+            product = by_id.get(product_id)
+            if product is None:
+                raise ProductNotFoundError(product_id)
+            available = int(product.stock_level) - held.get(product_id, 0)
+            if available < quantity:
+                raise InsufficientStockError(product_id, product.name, max(0, available), quantity)
+            products[product_id] = self._model_to_dict(product)
+            if validate:
+                validate(products[product_id])
+
+        for product_id, quantity in quantities.items():
+            result = db.execute(
+                update(ProductModel)
+                .where(
+                    ProductModel.id == product_id,
+                    ProductModel.user_id == self.user_id,
+                    ProductModel.stock_level >= quantity
+                )
+                .values(stock_level=ProductModel.stock_level - quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                # Only possible if the row lock isn't honoured (e.g. SQLite); abort everything
+                raise InsufficientStockError(
+                    product_id, products[product_id]["name"],
+                    products[product_id]["stock_level"], quantity
+                )
+            products[product_id]["stock_level"] -= quantity
+
+        return products
+
+    def release_items(self, items: List[Tuple[str, int]]) -> bool:
+        """
+        Give back stock taken by reserve_items, in one transaction.
+
+        Returns True if every product was found and restored.
+        """
+        quantities = self._merge_quantities(items)
+        if not quantities:
+            return True
+
+        try:
+            with self._write_session() as db:
+                return self._release_in_session(db, quantities)
+        except Exception as e:
+            logger.error(f"Error releasing reserved stock {quantities}: {e}")
+            return False
+
+    async def release_items_async(self, items: List[Tuple[str, int]]) -> bool:
+        """Async release_items() for the request path."""
+        quantities = self._merge_quantities(items)
+        if not quantities:
+            return True
+
+        try:
+            return await run_db(self._release_in_session, quantities, commit=True)
+        except Exception as e:
+            logger.error(f"Error releasing reserved stock {quantities}: {e}")
+            return False
+        finally:
+            catalog_store.bump(self.user_id)
+
+    def _release_in_session(self, db: Session, quantities: Dict[str, int]) -> bool:
+        restored = 0
+        for product_id, quantity in quantities.items():
+            result = db.execute(
+                update(ProductModel)
+                .where(
+                    ProductModel.id == product_id,
+                    ProductModel.user_id == self.user_id
+                )
+                .values(stock_level=ProductModel.stock_level + quantity)
+                .execution_options(synchronize_session=False)
+            )
+            restored += result.rowcount
+        return restored == len(quantities)
+
     def update_stock(self, product_id: str, quantity_delta: int) -> Optional[dict]:
         """Updates stock level (positive for restock, negative for sale)."""
-        with self._get_db_session() as db:
+        with self._write_session() as db:
             product = db.query(ProductModel).filter(
                 ProductModel.id == product_id,
                 ProductModel.user_id == self.user_id
@@ -402,7 +613,7 @@ class InventoryManager:
 
     def update_product_fields(self, product_id: str, updates: dict) -> Optional[dict]:
         """Update product fields (name, price, stock, description, etc.)."""
-        with self._get_db_session() as db:
+        with self._write_session() as db:
             product = db.query(ProductModel).filter(
                 ProductModel.id == product_id,
                 ProductModel.user_id == self.user_id
@@ -431,11 +642,14 @@ class InventoryManager:
             db.flush()
             db.refresh(product)
 
-            return self._model_to_dict(product)
+            result = self._model_to_dict(product)
+
+        self._reindex_product(result)
+        return result
 
     def delete_product(self, product_id: str) -> bool:
         """Delete a product from inventory."""
-        with self._get_db_session() as db:
+        with self._write_session() as db:
             try:
                 product = db.query(ProductModel).filter(
                     ProductModel.id == product_id,
@@ -446,19 +660,40 @@ class InventoryManager:
                     return False
 
                 db.delete(product)
-                return True
             except Exception as e:
                 logger.error(f"Error deleting product {product_id}: {e}")
                 return False
 
-    def list_products(self) -> List[dict]:
-        """List all products - PERFORMANCE OPTIMIZED."""
+        self._unindex_product(product_id)
+        return True
+
+    def _query_catalog(self, db: Session) -> List[dict]:
+        products = db.query(ProductModel).filter(
+            ProductModel.user_id == self.user_id
+        ).all()
+
+        return [self._model_to_dict(p) for p in products]
+
+    def _load_catalog(self) -> List[dict]:
+        """Load every product for this vendor from the database."""
         with self._get_db_session() as db:
-            products = db.query(ProductModel).filter(
-                ProductModel.user_id == self.user_id
-            ).all()
+            return self._query_catalog(db)
+
+    def catalog_snapshot(self) -> CatalogSnapshot:
+        """Shared, versioned snapshot of this vendor's catalog (read-only)."""
+        return catalog_store.get(self.user_id, self._load_catalog)
 
-            return [self._model_to_dict(p) for p in products]
+    async def catalog_snapshot_async(self) -> CatalogSnapshot:
+        """Async catalog_snapshot() for the request path."""
+        return await catalog_store.get_async(self.user_id, lambda: run_db(self._query_catalog))
+
+    def list_products(self) -> List[dict]:
+        """List all products - served from the shared catalog snapshot."""
+        return [dict(p) for p in self.catalog_snapshot().products]
+
+    async def list_products_async(self) -> List[dict]:
+        """Async list_products() for the request path."""
+        return [dict(p) for p in (await self.catalog_snapshot_async()).products]
 
     def create_order(self, customer_phone: str, items: List[Dict], total_amount_ngn: float) -> Optional[Order]:
         """Create a new order (legacy method - kept for compatibility)."""
@@ -466,159 +701,121 @@ class InventoryManager:
         # which uses the Order model directly
         return None
 
-    def smart_search_products(self, query: str) -> List[dict]:
+    def _search_index(self, db: Session) -> ProductSearchIndex:
+        """Get this vendor's search index, (re)building it from the database if needed."""
+        index = get_search_index(self.user_id)
+        if not index.built_at or index.is_stale():
+            # Only the searchable columns - never drag image blobs in here
+            rows = db.query(
+                ProductModel.id,
+                ProductModel.name,
+                ProductModel.voice_tags,
+                ProductModel.description,
+                ProductModel.category
+            ).filter(ProductModel.user_id == self.user_id).all()
+            index.rebuild(
+                {
+                    "id": r.id,
+                    "name": r.name,
+                    "voice_tags": r.voice_tags,
+                    "description": r.description,
+                    "category": r.category
+                }
+                for r in rows
+            )
+        return index
+
+    async def warm_search_index_async(self):
+        """Build this vendor's search index ahead of the first customer query."""
+        await run_db(self._search_index)
+
+    def _reindex_product(self, product: dict):
+        """Keep an already-built search index in step with a product write."""
+        index = peek_search_index(self.user_id)
+        if index is not None:
+            index.upsert(product)
+
+    def _unindex_product(self, product_id: str):
+        """Drop a deleted product from an already-built search index."""
+        index = peek_search_index(self.user_id)
+        if index is not None:
+            index.remove(product_id)
+
+    def _load_products_by_ids(self, db: Session, product_ids: List[str]) -> List[dict]:
+        """Fetch products by ID, returned in the order of product_ids."""
+        if not product_ids:
+            return []
+        rows = db.query(ProductModel).filter(
+            ProductModel.user_id == self.user_id,
+            ProductModel.id.in_(product_ids)
+        ).all()
+        by_id = {str(p.id): p for p in rows}
+        return [self._model_to_dict(by_id[pid]) for pid in product_ids if pid in by_id]
+
+    def smart_search_products(self, query: Union[str, PreprocessedMessage]) -> List[dict]:
         """
         Smart product search that ALWAYS tries to find matching products.
         Uses multiple strategies to avoid false \"not found\" responses.
-        PERFORMANCE OPTIMIZED: Uses context manager for session handling.
+        PERFORMANCE OPTIMIZED: Candidates come from the vendor's in-memory
+        search index, so only a few dozen products are scored per query and
+        only the matches are loaded from the database.
         
+        The query may be a preprocessed message, whose tokens are reused.
+
         Returns: List of matching products (may be empty only if truly nothing matches)
         """
-        from fuzzywuzzy import fuzz
-        from .conversation import expand_query_with_synonyms, get_all_synonyms
-
         with self._get_db_session() as db:
-            query_lower = query.lower().strip()
-            query_words = query_lower.split()
+            query = preprocess(query)
+            query_lower, query_words = query.normalized, query.tokens
 
-            # Get all products for this user
-            all_products = db.query(ProductModel).filter(
-                ProductModel.user_id == self.user_id
-            ).all()
-
-            if not all_products:
+            index = self._search_index(db)
+            if not len(index):
                 return []
 
-            # Score each product based on multiple matching strategies
-            scored_products = []
-
-            for product in all_products:
-                score = 0
-                name_lower = product.name.lower()
-                description_lower = (product.description or "").lower()
-                category_lower = (product.category or "").lower()
-                # Parse voice_tags from JSON
-                tags_raw = product.voice_tags or "[]"
-                if isinstance(tags_raw, str):
-                    try:
-                        tags_list = json.loads(tags_raw)
-                    except (json.JSONDecodeError, TypeError):
-                        tags_list = []
-                else:
-                    tags_list = tags_raw or []
-                tags = [t.lower() for t in tags_list]
-
-                # STRATEGY 1: Exact name match (highest priority)
-                if query_lower in name_lower:
-                    score += 100
-
-                # STRATEGY 2: Exact voice tag match
-                for tag in tags:
-                    if query_lower == tag or query_lower in tag or tag in query_lower:
-                        score += 80
-                        break
+            # Expand synonyms once per query (built-in + this vendor's custom lists)
+            synonyms = synonym_service.expand(self.user_id, query_words)
 
-                # STRATEGY 3: Word-by-word matching
-                for word in query_words:
-                    if len(word) < 2:
-                        continue
-
-                    if word in name_lower:
-                        score += 40
-
-                    for tag in tags:
-                        if word in tag:
-                            score += 35
-                            break
-
-                    if word in description_lower:
-                        score += 15
-
-                    if word in category_lower:
-                        score += 25
+            # Score each candidate based on multiple matching strategies
+            candidates = index.candidates(query_lower, query_words, synonyms)
+            bonuses = fuzzy_bonuses(candidates, query_lower)
+            scored_products = []
+            for doc, fuzzy_bonus in zip(candidates, bonuses):
+                score = score_product(doc, query_lower, query_words, fuzzy_bonus, synonyms)
+                if score > 0:
+                    scored_products.append((doc, score))
 
-                # STRATEGY 4: Synonym matching
-                for word in query_words:
-                    if len(word) < 3:
-                        continue
-                    synonyms = get_all_synonyms(word)
-                    for synonym in synonyms:
-                        if synonym in name_lower:
-                            score += 30
-                        for tag in tags:
-                            if synonym in tag:
-                                score += 25
-                                break
-                        if synonym in category_lower:
-                            score += 20
-
-                # STRATEGY 5: Fuzzy matching (for typos/variations)
-                name_fuzzy = fuzz.partial_ratio(query_lower, name_lower)
-                if name_fuzzy > 70:
-                    score += name_fuzzy // 4
+            # Sort by score (highest first), catalog order breaks ties
+            scored_products.sort(key=lambda x: (-x[1], x[0].seq))
 
-                for tag in tags:
-                    tag_fuzzy = fuzz.ratio(query_lower, tag)
-                    if tag_fuzzy > 70:
-                        score += tag_fuzzy // 5
-                        break
-
-                # STRATEGY 6: Category fallback
-                category_terms = {
-                    "footwear": ["shoe", "shoes", "sneaker", "sneakers", "canvas", "kicks"],
-                    "clothing": ["shirt", "shorts", "jeans", "trouser", "top", "clothes"],
-                    "accessories": ["bag", "wallet", "chain", "glasses", "shades"],
-                    "jewelry": ["chain", "necklace", "gold", "ring", "earring"],
-                    "electronics": ["charger", "phone", "cable", "earphones"]
-                }
+            # Return products with meaningful scores
+            matched_ids = [doc.product_id for doc, s in scored_products if s >= MIN_RESULT_SCORE]
 
-                for cat, terms in category_terms.items():
-                    if any(term in query_lower for term in terms):
-                        if category_lower == cat:
-                            score += 20
+            # If no results, try even more aggressive matching
+            if not matched_ids:
+                matched_ids = [doc.product_id for doc in index.substring_matches(query_words)]
 
-                if score > 0:
-                    scored_products.append((product, score))
+            return self._load_products_by_ids(db, matched_ids)
 
-            # Sort by score (highest first)
-            scored_products.sort(key=lambda x: x[1], reverse=True)
+    async def smart_search_products_async(self, query: Union[str, PreprocessedMessage]) -> List[dict]:
+        """
+        Async smart_search_products() for the request path.
 
-            # Return products with meaningful scores
-            results = [self._model_to_dict(p) for p, s in scored_products if s >= 20]
+        Search is mostly CPU work on the in-memory index plus a couple of small
+        lookups, so it runs whole in a worker thread rather than per query.
+        """
+        return await asyncio.to_thread(self.smart_search_products, query)
 
-            # If no results, try even more aggressive matching
-            if not results:
-                for product in all_products:
-                    name_lower = product.name.lower()
-                    # Parse voice_tags from JSON
-                    tags_raw = product.voice_tags or "[]"
-                    if isinstance(tags_raw, str):
-                        try:
-                            tags_list = json.loads(tags_raw)
-                        except (json.JSONDecodeError, TypeError):
-                            tags_list = []
-                    else:
-                        tags_list = tags_raw or []
-                    tags = [t.lower() for t in tags_list]
-
-                    for word in query_words:
-                        if len(word) >= 3:
-                            if word in name_lower or any(word in t for t in tags):
-                                prod_dict = self._model_to_dict(product)
-                                if prod_dict not in results:
-                                    results.append(prod_dict)
-
-            return results
-
-    def find_product_by_selection(self, selection: str, product_list: List[dict]) -> Optional[dict]:
+    def find_product_by_selection(
+        self,
+        selection: Union[str, PreprocessedMessage],
+        product_list: List[dict]
+    ) -> Optional[dict]:
         """
         Find a product from a list based on user selection.
         Handles: "1", "first", "the red one", "green yam", etc.
         PRIORITIZES exact name matches over partial matches.
         """
-        from fuzzywuzzy import fuzz
-
-        selection_lower = selection.lower().strip()
+        selection_lower = preprocess(selection).normalized
 
         # Handle numeric selection: "1", "2", etc.
         if selection_lower.isdigit():
@@ -655,14 +852,15 @@ class InventoryManager:
         best_match = None
         best_score = 0
 
-        for product in product_list:
+        # Full phrase fuzzy match against every name in one batch call
+        name_scores = ratio_scores(
+            clean_selection, [product.get("name", "").lower() for product in product_list]
+        )
+
+        for product, name_fuzzy in zip(product_list, name_scores):
             name_lower = product.get("name", "").lower()
             tags = [t.lower() for t in product.get("voice_tags", [])]
-            score = 0
-
-            # Full phrase fuzzy match against name
-            name_fuzzy = fuzz.ratio(clean_selection, name_lower)
-            score += name_fuzzy
+            score = int(name_fuzzy)
 
             # Check word-by-word
             selection_words = clean_selection.split()
@@ -0,0 +1,71 @@
+"""
+Aho-Corasick automaton for multi-pattern keyword matching.
+
+Compiles many groups of keywords into one automaton, so a single left to
+right pass over a message finds every group with a keyword occurring in it
+(as a substring, overlaps included), instead of one `in` test per keyword per
+group. Matching is exact and case-sensitive, like `keyword in text`.
+
+Transitions are precomputed for every state and every character that occurs
+in a keyword (a DFA), so the scan is one dict lookup per character; a
+character no keyword contains sends the automaton back to the root.
+"""
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List
+
+
+class KeywordAutomaton:
+    """Finds which keyword groups occur in a text, in one pass."""
+
+    def __init__(self, groups: Dict[str, Iterable[str]]):
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[set] = [set()]
+        for group, keywords in groups.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                state = 0
+                for ch in keyword:
+                    if ch not in goto[state]:
+                        goto.append({})
+                        outputs.append(set())
+                        goto[state][ch] = len(goto) - 1
+                    state = goto[state][ch]
+                outputs[state].add(group)
+
+        # Breadth-first: a state's failure link (longest proper suffix that is
+        # also a keyword prefix) is always shallower, so it is complete first
+        alphabet = {ch for edges in goto for ch in edges}
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [None] * (len(goto) - 1)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] |= outputs[fail[state]]
+            transitions = {}
+            for ch in alphabet:
+                child = goto[state].get(ch)
+                if child is not None:
+                    fail[child] = delta[fail[state]].get(ch, 0) if state else 0
+                    transitions[ch] = child
+                    queue.append(child)
+                else:
+                    target = delta[fail[state]].get(ch, 0)
+                    if target:
+                        transitions[ch] = target
+            delta[state] = transitions
+
+        self._delta = delta
+        self._outputs: List[FrozenSet[str]] = [frozenset(groups) for groups in outputs]
+        self.groups = frozenset(groups)
+
+    def groups_in(self, text: str) -> FrozenSet[str]:
+        """Groups with at least one keyword occurring in text."""
+        delta, outputs = self._delta, self._outputs
+        found = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return frozenset(found)
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, HTTPException, APIRouter, UploadFile, File, Request
-from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, APIRouter, UploadFile, File, Request, Response, Query, Header
+from fastapi.responses import PlainTextResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, validator
 from typing import Optional, List, Dict
@@ -7,7 +7,8 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import uuid
-from datetime import datetime
+import base64
+from datetime import date, datetime
 import logging
 
 # Configure logging
@@ -47,20 +48,34 @@ log_to_file("FastAPI application starting", {"python_version": "3.x", "platform"
 # #endregion
 
 # Relative imports for package structure
-from .inventory import InventoryManager
+from .inventory import InventoryManager, ProductNotFoundError, InsufficientStockError
 from .intent import IntentRecognizer, Intent
+from .preprocess import preprocess
 from .payment import PaymentManager
 from .response_formatter import ResponseFormatter, ResponseStyle
 from .conversation import conversation_manager
-from .cache import get_cache, set_cache, invalidate_cache  # Database query caching
+from .state_store import state_store, parse_number
+from .cache import get_or_load, invalidate_cache, invalidate_cache_async, close_cache, orders_tag  # Database query caching
+from .catalog import catalog_store
 from .services import vendor_state
 from .services.push_notifications import push_service, PushNotification
 from .services.bulk_operations import bulk_service
 from .services.payments import paystack_service, PaymentLinkRequest
+from .services.stock_holds import stock_hold_ledger
+from .services.order_store import order_store
+from .services.order_counters import order_counters
+from .services.sales_rollup import utc_today
+from .services.business_ai_memory import business_ai_memory
+from .services.idempotency import (
+    idempotency_store, fingerprint, IdempotencyInProgress, IdempotencyKeyMismatch, MAX_KEY_LENGTH
+)
+from .config import settings
+from .services.warmup import cache_warmer
 from .services.subscription import subscription_service, SubscriptionTier
 from .services.privacy import privacy_service, ConsentType
 from .services.localization import localization_service, Language, t
 from .services import storage_service
+from .services.blob_store import blob_store, BlobStoreError, LocalBlobBackend, EXTENSION_CONTENT_TYPES
 from .routers import (
     expenses, analytics, invoice, 
     recommendations, notifications, installments, profit_loss, sales_channels, whatsapp,
@@ -80,6 +95,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed"],  # GET /orders pagination, retried POSTs
 )
 
 # ===== RATE LIMITING (DoS Protection) =====
@@ -87,17 +103,115 @@ limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+
+@app.on_event("startup")
+async def start_stock_hold_sweeper():
+    """Release expired stock holds from unpaid chatbot orders in the background."""
+    stock_hold_ledger.start_sweeper()
+
+
+@app.on_event("shutdown")
+async def stop_stock_hold_sweeper():
+    await stock_hold_ledger.stop_sweeper()
+
+
+@app.on_event("startup")
+async def load_order_store():
+    """Index pending and recent orders so "I paid" survives a restart."""
+    try:
+        await order_store.load_async()
+    except Exception as e:
+        logger.warning(f"Order store load failed, starting empty: {e}")
+
+
+@app.on_event("startup")
+async def start_order_counters():
+    """Keep dashboard/widget counters fresh on stock changes and reconcile them periodically."""
+    order_counters.start()
+
+
+@app.on_event("shutdown")
+async def stop_order_counters():
+    await order_counters.stop()
+
+
+@app.on_event("startup")
+async def start_idempotency_purge():
+    """Drop expired idempotency keys in the background."""
+    idempotency_store.start()
+
+
+@app.on_event("shutdown")
+async def stop_idempotency_purge():
+    await idempotency_store.stop()
+
+
+@app.on_event("startup")
+async def start_conversation_sweeper():
+    """Evict idle chat sessions in the background."""
+    conversation_manager.start()
+
+
+@app.on_event("shutdown")
+async def stop_conversation_sweeper():
+    await conversation_manager.stop()
+
+
+@app.on_event("startup")
+async def start_cache_warmup():
+    """Pre-load caches for the most active vendors without delaying startup."""
+    cache_warmer.start()
+
+
+@app.on_event("shutdown")
+async def stop_cache_warmup():
+    await cache_warmer.stop()
+
+
+@app.on_event("shutdown")
+async def close_cache_connections():
+    await close_cache()
+
 # In‑memory store for demo purposes (User preferences)
 USERS: dict = {}
 
-# Orders store - tracks orders created by chatbot
-ORDERS_STORE: dict = {}
+# Customer purchase history, in the shared state store, per customer:
+# customer:{customer_id} hash {"orders": count, "spent": total}, and
+# customer:{customer_id}:orders, a list of the latest CUSTOMER_ORDERS_KEPT orders.
+# Both expire CUSTOMER_HISTORY_TTL_SECONDS after the customer's last order.
+CUSTOMER_ORDERS_KEPT = 50
+CUSTOMER_HISTORY_TTL_SECONDS = 365 * 24 * 3600
+
+
+async def record_customer_order(customer_id: str, order, amount: float):
+    """Add an order (details dict or order ID) to a customer's purchase history."""
+    key = f"customer:{customer_id}"
+    await state_store.incr_field_async(key, "orders", 1, ttl_seconds=CUSTOMER_HISTORY_TTL_SECONDS)
+    await state_store.incr_field_async(key, "spent", amount, ttl_seconds=CUSTOMER_HISTORY_TTL_SECONDS)
+    await state_store.push_async(
+        f"{key}:orders", json.dumps(order, default=str),
+        max_len=CUSTOMER_ORDERS_KEPT, ttl_seconds=CUSTOMER_HISTORY_TTL_SECONDS
+    )
+
 
-# Customer purchase history tracking
-CUSTOMER_HISTORY: dict = {}
+async def get_customer_history(customer_id: str) -> Optional[dict]:
+    """{"order_count", "total_spent", "orders"} for a customer seen before, else None."""
+    history = await state_store.get_fields_async(f"customer:{customer_id}")
+    if not history.get("orders"):
+        return None
+    return {
+        "order_count": int(history["orders"]),
+        "total_spent": parse_number(history.get("spent")),
+        "orders": [json.loads(order) for order in await state_store.get_list_async(f"customer:{customer_id}:orders")]
+    }
 
 # Low stock threshold
-LOW_STOCK_THRESHOLD = 5
+LOW_STOCK_THRESHOLD = settings.low_stock_threshold
+
+# Orders pages carry their vendor's tag plus this one, bumped by writes that don't know the vendor
+ORDERS_CACHE_TAG = orders_tag("all")
+# Writes bump the tag, so an expired orders list is only served while it's being refreshed
+ORDERS_STALE_SECONDS = 30
 
 # Vendor settings store (payment accounts, business info)
 VENDOR_SETTINGS: dict = {
@@ -131,18 +245,33 @@ FREEMIUM_LIMITS = {
     }
 }
 
-# Usage tracking (resets monthly)
-USAGE_TRACKING: dict = {
-    "orders_this_month": 0,
-    "bot_conversations_this_month": 0,
-    "month_started": datetime.now().strftime("%Y-%m"),
-}
+# Usage tracking: one usage:{YYYY-MM} hash per month in the shared state store,
+# so a new month starts from zero; old months expire
+USAGE_TTL_SECONDS = 40 * 24 * 3600
+
+
+async def get_usage() -> dict:
+    """This month's order and bot conversation counts."""
+    month = datetime.now().strftime("%Y-%m")
+    usage = await state_store.get_fields_async(f"usage:{month}")
+    return {
+        "orders_this_month": int(usage.get("orders", 0)),
+        "bot_conversations_this_month": int(usage.get("bot_conversations", 0)),
+        "month_started": month,
+    }
+
+
+async def record_usage(counter: str):
+    """Count one order or bot conversation this month."""
+    await state_store.incr_field_async(
+        f"usage:{datetime.now().strftime('%Y-%m')}", counter, 1, ttl_seconds=USAGE_TTL_SECONDS
+    )
 
 def get_subscription_tier() -> str:
     """Get current subscription tier."""
     return VENDOR_SETTINGS.get("subscription_tier", "free")
 
-def check_limit(limit_type: str) -> dict:
+async def check_limit(limit_type: str) -> dict:
     """
     Check if user has hit a freemium limit.
     Returns: {"allowed": bool, "current": int, "max": int, "upgrade_needed": bool}
@@ -150,25 +279,18 @@ def check_limit(limit_type: str) -> dict:
     tier = get_subscription_tier()
     limits = FREEMIUM_LIMITS.get(tier, FREEMIUM_LIMITS["free"])
     
-    # Reset monthly counters if new month
-    current_month = datetime.now().strftime("%Y-%m")
-    if USAGE_TRACKING.get("month_started") != current_month:
-        USAGE_TRACKING["orders_this_month"] = 0
-        USAGE_TRACKING["bot_conversations_this_month"] = 0
-        USAGE_TRACKING["month_started"] = current_month
-    
     if limit_type == "products":
-        current = len(inventory_manager.list_products())
+        current = len(await inventory_manager.list_products_async())
         max_allowed = limits["max_products"]
     elif limit_type == "orders":
-        current = USAGE_TRACKING.get("orders_this_month", 0)
+        current = (await get_usage())["orders_this_month"]
         max_allowed = limits["max_orders_per_month"]
     elif limit_type == "bot_conversations":
-        current = USAGE_TRACKING.get("bot_conversations_this_month", 0)
+        current = (await get_usage())["bot_conversations_this_month"]
         max_allowed = limits["max_bot_conversations_per_month"]
     elif limit_type == "image_uploads":
         # Count products with images
-        products = inventory_manager.list_products()
+        products = await inventory_manager.list_products_async()
         current = sum(1 for p in products if p.get("image_url"))
         max_allowed = limits["max_image_uploads"]
     else:
@@ -290,52 +412,77 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    """Liveness (the process is serving), with readiness reported separately."""
+    return {"status": "healthy", "readiness": cache_warmer.readiness()}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: 503 until the startup cache warm-up has finished."""
+    readiness = cache_warmer.readiness()
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
 
 @router.get("/products")
 @limiter.limit("50/minute")
 async def get_products(request: Request, user_id: str = None):
     """Get products for a specific user (vendor). Requires user_id."""
-    from .database import SessionLocal
-    from .models import Product as ProductModel
-    
     # If no user_id, return empty list (no global product listing)
     if not user_id:
         return []
     
-    cache_key = f"products:user:{user_id}"
-    
-    # Check cache first (fast, in-memory)
-    cached = get_cache(cache_key)
-    if cached is not None:
-        return cached
-    
-    # Cache miss - fetch from database filtered by user_id
-    db = SessionLocal()
+    # Served from the vendor's shared catalog snapshot (reloaded after any write)
+    snapshot = await InventoryManager(user_id=user_id).catalog_snapshot_async()
+    return [
+        {
+            "id": p["id"],
+            "name": p["name"],
+            "price_ngn": p["price_ngn"],
+            "stock_level": p["stock_level"],
+            "description": p.get("description") or "",
+            "category": p.get("category") or "",
+            "image_url": p.get("image_url") or None
+        }
+        for p in snapshot.products
+    ]
+
+async def run_idempotent(scope: str, key: Optional[str], handler, payload, response: Response = None):
+    """
+    Run handler() once per idempotency key: a retry with the same key gets the
+    stored response (with an Idempotent-Replayed header) instead of running again.
+    With a payload, reusing the key for a different request is rejected.
+    """
+    if key and len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
     try:
-        products = db.query(ProductModel).filter(ProductModel.user_id == user_id).all()
-        product_list = []
-        for p in products:
-            product_list.append({
-                "id": p.id,
-                "name": p.name,
-                "price_ngn": p.price_ngn,
-                "stock_level": p.stock_level,
-                "description": p.description or "",
-                "category": p.category or "",
-                "image_url": p.image_url or None
-            })
-        
-        # Store in cache for 60 seconds
-        set_cache(cache_key, product_list, ttl_seconds=60)
-        
-        return product_list
-    finally:
-        db.close()
+        result, replayed = await idempotency_store.run_async(
+            scope, key, handler, fingerprint(payload) if key and payload is not None else None
+        )
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IdempotencyKeyMismatch as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed and response is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
 
 @router.post("/orders", response_model=OrderResponse)
-async def create_order(request: OrderRequest):
+async def create_order(
+    request: OrderRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, description="Retries with the same key return the first response")
+):
     """Create a new order and generate payment link."""
+    async def create():
+        return (await _create_order(request)).dict()
+
+    return await run_idempotent("orders", idempotency_key, create, request.dict(), response)
+
+
+async def _create_order(request: OrderRequest) -> OrderResponse:
+    """Validate, reserve stock, generate the payment link and record the order."""
     # Validate request
     if not request.items:
         raise HTTPException(status_code=400, detail="Order must contain at least one item")
@@ -343,43 +490,45 @@ async def create_order(request: OrderRequest):
     if not request.user_id or not request.user_id.strip():
         raise HTTPException(status_code=400, detail="User ID is required")
     
-    total_amount = 0.0
-    order_items = []
-    products_to_decrement = []  # Track products for stock decrement
-    
-    # Validate all products exist and have sufficient stock
+    # Validate quantities
     for item in request.items:
-        # Validate quantity
         if item.quantity <= 0:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Invalid quantity for product {item.product_id}: {item.quantity}. Quantity must be greater than 0"
             )
-        
-        # Get product by ID
-        product = inventory_manager.get_product_by_id(item.product_id)
-        if not product:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Product {item.product_id} not found"
-            )
-        
-        # Check stock availability
-        current_stock = product.get("stock_level", 0)
-        if current_stock < item.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock for {product.get('name', 'product')}. Available: {current_stock}, Requested: {item.quantity}"
-            )
-        
-        # Calculate item total
+    
+    def validate_price(product: dict):
         price = float(product.get("price_ngn", 0))
         if price <= 0:
             raise HTTPException(
                 status_code=400,
                 detail=f"Invalid price for product {product.get('name', 'product')}: {price}"
             )
-        
+    
+    # Lock, validate and decrement stock for ALL items in one transaction
+    # (all-or-nothing, so concurrent orders can't oversell)
+    requested = [(item.product_id, item.quantity) for item in request.items]
+    try:
+        reserved = await inventory_manager.reserve_items_async(requested, validate=validate_price)
+    except ProductNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Product {e.product_id} not found")
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Stock reservation failed: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to reserve stock for this order. Please try again."
+        )
+    
+    total_amount = 0.0
+    order_items = []
+    for item in request.items:
+        product = reserved[item.product_id]
+        price = float(product.get("price_ngn", 0))
         item_total = price * item.quantity
         total_amount += item_total
         
@@ -391,26 +540,10 @@ async def create_order(request: OrderRequest):
             "price": price,
             "total": item_total
         })
-        
-        # Track for stock decrement
-        products_to_decrement.append((item.product_id, item.quantity))
-    
-    if total_amount <= 0:
-        raise HTTPException(status_code=400, detail="Order total must be greater than 0")
 
     # Generate order ID
     order_id = str(uuid.uuid4())
     
-    # Decrement stock for all items (do this before creating payment link)
-    for product_id, quantity in products_to_decrement:
-        success = inventory_manager.decrement_stock(product_id, quantity)
-        if not success:
-            # This should rarely happen since we checked above, but handle it anyway
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to reserve stock for product {product_id}. Please try again."
-            )
-    
     # Generate payment link
     payment_link = payment_manager.generate_payment_link(
         order_id=order_id,
@@ -420,25 +553,23 @@ async def create_order(request: OrderRequest):
     )
     
     if not payment_link:
-        # Rollback stock decrements if payment link generation fails
-        # Note: In production, use database transactions for this
-        for product_id, quantity in products_to_decrement:
-            inventory_manager.update_stock(product_id, quantity)  # Restore stock
+        # Give the reserved stock back in one transaction
+        await inventory_manager.release_items_async(requested)
         raise HTTPException(status_code=500, detail="Failed to generate payment link")
     
-    # Store order in ORDERS_STORE
-    ORDERS_STORE[order_id] = {
+    # Track and persist the order
+    await order_store.add_async({
         "id": order_id,
         "customer_phone": request.user_id,
         "items": order_items,
         "total_amount": total_amount,
         "status": "pending",
         "payment_ref": None,
-        "created_at": datetime.now().isoformat()
-    }
+        "created_at": datetime.utcnow().isoformat()
+    }, vendor_id=inventory_manager.user_id)
     
     # Invalidate orders cache so new order appears immediately
-    invalidate_cache(prefix="orders:")
+    await invalidate_cache_async(tags=_orders_cache_tags(inventory_manager.user_id))
         
     return OrderResponse(
         order_id=order_id,
@@ -449,8 +580,6 @@ async def create_order(request: OrderRequest):
 
 
 # ===== BUSINESS AI ENDPOINT =====
-# Conversation history storage for Business AI
-BUSINESS_AI_CONVERSATIONS: Dict[str, List[Dict]] = {}
 
 @router.post("/business-ai")
 @limiter.limit("10/minute")  # Protect AI credits
@@ -473,8 +602,8 @@ async def business_ai_chat(body: BusinessAIRequest, request: Request):
         # Get or create conversation ID
         conversation_id = body.conversation_id or str(uuid.uuid4())
         
-        # Get conversation history
-        history = BUSINESS_AI_CONVERSATIONS.get(conversation_id, [])
+        # Get conversation history (summary of older turns + recent window, token-budgeted)
+        history = await business_ai_memory.get_messages_async(conversation_id)
         
         # Process with AI
         result = await process_business_command(
@@ -485,11 +614,7 @@ async def business_ai_chat(body: BusinessAIRequest, request: Request):
         )
         
         # Update conversation history
-        history.append({"role": "user", "content": body.message})
-        history.append({"role": "assistant", "content": result["response"]})
-        
-        # Keep only last 10 messages for context
-        BUSINESS_AI_CONVERSATIONS[conversation_id] = history[-10:]
+        await business_ai_memory.record_async(conversation_id, body.message, result["response"])
         
         return BusinessAIResponse(
             response=result["response"],
@@ -513,42 +638,110 @@ async def business_ai_chat(body: BusinessAIRequest, request: Request):
         )
 
 
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+
+
+def _encode_order_cursor(created_at: str, order_id: str) -> str:
+    """Opaque keyset cursor for the position after (created_at, id)."""
+    return base64.urlsafe_b64encode(f"{created_at}|{order_id}".encode()).decode().rstrip("=")
+
+
+def _decode_order_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), order_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _orders_cache_tags(vendor_id: Optional[str]) -> list:
+    """Tags to bump after an order write; unknown vendor bumps every orders page."""
+    return [orders_tag(vendor_id)] if vendor_id else [ORDERS_CACHE_TAG]
+
+
 @router.get("/orders")
-async def get_orders(status: Optional[str] = None):
+async def get_orders(
+    response: Response,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(ORDERS_PAGE_SIZE, ge=1, le=ORDERS_MAX_PAGE_SIZE)
+):
     """
-    Get all orders for merchant dashboard.
-    Fetches from database, falling back to ORDERS_STORE + mock demo orders.
-    PERFORMANCE OPTIMIZED: Uses eager loading + 60-second caching.
+    Get one page of a vendor's orders for the merchant dashboard, newest first.
+    
+    Keyset-paginated on (created_at, id): pass the X-Next-Cursor response
+    header back as ?cursor= for the next page (no header on the last page).
+    since/until are inclusive dates. Without user_id, the default vendor's
+    orders are returned (single-vendor mode).
+    Pages are cached for 60 seconds; concurrent misses share one query
+    (single-flight), and an expired page is served while one request refreshes it.
     """
-    # Build cache key based on status filter
-    cache_key = f"orders:{status or 'all'}"
-    
-    # Check cache first (fast, in-memory)
-    cached = get_cache(cache_key)
-    if cached is not None:
-        return cached
-    
-    from datetime import timedelta
-    from sqlalchemy.orm import joinedload
+    vendor_id = user_id or inventory_manager.user_id
+    status = status.lower() if status else None
+    after = _decode_order_cursor(cursor) if cursor else None
+    
+    cache_key = f"orders:{vendor_id}:{status or 'all'}:{since}:{until}:{cursor or ''}:{limit}"
+    page = await get_or_load(
+        cache_key,
+        lambda: _load_orders_page(vendor_id, status, since, until, after, limit),
+        ttl_seconds=60,
+        tags=[orders_tag(vendor_id), ORDERS_CACHE_TAG],
+        stale_seconds=ORDERS_STALE_SECONDS
+    )
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["orders"]
+
+
+async def _load_orders_page(
+    vendor_id: str,
+    status: Optional[str],
+    since: Optional[date],
+    until: Optional[date],
+    after: Optional[tuple],
+    limit: int
+) -> dict:
+    """Load one page of orders: {"orders": [...], "next_cursor": str | None}."""
+    from datetime import time as dt_time, timedelta
     
-    all_orders = []
+    start = datetime.combine(since, dt_time.min) if since else None
+    end = datetime.combine(until + timedelta(days=1), dt_time.min) if until else None
     
-    # Try to fetch from database first
     try:
-        from .database import SessionLocal
-        from .models import Order as OrderModel, OrderItem as OrderItemModel
+        from .database import run_db
+        from sqlalchemy import and_, or_
+        from sqlalchemy.orm import selectinload
+        from .models import Order as OrderModel
         
-        db = SessionLocal()
-        try:
-            # Query orders with their items - EAGER LOADING to prevent N+1
-            query = db.query(OrderModel).options(joinedload(OrderModel.order_items))
+        def load_orders(db):
+            # Every filter is in SQL; items come in one extra IN query for the page only
+            query = db.query(OrderModel).options(selectinload(OrderModel.order_items)).filter(
+                OrderModel.user_id == vendor_id
+            )
             if status:
-                query = query.filter(OrderModel.status == status.lower())
+                query = query.filter(OrderModel.status == status)
+            if start:
+                query = query.filter(OrderModel.created_at >= start)
+            if end:
+                query = query.filter(OrderModel.created_at < end)
+            if after:
+                created_at, order_id = after
+                query = query.filter(or_(
+                    OrderModel.created_at < created_at,
+                    and_(OrderModel.created_at == created_at, OrderModel.id < order_id)
+                ))
             
-            db_orders = query.order_by(OrderModel.created_at.desc()).all()
+            db_orders = query.order_by(
+                OrderModel.created_at.desc(), OrderModel.id.desc()
+            ).limit(limit + 1).all()
             
+            orders = []
             for order in db_orders:
-                # Get order items (already loaded via joinedload)
                 items = []
                 for item in order.order_items:
                     items.append({
@@ -559,7 +752,7 @@ async def get_orders(status: Optional[str] = None):
                         "total": item.total
                     })
                 
-                all_orders.append({
+                orders.append({
                     "id": str(order.id),
                     "customer_phone": order.customer_phone,
                     "items": items,
@@ -569,39 +762,52 @@ async def get_orders(status: Optional[str] = None):
                     "created_at": order.created_at.isoformat() if order.created_at else None,
                     "source": "database"
                 })
-        finally:
-            db.close()
+            return orders
+        
+        # Runs on the async engine (or a worker thread) so it doesn't block the event loop
+        orders = await run_db(load_orders)
     except Exception as db_error:
         logger.warning(f"Database query failed, using memory store: {db_error}")
-        # Fallback to ORDERS_STORE
-        for order_id, order in ORDERS_STORE.items():
-            all_orders.append({
-                "id": order.get("id", order_id),
-                "customer_phone": order.get("customer_phone", "Unknown"),
-                "items": order.get("items", []),
-                "total_amount": order.get("total_amount", 0),
-                "status": order.get("status", "pending"),
-                "payment_ref": order.get("payment_ref"),
-                "created_at": order.get("created_at", datetime.now().isoformat()),
-                "source": "memory"
-            })
-    
-    # Filter by status if needed (for database fallback case)
-    if status and all_orders:
-        all_orders = [o for o in all_orders if o.get("status", "").lower() == status.lower()]
-    
-    # Sort by created_at descending
-    all_orders.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    
-    # Store in cache for 60 seconds
-    set_cache(cache_key, all_orders, ttl_seconds=60)
-    
-    return all_orders
-
-def create_chatbot_order(user_id: str, product: dict, quantity: int = 1) -> tuple[str, str]:
+        orders = _orders_page_from_memory(vendor_id, status, start, end, after, limit)
+    
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = _encode_order_cursor(orders[-1]["created_at"], orders[-1]["id"])
+    return {"orders": orders, "next_cursor": next_cursor}
+
+
+def _orders_page_from_memory(vendor_id, status, start, end, after, limit) -> list:
+    """Same page from the orders this worker has in memory (database unreachable)."""
+    orders = []
+    for order in order_store.values():
+        if order.get("vendor_id", vendor_id) != vendor_id or not order.get("created_at"):
+            continue
+        if status and order.get("status") != status:
+            continue
+        created_at = datetime.fromisoformat(order["created_at"])
+        if (start and created_at < start) or (end and created_at >= end):
+            continue
+        if after and (created_at, order["id"]) >= after:
+            continue
+        orders.append({
+            "id": order["id"],
+            "customer_phone": order.get("customer_phone", "Unknown"),
+            "items": order.get("items", []),
+            "total_amount": order.get("total_amount", 0),
+            "status": order.get("status", "pending"),
+            "payment_ref": order.get("payment_ref"),
+            "created_at": order["created_at"],
+            "source": "memory"
+        })
+    orders.sort(key=lambda o: (o["created_at"], o["id"]), reverse=True)
+    return orders[:limit + 1]
+
+async def create_chatbot_order(user_id: str, product: dict, quantity: int = 1) -> tuple[str, str]:
     """
-    Create an order for chatbot purchase - validates stock, decrements inventory,
-    creates order record, and returns payment instructions with bank details.
+    Create an order for chatbot purchase - validates stock, holds inventory until
+    payment (the hold expires if the customer never pays), creates order record,
+    and returns payment instructions with bank details.
 
     Returns: (order_id, payment_info) or raises HTTPException
     """
@@ -620,30 +826,28 @@ def create_chatbot_order(user_id: str, product: dict, quantity: int = 1) -> tupl
         raise HTTPException(status_code=400, detail="Quantity must be greater than 0")
     
     # Check freemium order limit
-    order_limit = check_limit("orders")
+    order_limit = await check_limit("orders")
     if not order_limit["allowed"]:
         raise HTTPException(
             status_code=403,
             detail=f"Monthly order limit reached ({order_limit['max']} orders). Upgrade to Pro for unlimited orders!"
         )
 
-    # Check stock availability
-    current_stock = product.get("stock_level", 0)
-    if current_stock < quantity:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient stock for {product_name}. Available: {current_stock}, Requested: {quantity}"
-        )
-
     # Calculate total
     total_amount = price * quantity
 
     # Generate order ID (shorter format for easy reference)
     order_id = str(uuid.uuid4())[:8].upper()
 
-    # Decrement stock first
-    success = inventory_manager.decrement_stock(product_id, quantity)
-    if not success:
+    # Hold stock until payment is confirmed; stock_level is decremented on commit
+    try:
+        await stock_hold_ledger.place_async(order_id, inventory_manager.user_id, [(product_id, quantity)])
+    except ProductNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    except InsufficientStockError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to hold stock for chatbot order {order_id}: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to reserve stock for {product_name}. Please try again."
@@ -689,71 +893,30 @@ After payment, reply "I paid" to confirm your order! ✅"""
         "total": total_amount
     }]
 
-    # Store order in ORDERS_STORE (in-memory for quick access)
-    ORDERS_STORE[order_id] = {
+    # Track the order and persist it (with its item) to the orders table
+    await order_store.add_async({
         "id": order_id,
         "customer_phone": user_id,
         "items": order_items,
         "total_amount": total_amount,
         "status": "pending",
         "payment_ref": None,
-        "created_at": datetime.now().isoformat(),
+        "notes": f"Chatbot order for {product_name}",
+        "created_at": datetime.utcnow().isoformat(),
         "source": "chatbot"
-    }
+    }, vendor_id=inventory_manager.user_id)
+    await invalidate_cache_async(tags=_orders_cache_tags(inventory_manager.user_id))
     
     # Increment order usage counter for freemium tracking
-    USAGE_TRACKING["orders_this_month"] = USAGE_TRACKING.get("orders_this_month", 0) + 1
-    
-    # Persist order to database
-    try:
-        from .database import SessionLocal
-        from .models import Order as OrderModel, OrderItem as OrderItemModel
-        
-        db = SessionLocal()
-        try:
-            # Create order record
-            db_order = OrderModel(
-                id=order_id,
-                user_id=inventory_manager.user_id,  # Vendor/owner ID
-                customer_phone=user_id,
-                total_amount=total_amount,
-                status="pending",
-                notes=f"Chatbot order for {product_name}"
-            )
-            db.add(db_order)
-            
-            # Create order item record
-            db_order_item = OrderItemModel(
-                order_id=order_id,
-                product_id=product_id,
-                product_name=product_name,
-                quantity=quantity,
-                price=price,
-                total=total_amount
-            )
-            db.add(db_order_item)
-            
-            db.commit()
-        except Exception as db_error:
-            db.rollback()
-            logger.error(f"Failed to persist order to database: {db_error}")
-            # Continue anyway - order is in memory
-        finally:
-            db.close()
-    except Exception as import_error:
-        logger.error(f"Database import error: {import_error}")
+    await record_usage("orders")
 
     # Update customer history
-    if user_id not in CUSTOMER_HISTORY:
-        CUSTOMER_HISTORY[user_id] = {"orders": [], "total_spent": 0}
-
-    CUSTOMER_HISTORY[user_id]["orders"].append({
+    await record_customer_order(user_id, {
         "order_id": order_id,
         "product_name": product_name,
         "amount": total_amount,
         "timestamp": datetime.now().isoformat()
-    })
-    CUSTOMER_HISTORY[user_id]["total_spent"] += total_amount
+    }, total_amount)
 
     return order_id, payment_info
 
@@ -766,13 +929,22 @@ async def process_message(request: MessageRequest):
     3. Handle multiple matches by asking user to choose
     4. Remember context for follow-up queries
     """
-    from .conversation import conversation_manager
-    
+    # Conversation state for this user, written back for whichever worker gets the next message
+    state = await conversation_manager.get_state_async(request.user_id)
+    try:
+        return await _process_message(request, state)
+    finally:
+        await conversation_manager.save_state_async(request.user_id, state)
+
+
+async def _process_message(request: MessageRequest, state) -> MessageResponse:
     user_id = request.user_id
     text = request.message_text
+    # Normalized and tokenized once, reused by every stage below
+    message = preprocess(text)
     
     # Check freemium bot conversation limit
-    bot_limit = check_limit("bot_conversations")
+    bot_limit = await check_limit("bot_conversations")
     if not bot_limit["allowed"]:
         return MessageResponse(
             response=f"⚠️ Monthly conversation limit reached ({bot_limit['max']} messages). The vendor needs to upgrade to Pro for unlimited bot conversations!",
@@ -782,46 +954,39 @@ async def process_message(request: MessageRequest):
         )
     
     # Increment bot conversation counter
-    USAGE_TRACKING["bot_conversations_this_month"] = USAGE_TRACKING.get("bot_conversations_this_month", 0) + 1
-    
-    # Get conversation state for this user
-    state = conversation_manager.get_state(user_id)
+    await record_usage("bot_conversations")
     
     response_text = ""
     product_data = None
     payment_link = None
     
     # Recognize intent
-    intent = intent_recognizer.recognize(text)
+    intent = intent_recognizer.recognize(message)
     
     # ========== PAYMENT CONFIRMATION: Handle "I paid" messages ==========
     if intent == Intent.PAYMENT_CONFIRMATION:
-        # Check for pending order in state or ORDERS_STORE
-        order = None
-        order_id = None
-        
         # First check state for pending order
-        if state.pending_order_id and state.pending_order_id in ORDERS_STORE:
-            order_id = state.pending_order_id
-            order = ORDERS_STORE[order_id]
-        else:
-            # Fallback: find any pending order for this user
-            for oid, o in ORDERS_STORE.items():
-                if o.get("customer_phone") == user_id and o.get("status") == "pending":
-                    order_id = oid
-                    order = o
-                    break
+        order = None
+        if state.pending_order_id:
+            order = order_store.get(state.pending_order_id)
+        if order is None:
+            # Fallback: the customer's latest pending order (indexed, no scan)
+            order = await order_store.find_pending_async(user_id)
         
         if order:
+            order_id = order["id"]
             # Update order status
-            order["status"] = "paid"
-            order["paid_at"] = datetime.now().isoformat()
+            order = await order_store.set_status_async(order_id, "paid") or order
+            await invalidate_cache_async(tags=_orders_cache_tags(order.get("vendor_id")))
+
+            # Turn the order's stock holds into a sale
+            try:
+                await stock_hold_ledger.commit_order_async(order_id)
+            except Exception as e:
+                logger.error(f"Failed to commit stock holds for order {order_id}: {e}")
             
             # Track customer purchase history
-            if user_id not in CUSTOMER_HISTORY:
-                CUSTOMER_HISTORY[user_id] = {"orders": [], "total_spent": 0}
-            CUSTOMER_HISTORY[user_id]["orders"].append(order_id)
-            CUSTOMER_HISTORY[user_id]["total_spent"] += order.get("total_amount", 0)
+            await record_customer_order(user_id, order_id, order.get("total_amount", 0))
             
             # Clear pending state
             state.pending_order_id = None
@@ -850,9 +1015,10 @@ async def process_message(request: MessageRequest):
     # ========== STEP 1: Check if user is selecting from a previous list ==========
     if state.awaiting_selection and state.last_products:
         # Try to find which product they're selecting
-        selected = inventory_manager.find_product_by_selection(text, state.last_products)
+        selected = inventory_manager.find_product_by_selection(message, state.last_products)
         
         if selected:
+            selected = stock_hold_ledger.with_available([selected])[0]
             state.select_product(selected)
             product_data = selected
             price_fmt = payment_manager.format_naira(selected["price_ngn"])
@@ -881,8 +1047,9 @@ async def process_message(request: MessageRequest):
 
         if product["stock_level"] > 0:
             try:
-                # Create order, decrement stock, and get payment instructions
-                order_id, payment_info = create_chatbot_order(user_id, product, quantity=1)
+                # Create order, hold stock, and get payment instructions
+                order_id, payment_info = await create_chatbot_order(user_id, product, quantity=1)
+                state.pending_order_id = order_id
                 response_text = f"✅ Order #{order_id} created!\n\n{payment_info}"
             except HTTPException as e:
                 response_text = f"❌ Sorry, I couldn't process your order: {e.detail}"
@@ -900,11 +1067,13 @@ async def process_message(request: MessageRequest):
     if intent == Intent.GREETING:
         state.reset()  # Clear any previous context
         
+        store_name = VENDOR_SETTINGS["business_info"]["name"]
+        
         # Customer recognition - check if returning customer
-        if user_id in CUSTOMER_HISTORY:
-            history = CUSTOMER_HISTORY[user_id]
-            order_count = len(history.get("orders", []))
-            total_spent = history.get("total_spent", 0)
+        history = await get_customer_history(user_id)
+        if history is not None:
+            order_count = history["order_count"]
+            total_spent = history["total_spent"]
             
             if order_count > 0:
                 response_text = (
@@ -913,16 +1082,16 @@ async def process_message(request: MessageRequest):
                     f"What can I help you with today? Just tell me what you're looking for!"
                 )
             else:
-                response_text = response_formatter.format_greeting()
+                response_text = response_formatter.format_greeting(message.language, store_name)
         else:
-            response_text = response_formatter.format_greeting()
+            response_text = response_formatter.format_greeting(message.language, store_name)
         
     elif intent == Intent.HELP:
-        response_text = response_formatter.format_help()
+        response_text = response_formatter.format_help(message.language)
         
     elif intent in [Intent.PRICE_INQUIRY, Intent.AVAILABILITY_CHECK, Intent.PURCHASE]:
         # Extract product query
-        product_query = intent_recognizer.extract_product_query(text)
+        product_query = intent_recognizer.extract_product_query(message)
         
         if not product_query:
             # No product mentioned - if purchase, ask what they want
@@ -935,8 +1104,9 @@ async def process_message(request: MessageRequest):
 
                     if product["stock_level"] > 0:
                         try:
-                            # Create order, decrement stock, and get payment instructions
-                            order_id, payment_info = create_chatbot_order(user_id, product, quantity=1)
+                            # Create order, hold stock, and get payment instructions
+                            order_id, payment_info = await create_chatbot_order(user_id, product, quantity=1)
+                            state.pending_order_id = order_id
                             response_text = f"✅ Order #{order_id} created!\n\n{payment_info}"
                         except HTTPException as e:
                             response_text = f"❌ Sorry, I couldn't process your order: {e.detail}"
@@ -945,10 +1115,12 @@ async def process_message(request: MessageRequest):
                 else:
                     response_text = response_formatter.format_purchase_no_context()
             else:
-                response_text = response_formatter.format_unknown_message()
+                response_text = response_formatter.format_unknown_message(message.language)
         else:
             # ========== SMART SEARCH: Find all matching products ==========
-            matching_products = inventory_manager.smart_search_products(product_query)
+            matching_products = stock_hold_ledger.with_available(
+                await inventory_manager.smart_search_products_async(message.product_query_message)
+            )
             
             if not matching_products:
                 # Truly nothing found - but this should be very rare now
@@ -964,8 +1136,9 @@ async def process_message(request: MessageRequest):
                 if intent == Intent.PURCHASE:
                     if product["stock_level"] > 0:
                         try:
-                            # Create order, decrement stock, and get payment instructions
-                            order_id, payment_info = create_chatbot_order(user_id, product, quantity=1)
+                            # Create order, hold stock, and get payment instructions
+                            order_id, payment_info = await create_chatbot_order(user_id, product, quantity=1)
+                            state.pending_order_id = order_id
                             response_text = f"✅ Order #{order_id} created!\n\n{payment_info}"
                         except HTTPException as e:
                             response_text = f"❌ Sorry, I couldn't process your order: {e.detail}"
@@ -987,7 +1160,9 @@ async def process_message(request: MessageRequest):
                 )
     else:
         # Unknown intent - try smart search on the whole message as fallback
-        matching_products = inventory_manager.smart_search_products(text)
+        matching_products = stock_hold_ledger.with_available(
+            await inventory_manager.smart_search_products_async(message)
+        )
         
         if matching_products:
             if len(matching_products) == 1:
@@ -1009,7 +1184,7 @@ async def process_message(request: MessageRequest):
                     payment_manager.format_naira
                 )
         else:
-            response_text = response_formatter.format_unknown_message()
+            response_text = response_formatter.format_unknown_message(message.language)
 
     return MessageResponse(
         response=response_text,
@@ -1127,8 +1302,8 @@ async def test_customer_bot(request: CustomerBotTestRequest):
     Uses Groq AI (with Gemini fallback) and real product context.
     """
     from .ai_unified import send_to_ai, build_context_prompt
-    from .database import SessionLocal
-    from .models import Product, User
+    from .database import run_db
+    from .models import User
     
     style = request.style.lower()
     products = []
@@ -1137,25 +1312,23 @@ async def test_customer_bot(request: CustomerBotTestRequest):
     # Fetch real products if user_id provided
     if request.user_id:
         try:
-            db = SessionLocal()
-            try:
-                # Get user's store name
-                user = db.query(User).filter(User.id == request.user_id).first()
-                if user and user.business_name:
-                    store_name = user.business_name
-                
-                # Get user's products
-                db_products = db.query(Product).filter(Product.user_id == request.user_id).limit(20).all()
-                products = [
-                    {
-                        "name": p.name,
-                        "price": p.price_ngn,
-                        "stock_level": p.stock_level
-                    }
-                    for p in db_products
-                ]
-            finally:
-                db.close()
+            # Get user's store name
+            business_name = await run_db(
+                lambda db: db.query(User.business_name).filter(User.id == request.user_id).scalar()
+            )
+            if business_name:
+                store_name = business_name
+
+            # Get user's products from the shared catalog snapshot
+            catalog = await InventoryManager(user_id=request.user_id).catalog_snapshot_async()
+            products = [
+                {
+                    "name": p["name"],
+                    "price": p["price_ngn"],
+                    "stock_level": p["stock_level"]
+                }
+                for p in catalog.products[:20]
+            ]
         except Exception:
             pass  # Use empty products list
     
@@ -1209,7 +1382,7 @@ async def create_product(product: ProductCreate):
         )
     
     # Check freemium limit
-    limit_check = check_limit("products")
+    limit_check = await check_limit("products")
     if not limit_check["allowed"]:
         raise HTTPException(
             status_code=403,
@@ -1222,6 +1395,12 @@ async def create_product(product: ProductCreate):
             }
         )
     
+    # Inline data: images go to the blob store; the row keeps a short URL
+    try:
+        image_url = await blob_store.put_data_url(product.image_url)
+    except BlobStoreError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid product image: {str(e)}")
+    
     new_product = {
         "id": str(uuid.uuid4()),
         "name": product.name,
@@ -1230,7 +1409,7 @@ async def create_product(product: ProductCreate):
         "description": product.description or "",
         "category": product.category or "uncategorized",
         "voice_tags": product.voice_tags or [],
-        "image_url": product.image_url or ""
+        "image_url": image_url or ""
     }
     
     # Create user-specific inventory manager and add product
@@ -1238,7 +1417,7 @@ async def create_product(product: ProductCreate):
     user_inventory.add_product(new_product)
     
     # Return with limit info
-    new_limit = check_limit("products")
+    new_limit = await check_limit("products")
     return {
         "status": "success",
         "message": f"Product '{product.name}' added successfully",
@@ -1276,7 +1455,7 @@ class RestockRequest(BaseModel):
 
 class OrderStatusUpdate(BaseModel):
     """Update order status."""
-    status: str  # "pending", "paid", "fulfilled"
+    status: str  # "pending", "paid", "fulfilled", "cancelled"
 
 
 
@@ -1315,7 +1494,7 @@ async def restock_product(product_id: str, restock: RestockRequest):
         raise HTTPException(status_code=400, detail="Quantity exceeds maximum allowed (100,000)")
     
     # Find product
-    products = inventory_manager.list_products()
+    products = await inventory_manager.list_products_async()
     product_found = None
     
     for p in products:
@@ -1364,11 +1543,10 @@ async def delete_product(product_id: str):
 async def upload_product_image(product_id: str, file: UploadFile = File(...)):
     """
     Upload an image for a product.
-    Stores as base64 data URL in the database.
+    Stores the bytes in the content-addressed blob store; the product row keeps only the URL.
     """
-    from .database import SessionLocal
+    from .database import run_db
     from .models import Product as ProductModel
-    import base64
     
     # Validate file type
     allowed_types = ["image/jpeg", "image/png", "image/webp", "image/gif"]
@@ -1378,47 +1556,85 @@ async def upload_product_image(product_id: str, file: UploadFile = File(...)):
             detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}"
         )
     
-    # Check file size (max 2MB for base64 storage)
+    # Check file size (max 2MB)
     contents = await file.read()
     if len(contents) > 2 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File too large. Maximum size is 2MB")
     
-    # Find the product directly in database
-    db = SessionLocal()
+    def find_product(db):
+        row = db.query(ProductModel.user_id, ProductModel.image_url).filter(ProductModel.id == product_id).first()
+        return (str(row.user_id), row.image_url) if row else None
+    
+    found = await run_db(find_product)
+    if not found:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    vendor_id, old_image_url = found
+    
     try:
-        product = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-        
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        image_url = await blob_store.put(contents, file.content_type)
         
-        # Convert to base64 data URL
-        base64_data = base64.b64encode(contents).decode('utf-8')
-        image_url = f"data:{file.content_type};base64,{base64_data}"
-        
-        # Update product with image URL
-        product.image_url = image_url
-        db.commit()
+        def set_image(db):
+            db.query(ProductModel).filter(ProductModel.id == product_id).update(
+                {"image_url": image_url}, synchronize_session=False
+            )
         
-        return {
-            "status": "success",
-            "message": "Product image uploaded successfully",
-            "image_url": image_url[:100] + "...",  # Return truncated for response
-            "product_id": product_id
-        }
-    except HTTPException:
-        raise
+        await run_db(set_image, commit=True)
+    except BlobStoreError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to store image: {str(e)}")
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to upload image: {str(e)}")
-    finally:
-        db.close()
+    
+    catalog_store.bump(vendor_id)
+    if old_image_url and old_image_url != image_url:
+        await _delete_blob_if_unreferenced(old_image_url)
+    
+    return {
+        "status": "success",
+        "message": "Product image uploaded successfully",
+        "image_url": image_url,
+        "product_id": product_id
+    }
+
+
+async def _delete_blob_if_unreferenced(image_url: str) -> bool:
+    """Delete a blob-store image once no product uses it (blobs are shared by content)."""
+    from .database import run_db
+    from .models import Product as ProductModel
+    
+    if not blob_store.owns(image_url):
+        return False
+    still_used = await run_db(
+        lambda db: db.query(ProductModel.id).filter(ProductModel.image_url == image_url).first()
+    )
+    if still_used:
+        return False
+    return await blob_store.delete(image_url)
+
+
+@router.get("/blobs/{key}")
+async def get_blob(key: str):
+    """Serve a locally stored image blob. Content-addressed, so cacheable forever."""
+    backend = blob_store.backend
+    if not isinstance(backend, LocalBlobBackend):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    try:
+        path = backend.path_for(key)
+    except BlobStoreError:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return FileResponse(
+        path,
+        media_type=EXTENSION_CONTENT_TYPES.get(key.rsplit(".", 1)[-1], "application/octet-stream"),
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
 
 
 @router.delete("/products/{product_id}/image")
 async def delete_product_image(product_id: str):
     """Delete the image for a product."""
     # Find product
-    products = inventory_manager.list_products()
+    products = await inventory_manager.list_products_async()
     product_found = None
     for p in products:
         if str(p.get('id')) == product_id:
@@ -1432,12 +1648,22 @@ async def delete_product_image(product_id: str):
     if not image_url:
         return {"status": "success", "message": "No image to delete"}
     
-    # Delete from storage
-    success, message = await storage_service.delete_product_image(image_url)
-    
-    if success:
-        # Clear image URL from product
+    if blob_store.owns(image_url):
+        # Clear the product first; the blob may be shared with other products
+        inventory_manager.update_product_fields(product_id, {"image_url": None})
+        await _delete_blob_if_unreferenced(image_url)
+        success, message = True, "Image deleted successfully"
+    elif image_url.startswith("data:"):
+        # Legacy inline image: nothing stored elsewhere
         inventory_manager.update_product_fields(product_id, {"image_url": None})
+        success, message = True, "Image deleted successfully"
+    else:
+        # Delete from storage
+        success, message = await storage_service.delete_product_image(image_url)
+        
+        if success:
+            # Clear image URL from product
+            inventory_manager.update_product_fields(product_id, {"image_url": None})
     
     return {
         "status": "success" if success else "error",
@@ -1448,41 +1674,39 @@ async def delete_product_image(product_id: str):
 @router.put("/orders/{order_id}/status")
 async def update_order_status(order_id: str, update: OrderStatusUpdate):
     """Update order status."""
-    valid_statuses = ["pending", "paid", "fulfilled"]
+    valid_statuses = ["pending", "paid", "fulfilled", "cancelled"]
     new_status = update.status.lower()
     
     if new_status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     
-    # Check if order exists in ORDERS_STORE
-    if order_id in ORDERS_STORE:
-        # Update the status field within the existing order
-        ORDERS_STORE[order_id]["status"] = new_status
-        ORDERS_STORE[order_id]["updated_at"] = datetime.now().isoformat()
-        
-        if new_status == "paid":
-            ORDERS_STORE[order_id]["paid_at"] = datetime.now().isoformat()
-        elif new_status == "fulfilled":
-            ORDERS_STORE[order_id]["fulfilled_at"] = datetime.now().isoformat()
-        
-        return {
-            "status": "success",
-            "message": f"Order {order_id} marked as {new_status}",
-            "order": ORDERS_STORE[order_id]
-        }
-    else:
+    # Updates memory and the orders table (loading orders this worker hasn't seen)
+    order = await order_store.set_status_async(order_id, new_status)
+    if order is None:
         # Order not in store - create a minimal record (for demo orders)
-        ORDERS_STORE[order_id] = {
+        order = order_store.add({
             "id": order_id,
             "status": new_status,
-            "updated_at": datetime.now().isoformat()
-        }
-        
-        return {
-            "status": "success",
-            "message": f"Order {order_id} marked as {new_status}",
-            "order": ORDERS_STORE[order_id]
-        }
+            "updated_at": datetime.utcnow().isoformat()
+        }, persist=False)
+    await invalidate_cache_async(tags=_orders_cache_tags(order.get("vendor_id")))
+
+    # A vendor-confirmed payment (e.g. bank transfer) turns the order's stock holds
+    # into a sale; holds already committed are skipped, so repeats are harmless.
+    # A cancelled order gives its held stock back.
+    try:
+        if new_status in ("paid", "fulfilled"):
+            await stock_hold_ledger.commit_order_async(order_id)
+        elif new_status == "cancelled":
+            await stock_hold_ledger.release_order_async(order_id)
+    except Exception as e:
+        logger.error(f"Failed to resolve stock holds for order {order_id}: {e}")
+    
+    return {
+        "status": "success",
+        "message": f"Order {order_id} marked as {new_status}",
+        "order": order
+    }
 
 
 
@@ -1586,8 +1810,10 @@ async def get_usage_stats():
     limits = FREEMIUM_LIMITS.get(tier, FREEMIUM_LIMITS["free"])
     
     # Get current usage
-    products_count = len(inventory_manager.list_products())
-    products_with_images = sum(1 for p in inventory_manager.list_products() if p.get("image_url"))
+    usage = await get_usage()
+    catalog = await inventory_manager.catalog_snapshot_async()
+    products_count = len(catalog)
+    products_with_images = sum(1 for p in catalog.products if p.get("image_url"))
     
     return {
         "tier": tier,
@@ -1598,14 +1824,14 @@ async def get_usage_stats():
                 "remaining": max(0, limits["max_products"] - products_count)
             },
             "orders_this_month": {
-                "used": USAGE_TRACKING.get("orders_this_month", 0),
+                "used": usage["orders_this_month"],
                 "max": limits["max_orders_per_month"],
-                "remaining": max(0, limits["max_orders_per_month"] - USAGE_TRACKING.get("orders_this_month", 0))
+                "remaining": max(0, limits["max_orders_per_month"] - usage["orders_this_month"])
             },
             "bot_conversations_this_month": {
-                "used": USAGE_TRACKING.get("bot_conversations_this_month", 0),
+                "used": usage["bot_conversations_this_month"],
                 "max": limits["max_bot_conversations_per_month"],
-                "remaining": max(0, limits["max_bot_conversations_per_month"] - USAGE_TRACKING.get("bot_conversations_this_month", 0))
+                "remaining": max(0, limits["max_bot_conversations_per_month"] - usage["bot_conversations_this_month"])
             },
             "image_uploads": {
                 "used": products_with_images,
@@ -1613,7 +1839,7 @@ async def get_usage_stats():
                 "remaining": max(0, limits["max_image_uploads"] - products_with_images)
             }
         },
-        "month_started": USAGE_TRACKING.get("month_started", datetime.now().strftime("%Y-%m"))
+        "month_started": usage["month_started"]
     }
 
 @router.post("/subscription/upgrade")
@@ -1923,7 +2149,7 @@ async def get_faq():
 @router.get("/products/low-stock")
 async def get_low_stock_products():
     """Get products that are below the stock threshold."""
-    products = inventory_manager.list_products()
+    products = await inventory_manager.list_products_async()
     low_stock = [
         {
             "id": p.get("id"),
@@ -1949,7 +2175,7 @@ async def search_products(q: str):
     if not q or len(q) < 2:
         raise HTTPException(status_code=400, detail="Search query must be at least 2 characters")
     
-    matching = inventory_manager.smart_search_products(q)
+    matching = await inventory_manager.smart_search_products_async(q)
     
     return {
         "query": q,
@@ -1958,17 +2184,61 @@ async def search_products(q: str):
     }
 
 
+# ============== SEARCH SYNONYMS ==============
+
+class SynonymUpdate(BaseModel):
+    """Custom search synonyms for one term."""
+    term: str
+    synonyms: List[str]
+    user_id: str
+
+    @validator('term')
+    def validate_term(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Term is required')
+        if len(v.strip()) > 100:
+            raise ValueError('Term must be 100 characters or less')
+        return v.strip()
+
+
+@router.get("/synonyms")
+async def get_custom_synonyms(user_id: str):
+    """List a vendor's custom search synonyms."""
+    from .services.synonyms import synonym_service
+    return {
+        "user_id": user_id,
+        "synonyms": synonym_service.list_custom(user_id)
+    }
+
+
+@router.put("/synonyms")
+async def set_custom_synonyms(request: SynonymUpdate):
+    """Create or replace custom synonyms for a term. Search picks them up immediately."""
+    from .services.synonyms import synonym_service
+    result = synonym_service.set_custom(request.user_id, request.term, request.synonyms)
+    return {"status": "success", **result}
+
+
+@router.delete("/synonyms/{term}")
+async def delete_custom_synonyms(term: str, user_id: str):
+    """Remove a vendor's custom synonyms for a term."""
+    from .services.synonyms import synonym_service
+    if not synonym_service.delete_custom(user_id, term):
+        raise HTTPException(status_code=404, detail=f"No custom synonyms for '{term}'")
+    return {"status": "success", "message": f"Synonyms for '{term}' removed"}
+
+
 @router.get("/customers/{customer_id}/stats")
 async def get_customer_stats(customer_id: str):
     """Get purchase history and stats for a customer."""
-    if customer_id in CUSTOMER_HISTORY:
-        history = CUSTOMER_HISTORY[customer_id]
+    history = await get_customer_history(customer_id)
+    if history is not None:
         return {
             "customer_id": customer_id,
-            "total_orders": len(history.get("orders", [])),
-            "total_spent": history.get("total_spent", 0),
-            "orders": history.get("orders", []),
-            "is_returning_customer": len(history.get("orders", [])) > 1
+            "total_orders": history["order_count"],
+            "total_spent": history["total_spent"],
+            "orders": history["orders"],
+            "is_returning_customer": history["order_count"] > 1
         }
     else:
         return {
@@ -1980,23 +2250,39 @@ async def get_customer_stats(customer_id: str):
         }
 
 
+def _counters_vendor(vendor_id: str) -> str:
+    """'default' is the single-vendor mode owner."""
+    return inventory_manager.user_id if vendor_id == "default" else vendor_id
+
+
 @router.get("/dashboard/summary")
-async def get_dashboard_summary():
-    """Get quick summary for merchant dashboard."""
-    products = inventory_manager.list_products()
+async def get_dashboard_summary(vendor_id: str = "default"):
+    """Get quick summary for merchant dashboard (one counters-row read)."""
+    counters = await order_counters.get_async(_counters_vendor(vendor_id))
+    if counters is not None:
+        return {
+            "total_products": counters["product_count"],
+            "low_stock_count": counters["low_stock_count"],
+            "low_stock_threshold": LOW_STOCK_THRESHOLD,
+            "pending_orders": counters["pending_orders"],
+            "paid_orders": counters["paid_orders"],
+            "fulfilled_orders": counters["fulfilled_orders"],
+            "total_orders": counters["total_orders"],
+            "total_revenue": counters["total_revenue"],
+            "unique_customers": counters["unique_customers"]
+        }
+    
+    # Database unreachable: what this worker has in memory
+    products = await inventory_manager.list_products_async()
     low_stock_count = sum(1 for p in products if p.get("stock_level", 0) <= LOW_STOCK_THRESHOLD)
     
-    # Count orders by status
-    pending_orders = sum(1 for o in ORDERS_STORE.values() if o.get("status") == "pending")
-    paid_orders = sum(1 for o in ORDERS_STORE.values() if o.get("status") == "paid")
-    fulfilled_orders = sum(1 for o in ORDERS_STORE.values() if o.get("status") == "fulfilled")
+    # Count orders by status (index sizes, no scan)
+    pending_orders = order_store.count("pending")
+    paid_orders = order_store.count("paid")
+    fulfilled_orders = order_store.count("fulfilled")
     
     # Total revenue from paid/fulfilled orders
-    total_revenue = sum(
-        o.get("total_amount", 0) 
-        for o in ORDERS_STORE.values() 
-        if o.get("status") in ["paid", "fulfilled"]
-    )
+    total_revenue = order_store.revenue(["paid", "fulfilled"])
     
     return {
         "total_products": len(products),
@@ -2005,9 +2291,9 @@ async def get_dashboard_summary():
         "pending_orders": pending_orders,
         "paid_orders": paid_orders,
         "fulfilled_orders": fulfilled_orders,
-        "total_orders": len(ORDERS_STORE),
+        "total_orders": len(order_store),
         "total_revenue": total_revenue,
-        "unique_customers": len(CUSTOMER_HISTORY)
+        "unique_customers": len({o.get("customer_phone") for o in order_store.values()} - {None})
     }
 
 
@@ -2026,7 +2312,7 @@ class VendorActivityRequest(BaseModel):
 @router.post("/bot/pause")
 async def toggle_bot_pause(request: BotPauseRequest, vendor_id: str = "default"):
     """Toggle global bot pause. When paused, bot won't reply to any customers."""
-    result = vendor_state.set_bot_paused(vendor_id, request.paused)
+    result = await vendor_state.set_bot_paused_async(vendor_id, request.paused)
     return {
         "status": "success",
         "message": "Bot paused" if request.paused else "Bot resumed",
@@ -2037,7 +2323,7 @@ async def toggle_bot_pause(request: BotPauseRequest, vendor_id: str = "default")
 @router.get("/bot/status")
 async def get_bot_status(vendor_id: str = "default"):
     """Get current bot status including pause state and active silences."""
-    return vendor_state.get_bot_status(vendor_id)
+    return await vendor_state.get_bot_status_async(vendor_id)
 
 
 @router.post("/bot/vendor-activity")
@@ -2046,7 +2332,7 @@ async def record_vendor_activity(request: VendorActivityRequest, vendor_id: str
     Record that vendor is typing/active in a specific conversation.
     This triggers auto-silence for 30 minutes for that customer.
     """
-    result = vendor_state.record_vendor_activity(vendor_id, request.customer_id)
+    result = await vendor_state.record_vendor_activity_async(vendor_id, request.customer_id)
     return {
         "status": "success",
         "message": f"Bot will be silent for customer {request.customer_id} for 30 minutes",
@@ -2057,7 +2343,7 @@ async def record_vendor_activity(request: VendorActivityRequest, vendor_id: str
 @router.get("/bot/should-respond/{customer_id}")
 async def check_should_respond(customer_id: str, vendor_id: str = "default"):
     """Check if bot should respond to a specific customer."""
-    should_respond, reason = vendor_state.should_bot_respond(vendor_id, customer_id)
+    should_respond, reason = await vendor_state.should_bot_respond_async(vendor_id, customer_id)
     return {
         "should_respond": should_respond,
         "reason": reason
@@ -2209,8 +2495,20 @@ class BulkProductImportRequest(BaseModel):
     products: List[ProductImportItem]
 
 @router.post("/products/import")
-async def import_products_json(request: BulkProductImportRequest):
+async def import_products_json(
+    request: BulkProductImportRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, description="Retries with the same key return the first response")
+):
     """Import multiple products from JSON array."""
+    async def import_products():
+        return _import_products(request)
+
+    return await run_idempotent("products-import", idempotency_key, import_products, request.dict(), response)
+
+
+def _import_products(request: BulkProductImportRequest) -> dict:
+    """Add each product to the catalog, collecting per-product errors."""
     imported = 0
     errors = []
     
@@ -2347,30 +2645,37 @@ async def scan_product_image(image: UploadFile = File(...)):
 async def get_widget_stats(vendor_id: str = "default"):
     """
     Lightweight stats endpoint for home screen widget.
-    Returns minimal data for fast widget updates.
+    Returns minimal data for fast widget updates: one counters-row read.
     """
-    from datetime import date
+    counters = await order_counters.get_async(_counters_vendor(vendor_id))
+    if counters is not None:
+        return {
+            "date": counters["counters_day"].isoformat(),
+            "revenue_today": counters["revenue_today"],
+            "orders_today": counters["orders_today"],
+            "pending_orders": counters["pending_orders"],
+            "low_stock_alerts": counters["low_stock_count"],
+            "currency": "NGN"
+        }
     
-    today = date.today().isoformat()
+    # Database unreachable: what this worker has in memory
+    today = utc_today()
     
-    # Calculate today's revenue and order count
-    today_orders = [
-        o for o in ORDERS_STORE.values()
-        if o.get("created_at", "").startswith(today) and o.get("status") in ["paid", "fulfilled"]
-    ]
+    # Calculate today's revenue and order count (day index: only today's orders are visited)
+    today_orders = order_store.created_on(today, statuses=["paid", "fulfilled"])
     
     today_revenue = sum(o.get("total_amount", 0) for o in today_orders)
     today_order_count = len(today_orders)
     
     # Pending orders needing attention
-    pending_count = sum(1 for o in ORDERS_STORE.values() if o.get("status") == "pending")
+    pending_count = order_store.count("pending")
     
     # Low stock count
-    products = inventory_manager.list_products()
+    products = await inventory_manager.list_products_async()
     low_stock_count = sum(1 for p in products if p.get("stock_level", 0) <= LOW_STOCK_THRESHOLD)
     
     return {
-        "date": today,
+        "date": today.isoformat(),
         "revenue_today": today_revenue,
         "orders_today": today_order_count,
         "pending_orders": pending_count,
@@ -2440,10 +2745,29 @@ async def paystack_webhook(request: Request):
     event = payload.get("event", "")
     data = payload.get("data", {})
     
+    # Paystack redelivers events until it gets a 200: handle each one once
+    event_id = data.get("id") or data.get("reference")
+    
+    async def handle():
+        return await _handle_paystack_event(event, data)
+    
+    return await run_idempotent("paystack", f"{event}:{event_id}" if event_id else None, handle, None)
+
+
+async def _handle_paystack_event(event: str, data: dict) -> dict:
     result = await paystack_service.process_webhook(event, data)
     
-    # If payment successful, send push notification to vendor
+    # If payment successful, commit the order's stock holds and notify the vendor
     if event == "charge.success" and result.get("processed"):
+        order_id = result.get("order_id")
+        if order_id:
+            try:
+                await stock_hold_ledger.commit_order_async(order_id)
+            except Exception as e:
+                logger.error(f"Failed to commit stock holds for order {order_id}: {e}")
+            order = await order_store.set_status_async(order_id, "paid")
+            await invalidate_cache_async(tags=_orders_cache_tags(order and order.get("vendor_id")))
+
         vendor_id = result.get("vendor_id", "default")
         amount = result.get("amount_ngn", 0)
         await push_service.notify_payment_received(vendor_id, f"₦{amount:,.0f}")
@@ -1,7 +1,7 @@
 """SQLAlchemy database models for KOFA Commerce Engine.
 Compatible with both MySQL and SQL Server.
 """
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Text, CheckConstraint
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, ForeignKey, Text, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -83,6 +83,10 @@ class Order(Base):
             "status IN ('pending', 'paid', 'fulfilled', 'cancelled')",
             name="check_order_status"
         ),
+        # Latest pending order for a customer ("I paid" from another worker)
+        Index("ix_orders_customer_status_created", "customer_phone", "status", "created_at"),
+        # Keyset pagination of a vendor's orders (GET /orders)
+        Index("ix_orders_user_created_id", "user_id", "created_at", "id"),
     )
     
     # Relationships
@@ -121,3 +125,98 @@ class Expense(Base):
     receipt_image_url = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+
+class VendorSynonym(Base):
+    """Vendor-specific search synonyms (e.g. "ankara" -> ["wax print", "fabric"])."""
+    __tablename__ = "vendor_synonyms"
+    
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False, index=True)
+    term = Column(String(100), nullable=False)
+    synonyms = Column(Text, nullable=False)  # Stored as JSON string list
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "term", name="uq_vendor_synonyms_user_term"),
+    )
+
+
+class StockHold(Base):
+    """Temporary stock hold for an unpaid order; released automatically when it expires."""
+    __tablename__ = "stock_holds"
+    
+    id = Column(GUID, primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = Column(GUID, ForeignKey("users.id"), nullable=False, index=True)
+    order_id = Column(String(36), nullable=False, index=True)
+    product_id = Column(GUID, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="active")
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    resolved_at = Column(DateTime, nullable=True)  # When committed or released
+    
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('active', 'committed', 'released')",
+            name="check_stock_hold_status"
+        ),
+        # Sweeper: active holds by expiry; availability: active holds by product
+        Index("ix_stock_holds_status_expires", "status", "expires_at"),
+        Index("ix_stock_holds_product_status", "product_id", "status"),
+    )
+
+
+class VendorCounters(Base):
+    """Per-vendor order and stock counters read by the dashboard and widget."""
+    __tablename__ = "vendor_counters"
+    
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+    pending_orders = Column(Integer, nullable=False, default=0)
+    paid_orders = Column(Integer, nullable=False, default=0)
+    fulfilled_orders = Column(Integer, nullable=False, default=0)
+    cancelled_orders = Column(Integer, nullable=False, default=0)
+    total_orders = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Float, nullable=False, default=0)  # paid + fulfilled
+    unique_customers = Column(Integer, nullable=False, default=0)
+    product_count = Column(Integer, nullable=False, default=0)
+    low_stock_count = Column(Integer, nullable=False, default=0)
+    counters_day = Column(Date, nullable=True)  # UTC day orders_today/revenue_today belong to
+    orders_today = Column(Integer, nullable=False, default=0)  # created today, paid or fulfilled
+    revenue_today = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    reconciled_at = Column(DateTime, nullable=True)
+
+
+class DailyVendorRollup(Base):
+    """One vendor's sales and expenses for one day, maintained from order and expense writes."""
+    __tablename__ = "daily_vendor_rollup"
+    
+    user_id = Column(GUID, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    order_count = Column(Integer, nullable=False, default=0)  # paid or fulfilled orders created that day
+    revenue = Column(Float, nullable=False, default=0)
+    expenses = Column(Float, nullable=False, default=0)
+    expense_breakdown = Column(Text, nullable=True)  # JSON {category: amount}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IdempotencyKey(Base):
+    """A claimed idempotency key and, once the request completed, its stored response."""
+    __tablename__ = "idempotency_keys"
+    
+    scope = Column(String(50), primary_key=True)  # endpoint, e.g. "orders", "paystack"
+    key = Column(String(255), primary_key=True)  # Idempotency-Key header or provider event/message ID
+    fingerprint = Column(String(64), nullable=True)  # SHA-256 of the request payload
+    status = Column(String(20), nullable=False, default="processing")
+    response = Column(Text, nullable=True)  # JSON response body, once completed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('processing', 'completed')",
+            name="check_idempotency_key_status"
+        ),
+    )
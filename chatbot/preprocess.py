@@ -0,0 +1,135 @@
+"""
+Shared preprocessing for inbound customer messages.
+
+Intent recognition, product-query extraction, language detection, product
+search and list selection each used to lowercase, strip and split the same
+message again. preprocess() does that once per message, and those stages
+accept the PreprocessedMessage (or, as before, a plain string, which they
+preprocess themselves).
+
+Parts only some messages need (cleaned tokens, Pidgin fillers, the product
+query, the language) are worked out from the cleaned tokens on first use and
+kept on the message. Product search is handed product_query_message, which
+reuses the query tokens instead of splitting the query string again.
+"""
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+from .services.localization import LANGUAGE_KEYWORDS, Language
+
+# Punctuation stripped from the ends of each token
+PUNCTUATION = "?.,!"
+
+# Nigerian English / Pidgin filler words
+PIDGIN_FILLERS = frozenset([
+    "abeg", "oya", "na", "wetin", "dey", "fit", "una", "am", "e", "o",
+    "that", "this", "my", "brother", "sister", "hope", "you", "me", "i",
+    "wan", "make", "for", "be", "go", "don"
+])
+
+# Words that are never part of a product query
+QUERY_FILLERS = frozenset(["the", "a", "an", "?", ".", ",", "!", "get", "need", "have"]) | PIDGIN_FILLERS
+
+
+def _language_words() -> Dict[str, Tuple[Language, ...]]:
+    words: Dict[str, Tuple[Language, ...]] = {}
+    for language, keywords in LANGUAGE_KEYWORDS.items():
+        for keyword in keywords:
+            words[keyword] = words.get(keyword, ()) + (language,)
+    return words
+
+
+# Language keyword (one word, or two as "w1 w2") -> languages it counts for
+LANGUAGE_WORDS = _language_words()
+
+
+class PreprocessedMessage:
+    """One inbound message, normalized and tokenized once."""
+
+    __slots__ = ("text", "normalized", "tokens", "_clean_tokens", "_product_query_tokens", "_product_query_message",
+                 "_language")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.normalized = text.lower().strip()
+        self.tokens: List[str] = self.normalized.split()
+        self._clean_tokens = None
+        self._product_query_tokens = None
+        self._product_query_message = None
+        self._language = None
+
+    @classmethod
+    def _from_tokens(cls, tokens: List[str]) -> "PreprocessedMessage":
+        """A message of already normalized, clean tokens (no lowercasing or splitting)."""
+        message = cls.__new__(cls)
+        message.text = message.normalized = " ".join(tokens)
+        message.tokens = message._clean_tokens = tokens
+        message._product_query_tokens = message._product_query_message = message._language = None
+        return message
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"PreprocessedMessage({self.text!r})"
+
+    @property
+    def clean_tokens(self) -> List[str]:
+        """Tokens with surrounding punctuation stripped."""
+        if self._clean_tokens is None:
+            self._clean_tokens = [token.strip(PUNCTUATION) for token in self.tokens]
+        return self._clean_tokens
+
+    @property
+    def pidgin_fillers(self) -> FrozenSet[str]:
+        """Pidgin filler words the message contains."""
+        return PIDGIN_FILLERS.intersection(self.clean_tokens)
+
+    @property
+    def has_pidgin_fillers(self) -> bool:
+        return not PIDGIN_FILLERS.isdisjoint(self.clean_tokens)
+
+    @property
+    def product_query_tokens(self) -> List[str]:
+        """Words that could describe a product: fillers and single letters removed."""
+        if self._product_query_tokens is None:
+            self._product_query_tokens = [
+                word for word in self.clean_tokens if word not in QUERY_FILLERS and len(word) > 1
+            ]
+        return self._product_query_tokens
+
+    @property
+    def product_query(self) -> Optional[str]:
+        """Product name/description the message mentions, or None."""
+        query = self.product_query_message
+        return query.text if query is not None else None
+
+    @property
+    def product_query_message(self) -> Optional["PreprocessedMessage"]:
+        """The product query as a message of its own, for product search, or None."""
+        if self._product_query_message is None and self.product_query_tokens:
+            self._product_query_message = PreprocessedMessage._from_tokens(self.product_query_tokens)
+        return self._product_query_message
+
+
+    @property
+    def language(self) -> Language:
+        """
+        Detected language: the one with the most keywords among the words and
+        word pairs of the message (English when none match).
+        """
+        if self._language is None:
+            tokens = self.clean_tokens
+            scores = dict.fromkeys(Language, 0)
+            for word in set(tokens).union(" ".join(pair) for pair in zip(tokens, tokens[1:])):
+                for language in LANGUAGE_WORDS.get(word, ()):
+                    scores[language] += 1
+            best = max(scores, key=scores.get)
+            self._language = best if scores[best] > 0 else Language.ENGLISH
+        return self._language
+
+
+def preprocess(message: Union[str, PreprocessedMessage]) -> PreprocessedMessage:
+    """Preprocess a message, or return it unchanged if it already is."""
+    if isinstance(message, PreprocessedMessage):
+        return message
+    return PreprocessedMessage(message)
@@ -1,6 +1,8 @@
 """Response formatter for Nigerian market."""
 from enum import Enum
 
+from .services.localization import Language, t
+
 
 class ResponseStyle(str, Enum):
     """Response style options."""
@@ -20,15 +22,19 @@ class ResponseFormatter:
         """
         self.style = style
     
-    def format_greeting(self) -> str:
-        """Format greeting message."""
+    def format_greeting(self, language: Language = Language.ENGLISH, store_name: str = "our store") -> str:
+        """Format greeting message (in the customer's language when they don't write in English)."""
+        if language != Language.ENGLISH:
+            return t("greeting", language, store_name=store_name)
         if self.style == ResponseStyle.CORPORATE:
             return "Hello! 👋 Welcome to our store. I can help you check prices, availability, and make purchases. What are you looking for?"
         else:  # STREET
             return "Hello! 👋 How far? Wetin you dey find? I fit help you check price, availability, and buy anything. Talk to me!"
     
-    def format_help(self) -> str:
+    def format_help(self, language: Language = Language.ENGLISH) -> str:
         """Format help message."""
+        if language != Language.ENGLISH:
+            return t("help", language)
         if self.style == ResponseStyle.CORPORATE:
             return (
                 "Here's what I can help you with:\n\n"
@@ -129,8 +135,10 @@ class ResponseFormatter:
         else:  # STREET
             return "Omo sorry o, payment link no generate. Abeg contact customer care."
     
-    def format_unknown_message(self) -> str:
+    def format_unknown_message(self, language: Language = Language.ENGLISH) -> str:
         """Format unknown intent message."""
+        if language != Language.ENGLISH:
+            return t("unknown", language)
         if self.style == ResponseStyle.CORPORATE:
             return (
                 "I'm not sure what you're looking for. 🤔\n\n"
@@ -108,67 +108,60 @@ async def register(request: RegisterRequest):
     Sends verification email before creating the account.
     """
     try:
-        from ..database import SessionLocal
+        from ..database import run_db
         from ..models import User
         
-        db = SessionLocal()
-        try:
+        def find_conflict(db):
             # Check if email already exists
-            existing = db.query(User).filter(User.email == request.email).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Email already registered")
+            if db.query(User.id).filter(User.email == request.email).first():
+                return "Email already registered"
             
             # Check if phone exists (if provided)
-            if request.phone:
-                existing_phone = db.query(User).filter(User.phone == request.phone).first()
-                if existing_phone:
-                    raise HTTPException(status_code=400, detail="Phone number already registered")
-            
-            # Generate verification code
-            verification_code = generate_verification_code()
-            
-            # Send verification email
-            email_result = await send_verification_email(
-                to_email=request.email,
-                verification_code=verification_code,
-                first_name=request.first_name
+            if request.phone and db.query(User.id).filter(User.phone == request.phone).first():
+                return "Phone number already registered"
+            return None
+        
+        conflict = await run_db(find_conflict)
+        if conflict:
+            raise HTTPException(status_code=400, detail=conflict)
+        
+        # Generate verification code
+        verification_code = generate_verification_code()
+        
+        # Send verification email
+        email_result = await send_verification_email(
+            to_email=request.email,
+            verification_code=verification_code,
+            first_name=request.first_name
+        )
+        
+        if not email_result.get("success"):
+            raise HTTPException(
+                status_code=500, 
+                detail=f"Failed to send verification email: {email_result.get('error', 'Unknown error')}"
             )
-            
-            if not email_result.get("success"):
-                raise HTTPException(
-                    status_code=500, 
-                    detail=f"Failed to send verification email: {email_result.get('error', 'Unknown error')}"
-                )
-            
-            # Store pending user data with verification code
-            VERIFICATION_CODES[request.email] = {
-                "code": verification_code,
-                "expiry": get_verification_expiry(),
-                "user_data": {
-                    "email": request.email,
-                    "password": request.password,
-                    "first_name": request.first_name,
-                    "business_name": request.business_name,
-                    "phone": request.phone
-                }
+        
+        # Store pending user data with verification code
+        VERIFICATION_CODES[request.email] = {
+            "code": verification_code,
+            "expiry": get_verification_expiry(),
+            "user_data": {
+                "email": request.email,
+                "password": request.password,
+                "first_name": request.first_name,
+                "business_name": request.business_name,
+                "phone": request.phone
             }
-            
-            return AuthResponse(
-                success=True,
-                email=request.email,
-                first_name=request.first_name,
-                business_name=request.business_name,
-                requires_verification=True,
-                message="Verification email sent. Please check your inbox."
-            )
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
-        finally:
-            db.close()
+        }
+        
+        return AuthResponse(
+            success=True,
+            email=request.email,
+            first_name=request.first_name,
+            business_name=request.business_name,
+            requires_verification=True,
+            message="Verification email sent. Please check your inbox."
+        )
             
     except HTTPException:
         raise
@@ -183,7 +176,7 @@ async def verify_email(request: VerifyCodeRequest):
     Creates the user account after successful verification.
     """
     try:
-        from ..database import SessionLocal
+        from ..database import run_db
         from ..models import User
         
         email = request.email.lower().strip()
@@ -206,54 +199,50 @@ async def verify_email(request: VerifyCodeRequest):
         user_data = verification_data["user_data"]
         
         # Create user account
-        db = SessionLocal()
-        try:
+        def create_user(db):
             # Check if user already exists
             existing = db.query(User).filter(User.email == email).first()
             if existing:
-                del VERIFICATION_CODES[email]
-                return AuthResponse(
-                    success=True,
-                    user_id=existing.id,
-                    email=email,
-                    first_name=existing.first_name,
-                    business_name=existing.business_name,
-                    message="Email already verified and account exists"
-                )
+                return {
+                    "user_id": existing.id,
+                    "first_name": existing.first_name,
+                    "business_name": existing.business_name,
+                    "created": False
+                }
             
             # Create new user with hashed password
             user_id = str(uuid.uuid4())
-            new_user = User(
+            db.add(User(
                 id=user_id,
                 email=email,
                 phone=user_data.get("phone") or f"+234{uuid.uuid4().hex[:10]}",
                 password_hash=hash_password(user_data["password"]),
                 first_name=user_data["first_name"],
                 business_name=user_data["business_name"]
+            ))
+            return {
+                "user_id": user_id,
+                "first_name": user_data["first_name"],
+                "business_name": user_data["business_name"],
+                "created": True
+            }
+        
+        user = await run_db(create_user, commit=True)
+        
+        # Clear verification data
+        VERIFICATION_CODES.pop(email, None)
+        
+        return AuthResponse(
+            success=True,
+            user_id=user["user_id"],
+            email=email,
+            first_name=user["first_name"],
+            business_name=user["business_name"],
+            message=(
+                "Email verified and account created successfully" if user["created"]
+                else "Email already verified and account exists"
             )
-            
-            db.add(new_user)
-            db.commit()
-            
-            # Clear verification data
-            del VERIFICATION_CODES[email]
-            
-            return AuthResponse(
-                success=True,
-                user_id=user_id,
-                email=email,
-                first_name=user_data["first_name"],
-                business_name=user_data["business_name"],
-                message="Email verified and account created successfully"
-            )
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(status_code=500, detail=f"Verification failed: {str(e)}")
-        finally:
-            db.close()
+        )
             
     except HTTPException:
         raise
@@ -311,40 +300,43 @@ async def login(request: LoginRequest):
     Returns user data on success.
     """
     try:
-        from ..database import SessionLocal
+        from ..database import run_db
         from ..models import User
         
-        db = SessionLocal()
-        try:
+        def find_user(db):
             # Find user by email
             user = db.query(User).filter(User.email == request.email.lower().strip()).first()
-            
             if not user:
-                raise HTTPException(status_code=401, detail="Invalid email or password")
-            
-            # Check password from database
-            if not user.password_hash:
-                raise HTTPException(status_code=401, detail="Account not verified. Please complete email verification.")
-            
-            # Verify password
-            if not verify_password(request.password, user.password_hash):
-                raise HTTPException(status_code=401, detail="Invalid email or password")
-            
-            return AuthResponse(
-                success=True,
-                user_id=user.id,
-                email=user.email,
-                first_name=user.first_name or "User",
-                business_name=user.business_name,
-                message="Login successful"
-            )
-            
-        except HTTPException:
-            raise
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
-        finally:
-            db.close()
+                return None
+            return {
+                "id": user.id,
+                "email": user.email,
+                "first_name": user.first_name,
+                "business_name": user.business_name,
+                "password_hash": user.password_hash
+            }
+        
+        user = await run_db(find_user)
+        
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        # Check password from database
+        if not user["password_hash"]:
+            raise HTTPException(status_code=401, detail="Account not verified. Please complete email verification.")
+        
+        # Verify password
+        if not verify_password(request.password, user["password_hash"]):
+            raise HTTPException(status_code=401, detail="Invalid email or password")
+        
+        return AuthResponse(
+            success=True,
+            user_id=user["id"],
+            email=user["email"],
+            first_name=user["first_name"] or "User",
+            business_name=user["business_name"],
+            message="Login successful"
+        )
             
     except HTTPException:
         raise
@@ -358,34 +350,41 @@ async def get_current_user(user_id: str):
     Get current user profile.
     """
     try:
-        from ..database import SessionLocal
+        from ..database import run_db
         from ..models import User
         
-        db = SessionLocal()
-        try:
+        def find_user(db):
             user = db.query(User).filter(User.id == user_id).first()
-            
             if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-            
-            # Get stored data for first_name
-            stored_data = None
-            for email, data in USERS_STORE.items():
-                if data.get("user_id") == user_id:
-                    stored_data = data
-                    break
-            
+                return None
             return {
-                "user_id": user.id,
+                "id": user.id,
                 "email": user.email,
-                "first_name": stored_data.get("first_name") if stored_data else (user.business_name.split()[0] if user.business_name else "User"),
                 "business_name": user.business_name,
                 "phone": user.phone,
                 "bot_style": user.bot_style
             }
-            
-        finally:
-            db.close()
+        
+        user = await run_db(find_user)
+        
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        # Get stored data for first_name
+        stored_data = None
+        for email, data in USERS_STORE.items():
+            if data.get("user_id") == user_id:
+                stored_data = data
+                break
+        
+        return {
+            "user_id": user["id"],
+            "email": user["email"],
+            "first_name": stored_data.get("first_name") if stored_data else (user["business_name"].split()[0] if user["business_name"] else "User"),
+            "business_name": user["business_name"],
+            "phone": user["phone"],
+            "bot_style": user["bot_style"]
+        }
             
     except HTTPException:
         raise
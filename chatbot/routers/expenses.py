@@ -37,13 +37,13 @@ async def log_expense(expense: ExpenseCreate):
     """
     Logs a new business expense to the database.
     """
-    from ..database import SessionLocal
+    from ..database import run_db
     from ..models import Expense as ExpenseModel
+    from ..services.sales_rollup import sales_rollup
     
-    db = SessionLocal()
-    try:
-        expense_id = str(uuid.uuid4())
-        
+    expense_id = str(uuid.uuid4())
+    
+    def save(db):
         new_expense = ExpenseModel(
             id=expense_id,
             user_id=expense.user_id or "demo-user",  # Default for backward compatibility
@@ -53,24 +53,27 @@ async def log_expense(expense: ExpenseCreate):
             expense_type=expense.expense_type or "BUSINESS",
             date=datetime.fromisoformat(expense.date.replace('Z', '+00:00')) if expense.date else datetime.utcnow()
         )
-        
         db.add(new_expense)
-        db.commit()
-        
-        return {
-            "id": expense_id,
-            "amount": expense.amount,
-            "description": expense.description,
-            "category": expense.category,
-            "expense_type": expense.expense_type,
-            "date": new_expense.date.isoformat(),
-            "message": "Expense logged successfully"
-        }
+        db.flush()
+        sales_rollup.record_expense(
+            db, new_expense.user_id, new_expense.date.date(), new_expense.category, new_expense.amount
+        )
+        return new_expense.date
+    
+    try:
+        expense_date = await run_db(save, commit=True)
     except Exception as e:
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
+    
+    return {
+        "id": expense_id,
+        "amount": expense.amount,
+        "description": expense.description,
+        "category": expense.category,
+        "expense_type": expense.expense_type,
+        "date": expense_date.isoformat(),
+        "message": "Expense logged successfully"
+    }
 
 
 @router.get("/summary")
@@ -78,12 +81,11 @@ async def get_expense_summary(user_id: str = None):
     """
     Returns total expense summary for a user.
     """
-    from ..database import SessionLocal
+    from ..database import run_db
     from ..models import Expense as ExpenseModel
     from sqlalchemy import func
     
-    db = SessionLocal()
-    try:
+    def summarize(db):
         query = db.query(
             func.sum(ExpenseModel.amount).label('total'),
             func.count(ExpenseModel.id).label('count')
@@ -93,15 +95,16 @@ async def get_expense_summary(user_id: str = None):
             query = query.filter(ExpenseModel.user_id == user_id)
         
         result = query.first()
-        
-        return {
-            "total": result.total or 0,
-            "business_burn": result.total or 0,
-            "expense_count": result.count or 0,
-            "total_outflow": result.total or 0
-        }
-    finally:
-        db.close()
+        return result.total or 0, result.count or 0
+    
+    total, count = await run_db(summarize)
+    
+    return {
+        "total": total,
+        "business_burn": total,
+        "expense_count": count,
+        "total_outflow": total
+    }
 
 
 @router.get("/list")
@@ -109,11 +112,10 @@ async def list_expenses(user_id: str = None, expense_type: Optional[str] = None)
     """
     List all expenses for a user, optionally filtered by type.
     """
-    from ..database import SessionLocal
+    from ..database import run_db
     from ..models import Expense as ExpenseModel
     
-    db = SessionLocal()
-    try:
+    def load(db):
         query = db.query(ExpenseModel)
         
         if user_id:
@@ -136,5 +138,5 @@ async def list_expenses(user_id: str = None, expense_type: Optional[str] = None)
             }
             for e in expenses
         ]
-    finally:
-        db.close()
+    
+    return await run_db(load)
@@ -9,6 +9,9 @@ import json
 import os
 from datetime import datetime
 
+from ..services.idempotency import process_once
+from ..preprocess import PreprocessedMessage, preprocess
+
 router = APIRouter()
 
 # Verification token for webhook setup
@@ -70,14 +73,20 @@ async def receive_webhook(request: Request):
         # Parse the message
         messages = extract_messages(body)
         
+        processed = 0
         for message in messages:
-            # Track for analytics
-            track_message(message, "customer")
+            async def handle(message=message):
+                # Track for analytics
+                track_message(message, "customer")
+                
+                # Process each message through the chatbot
+                await process_instagram_message(message)
             
-            # Process each message through the chatbot
-            await process_instagram_message(message)
+            # Once per message ID: Meta redelivers
+            if await process_once("instagram", message.message_id, handle):
+                processed += 1
         
-        return {"status": "received", "messages_processed": len(messages)}
+        return {"status": "received", "messages_processed": processed}
         
     except Exception as e:
         print(f"❌ Error processing Instagram webhook: {e}")
@@ -135,7 +144,7 @@ async def process_instagram_message(message: InstagramMessage):
     
     # Check if bot should respond
     vendor_id = "default"
-    should_respond, reason = vendor_state.should_bot_respond(vendor_id, message.sender_id)
+    should_respond, reason = await vendor_state.should_bot_respond_async(vendor_id, message.sender_id)
     
     if not should_respond:
         print(f"🤐 Bot silent for Instagram user {message.sender_id}: {reason}")
@@ -146,10 +155,11 @@ async def process_instagram_message(message: InstagramMessage):
         from ..intent import Intent
         
         # Recognize intent
-        intent, entities = intent_recognizer.recognize(message.text)
+        preprocessed = preprocess(message.text)
+        intent = intent_recognizer.recognize(preprocessed)
         
         # Generate response
-        response_text = generate_response(intent, entities, inventory_manager, response_formatter)
+        response_text = generate_response(intent, preprocessed, inventory_manager, response_formatter)
         
         # Track bot response
         track_message(InstagramMessage(
@@ -168,23 +178,28 @@ async def process_instagram_message(message: InstagramMessage):
         print(f"❌ Error processing Instagram message: {e}")
 
 
-def generate_response(intent, entities, inventory_manager, formatter) -> str:
-    """Generate a response based on intent and entities."""
+def generate_response(
+    intent,
+    message: PreprocessedMessage,
+    inventory_manager,
+    formatter
+) -> str:
+    """Generate a response based on the intent and the preprocessed message."""
     from ..intent import Intent
     from ..payment import PaymentManager
     
     payment_manager = PaymentManager()
     
     if intent == Intent.GREETING:
-        return formatter.format_greeting()
+        return formatter.format_greeting(message.language)
     
     elif intent == Intent.HELP:
-        return formatter.format_help()
+        return formatter.format_help(message.language)
     
     elif intent in [Intent.AVAILABILITY_CHECK, Intent.PRICE_INQUIRY]:
-        product_query = entities.get("product", "")
+        product_query = message.product_query
         if product_query:
-            products = inventory_manager.smart_search_products(product_query)
+            products = inventory_manager.smart_search_products(message.product_query_message)
             if products and len(products) > 0:
                 product = products[0]
                 price_formatted = payment_manager.format_naira(product.get("price_ngn", 0))
@@ -202,7 +217,7 @@ def generate_response(intent, entities, inventory_manager, formatter) -> str:
         return "Check your order status in the KOFA merchant app! 📱"
     
     else:
-        return formatter.format_unknown_message()
+        return formatter.format_unknown_message(message.language)
 
 
 async def send_instagram_message(recipient_id: str, message_text: str):
@@ -29,6 +29,96 @@ class ShopResponse(BaseModel):
     products: List[ProductItem]
 
 
+# Shop name -> vendor profile lookups; names only change at signup
+SHOP_PROFILE_TTL_SECONDS = 300
+
+
+def _shop_profile_key(shop_name: str) -> str:
+    return f"storefront:shop:{shop_name.strip().lower()}"
+
+
+def _profile_dict(vendor) -> dict:
+    return {
+        "vendor_id": str(vendor.id),
+        "business_name": vendor.business_name or "Shop",
+        "display_name": vendor.first_name or vendor.business_name or "Shop",
+        "phone": vendor.phone
+    }
+
+
+async def _shop_profile(decoded_name: str) -> dict:
+    """Vendor profile for a shop name (cached)."""
+    from ..cache import get_or_load
+    from ..database import run_db
+    from ..models import User
+
+    def load_profile(db):
+        # Find vendor by business_name (case-insensitive)
+        vendor = db.query(User).filter(
+            func.lower(User.business_name) == decoded_name.lower()
+        ).first()
+        
+        if not vendor:
+            # Try partial match
+            vendor = db.query(User).filter(
+                User.business_name.ilike(f"%{decoded_name}%")
+            ).first()
+        
+        if not vendor:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Shop '{decoded_name}' not found"
+            )
+        return _profile_dict(vendor)
+
+    return await get_or_load(
+        _shop_profile_key(decoded_name),
+        lambda: run_db(load_profile),
+        ttl_seconds=SHOP_PROFILE_TTL_SECONDS
+    )
+
+
+async def _shop_products(vendor_id: str) -> List[ProductItem]:
+    """In-stock products by name, from the vendor's shared catalog snapshot."""
+    from ..inventory import InventoryManager
+
+    snapshot = await InventoryManager(user_id=vendor_id).catalog_snapshot_async()
+    in_stock = sorted(
+        (p for p in snapshot.products if p["stock_level"] > 0),
+        key=lambda p: p["name"]
+    )
+    return [
+        ProductItem(
+            id=p["id"],
+            name=p["name"],
+            price=p["price_ngn"],
+            stock=p["stock_level"],
+            image_url=p.get("image_url"),
+            category=p.get("category") or None
+        )
+        for p in in_stock
+    ]
+
+
+async def warm_storefront(vendor_id: str) -> bool:
+    """Pre-load a vendor's storefront profile and products. False if the vendor has no shop name."""
+    from ..cache import set_cache_async
+    from ..database import run_db
+    from ..models import User
+
+    def load_vendor(db):
+        vendor = db.query(User).filter(User.id == vendor_id).first()
+        return (vendor.business_name, _profile_dict(vendor)) if vendor and vendor.business_name else None
+
+    found = await run_db(load_vendor)
+    if found is None:
+        return False
+    business_name, profile = found
+    await set_cache_async(_shop_profile_key(business_name), profile, ttl_seconds=SHOP_PROFILE_TTL_SECONDS)
+    await _shop_products(vendor_id)
+    return True
+
+
 @router.get("/shop/{shop_name}", response_model=ShopResponse)
 async def get_public_shop(shop_name: str):
     """
@@ -36,61 +126,16 @@ async def get_public_shop(shop_name: str):
     Lookup by business_name (case-insensitive, URL-decoded).
     """
     try:
-        from ..database import SessionLocal
-        from ..models import User, Product
-        
         # URL decode and normalize the shop name
         import urllib.parse
         decoded_name = urllib.parse.unquote(shop_name).strip()
         
-        db = SessionLocal()
-        try:
-            # Find vendor by business_name (case-insensitive)
-            vendor = db.query(User).filter(
-                func.lower(User.business_name) == decoded_name.lower()
-            ).first()
-            
-            if not vendor:
-                # Try partial match
-                vendor = db.query(User).filter(
-                    User.business_name.ilike(f"%{decoded_name}%")
-                ).first()
-            
-            if not vendor:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Shop '{decoded_name}' not found"
-                )
-            
-            # Get vendor's products (only in-stock items)
-            products = db.query(Product).filter(
-                Product.user_id == vendor.id,
-                Product.stock_level > 0
-            ).order_by(Product.name).all()
-            
-            # Build product list
-            product_list = []
-            for p in products:
-                product_list.append(ProductItem(
-                    id=p.id,
-                    name=p.name,
-                    price=p.price_ngn,
-                    stock=p.stock_level,
-                    image_url=p.image_url,
-                    category=p.category
-                ))
-            
-            return ShopResponse(
-                vendor_id=vendor.id,
-                business_name=vendor.business_name or "Shop",
-                display_name=vendor.first_name or vendor.business_name or "Shop",
-                phone=vendor.phone,
-                avatar_url=None,  # Can add avatar field later
-                products=product_list
-            )
-            
-        finally:
-            db.close()
+        profile = await _shop_profile(decoded_name)
+        return ShopResponse(
+            **profile,
+            avatar_url=None,  # Can add avatar field later
+            products=await _shop_products(profile["vendor_id"])
+        )
             
     except HTTPException:
         raise
@@ -6,6 +6,9 @@ import json
 import hmac
 import hashlib
 
+from ..services.idempotency import process_once
+from ..preprocess import PreprocessedMessage, preprocess
+
 router = APIRouter()
 
 
@@ -68,12 +71,14 @@ async def receive_webhook(request: Request):
         # Parse the message
         messages = extract_messages(body)
         
+        processed = 0
         for message in messages:
-            # Process each message through the chatbot
-            await process_whatsapp_message(message)
+            # Process each message through the chatbot (once: Meta redelivers)
+            if await process_once("whatsapp", message.message_id, process_whatsapp_message, message):
+                processed += 1
         
         # Always return 200 to acknowledge receipt
-        return {"status": "received", "messages_processed": len(messages)}
+        return {"status": "received", "messages_processed": processed}
         
     except Exception as e:
         print(f"❌ Error processing webhook: {e}")
@@ -179,7 +184,7 @@ async def process_whatsapp_message(message: WhatsAppMessage):
     
     # Check if bot should respond (respects global pause and auto-silence)
     vendor_id = "default"  # In production, extract from context
-    should_respond, reason = vendor_state.should_bot_respond(vendor_id, message.from_number)
+    should_respond, reason = await vendor_state.should_bot_respond_async(vendor_id, message.from_number)
     
     if not should_respond:
         print(f"🤐 Bot silent for {message.from_number}: {reason}")
@@ -187,12 +192,13 @@ async def process_whatsapp_message(message: WhatsAppMessage):
     
     try:
         # Recognize intent from text (original or transcribed)
-        intent, entities = intent_recognizer.recognize(message_text)
+        preprocessed = preprocess(message_text)
+        intent = intent_recognizer.recognize(preprocessed)
         
         # Generate response based on intent (simplified version)
         response_text = generate_chatbot_response(
             intent, 
-            entities, 
+            preprocessed, 
             inventory_manager,
             response_formatter
         )
@@ -207,9 +213,14 @@ async def process_whatsapp_message(message: WhatsAppMessage):
         print(f"❌ Error processing message: {e}")
 
 
-def generate_chatbot_response(intent, entities, inventory_manager, formatter) -> str:
+def generate_chatbot_response(
+    intent,
+    message: PreprocessedMessage,
+    inventory_manager,
+    formatter
+) -> str:
     """
-    Generate a response based on intent and entities.
+    Generate a response based on the intent and the preprocessed message.
     
     IMPORTANT: Responses should NEVER end the conversation!
     Always include a follow-up question to keep the 24-hour window open.
@@ -231,15 +242,15 @@ def generate_chatbot_response(intent, entities, inventory_manager, formatter) ->
     follow_up = random.choice(FOLLOW_UPS)
     
     if intent == Intent.GREETING:
-        return formatter.format_greeting() + follow_up
+        return formatter.format_greeting(message.language) + follow_up
     
     elif intent == Intent.HELP:
-        return formatter.format_help() + follow_up
+        return formatter.format_help(message.language) + follow_up
     
     elif intent in [Intent.AVAILABILITY_CHECK, Intent.PRICE_INQUIRY]:
-        product_query = entities.get("product", "")
+        product_query = message.product_query
         if product_query:
-            products = inventory_manager.smart_search_products(product_query)
+            products = inventory_manager.smart_search_products(message.product_query_message)
             if products and len(products) > 0:
                 product = products[0]
                 price_formatted = payment_manager.format_naira(product.get("price_ngn", 0))
@@ -258,7 +269,7 @@ def generate_chatbot_response(intent, entities, inventory_manager, formatter) ->
         return "Check your order status in the KOFA merchant app! 📱" + "\n\n📋 *Want a receipt sent to you?*"
     
     else:
-        return formatter.format_unknown_message() + follow_up
+        return formatter.format_unknown_message(message.language) + follow_up
 
 
 async def send_whatsapp_message(to_number: str, message_text: str):
@@ -0,0 +1,404 @@
+"""
+In-memory product search index for smart product search.
+
+Keeps one index per vendor with token and character-trigram postings over
+product name, voice tags, category and description. The index is built once
+from the database and then kept current by InventoryManager writes, so a
+customer query only has to fuzzy-score a few dozen candidates instead of the
+whole catalog.
+"""
+import json
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from .fuzzy import first_above_per_group, partial_ratio_scores, ratio_scores
+
+# How many candidates are handed to the (expensive) scoring stage per query
+MAX_CANDIDATES = 50
+
+# Rebuild from the database after this long, so products written by other
+# workers or by bulk jobs that bypass InventoryManager show up eventually
+INDEX_MAX_AGE_SECONDS = 300
+
+# Minimum score for a product to be returned by smart search
+MIN_RESULT_SCORE = 20
+
+# Query terms that pull in every product of a category (strategy 6)
+CATEGORY_TERMS = {
+    "footwear": ["shoe", "shoes", "sneaker", "sneakers", "canvas", "kicks"],
+    "clothing": ["shirt", "shorts", "jeans", "trouser", "top", "clothes"],
+    "accessories": ["bag", "wallet", "chain", "glasses", "shades"],
+    "jewelry": ["chain", "necklace", "gold", "ring", "earring"],
+    "electronics": ["charger", "phone", "cable", "earphones"]
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def parse_voice_tags(raw) -> List[str]:
+    """Decode the voice_tags column (JSON text or list) into lowercase tags."""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            return []
+    if not isinstance(raw, list):
+        return []
+    return [str(t).lower() for t in raw]
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of character trigrams of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class IndexedProduct:
+    """Search fields of one product, pre-lowercased and pre-parsed."""
+
+    __slots__ = ("seq", "product_id", "name", "tags", "description", "category")
+
+    def __init__(self, seq: int, product_id: str, name: str, tags: List[str],
+                 description: str, category: str):
+        self.seq = seq
+        self.product_id = product_id
+        self.name = name
+        self.tags = tags
+        self.description = description
+        self.category = category
+
+
+def fuzzy_bonuses(docs: List[IndexedProduct], query_lower: str) -> List[int]:
+    """
+    Fuzzy-matching points (strategy 5) for a batch of products.
+
+    One batch partial_ratio call covers every name and one batch ratio call
+    covers every voice tag, instead of one fuzzywuzzy call per pair.
+    """
+    name_scores = partial_ratio_scores(query_lower, [doc.name for doc in docs])
+
+    flat_tags: List[str] = []
+    offsets = [0]
+    for doc in docs:
+        flat_tags.extend(doc.tags)
+        offsets.append(len(flat_tags))
+    tag_scores = first_above_per_group(ratio_scores(query_lower, flat_tags), 70, offsets)
+
+    bonuses = []
+    for name_fuzzy, tag_fuzzy in zip(name_scores, tag_scores):
+        bonus = 0
+        if name_fuzzy > 70:
+            bonus += int(name_fuzzy) // 4
+        if tag_fuzzy > 70:
+            bonus += tag_fuzzy // 5
+        bonuses.append(bonus)
+    return bonuses
+
+
+def expand_synonyms(query_words: List[str]) -> Dict[str, FrozenSet[str]]:
+    """Built-in synonym sets for each query word of 3+ characters."""
+    from .conversation import get_synonym_table
+
+    table = get_synonym_table()
+    return {
+        word: table.get(word, frozenset((word,)))
+        for word in query_words if len(word) >= 3
+    }
+
+
+def score_product(doc: IndexedProduct, query_lower: str, query_words: List[str],
+                  fuzzy_bonus: Optional[int] = None,
+                  synonyms: Optional[Dict[str, FrozenSet[str]]] = None) -> int:
+    """
+    Score one product against a query.
+
+    Same strategies and weights smart_search_products has always used:
+    exact name, voice tag, word-by-word, synonyms, fuzzy and category fallback.
+    When scoring a batch, pass fuzzy_bonus from fuzzy_bonuses() and synonyms
+    expanded once for the whole query.
+    """
+    if synonyms is None:
+        synonyms = expand_synonyms(query_words)
+
+    score = 0
+    name_lower = doc.name
+    description_lower = doc.description
+    category_lower = doc.category
+    tags = doc.tags
+
+    # STRATEGY 1: Exact name match (highest priority)
+    if query_lower in name_lower:
+        score += 100
+
+    # STRATEGY 2: Exact voice tag match
+    for tag in tags:
+        if query_lower == tag or query_lower in tag or tag in query_lower:
+            score += 80
+            break
+
+    # STRATEGY 3: Word-by-word matching
+    for word in query_words:
+        if len(word) < 2:
+            continue
+
+        if word in name_lower:
+            score += 40
+
+        for tag in tags:
+            if word in tag:
+                score += 35
+                break
+
+        if word in description_lower:
+            score += 15
+
+        if word in category_lower:
+            score += 25
+
+    # STRATEGY 4: Synonym matching
+    for word in query_words:
+        if len(word) < 3:
+            continue
+        for synonym in synonyms.get(word, (word,)):
+            if synonym in name_lower:
+                score += 30
+            for tag in tags:
+                if synonym in tag:
+                    score += 25
+                    break
+            if synonym in category_lower:
+                score += 20
+
+    # STRATEGY 5: Fuzzy matching (for typos/variations)
+    if fuzzy_bonus is None:
+        fuzzy_bonus = fuzzy_bonuses([doc], query_lower)[0]
+    score += fuzzy_bonus
+
+    # STRATEGY 6: Category fallback
+    for cat, terms in CATEGORY_TERMS.items():
+        if any(term in query_lower for term in terms):
+            if category_lower == cat:
+                score += 20
+
+    return score
+
+
+class ProductSearchIndex:
+    """
+    Inverted index over one vendor's catalog.
+
+    Name, voice tags and category are indexed by character trigram (so
+    substring and typo matches still find candidates); all four fields are
+    indexed by whole token. Postings hold small integer sequence numbers that
+    also preserve catalog order for stable ranking.
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.built_at = 0.0
+        self._lock = threading.RLock()
+        self._seq = 0
+        self._docs: Dict[int, IndexedProduct] = {}
+        self._by_product_id: Dict[str, int] = {}
+        self._trigram_postings: Dict[str, Set[int]] = {}
+        self._token_postings: Dict[str, Set[int]] = {}
+        self._category_postings: Dict[str, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def is_stale(self) -> bool:
+        """True if the index should be rebuilt from the database."""
+        return time.time() - self.built_at > INDEX_MAX_AGE_SECONDS
+
+    def rebuild(self, rows: Iterable[dict]):
+        """Replace the whole index with the given product rows."""
+        with self._lock:
+            self._seq = 0
+            self._docs = {}
+            self._by_product_id = {}
+            self._trigram_postings = {}
+            self._token_postings = {}
+            self._category_postings = {}
+            for row in rows:
+                self._add(row)
+            self.built_at = time.time()
+
+    def upsert(self, row: dict):
+        """Add a product or re-index it after an update."""
+        with self._lock:
+            self._remove(str(row.get("id", "")))
+            self._add(row)
+
+    def remove(self, product_id: str):
+        """Drop a product from the index."""
+        with self._lock:
+            self._remove(str(product_id))
+
+    def _doc_terms(self, doc: IndexedProduct):
+        grams = trigrams(doc.name) | trigrams(doc.category)
+        for tag in doc.tags:
+            grams |= trigrams(tag)
+        tokens = set(tokenize(doc.name)) | set(tokenize(doc.category)) | set(tokenize(doc.description))
+        for tag in doc.tags:
+            tokens.update(tokenize(tag))
+        return grams, tokens
+
+    def _add(self, row: dict):
+        product_id = str(row.get("id", ""))
+        if not product_id:
+            return
+        self._seq += 1
+        doc = IndexedProduct(
+            seq=self._seq,
+            product_id=product_id,
+            name=(row.get("name") or "").lower(),
+            tags=parse_voice_tags(row.get("voice_tags")),
+            description=(row.get("description") or "").lower(),
+            category=(row.get("category") or "").lower()
+        )
+        self._docs[doc.seq] = doc
+        self._by_product_id[product_id] = doc.seq
+
+        grams, tokens = self._doc_terms(doc)
+        for gram in grams:
+            self._trigram_postings.setdefault(gram, set()).add(doc.seq)
+        for token in tokens:
+            self._token_postings.setdefault(token, set()).add(doc.seq)
+        if doc.category:
+            self._category_postings.setdefault(doc.category, set()).add(doc.seq)
+
+    def _remove(self, product_id: str):
+        seq = self._by_product_id.pop(product_id, None)
+        if seq is None:
+            return
+        doc = self._docs.pop(seq)
+        grams, tokens = self._doc_terms(doc)
+        for postings, keys in (
+            (self._trigram_postings, grams),
+            (self._token_postings, tokens),
+            (self._category_postings, [doc.category] if doc.category else []),
+        ):
+            for key in keys:
+                bucket = postings.get(key)
+                if bucket is not None:
+                    bucket.discard(seq)
+                    if not bucket:
+                        del postings[key]
+
+    def _term_hits(self, term: str, hits: Dict[int, float], weight: float):
+        """
+        Credit each doc with the share of a term's trigrams it contains.
+
+        A doc containing the whole term gets the full weight, so ranking
+        follows the strategy weights rather than how long a term is.
+        """
+        if len(term) >= 3:
+            grams = trigrams(term)
+            share = weight / len(grams)
+            for gram in grams:
+                for seq in self._trigram_postings.get(gram, ()):
+                    hits[seq] = hits.get(seq, 0.0) + share
+        else:
+            for seq in self._token_postings.get(term, ()):
+                hits[seq] = hits.get(seq, 0.0) + weight
+
+    def candidates(self, query_lower: str, query_words: List[str],
+                   synonyms: Optional[Dict[str, FrozenSet[str]]] = None,
+                   limit: int = MAX_CANDIDATES) -> List[IndexedProduct]:
+        """
+        Retrieve the most promising products for a query.
+
+        Candidates are ranked by postings overlap with the query, its words
+        and their synonyms, weighted like the scoring strategies; products in
+        a category named by the query are always included so the category
+        fallback keeps working.
+        """
+        if synonyms is None:
+            synonyms = expand_synonyms(query_words)
+
+        with self._lock:
+            hits: Dict[int, float] = {}
+            self._term_hits(query_lower, hits, weight=100)
+            for word in query_words:
+                if len(word) < 2:
+                    continue
+                self._term_hits(word, hits, weight=40)
+                if len(word) >= 3:
+                    # Whole-token hits also cover description words
+                    for seq in self._token_postings.get(word, ()):
+                        hits[seq] = hits.get(seq, 0.0) + 15
+                    for synonym in synonyms.get(word, ()):
+                        if synonym != word:
+                            self._term_hits(synonym, hits, weight=30)
+
+            ranked = sorted(hits, key=lambda seq: (-hits[seq], seq))[:limit]
+            selected = set(ranked)
+
+            for cat, terms in CATEGORY_TERMS.items():
+                if any(term in query_lower for term in terms):
+                    selected.update(self._category_postings.get(cat, ()))
+
+            return [self._docs[seq] for seq in sorted(selected)]
+
+    def substring_matches(self, query_words: List[str]) -> List[IndexedProduct]:
+        """
+        Products whose name or a voice tag contains any query word (3+ chars).
+
+        Used as the last-resort fallback when scoring finds nothing; every
+        trigram of the word must be present, which is then confirmed exactly.
+        """
+        with self._lock:
+            matches: Set[int] = set()
+            for word in query_words:
+                if len(word) < 3:
+                    continue
+                postings = [self._trigram_postings.get(g, set()) for g in trigrams(word)]
+                if not postings or not all(postings):
+                    continue
+                found = set.intersection(*postings)
+                for seq in found:
+                    doc = self._docs[seq]
+                    if word in doc.name or any(word in t for t in doc.tags):
+                        matches.add(seq)
+            return [self._docs[seq] for seq in sorted(matches)]
+
+
+# Per-vendor indexes, shared by every InventoryManager in this process
+_INDEXES: Dict[str, ProductSearchIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_search_index(user_id: str) -> ProductSearchIndex:
+    """Get (or create an empty, unbuilt) search index for a vendor."""
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(user_id)
+        if index is None:
+            index = ProductSearchIndex(user_id)
+            _INDEXES[user_id] = index
+        return index
+
+
+def peek_search_index(user_id: str) -> Optional[ProductSearchIndex]:
+    """Return the vendor's index only if one has already been built."""
+    index = _INDEXES.get(user_id)
+    if index is not None and index.built_at:
+        return index
+    return None
+
+
+def drop_search_index(user_id: Optional[str] = None):
+    """Forget one vendor's index (or all of them) so it is rebuilt on next use."""
+    with _INDEXES_LOCK:
+        if user_id is None:
+            _INDEXES.clear()
+        else:
+            _INDEXES.pop(user_id, None)
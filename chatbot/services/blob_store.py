@@ -0,0 +1,212 @@
+"""
+Content-addressed blob store for product images.
+
+Images used to live in Product.image_url as base64 data URLs (up to ~2.7 MB
+each), so every catalog query, snapshot and cache entry carried them. Now the
+bytes are stored once under their SHA-256 hash and the product row holds only
+a short URL. Identical uploads share one blob, and blob URLs never change
+content, so they can be cached forever.
+
+Backends:
+- local: files under BLOB_DIR, served by GET /blobs/{key}
+- supabase: the product-images bucket via storage_service
+
+BLOB_BACKEND picks one explicitly; by default Supabase is used when configured.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Optional, Tuple
+
+from . import storage_service
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+    "image/gif": "gif",
+}
+EXTENSION_CONTENT_TYPES = {ext: ct for ct, ext in CONTENT_TYPE_EXTENSIONS.items()}
+
+# sha256 hex digest + extension; anything else is rejected (no path tricks)
+BLOB_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]{1,5}$")
+
+DATA_URL_PATTERN = re.compile(r"^data:([\w.+-]+/[\w.+-]+)?(;[^,]*)?,", re.IGNORECASE)
+
+
+class BlobStoreError(Exception):
+    """Raised when a blob can't be stored."""
+
+
+def blob_key(data: bytes, content_type: str) -> str:
+    """Content-addressed key: sha256 of the bytes plus an extension for the type."""
+    ext = CONTENT_TYPE_EXTENSIONS.get((content_type or "").lower(), "bin")
+    return f"{hashlib.sha256(data).hexdigest()}.{ext}"
+
+
+def is_data_url(url: Optional[str]) -> bool:
+    """True for inline data: URLs (the old storage format)."""
+    return bool(url) and url[:5].lower() == "data:"
+
+
+def decode_data_url(url: str) -> Tuple[bytes, str]:
+    """
+    Split a data URL into (bytes, content_type).
+
+    Raises:
+        BlobStoreError if it isn't a valid data URL
+    """
+    match = DATA_URL_PATTERN.match(url or "")
+    if not match:
+        raise BlobStoreError("Not a data URL")
+    content_type = (match.group(1) or "application/octet-stream").lower()
+    payload = url[match.end():]
+    try:
+        if match.group(2) and "base64" in match.group(2).lower():
+            return base64.b64decode(payload, validate=True), content_type
+        from urllib.parse import unquote_to_bytes
+        return unquote_to_bytes(payload), content_type
+    except (binascii.Error, ValueError) as e:
+        raise BlobStoreError(f"Invalid data URL payload: {e}")
+
+
+class LocalBlobBackend:
+    """Blobs as files on local disk, fanned out by the first two hex characters."""
+
+    name = "local"
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def path_for(self, key: str) -> str:
+        if not BLOB_KEY_PATTERN.match(key):
+            raise BlobStoreError(f"Invalid blob key: {key}")
+        return os.path.join(self.root, key[:2], key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.base_url}/"
+        if url and url.startswith(prefix):
+            key = url[len(prefix):]
+            if BLOB_KEY_PATTERN.match(key):
+                return key
+        return None
+
+    def _write(self, key: str, data: bytes):
+        path = self.path_for(key)
+        if os.path.exists(path):
+            return  # Same key, same bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def put(self, key: str, data: bytes, content_type: str) -> str:
+        await asyncio.to_thread(self._write, key, data)
+        return self.url_for(key)
+
+    async def delete(self, key: str) -> bool:
+        path = self.path_for(key)
+        try:
+            await asyncio.to_thread(os.unlink, path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class SupabaseBlobBackend:
+    """Blobs in the Supabase product-images bucket under blobs/."""
+
+    name = "supabase"
+    folder = "blobs"
+
+    def url_for(self, key: str) -> str:
+        return storage_service.get_public_url(f"{self.folder}/{key}")
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        prefix = self.url_for("")
+        if url and url.startswith(prefix):
+            key = url[len(prefix):]
+            if BLOB_KEY_PATTERN.match(key):
+                return key
+        return None
+
+    async def put(self, key: str, data: bytes, content_type: str) -> str:
+        success, message, url = await storage_service.upload_file(f"{self.folder}/{key}", data, content_type)
+        if not success:
+            raise BlobStoreError(message)
+        return url
+
+    async def delete(self, key: str) -> bool:
+        success, message = await storage_service.delete_product_image(self.url_for(key))
+        if not success:
+            logger.warning(f"Failed to delete blob {key}: {message}")
+        return success
+
+
+class BlobStore:
+    """Stores image bytes by content hash and hands back short URLs."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        """Store bytes (deduplicated by content) and return their URL."""
+        if not data:
+            raise BlobStoreError("Empty blob")
+        return await self.backend.put(blob_key(data, content_type), data, content_type)
+
+    async def put_data_url(self, url: Optional[str]) -> Optional[str]:
+        """Move an inline data URL into the store; other URLs are returned unchanged."""
+        if not is_data_url(url):
+            return url
+        data, content_type = decode_data_url(url)
+        return await self.put(data, content_type)
+
+    def owns(self, url: Optional[str]) -> bool:
+        """True if the URL points at a blob in this store."""
+        return self.backend.key_from_url(url or "") is not None
+
+    async def delete(self, url: str) -> bool:
+        """
+        Delete the blob behind a URL from this store.
+
+        Blobs are shared by content, so callers should only delete once no
+        product references the URL any more.
+        """
+        key = self.backend.key_from_url(url or "")
+        if key is None:
+            return False
+        return await self.backend.delete(key)
+
+
+def _default_backend():
+    backend = os.getenv("BLOB_BACKEND", "").lower()
+    if backend == "supabase" or (not backend and storage_service.SUPABASE_URL and storage_service.SUPABASE_KEY):
+        return SupabaseBlobBackend()
+
+    root = os.getenv("BLOB_DIR", os.path.join(os.getcwd(), "blobs"))
+    # Absolute URLs so images work from the frontend's origin too
+    base_url = os.getenv("BLOB_BASE_URL") or f"{os.getenv('RENDER_EXTERNAL_URL', '')}/blobs"
+    return LocalBlobBackend(root, base_url)
+
+
+# Singleton instance
+blob_store = BlobStore(_default_backend())
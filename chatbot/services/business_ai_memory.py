@@ -0,0 +1,136 @@
+"""
+Conversation memory for the Business AI assistant.
+
+Every /business-ai call resends the conversation to Groq, so what is sent is
+bounded by tokens rather than turns:
+- The latest messages are kept verbatim while they fit in the token budget
+  (BUSINESS_AI_HISTORY_TOKENS), up to WINDOW_MESSAGES of them.
+- Older turns are folded into a rolling summary, one short line per turn
+  (the request and the answer, truncated), capped at SUMMARY_TOKENS by
+  dropping its oldest lines. The summary is built locally, so keeping it
+  costs no extra model call.
+
+Tokens are estimated locally at ~4 characters per token, close enough to
+budget with and free to compute.
+
+A conversation is one bizai:{conversation_id} hash in the shared state store,
+{"s": summary, "m": JSON [[role initial, content], ...]}, read once and
+written once per call (request handlers use the *_async methods). Idle
+conversations expire BUSINESS_AI_HISTORY_TTL_HOURS after their last message
+(with Redis, run a volatile-lru maxmemory policy to evict the least recently
+used first under memory pressure).
+"""
+import json
+import re
+from typing import Dict, List, Tuple
+
+from ..config import settings
+from ..state_store import state_store
+
+CHARS_PER_TOKEN = 4
+# Role and separator tokens the chat format adds to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+WINDOW_MESSAGES = 10
+SUMMARY_TOKENS = 200
+# A single message is cut to this many characters before it is kept
+MAX_MESSAGE_CHARS = 2000
+SUMMARY_SNIPPET_CHARS = 80
+
+_ROLES = {"u": "user", "a": "assistant"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a message's content, including its framing."""
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def _snippet(text: str) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= SUMMARY_SNIPPET_CHARS else text[:SUMMARY_SNIPPET_CHARS - 1] + "…"
+
+
+class BusinessAIMemory:
+    """Token-budgeted window of recent messages plus a summary of older turns, per conversation."""
+
+    def __init__(self, store=None, token_budget: int = None, ttl_hours: int = None,
+                 window_messages: int = WINDOW_MESSAGES, summary_tokens: int = SUMMARY_TOKENS):
+        self.store = store or state_store
+        self.token_budget = token_budget or settings.business_ai_history_tokens
+        self.ttl_seconds = (ttl_hours or settings.business_ai_history_ttl_hours) * 3600
+        self.window_messages = window_messages
+        self.summary_tokens = summary_tokens
+
+    @staticmethod
+    def _key(conversation_id: str) -> str:
+        return f"bizai:{conversation_id}"
+
+    @staticmethod
+    def _parse(fields: Dict[str, str]) -> Tuple[List[str], List[List[str]]]:
+        summary = fields.get("s")
+        return (summary.split("\n") if summary else []), json.loads(fields.get("m") or "[]")
+
+    def _load(self, conversation_id: str) -> Tuple[List[str], List[List[str]]]:
+        return self._parse(self.store.get_fields(self._key(conversation_id)))
+
+    async def _load_async(self, conversation_id: str) -> Tuple[List[str], List[List[str]]]:
+        return self._parse(await self.store.get_fields_async(self._key(conversation_id)))
+
+    def get_messages(self, conversation_id: str) -> List[Dict]:
+        """
+        Messages to send before the new one: the summary of older turns (as a
+        system message) and the recent window. A new list on every call.
+        """
+        return self._prompt(*self._load(conversation_id))
+
+    async def get_messages_async(self, conversation_id: str) -> List[Dict]:
+        """get_messages() for async handlers: the store is read without blocking the loop."""
+        return self._prompt(*await self._load_async(conversation_id))
+
+    @staticmethod
+    def _prompt(summary: List[str], messages: List[List[str]]) -> List[Dict]:
+        prompt = [{"role": "system", "content": "Earlier in this conversation:\n" + "\n".join(summary)}] if summary else []
+        prompt.extend({"role": _ROLES[role], "content": content} for role, content in messages)
+        return prompt
+
+    def record(self, conversation_id: str, user_message: str, reply: str):
+        """Add a turn, moving what no longer fits the window into the summary."""
+        fields = self._with_turn(*self._load(conversation_id), user_message, reply)
+        self.store.set_fields(self._key(conversation_id), fields, ttl_seconds=self.ttl_seconds, replace=True)
+
+    async def record_async(self, conversation_id: str, user_message: str, reply: str):
+        """record() for async handlers."""
+        fields = self._with_turn(*await self._load_async(conversation_id), user_message, reply)
+        await self.store.set_fields_async(self._key(conversation_id), fields, ttl_seconds=self.ttl_seconds, replace=True)
+
+    def _with_turn(self, summary: List[str], messages: List[List[str]], user_message: str, reply: str) -> Dict[str, str]:
+        """Fields of the conversation with a turn added and compacted."""
+        messages.append(["u", user_message[:MAX_MESSAGE_CHARS]])
+        messages.append(["a", reply[:MAX_MESSAGE_CHARS]])
+        self._compact(summary, messages)
+        fields = {"m": json.dumps(messages, ensure_ascii=False, separators=(",", ":"))}
+        if summary:
+            fields["s"] = "\n".join(summary)
+        return fields
+
+    def _compact(self, summary: List[str], messages: List[List[str]]):
+        """Fold the oldest turns into summary lines until the window fits; trims both in place."""
+        tokens = sum(estimate_tokens(content) for _, content in messages)
+        # The latest turn always stays verbatim
+        while len(messages) > 2 and (len(messages) > self.window_messages or tokens > self.token_budget):
+            role, content = messages.pop(0)
+            tokens -= estimate_tokens(content)
+            if role == "u" and messages and messages[0][0] == "a":
+                _, answer = messages.pop(0)
+                tokens -= estimate_tokens(answer)
+                summary.append(f"- {_snippet(content)} → {_snippet(answer)}")
+            else:
+                summary.append(f"- {'Owner' if role == 'u' else 'Assistant'}: {_snippet(content)}")
+        while len(summary) > 1 and estimate_tokens("\n".join(summary)) > self.summary_tokens:
+            summary.pop(0)
+
+    def clear(self, conversation_id: str):
+        self.store.delete(self._key(conversation_id))
+
+
+# Singleton instance
+business_ai_memory = BusinessAIMemory()
@@ -0,0 +1,220 @@
+"""
+Idempotency keys for retried requests and redelivered webhooks.
+
+Mobile clients retry POST /orders on flaky networks and Meta/Paystack
+redeliver webhooks, so the same request can arrive several times. Each one
+is identified by a key (the Idempotency-Key header, or the provider's event
+or message ID) in a scope (the endpoint). The first request claims the key
+by inserting an idempotency_keys row (the primary key makes the claim atomic
+across workers), runs, and stores its response; duplicates get the stored
+response back without running the handler again.
+
+- A duplicate of a request still running raises IdempotencyInProgress (409):
+  the client or provider retries later. A claim older than
+  PROCESSING_TIMEOUT_SECONDS is taken over, so a crashed worker doesn't
+  block the key until it expires.
+- The same key with a different payload raises IdempotencyKeyMismatch (422).
+- A handler that raises releases its claim, so a retry runs again; only
+  successful responses are stored.
+- If the table is unreachable the request runs without protection rather
+  than failing.
+
+Rows expire after IDEMPOTENCY_TTL_HOURS and are purged in the background,
+so the table stays bounded.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+# A claim this old is assumed to belong to a worker that died mid-request
+PROCESSING_TIMEOUT_SECONDS = 120
+# Minutes between purges of expired keys
+PURGE_INTERVAL_MINUTES = 10
+
+
+class IdempotencyInProgress(Exception):
+    """A request with this key is still being processed."""
+
+
+class IdempotencyKeyMismatch(Exception):
+    """The key was already used for a request with a different payload."""
+
+
+def fingerprint(payload: Any) -> str:
+    """Stable hash of a request payload, to detect a key reused for another request."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Claims keys and stores responses in the idempotency_keys table."""
+
+    def __init__(self, ttl_hours: int = None):
+        self.ttl_hours = ttl_hours or settings.idempotency_ttl_hours
+        self._purge_task: Optional[asyncio.Task] = None
+
+    # ---------- claims ----------
+
+    def _claim(self, db, scope: str, key: str, request_hash: Optional[str]) -> Optional[str]:
+        """
+        Claim (scope, key) in the caller's transaction. Returns None if the caller
+        now owns the key, or the stored response JSON of a completed request.
+        """
+        from ..models import IdempotencyKey
+
+        now = datetime.utcnow()
+        try:
+            with db.begin_nested():
+                db.add(IdempotencyKey(
+                    scope=scope, key=key, fingerprint=request_hash, status="processing",
+                    created_at=now, expires_at=now + timedelta(hours=self.ttl_hours)
+                ))
+                db.flush()
+            return None
+        except IntegrityError:
+            pass
+
+        row = db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == scope, IdempotencyKey.key == key
+        ).with_for_update().one()
+        stale = row.status == "processing" and row.created_at < now - timedelta(seconds=PROCESSING_TIMEOUT_SECONDS)
+        if row.expires_at <= now or stale:
+            # Expired, or abandoned by a worker that died: start over
+            row.fingerprint = request_hash
+            row.status = "processing"
+            row.response = None
+            row.created_at = now
+            row.expires_at = now + timedelta(hours=self.ttl_hours)
+            return None
+        if request_hash and row.fingerprint and row.fingerprint != request_hash:
+            raise IdempotencyKeyMismatch(f"Idempotency key {key!r} was used for a different request")
+        if row.status != "completed":
+            raise IdempotencyInProgress(f"A request with idempotency key {key!r} is still in progress")
+        return row.response
+
+    def _complete(self, db, scope: str, key: str, response_json: str):
+        from ..models import IdempotencyKey
+
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == scope, IdempotencyKey.key == key
+        ).update({"status": "completed", "response": response_json}, synchronize_session=False)
+
+    def _release(self, db, scope: str, key: str):
+        from ..models import IdempotencyKey
+
+        db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.status == "processing"
+        ).delete(synchronize_session=False)
+
+    async def run_async(
+        self,
+        scope: str,
+        key: Optional[str],
+        handler: Callable[[], Awaitable[Any]],
+        request_hash: Optional[str] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Run handler() at most once per (scope, key).
+
+        Returns (response, replayed): the handler's result, or the stored JSON
+        response of an earlier request with replayed=True. The handler's result
+        must be JSON-serializable (convert models before returning). Without a
+        key the handler just runs.
+        """
+        from ..database import run_db
+
+        if not key:
+            return await handler(), False
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency key is longer than {MAX_KEY_LENGTH} characters")
+
+        try:
+            stored = await run_db(self._claim, scope, key, request_hash, commit=True)
+        except (IdempotencyInProgress, IdempotencyKeyMismatch):
+            raise
+        except Exception as e:
+            logger.warning(f"Idempotency claim failed for {scope}/{key}, running unprotected: {e}")
+            return await handler(), False
+        if stored is not None:
+            return json.loads(stored), True
+
+        try:
+            response = await handler()
+        except BaseException:
+            try:
+                await run_db(self._release, scope, key, commit=True)
+            except Exception as e:
+                logger.warning(f"Failed to release idempotency key {scope}/{key}: {e}")
+            raise
+
+        try:
+            await run_db(self._complete, scope, key, json.dumps(response, default=str), commit=True)
+        except Exception as e:
+            logger.warning(f"Failed to store response for idempotency key {scope}/{key}: {e}")
+        return response, False
+
+    # ---------- expiry ----------
+
+    def purge(self, db, now: Optional[datetime] = None) -> int:
+        """Delete expired keys. Returns the number deleted."""
+        from ..models import IdempotencyKey
+
+        return db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at <= (now or datetime.utcnow())
+        ).delete(synchronize_session=False)
+
+    async def _run_purger(self, interval_minutes: int):
+        from ..database import run_db
+
+        while True:
+            try:
+                purged = await run_db(self.purge, commit=True)
+                if purged:
+                    logger.info(f"Purged {purged} expired idempotency keys")
+            except Exception as e:
+                logger.error(f"Idempotency key purge failed: {e}")
+            await asyncio.sleep(interval_minutes * 60)
+
+    def start(self, interval_minutes: int = PURGE_INTERVAL_MINUTES):
+        """Start purging expired keys on the running event loop."""
+        if self._purge_task is None or self._purge_task.done():
+            self._purge_task = asyncio.get_running_loop().create_task(self._run_purger(interval_minutes))
+
+    async def stop(self):
+        """Cancel the purger."""
+        if self._purge_task is not None:
+            self._purge_task.cancel()
+            try:
+                await self._purge_task
+            except asyncio.CancelledError:
+                pass
+            self._purge_task = None
+
+
+# Singleton instance
+idempotency_store = IdempotencyStore()
+
+
+async def process_once(scope: str, message_id: Optional[str], handler: Callable[..., Awaitable[Any]], *args) -> bool:
+    """
+    Run handler(*args) for a webhook message unless its provider ID was already
+    handled (or is being handled by another delivery). Returns whether it ran.
+    """
+    async def run():
+        await handler(*args)
+        return {"processed": True}
+
+    try:
+        _, replayed = await idempotency_store.run_async(scope, message_id, run)
+    except IdempotencyInProgress:
+        return False
+    return not replayed
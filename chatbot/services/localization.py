@@ -172,33 +172,21 @@ class LocalizationService:
         # Store user language preferences
         self._user_languages: Dict[str, Language] = {}
     
-    def detect_language(self, text: str) -> Language:
+    def detect_language(self, text) -> Language:
         """
         Auto-detect language from message text.
         
+        Keywords are matched as whole words (or word pairs), so "na" doesn't
+        count inside "banana".
+        
         Args:
-            text: Message text
+            text: Message text, or a PreprocessedMessage (detected once, then reused)
             
         Returns:
             Detected language (defaults to English)
         """
-        text_lower = text.lower()
-        
-        # Count keyword matches for each language
-        scores = {lang: 0 for lang in Language}
-        
-        for lang, keywords in LANGUAGE_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    scores[lang] += 1
-        
-        # Find language with highest score
-        max_lang = max(scores, key=scores.get)
-        
-        if scores[max_lang] > 0:
-            return max_lang
-        
-        return Language.ENGLISH
+        from ..preprocess import preprocess
+        return preprocess(text).language
     
     def get_user_language(self, user_id: str) -> Language:
         """Get stored language preference for a user."""
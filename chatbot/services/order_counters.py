@@ -0,0 +1,329 @@
+"""
+Per-vendor order and stock counters for the dashboard and widget.
+
+One vendor_counters row per vendor holds order counts by status, revenue,
+unique customers, product and low-stock counts and today's paid orders, so
+/widget/stats and /dashboard/summary read one row by primary key instead of
+scanning orders and loading the catalog.
+
+Order transitions update the row with relative increments inside the same
+transaction as the order write (see OrderStore). Stock changes are heard from
+catalog_store bumps and recount the vendor's products shortly after, off the
+writing thread. A reconciliation job recomputes every row from the orders and
+products tables every COUNTERS_RECONCILE_MINUTES and logs any drift it fixes;
+it locks each row first, so transitions racing with it are applied on top of
+the recount rather than lost.
+
+"Today" is the UTC day; orders_today/revenue_today count orders created today
+that are paid or fulfilled.
+"""
+import asyncio
+import logging
+import threading
+from datetime import date, datetime, time as dt_time
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, update
+
+from ..catalog import catalog_store
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+STATUS_COLUMNS = {
+    "pending": "pending_orders",
+    "paid": "paid_orders",
+    "fulfilled": "fulfilled_orders",
+    "cancelled": "cancelled_orders",
+}
+REVENUE_STATUSES = ("paid", "fulfilled")
+COUNTER_FIELDS = (
+    "pending_orders", "paid_orders", "fulfilled_orders", "cancelled_orders", "total_orders",
+    "total_revenue", "unique_customers", "product_count", "low_stock_count",
+    "orders_today", "revenue_today",
+)
+# Bursts of catalog writes (bulk restock, CSV import) cost one recount
+STOCK_REFRESH_DELAY_SECONDS = 0.5
+
+
+def _today() -> date:
+    return datetime.utcnow().date()
+
+
+def _is_revenue(status: Optional[str]) -> int:
+    return 1 if status in REVENUE_STATUSES else 0
+
+
+class OrderCounters:
+    """Maintains vendor_counters rows incrementally and reconciles them periodically."""
+
+    def __init__(self, reconcile_minutes: int = None, low_stock_threshold: int = None):
+        self.reconcile_minutes = reconcile_minutes or settings.counters_reconcile_minutes
+        self.low_stock_threshold = low_stock_threshold if low_stock_threshold is not None else settings.low_stock_threshold
+        self._lock = threading.Lock()
+        self._stock_dirty = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+    # ---------- order transitions ----------
+
+    def record_transition(
+        self,
+        db,
+        vendor_id: str,
+        old_status: Optional[str],
+        new_status: str,
+        amount: float,
+        created_at: Optional[datetime] = None,
+        new_customer: bool = False
+    ):
+        """
+        Apply one order transition (old_status None = created) in the caller's transaction.
+
+        Call after the order change is flushed: a vendor without a row gets one
+        built by a full recount, which already includes this change.
+        Failures are logged, never raised, so they can't undo the order write;
+        the reconciliation job repairs the row.
+        """
+        from ..models import VendorCounters
+
+        delta: Dict[str, float] = {}
+        if old_status in STATUS_COLUMNS:
+            delta[STATUS_COLUMNS[old_status]] = -1
+        if new_status in STATUS_COLUMNS:
+            column = STATUS_COLUMNS[new_status]
+            delta[column] = delta.get(column, 0) + 1
+        if old_status is None:
+            delta["total_orders"] = 1
+        if new_customer:
+            delta["unique_customers"] = 1
+        revenue = _is_revenue(new_status) - _is_revenue(old_status)
+        if revenue:
+            delta["total_revenue"] = revenue * amount
+
+        today = _today()
+        created_today = (created_at or datetime.utcnow()).date() == today
+        orders_today = revenue if created_today else 0
+
+        values = {
+            name: getattr(VendorCounters, name) + change for name, change in delta.items() if change
+        }
+        values.update(
+            # First write of a new day starts today's counts over
+            orders_today=case(
+                (VendorCounters.counters_day == today, VendorCounters.orders_today + orders_today),
+                else_=max(orders_today, 0)
+            ),
+            revenue_today=case(
+                (VendorCounters.counters_day == today, VendorCounters.revenue_today + orders_today * amount),
+                else_=max(orders_today, 0) * amount
+            ),
+            counters_day=today,
+            updated_at=datetime.utcnow()
+        )
+
+        try:
+            with db.begin_nested():
+                updated = db.execute(
+                    update(VendorCounters)
+                    .where(VendorCounters.user_id == vendor_id)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if not updated:
+                    db.add(VendorCounters(user_id=vendor_id, **self._recount(db, vendor_id)))
+        except Exception as e:
+            logger.warning(f"Counter update failed for vendor {vendor_id}, reconciliation will fix it: {e}")
+
+    # ---------- stock ----------
+
+    def _stock_counts(self, db, vendor_id: str) -> Dict[str, int]:
+        from ..models import Product as ProductModel
+
+        product_count, low_stock = db.query(
+            func.count(ProductModel.id),
+            func.sum(case((ProductModel.stock_level <= self.low_stock_threshold, 1), else_=0))
+        ).filter(ProductModel.user_id == vendor_id).one()
+        return {"product_count": int(product_count or 0), "low_stock_count": int(low_stock or 0)}
+
+    def refresh_stock(self, db, vendor_id: str):
+        """Recount the vendor's products and low-stock products into its row."""
+        from ..models import VendorCounters
+
+        counts = self._stock_counts(db, vendor_id)
+        updated = db.query(VendorCounters).filter(VendorCounters.user_id == vendor_id).update(
+            {**counts, "updated_at": datetime.utcnow()}, synchronize_session=False
+        )
+        if not updated:
+            db.add(VendorCounters(user_id=vendor_id, **self._recount(db, vendor_id)))
+
+    def _on_catalog_write(self, vendor_id: str):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        with self._lock:
+            if vendor_id in self._stock_dirty:
+                return
+            self._stock_dirty.add(vendor_id)
+        # Thread-safe: catalog writes happen on worker threads as well as the loop
+        asyncio.run_coroutine_threadsafe(self._refresh_stock_soon(vendor_id), loop)
+
+    async def _refresh_stock_soon(self, vendor_id: str):
+        from ..database import run_db
+
+        await asyncio.sleep(STOCK_REFRESH_DELAY_SECONDS)
+        with self._lock:
+            self._stock_dirty.discard(vendor_id)
+        try:
+            await run_db(self.refresh_stock, vendor_id, commit=True)
+        except Exception as e:
+            logger.warning(f"Stock counter refresh failed for vendor {vendor_id}: {e}")
+
+    # ---------- reads ----------
+
+    async def get_async(self, vendor_id: str) -> Optional[dict]:
+        """
+        The vendor's counters as a dict (one primary-key read), or None if the
+        database is unreachable. A vendor without a row gets one by recount.
+        """
+        from ..database import run_db
+        from ..models import VendorCounters
+
+        def load(db):
+            row = db.query(VendorCounters).filter(VendorCounters.user_id == vendor_id).first()
+            if row is None:
+                values = self._recount(db, vendor_id)
+                db.add(VendorCounters(user_id=vendor_id, **values))
+                return values
+            return {name: getattr(row, name) for name in COUNTER_FIELDS + ("counters_day",)}
+
+        try:
+            counters = await run_db(load, commit=True)
+        except Exception as e:
+            logger.warning(f"Counter read failed for vendor {vendor_id}: {e}")
+            return None
+        if counters.get("counters_day") != _today():
+            # Nothing paid yet today
+            counters["orders_today"] = 0
+            counters["revenue_today"] = 0.0
+        counters["counters_day"] = _today()
+        return counters
+
+    # ---------- reconciliation ----------
+
+    def _recount(self, db, vendor_id: str) -> dict:
+        """Every counter for one vendor, computed from the orders and products tables."""
+        from ..models import Order as OrderModel
+
+        values = {name: 0 for name in COUNTER_FIELDS}
+        values["total_revenue"] = 0.0
+        values["revenue_today"] = 0.0
+
+        rows = db.query(OrderModel.status, func.count(OrderModel.id), func.sum(OrderModel.total_amount)).filter(
+            OrderModel.user_id == vendor_id
+        ).group_by(OrderModel.status).all()
+        for status, count, amount in rows:
+            values["total_orders"] += int(count)
+            if status in STATUS_COLUMNS:
+                values[STATUS_COLUMNS[status]] = int(count)
+            if status in REVENUE_STATUSES:
+                values["total_revenue"] += float(amount or 0)
+
+        today = _today()
+        count, amount = db.query(func.count(OrderModel.id), func.sum(OrderModel.total_amount)).filter(
+            OrderModel.user_id == vendor_id,
+            OrderModel.status.in_(REVENUE_STATUSES),
+            OrderModel.created_at >= datetime.combine(today, dt_time.min)
+        ).one()
+        values["orders_today"] = int(count or 0)
+        values["revenue_today"] = float(amount or 0)
+
+        values["unique_customers"] = int(db.query(func.count(func.distinct(OrderModel.customer_phone))).filter(
+            OrderModel.user_id == vendor_id
+        ).scalar() or 0)
+        values.update(self._stock_counts(db, vendor_id))
+        values["counters_day"] = today
+        values["updated_at"] = values["reconciled_at"] = datetime.utcnow()
+        return values
+
+    def reconcile_vendor(self, db, vendor_id: str) -> Dict[str, tuple]:
+        """
+        Recompute one vendor's row. Returns {field: (stored, actual)} for every
+        counter that had drifted (empty for a new row).
+        """
+        from ..models import VendorCounters
+
+        row = db.query(VendorCounters).filter(VendorCounters.user_id == vendor_id).with_for_update().first()
+        values = self._recount(db, vendor_id)
+        if row is None:
+            db.add(VendorCounters(user_id=vendor_id, **values))
+            return {}
+
+        drift = {}
+        stale_day = row.counters_day != values["counters_day"]
+        for name in COUNTER_FIELDS:
+            stored = getattr(row, name)
+            if name in ("orders_today", "revenue_today") and stale_day:
+                stored = 0
+            if abs((stored or 0) - values[name]) > 1e-6:
+                drift[name] = (stored, values[name])
+        for name, value in values.items():
+            setattr(row, name, value)
+        return drift
+
+    def vendors(self, db) -> List[str]:
+        """Every vendor with orders, products or a counters row."""
+        from ..models import Order as OrderModel, Product as ProductModel, VendorCounters
+
+        ids = set()
+        for model in (OrderModel, ProductModel, VendorCounters):
+            ids.update(str(user_id) for (user_id,) in db.query(model.user_id).distinct())
+        return sorted(ids)
+
+    async def reconcile_async(self, vendor_id: Optional[str] = None) -> Dict[str, Dict[str, tuple]]:
+        """
+        Reconcile one vendor, or all of them (one transaction each, so a row
+        lock is never held for long). Returns {vendor_id: drift} for vendors that drifted.
+        """
+        from ..database import run_db
+
+        vendor_ids = [vendor_id] if vendor_id else await run_db(self.vendors)
+        drifted = {}
+        for vid in vendor_ids:
+            drift = await run_db(self.reconcile_vendor, vid, commit=True)
+            if drift:
+                logger.warning(f"Corrected counter drift for vendor {vid}: {drift}")
+                drifted[vid] = drift
+        return drifted
+
+    # ---------- background job ----------
+
+    async def _run_reconciler(self):
+        while True:
+            try:
+                await self.reconcile_async()
+            except Exception as e:
+                logger.error(f"Counter reconciliation failed: {e}")
+            await asyncio.sleep(self.reconcile_minutes * 60)
+
+    def start(self):
+        """Listen for catalog writes and start the reconciler on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        catalog_store.add_listener(self._on_catalog_write)
+        if self._reconcile_task is None or self._reconcile_task.done():
+            self._reconcile_task = self._loop.create_task(self._run_reconciler())
+
+    async def stop(self):
+        """Cancel the reconciler."""
+        self._loop = None
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            try:
+                await self._reconcile_task
+            except asyncio.CancelledError:
+                pass
+            self._reconcile_task = None
+
+
+# Singleton instance
+order_counters = OrderCounters()
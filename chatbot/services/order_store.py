@@ -0,0 +1,390 @@
+"""
+Order Store for chatbot and API orders.
+
+Every order is written to the orders table; the store also keeps the order
+records it has seen in memory with secondary indexes, so the hot lookups
+never scan:
+
+- latest pending order for a customer ("I paid"): O(1)
+- orders by status (dashboard counts and revenue): O(1) running totals
+- orders by creation day (widget "today"): only that day's orders are visited
+
+Pending orders and the last HYDRATE_DAYS of orders are loaded from the
+database at startup, so a restart doesn't forget who still owes payment.
+On each UTC day rollover, settled orders older than that window are evicted,
+so memory holds the same window a fresh start would.
+Orders placed by other workers are found through find_pending_async, which
+falls back to an indexed (customer_phone, status, created_at) query.
+Each write also updates the vendor's dashboard counters and daily sales
+rollup in the same transaction (see order_counters and sales_rollup).
+"""
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+from .order_counters import order_counters
+from .sales_rollup import sales_rollup, utc_today
+
+logger = logging.getLogger(__name__)
+
+# Days of recent orders loaded into memory at startup (pending orders are always loaded)
+HYDRATE_DAYS = 1
+
+
+def _day_of(created_at: Optional[str]) -> Optional[str]:
+    """'2026-01-31T10:00:00' -> '2026-01-31'."""
+    return created_at[:10] if created_at else None
+
+
+def _order_record(order) -> dict:
+    """Plain-dict record for an Order row (items must already be loaded)."""
+    return {
+        "id": str(order.id),
+        "vendor_id": str(order.user_id),
+        "customer_phone": order.customer_phone,
+        "items": [
+            {
+                "product_id": str(item.product_id),
+                "product_name": item.product_name,
+                "quantity": item.quantity,
+                "price": item.price,
+                "total": item.total
+            }
+            for item in order.order_items
+        ],
+        "total_amount": order.total_amount,
+        "status": order.status,
+        "payment_ref": order.payment_ref,
+        "created_at": order.created_at.isoformat() if order.created_at else None,
+        "paid_at": order.paid_at.isoformat() if order.paid_at else None,
+        "fulfilled_at": order.fulfilled_at.isoformat() if order.fulfilled_at else None,
+        "source": "database"
+    }
+
+
+class OrderStore:
+    """Orders table write-through store with in-memory customer/status/day indexes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {order_id: order record}
+        self._orders: Dict[str, dict] = {}
+        # {customer_phone: {order_id: None}} pending orders, oldest first (dicts keep insertion order)
+        self._pending_by_customer: Dict[str, Dict[str, None]] = {}
+        # {status: {order_id}}
+        self._by_status: Dict[str, Set[str]] = {}
+        # {status: sum of total_amount}
+        self._amount_by_status: Dict[str, float] = {}
+        # {'YYYY-MM-DD': {order_id}}
+        self._by_day: Dict[str, Set[str]] = {}
+        # UTC day of the last prune; a different day triggers the next one
+        self._pruned_day: Optional[str] = None
+
+    # ---------- in-memory indexes ----------
+
+    def _index(self, record: dict):
+        self._prune_on_rollover()
+        order_id = record["id"]
+        self._unindex(order_id)
+        self._orders[order_id] = record
+        status = record.get("status", "pending")
+        self._by_status.setdefault(status, set()).add(order_id)
+        self._amount_by_status[status] = self._amount_by_status.get(status, 0) + record.get("total_amount", 0)
+        day = _day_of(record.get("created_at"))
+        if day:
+            self._by_day.setdefault(day, set()).add(order_id)
+        customer = record.get("customer_phone")
+        if status == "pending" and customer:
+            self._pending_by_customer.setdefault(customer, {})[order_id] = None
+
+    def _unindex(self, order_id: str):
+        record = self._orders.pop(order_id, None)
+        if record is None:
+            return
+        status = record.get("status", "pending")
+        self._by_status[status].discard(order_id)
+        self._amount_by_status[status] -= record.get("total_amount", 0)
+        day = _day_of(record.get("created_at"))
+        if day and day in self._by_day:
+            self._by_day[day].discard(order_id)
+            if not self._by_day[day]:
+                del self._by_day[day]
+        pending = self._pending_by_customer.get(record.get("customer_phone"))
+        if pending is not None:
+            pending.pop(order_id, None)
+            if not pending:
+                del self._pending_by_customer[record["customer_phone"]]
+
+    def _prune_on_rollover(self):
+        today = utc_today()
+        if self._pruned_day != today.isoformat():
+            self._pruned_day = today.isoformat()
+            self._evict_before(today - timedelta(days=HYDRATE_DAYS))
+
+    def _evict_before(self, cutoff: date) -> int:
+        """Drop orders created before `cutoff`, except pending ones. Returns orders evicted."""
+        cutoff_key = cutoff.isoformat()
+        evicted = 0
+        for day in [d for d in self._by_day if d < cutoff_key]:
+            for order_id in list(self._by_day.get(day, ())):
+                if self._orders[order_id].get("status", "pending") != "pending":
+                    self._unindex(order_id)
+                    evicted += 1
+        return evicted
+
+    def prune(self, days: int = HYDRATE_DAYS) -> int:
+        """Evict settled orders created more than `days` UTC days ago. Returns orders evicted."""
+        with self._lock:
+            return self._evict_before(utc_today() - timedelta(days=days))
+
+    def _apply_status(self, order_id: str, status: str) -> Optional[dict]:
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            record = self._orders.get(order_id)
+            if record is None:
+                return None
+            record = {**record, "status": status, "updated_at": now}
+            if status == "paid":
+                record["paid_at"] = now
+            elif status == "fulfilled":
+                record["fulfilled_at"] = now
+            self._index(record)
+            return record
+
+    # ---------- reads ----------
+
+    def get(self, order_id: str) -> Optional[dict]:
+        return self._orders.get(order_id)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._orders
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def values(self) -> List[dict]:
+        return list(self._orders.values())
+
+    def latest_pending_for_customer(self, customer_phone: str) -> Optional[dict]:
+        """The customer's most recent pending order held in memory, or None."""
+        pending = self._pending_by_customer.get(customer_phone)
+        if not pending:
+            return None
+        return self._orders.get(next(reversed(pending)))
+
+    def count(self, status: str) -> int:
+        return len(self._by_status.get(status, ()))
+
+    def revenue(self, statuses: Iterable[str] = ("paid", "fulfilled")) -> float:
+        return sum(self._amount_by_status.get(status, 0) for status in statuses)
+
+    def created_on(self, day: date, statuses: Optional[Iterable[str]] = None) -> List[dict]:
+        """Orders created on a calendar day, optionally filtered by status."""
+        orders = [self._orders[oid] for oid in list(self._by_day.get(day.isoformat(), ()))]
+        if statuses is not None:
+            statuses = set(statuses)
+            orders = [o for o in orders if o.get("status") in statuses]
+        return orders
+
+    # ---------- writes ----------
+
+    def add(self, order: dict, vendor_id: Optional[str] = None, persist: bool = True) -> dict:
+        """
+        Track a new order and write it (and its items) to the orders table.
+
+        A failed write is logged and the order is kept in memory, so checkout
+        never fails because the database is briefly unreachable.
+        """
+        record = dict(order)
+        if vendor_id:
+            record["vendor_id"] = vendor_id
+        with self._lock:
+            self._index(record)
+        if persist and vendor_id:
+            from ..database import SessionLocal
+
+            try:
+                db = SessionLocal()
+                try:
+                    self._persist(db, record, vendor_id)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                finally:
+                    db.close()
+            except Exception as e:
+                logger.error(f"Failed to persist order {record['id']} to database: {e}")
+        return record
+
+    async def add_async(self, order: dict, vendor_id: Optional[str] = None, persist: bool = True) -> dict:
+        """add() without blocking the event loop on the database write."""
+        record = dict(order)
+        if vendor_id:
+            record["vendor_id"] = vendor_id
+        with self._lock:
+            self._index(record)
+        if persist and vendor_id:
+            from ..database import run_db
+
+            try:
+                await run_db(self._persist, record, vendor_id, commit=True)
+            except Exception as e:
+                logger.error(f"Failed to persist order {record['id']} to database: {e}")
+        return record
+
+    @staticmethod
+    def _persist(db, record: dict, vendor_id: str):
+        from ..models import Order as OrderModel, OrderItem as OrderItemModel
+
+        items = record.get("items", [])
+        new_customer = db.query(OrderModel.id).filter(
+            OrderModel.user_id == vendor_id,
+            OrderModel.customer_phone == record["customer_phone"]
+        ).first() is None
+        db.add(OrderModel(
+            id=record["id"],
+            user_id=vendor_id,
+            customer_phone=record["customer_phone"],
+            total_amount=record["total_amount"],
+            status=record.get("status", "pending"),
+            payment_ref=record.get("payment_ref"),
+            notes=record.get("notes")
+        ))
+        for item in items:
+            db.add(OrderItemModel(
+                order_id=record["id"],
+                product_id=item["product_id"],
+                product_name=item["product_name"],
+                quantity=item["quantity"],
+                price=item["price"],
+                total=item["total"]
+            ))
+        db.flush()
+        order_counters.record_transition(
+            db, vendor_id, None, record.get("status", "pending"), record["total_amount"],
+            new_customer=new_customer
+        )
+        sales_rollup.record_order(
+            db, vendor_id, None, None, record.get("status", "pending"), record["total_amount"]
+        )
+
+    async def set_status_async(self, order_id: str, status: str) -> Optional[dict]:
+        """
+        Move an order to a new status in memory and in the orders table.
+
+        Orders this worker hasn't seen are updated in the database and then
+        tracked. Returns the updated record, or None if the order exists nowhere.
+        """
+        from ..database import run_db
+
+        record = self._apply_status(order_id, status)
+
+        def update_order(db):
+            from ..models import Order as OrderModel
+
+            # Row lock: the counters need the status this change replaces
+            order = db.query(OrderModel).filter(OrderModel.id == order_id).with_for_update().first()
+            if order is None:
+                return None
+            old_status = order.status
+            now = datetime.utcnow()
+            order.status = status
+            order.updated_at = now
+            if status == "paid":
+                order.paid_at = now
+            elif status == "fulfilled":
+                order.fulfilled_at = now
+            db.flush()
+            if old_status != status:
+                order_counters.record_transition(
+                    db, str(order.user_id), old_status, status, order.total_amount, order.created_at
+                )
+                sales_rollup.record_order(
+                    db, str(order.user_id), order.created_at, old_status, status, order.total_amount
+                )
+            return None if record is not None else _order_record(order)
+
+        try:
+            loaded = await run_db(update_order, commit=True)
+        except Exception as e:
+            logger.error(f"Failed to persist status {status!r} for order {order_id}: {e}")
+            return record
+
+        if record is None and loaded is not None:
+            with self._lock:
+                self._index(loaded)
+            record = loaded
+        return record
+
+    # ---------- database lookups ----------
+
+    async def find_pending_async(self, customer_phone: str) -> Optional[dict]:
+        """
+        The customer's most recent pending order.
+
+        Memory first; otherwise one indexed query, for orders placed through
+        another worker or before this one started.
+        """
+        record = self.latest_pending_for_customer(customer_phone)
+        if record is not None:
+            return record
+
+        from ..database import run_db
+
+        def load_pending(db):
+            from sqlalchemy.orm import selectinload
+            from ..models import Order as OrderModel
+
+            order = db.query(OrderModel).options(selectinload(OrderModel.order_items)).filter(
+                OrderModel.customer_phone == customer_phone,
+                OrderModel.status == "pending"
+            ).order_by(OrderModel.created_at.desc()).first()
+            return _order_record(order) if order else None
+
+        try:
+            record = await run_db(load_pending)
+        except Exception as e:
+            logger.warning(f"Pending order lookup failed for {customer_phone}: {e}")
+            return None
+        if record is not None:
+            with self._lock:
+                self._index(record)
+        return record
+
+    async def load_async(self, days: int = HYDRATE_DAYS) -> int:
+        """Load pending orders and the last `days` of orders from the database. Returns orders loaded."""
+        from ..database import run_db
+
+        def load_orders(db):
+            from sqlalchemy import or_
+            from sqlalchemy.orm import selectinload
+            from ..models import Order as OrderModel
+
+            since = datetime.utcnow() - timedelta(days=days)
+            orders = db.query(OrderModel).options(selectinload(OrderModel.order_items)).filter(
+                or_(OrderModel.status == "pending", OrderModel.created_at >= since)
+            ).order_by(OrderModel.created_at).all()
+            return [_order_record(order) for order in orders]
+
+        records = await run_db(load_orders)
+        with self._lock:
+            for record in records:
+                # Don't overwrite newer in-memory state for orders already tracked
+                if record["id"] not in self._orders:
+                    self._index(record)
+        return len(records)
+
+    def clear(self):
+        with self._lock:
+            self._orders.clear()
+            self._pending_by_customer.clear()
+            self._by_status.clear()
+            self._amount_by_status.clear()
+            self._by_day.clear()
+            self._pruned_day = None
+
+
+# Singleton instance
+order_store = OrderStore()
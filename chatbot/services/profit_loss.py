@@ -3,12 +3,17 @@
 Profit/Loss Service for Nigerian SME Dashboard
 Tracks actual profit by considering orders and expenses from database.
 This is the "know your money" core feature.
+
+Reports sum daily_vendor_rollup rows (see sales_rollup) instead of
+aggregating raw orders and expenses, so periods are whole days.
 """
 from typing import Dict, Optional, List
 from dataclasses import dataclass
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from enum import Enum
 
+from .sales_rollup import sales_rollup, utc_today
+
 
 class ReportPeriod(Enum):
     TODAY = "today"
@@ -62,12 +67,12 @@ class DailySummary:
 class ProfitLossService:
     """
     Profit/Loss calculation engine using REAL database data.
-    Queries orders and expenses from Azure SQL with user_id filtering.
+    Reads the daily per-vendor rollup with user_id filtering.
     """
     
     def _get_period_bounds(self, period: ReportPeriod, custom_start: datetime = None, custom_end: datetime = None):
-        """Calculate period start and end dates."""
-        now = datetime.now()
+        """Calculate period start and end dates (UTC, the rollup's days)."""
+        now = datetime.utcnow()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         
         if period == ReportPeriod.TODAY:
@@ -97,113 +102,91 @@ class ProfitLossService:
         Generate complete profit/loss report from REAL database data.
         """
         from ..database import SessionLocal
-        from ..models import Order, Expense
-        from sqlalchemy import func
         
         start_date, end_date = self._get_period_bounds(period, custom_start, custom_end)
         
         db = SessionLocal()
         try:
-            # Query real orders from database
-            order_query = db.query(
-                func.count(Order.id).label('count'),
-                func.sum(Order.total_amount).label('revenue')
-            ).filter(
-                Order.created_at >= start_date,
-                Order.created_at <= end_date,
-                Order.status.in_(['paid', 'fulfilled', 'completed'])
-            )
-            
-            if user_id:
-                order_query = order_query.filter(Order.user_id == user_id)
-            
-            order_result = order_query.first()
-            order_count = order_result.count or 0
-            total_revenue = float(order_result.revenue or 0)
-            
-            # COGS estimated at 50% of revenue (can be refined with cost_price field later)
-            total_cogs = total_revenue * 0.5
-            gross_profit = total_revenue - total_cogs
-            gross_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
-            
-            # Query real expenses from database
-            expense_query = db.query(
-                func.sum(Expense.amount).label('total'),
-                Expense.category
-            ).filter(
-                Expense.date >= start_date,
-                Expense.date <= end_date
-            )
-            
-            if user_id:
-                expense_query = expense_query.filter(Expense.user_id == user_id)
-            
-            # Get total expenses
-            total_expense_query = db.query(func.sum(Expense.amount)).filter(
-                Expense.date >= start_date,
-                Expense.date <= end_date
-            )
-            if user_id:
-                total_expense_query = total_expense_query.filter(Expense.user_id == user_id)
-            
-            total_expenses = float(total_expense_query.scalar() or 0)
-            
-            # Get expense breakdown by category
-            breakdown_query = db.query(
-                Expense.category,
-                func.sum(Expense.amount).label('total')
-            ).filter(
-                Expense.date >= start_date,
-                Expense.date <= end_date
-            )
-            if user_id:
-                breakdown_query = breakdown_query.filter(Expense.user_id == user_id)
-            
-            breakdown_results = breakdown_query.group_by(Expense.category).all()
-            expense_breakdown = {row.category: float(row.total) for row in breakdown_results}
-            
-            # Net profit = Gross profit - Expenses
-            net_profit = gross_profit - total_expenses
-            net_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else 0
-            
-            return ProfitLossReport(
-                period=period.value,
-                period_start=start_date,
-                period_end=end_date,
-                total_revenue_ngn=total_revenue,
-                order_count=order_count,
-                total_cogs_ngn=total_cogs,
-                gross_profit_ngn=gross_profit,
-                gross_margin_percent=round(gross_margin, 1),
-                total_expenses_ngn=total_expenses,
-                expense_breakdown=expense_breakdown,
-                net_profit_ngn=net_profit,
-                net_margin_percent=round(net_margin, 1),
-                vs_previous_period_percent=None
-            )
+            totals = sales_rollup.totals(db, user_id, *self._period_days(period, start_date, end_date))
         finally:
             db.close()
+        
+        return self._build_report(
+            period.value, start_date, end_date,
+            totals["order_count"], totals["revenue"], totals["expenses"], totals["expense_breakdown"]
+        )
+    
+    @staticmethod
+    def _period_days(period: ReportPeriod, start_date: datetime, end_date: datetime):
+        """Inclusive rollup days covering the period."""
+        if period == ReportPeriod.YESTERDAY:
+            # Ends at midnight today
+            return start_date.date(), start_date.date()
+        return start_date.date(), end_date.date()
+    
+    @staticmethod
+    def _build_report(period: str, start_date: datetime, end_date: datetime, order_count: int,
+                      total_revenue: float, total_expenses: float, expense_breakdown: Dict[str, float]) -> ProfitLossReport:
+        # COGS estimated at 50% of revenue (can be refined with cost_price field later)
+        total_cogs = total_revenue * 0.5
+        gross_profit = total_revenue - total_cogs
+        gross_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
+        
+        # Net profit = Gross profit - Expenses
+        net_profit = gross_profit - total_expenses
+        net_margin = (net_profit / total_revenue * 100) if total_revenue > 0 else 0
+        
+        return ProfitLossReport(
+            period=period,
+            period_start=start_date,
+            period_end=end_date,
+            total_revenue_ngn=total_revenue,
+            order_count=order_count,
+            total_cogs_ngn=total_cogs,
+            gross_profit_ngn=gross_profit,
+            gross_margin_percent=round(gross_margin, 1),
+            total_expenses_ngn=total_expenses,
+            expense_breakdown=expense_breakdown,
+            net_profit_ngn=net_profit,
+            net_margin_percent=round(net_margin, 1),
+            vs_previous_period_percent=None
+        )
     
     def get_daily_summary(self, user_id: str = None) -> DailySummary:
-        """Get quick daily profit summary for dashboard."""
-        report = self.get_profit_loss_report(ReportPeriod.TODAY, user_id=user_id)
-        yesterday = self.get_profit_loss_report(ReportPeriod.YESTERDAY, user_id=user_id)
+        """Get quick daily profit summary for dashboard (one rollup query for today and yesterday)."""
+        from ..database import SessionLocal
+        
+        today = utc_today()
+        db = SessionLocal()
+        try:
+            days = sales_rollup.daily_totals(db, user_id, today - timedelta(days=1), today)
+        finally:
+            db.close()
+        
+        def net_profit(day: date) -> float:
+            totals = days.get(day, {"revenue": 0.0, "expenses": 0.0})
+            # Same 50% COGS estimate as the full report
+            return totals["revenue"] * 0.5 - totals["expenses"]
+        
+        report = days.get(today, {"order_count": 0, "revenue": 0.0})
+        profit = net_profit(today)
+        yesterday_profit = net_profit(today - timedelta(days=1))
         
         # Determine trend
-        if yesterday.net_profit_ngn == 0:
+        if yesterday_profit == 0:
             trend = "stable"
-        elif report.net_profit_ngn > yesterday.net_profit_ngn:
+        elif profit > yesterday_profit:
             trend = "up"
-        elif report.net_profit_ngn < yesterday.net_profit_ngn:
+        elif profit < yesterday_profit:
             trend = "down"
         else:
             trend = "stable"
         
         return DailySummary(
-            date=datetime.now().strftime("%Y-%m-%d"),
-            revenue_ngn=report.total_revenue_ngn,
-            profit_ngn=report.net_profit_ngn,
-            order_count=report.order_count,
+            date=today.strftime("%Y-%m-%d"),
+            revenue_ngn=report["revenue"],
+            profit_ngn=profit,
+            order_count=report["order_count"],
             top_product="Product data",  # Can be enhanced later
             profit_trend=trend
         )
@@ -167,6 +167,30 @@ class PushNotificationService:
         )
         return await self.send_notification(vendor_id, notification)
 
+    
+    async def send_stock_shortfall_alert(
+        self, 
+        vendor_id: str, 
+        order_id: str, 
+        product_name: str,
+        quantity: int,
+        stock_level: int
+    ):
+        """Send notification for a paid order whose stock was sold before it was committed."""
+        notification = PushNotification(
+            title="⚠️ Paid Order Short on Stock",
+            body=f"Order #{order_id} was paid for {quantity}x {product_name}, but only "
+                 f"{stock_level} left. Restock or refund the customer.",
+            data={
+                "type": "stock_shortfall",
+                "order_id": order_id,
+                "product_name": product_name,
+                "quantity": quantity,
+                "stock_level": stock_level
+            }
+        )
+        return await self.send_notification(vendor_id, notification)
+
 
 # Singleton instance
 push_service = PushNotificationService()
@@ -0,0 +1,249 @@
+"""
+Daily sales rollup per vendor.
+
+daily_vendor_rollup holds one row per vendor per day: paid/fulfilled orders
+and revenue (by the order's creation day, like the profit/loss report) and
+expenses with a per-category breakdown. Rows are maintained incrementally in
+the same transaction as the order or expense write, so a profit/loss report
+for any period is one indexed range read over at most a few hundred rows
+instead of aggregates over raw orders and expenses.
+
+Days are UTC throughout (utc_today()). Totals for closed periods (ending
+before today) are cached under the "pnl:" cache policy, effectively forever:
+a late write to a past day (an old order paid today, a back-dated expense)
+bumps the vendor's rollup tag after commit, which drops every cached period
+for that vendor.
+
+rebuild() recomputes rows from the raw tables; run
+scripts/backfill_daily_rollup.py once after creating the table.
+"""
+import json
+import logging
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import event, update
+from sqlalchemy.exc import IntegrityError
+
+from ..cache import get_cache, invalidate_tags, set_cache
+
+logger = logging.getLogger(__name__)
+
+REVENUE_STATUSES = ("paid", "fulfilled", "completed")
+CACHE_KEY_PREFIX = "pnl:"
+# Bumped by rebuild(): drops every cached period at once
+REBUILD_TAG = "rollup:rebuild"
+
+
+def utc_today() -> date:
+    """Today's rollup day: orders and reports use UTC days, like the order counters."""
+    return datetime.utcnow().date()
+
+
+def rollup_tag(vendor_id: Optional[str]) -> str:
+    """Cached periods of one vendor (None: reports across all vendors)."""
+    return f"rollup:{vendor_id or 'all'}"
+
+
+def _invalidate_after_commit(db, *tags: str):
+    """Bump cache tags once the transaction commits (not before, or a reader could re-cache old rows)."""
+    if not db.info.get("rollup_listening"):
+        db.info["rollup_listening"] = True
+
+        def on_commit(session):
+            # Also fired when a savepoint is released: wait for the real commit
+            if not session.in_nested_transaction():
+                invalidate_tags(*session.info.pop("rollup_invalidate", ()))
+
+        def on_rollback(session):
+            if not session.in_nested_transaction():
+                session.info.pop("rollup_invalidate", None)
+
+        event.listen(db, "after_commit", on_commit)
+        event.listen(db, "after_rollback", on_rollback)
+    db.info.setdefault("rollup_invalidate", set()).update(tags)
+
+
+class SalesRollup:
+    """Incremental daily_vendor_rollup maintenance and period totals."""
+
+    # ---------- writes (inside the caller's transaction) ----------
+
+    def _touch(self, db, vendor_id: str, day: date, values: dict):
+        """Apply relative updates to (vendor, day), creating the row if it's missing."""
+        from ..models import DailyVendorRollup
+
+        statement = (
+            update(DailyVendorRollup)
+            .where(DailyVendorRollup.user_id == vendor_id, DailyVendorRollup.day == day)
+            .values(**{name: getattr(DailyVendorRollup, name) + change for name, change in values.items()})
+            .execution_options(synchronize_session=False)
+        )
+        if not db.execute(statement).rowcount:
+            try:
+                with db.begin_nested():
+                    db.add(DailyVendorRollup(user_id=vendor_id, day=day, **{
+                        "order_count": 0, "revenue": 0.0, "expenses": 0.0, **values
+                    }))
+                    db.flush()
+            except IntegrityError:
+                # Another transaction created the row first
+                db.execute(statement)
+        if day < utc_today():
+            # Closed periods are cached: a write to a past day drops them
+            _invalidate_after_commit(db, rollup_tag(vendor_id), rollup_tag(None))
+
+    def record_order(self, db, vendor_id: str, created_at: Optional[datetime], old_status: Optional[str],
+                     new_status: str, amount: float):
+        """
+        Apply an order transition to its creation day. Only moves into or out of
+        paid/fulfilled change the rollup. Failures are logged, never raised;
+        rebuild() repairs the day.
+        """
+        change = (new_status in REVENUE_STATUSES) - (old_status in REVENUE_STATUSES)
+        if not change:
+            return
+        day = created_at.date() if created_at else utc_today()
+        try:
+            with db.begin_nested():
+                self._touch(db, vendor_id, day, {"order_count": change, "revenue": change * amount})
+        except Exception as e:
+            logger.warning(f"Rollup update failed for vendor {vendor_id} on {day}: {e}")
+
+    def record_expense(self, db, vendor_id: str, day: date, category: str, amount: float):
+        """Add an expense to its day, including the per-category breakdown."""
+        from ..models import DailyVendorRollup
+
+        try:
+            with db.begin_nested():
+                self._touch(db, vendor_id, day, {"expenses": amount})
+                # Breakdown is JSON text: update it under a row lock
+                row = db.query(DailyVendorRollup).filter(
+                    DailyVendorRollup.user_id == vendor_id, DailyVendorRollup.day == day
+                ).with_for_update().one()
+                breakdown = json.loads(row.expense_breakdown or "{}")
+                breakdown[category] = breakdown.get(category, 0) + amount
+                row.expense_breakdown = json.dumps(breakdown)
+        except Exception as e:
+            logger.warning(f"Rollup update failed for vendor {vendor_id} on {day}: {e}")
+
+    # ---------- reads ----------
+
+    def _sum(self, db, vendor_id: Optional[str], start: date, end: date) -> dict:
+        from ..models import DailyVendorRollup
+
+        query = db.query(
+            DailyVendorRollup.order_count, DailyVendorRollup.revenue,
+            DailyVendorRollup.expenses, DailyVendorRollup.expense_breakdown
+        ).filter(DailyVendorRollup.day >= start, DailyVendorRollup.day <= end)
+        if vendor_id:
+            query = query.filter(DailyVendorRollup.user_id == vendor_id)
+
+        totals = {"order_count": 0, "revenue": 0.0, "expenses": 0.0, "expense_breakdown": {}}
+        for order_count, revenue, expenses, breakdown in query:
+            totals["order_count"] += order_count or 0
+            totals["revenue"] += revenue or 0
+            totals["expenses"] += expenses or 0
+            for category, amount in json.loads(breakdown or "{}").items():
+                totals["expense_breakdown"][category] = totals["expense_breakdown"].get(category, 0) + amount
+        return totals
+
+    def totals(self, db, vendor_id: Optional[str], start: date, end: date) -> dict:
+        """
+        Orders, revenue, expenses and expense breakdown for start..end (inclusive days).
+        Closed periods come from cache after the first read.
+        """
+        if end >= utc_today():
+            return self._sum(db, vendor_id, start, end)
+
+        key = f"{CACHE_KEY_PREFIX}{vendor_id or 'all'}:{start.isoformat()}:{end.isoformat()}"
+        tags = [rollup_tag(vendor_id), REBUILD_TAG]
+        cached = get_cache(key, tags=tags)
+        if cached is not None:
+            return cached
+        totals = self._sum(db, vendor_id, start, end)
+        set_cache(key, totals, tags=tags)
+        return totals
+
+    def daily_totals(self, db, vendor_id: Optional[str], start: date, end: date) -> Dict[date, dict]:
+        """Per-day totals for start..end in one query (days without activity are absent)."""
+        from ..models import DailyVendorRollup
+
+        query = db.query(
+            DailyVendorRollup.day, DailyVendorRollup.order_count,
+            DailyVendorRollup.revenue, DailyVendorRollup.expenses
+        ).filter(DailyVendorRollup.day >= start, DailyVendorRollup.day <= end)
+        if vendor_id:
+            query = query.filter(DailyVendorRollup.user_id == vendor_id)
+
+        days: Dict[date, dict] = {}
+        for day, order_count, revenue, expenses in query:
+            totals = days.setdefault(day, {"order_count": 0, "revenue": 0.0, "expenses": 0.0})
+            totals["order_count"] += order_count or 0
+            totals["revenue"] += revenue or 0
+            totals["expenses"] += expenses or 0
+        return days
+
+    # ---------- rebuild ----------
+
+    def rebuild(self, db, vendor_id: Optional[str] = None, start: date = None, end: date = None) -> int:
+        """
+        Recompute rollup rows for start..end (default: all time) from orders and
+        expenses. Returns the number of rows written. Streams the raw rows, so it
+        runs in one pass without database-specific date functions.
+        """
+        from ..models import DailyVendorRollup, Expense, Order as OrderModel
+
+        rows: Dict[tuple, dict] = {}
+
+        def row_for(user_id, day):
+            return rows.setdefault((str(user_id), day), {
+                "order_count": 0, "revenue": 0.0, "expenses": 0.0, "expense_breakdown": {}
+            })
+
+        def in_range(query, column):
+            if vendor_id:
+                query = query.filter(column.class_.user_id == vendor_id)
+            if start:
+                query = query.filter(column >= datetime.combine(start, dt_time.min))
+            if end:
+                query = query.filter(column < datetime.combine(end + timedelta(days=1), dt_time.min))
+            return query
+
+        orders = in_range(db.query(OrderModel.user_id, OrderModel.created_at, OrderModel.total_amount).filter(
+            OrderModel.status.in_(REVENUE_STATUSES), OrderModel.created_at.isnot(None)
+        ), OrderModel.created_at)
+        for user_id, created_at, amount in orders.yield_per(1000):
+            row = row_for(user_id, created_at.date())
+            row["order_count"] += 1
+            row["revenue"] += amount or 0
+
+        expenses = in_range(db.query(Expense.user_id, Expense.date, Expense.category, Expense.amount).filter(
+            Expense.date.isnot(None)
+        ), Expense.date)
+        for user_id, expense_date, category, amount in expenses.yield_per(1000):
+            row = row_for(user_id, expense_date.date())
+            row["expenses"] += amount or 0
+            row["expense_breakdown"][category] = row["expense_breakdown"].get(category, 0) + (amount or 0)
+
+        existing = db.query(DailyVendorRollup)
+        if vendor_id:
+            existing = existing.filter(DailyVendorRollup.user_id == vendor_id)
+        if start:
+            existing = existing.filter(DailyVendorRollup.day >= start)
+        if end:
+            existing = existing.filter(DailyVendorRollup.day <= end)
+        existing.delete(synchronize_session=False)
+
+        for (user_id, day), values in rows.items():
+            db.add(DailyVendorRollup(
+                user_id=user_id, day=day,
+                order_count=values["order_count"], revenue=values["revenue"], expenses=values["expenses"],
+                expense_breakdown=json.dumps(values["expense_breakdown"]) if values["expense_breakdown"] else None
+            ))
+        _invalidate_after_commit(db, REBUILD_TAG)
+        return len(rows)
+
+
+# Singleton instance
+sales_rollup = SalesRollup()
@@ -0,0 +1,405 @@
+"""
+Stock Hold Ledger for unpaid chatbot orders.
+
+A chatbot order places a hold instead of decrementing stock_level. Holds expire
+after ORDER_RESERVATION_MINUTES; a background sweeper releases expired holds in
+bulk, and payment confirmation (the "I paid" message, Paystack charge.success or
+the vendor marking the order paid/fulfilled) commits them, which is when
+stock_level is actually decremented. Cancelling the order releases them.
+
+Available stock is stock_level - active holds. Active hold quantities are kept
+per product in memory (with an expiry heap for the sweeper), so chatbot replies
+never query the holds table. Placing a hold, and reserving stock for a direct
+order, re-checks against the database's active holds under a row lock, so
+concurrent checkouts on any worker can't sell or hold what another order holds.
+"""
+import asyncio
+import heapq
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, update
+
+from ..catalog import catalog_store
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds between sweeps for expired holds
+SWEEP_INTERVAL_SECONDS = 30
+# Re-read active holds from the database this often (holds placed by other workers)
+RESYNC_SECONDS = 300
+
+
+class StockHoldLedger:
+    """TTL stock holds with in-memory per-product totals and an expiry heap."""
+
+    def __init__(self, ttl_minutes: int = None, resync_seconds: int = RESYNC_SECONDS):
+        self.ttl_minutes = ttl_minutes or settings.order_reservation_minutes
+        self.resync_seconds = resync_seconds
+        self._lock = threading.Lock()
+        # {hold_id: (product_id, quantity, order_id)} for active holds
+        self._holds: Dict[str, Tuple[str, int, str]] = {}
+        # {product_id: total quantity held}
+        self._held: Dict[str, int] = {}
+        # [(expires_at, hold_id)]; entries for holds already resolved are skipped lazily
+        self._heap: List[Tuple[datetime, str]] = []
+        self._last_sync = 0.0
+        self._sweeper_task: Optional[asyncio.Task] = None
+
+    # ---------- in-memory bookkeeping ----------
+
+    def _track(self, hold_id: str, product_id: str, quantity: int, order_id: str, expires_at: datetime):
+        if hold_id in self._holds:
+            return
+        self._holds[hold_id] = (product_id, quantity, order_id)
+        self._held[product_id] = self._held.get(product_id, 0) + quantity
+        heapq.heappush(self._heap, (expires_at, hold_id))
+
+    def _forget(self, hold_ids: Iterable[str]):
+        with self._lock:
+            for hold_id in hold_ids:
+                entry = self._holds.pop(hold_id, None)
+                if entry is None:
+                    continue
+                product_id, quantity, _ = entry
+                remaining = self._held.get(product_id, 0) - quantity
+                if remaining > 0:
+                    self._held[product_id] = remaining
+                else:
+                    self._held.pop(product_id, None)
+
+    def held(self, product_id: str) -> int:
+        """Quantity of a product currently held by unpaid orders."""
+        return self._held.get(str(product_id), 0)
+
+    def available(self, product: dict) -> int:
+        """Stock a customer can still buy: stock_level minus active holds."""
+        return max(0, int(product.get("stock_level", 0)) - self.held(product.get("id", "")))
+
+    def with_available(self, products: List[dict]) -> List[dict]:
+        """Copies of product dicts with stock_level replaced by available stock."""
+        if not self._held:
+            return products
+        return [
+            {**p, "stock_level": self.available(p)} if str(p.get("id", "")) in self._held else p
+            for p in products
+        ]
+
+    @staticmethod
+    def held_in_session(db, product_ids: List[str], now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Active hold totals per product, read in the caller's transaction.
+
+        Unlike held(), this sees holds placed by every worker, so anything that
+        sells stock under a row lock should check against it.
+        """
+        from ..models import StockHold
+
+        now = now or datetime.utcnow()
+        rows = db.query(StockHold.product_id, func.sum(StockHold.quantity)).filter(
+            StockHold.product_id.in_(list(product_ids)),
+            StockHold.status == "active",
+            StockHold.expires_at > now
+        ).group_by(StockHold.product_id).all()
+        return {str(product_id): int(quantity or 0) for product_id, quantity in rows}
+
+    # ---------- ledger operations ----------
+
+    def place(self, order_id: str, user_id: str, items: List[Tuple[str, int]]) -> Dict[str, dict]:
+        """
+        Hold stock for an unpaid order.
+
+        Locks the product rows, checks stock_level - active holds for every item
+        and records all holds in one transaction; nothing is held if any item is short.
+
+        Returns:
+            {product_id: {"id", "name", "price_ngn", "available"}} after the hold
+
+        Raises:
+            ProductNotFoundError / InsufficientStockError (nothing is held)
+        """
+        from ..database import SessionLocal
+        from ..models import Product as ProductModel, StockHold
+        from ..inventory import InsufficientStockError, ProductNotFoundError
+
+        quantities: Dict[str, int] = {}
+        for product_id, quantity in items:
+            quantities[str(product_id)] = quantities.get(str(product_id), 0) + int(quantity)
+        if not quantities:
+            return {}
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(minutes=self.ttl_minutes)
+        new_holds = []
+
+        db = SessionLocal()
+        try:
+            rows = db.query(ProductModel).filter(
+                ProductModel.user_id == user_id,
+                ProductModel.id.in_(list(quantities))
+            ).with_for_update().all()
+            by_id = {str(p.id): p for p in rows}
+
+            held = self.held_in_session(db, list(quantities), now)
+
+            products = {}
+            for product_id, quantity in quantities.items():
+                product = by_id.get(product_id)
+                if product is None:
+                    raise ProductNotFoundError(product_id)
+                available = int(product.stock_level) - held.get(product_id, 0)
+                if available < quantity:
+                    raise InsufficientStockError(product_id, product.name, max(0, available), quantity)
+                products[product_id] = {
+                    "id": product_id,
+                    "name": product.name,
+                    "price_ngn": float(product.price_ngn),
+                    "available": available - quantity
+                }
+
+            for product_id, quantity in quantities.items():
+                hold_id = str(uuid.uuid4())
+                db.add(StockHold(
+                    id=hold_id,
+                    user_id=user_id,
+                    order_id=order_id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    status="active",
+                    expires_at=expires_at,
+                    created_at=now
+                ))
+                new_holds.append((hold_id, product_id, quantity))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        with self._lock:
+            for hold_id, product_id, quantity in new_holds:
+                self._track(hold_id, product_id, quantity, order_id, expires_at)
+        return products
+
+    async def place_async(self, order_id: str, user_id: str, items: List[Tuple[str, int]]) -> Dict[str, dict]:
+        """Async place() for the request path."""
+        return await asyncio.to_thread(self.place, order_id, user_id, items)
+
+    def commit_order(self, order_id: str) -> int:
+        """
+        Convert an order's holds into a sale: decrement stock_level and mark them committed.
+
+        Holds the sweeper already released are committed too (late payment), as
+        far as stock allows. Returns the number of holds committed.
+        """
+        committed, _ = self._commit(order_id)
+        return committed
+
+    async def commit_order_async(self, order_id: str) -> int:
+        """
+        Async commit_order() for the request path.
+
+        A hold that lapsed and whose stock was sold in the meantime can't be
+        covered; the vendor gets a push alert for it, to restock or refund.
+        """
+        from .push_notifications import push_service
+
+        committed, shortfalls = await asyncio.to_thread(self._commit, order_id)
+        for shortfall in shortfalls:
+            await push_service.send_stock_shortfall_alert(order_id=order_id, **shortfall)
+        return committed
+
+    def _commit(self, order_id: str) -> Tuple[int, List[dict]]:
+        """commit_order(), also returning the holds there wasn't stock left to cover."""
+        from ..database import SessionLocal
+        from ..models import Product as ProductModel, StockHold
+
+        now = datetime.utcnow()
+        shortfalls = []
+        db = SessionLocal()
+        try:
+            holds = db.query(StockHold).filter(
+                StockHold.order_id == order_id,
+                StockHold.status != "committed"
+            ).with_for_update().all()
+
+            for hold in holds:
+                result = db.execute(
+                    update(ProductModel)
+                    .where(
+                        ProductModel.id == hold.product_id,
+                        ProductModel.stock_level >= hold.quantity
+                    )
+                    .values(stock_level=ProductModel.stock_level - hold.quantity)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    logger.warning(
+                        f"Order {order_id} paid after its hold on {hold.product_id} lapsed; "
+                        f"not enough stock left to commit {hold.quantity}"
+                    )
+                    product = db.query(ProductModel.name, ProductModel.stock_level).filter(
+                        ProductModel.id == hold.product_id
+                    ).first()
+                    shortfalls.append({
+                        "vendor_id": str(hold.user_id),
+                        "product_name": product.name if product else str(hold.product_id),
+                        "quantity": int(hold.quantity),
+                        "stock_level": int(product.stock_level) if product else 0
+                    })
+                hold.status = "committed"
+                hold.resolved_at = now
+            hold_ids = [str(h.id) for h in holds]
+            vendors = {str(h.user_id) for h in holds}
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        for vendor_id in vendors:
+            catalog_store.bump(vendor_id)
+        self._forget(hold_ids)
+        return len(hold_ids), shortfalls
+
+    def release_order(self, order_id: str) -> int:
+        """Release an order's active holds (e.g. order cancelled). Returns holds released."""
+        from ..database import SessionLocal
+        from ..models import StockHold
+
+        db = SessionLocal()
+        try:
+            hold_ids = [str(h.id) for h in db.query(StockHold.id).filter(
+                StockHold.order_id == order_id,
+                StockHold.status == "active"
+            ).all()]
+            if hold_ids:
+                db.query(StockHold).filter(
+                    StockHold.id.in_(hold_ids),
+                    StockHold.status == "active"
+                ).update(
+                    {"status": "released", "resolved_at": datetime.utcnow()},
+                    synchronize_session=False
+                )
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self._forget(hold_ids)
+        return len(hold_ids)
+
+    async def release_order_async(self, order_id: str) -> int:
+        """Async release_order() for the request path."""
+        return await asyncio.to_thread(self.release_order, order_id)
+
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        """
+        Release every expired hold with one bulk UPDATE.
+
+        The expiry heap tells us which in-memory totals to reduce without
+        scanning; the UPDATE is by (status, expires_at) so holds placed by other
+        workers are released too. Returns the number of rows released.
+        """
+        from ..database import SessionLocal
+        from ..models import StockHold
+
+        now = now or datetime.utcnow()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, hold_id = heapq.heappop(self._heap)
+                if hold_id in self._holds:
+                    expired.append(hold_id)
+
+        db = SessionLocal()
+        try:
+            released = db.query(StockHold).filter(
+                StockHold.status == "active",
+                StockHold.expires_at <= now
+            ).update(
+                {"status": "released", "resolved_at": now},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put them back so the next sweep retries
+            with self._lock:
+                for hold_id in expired:
+                    heapq.heappush(self._heap, (now, hold_id))
+            raise
+        finally:
+            db.close()
+
+        self._forget(expired)
+        if released:
+            logger.info(f"Released {released} expired stock hold(s)")
+
+        if time.time() - self._last_sync >= self.resync_seconds:
+            self.load()
+        return released
+
+    def load(self):
+        """Rebuild the in-memory totals from the database's active holds."""
+        from ..database import SessionLocal
+        from ..models import StockHold
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                StockHold.id, StockHold.product_id, StockHold.quantity,
+                StockHold.order_id, StockHold.expires_at
+            ).filter(
+                StockHold.status == "active",
+                StockHold.expires_at > now
+            ).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            self._holds.clear()
+            self._held.clear()
+            self._heap = []
+            for hold_id, product_id, quantity, order_id, expires_at in rows:
+                self._track(str(hold_id), str(product_id), int(quantity), str(order_id), expires_at)
+        self._last_sync = time.time()
+
+    # ---------- background sweeper ----------
+
+    async def _run_sweeper(self, interval: int):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Stock hold sweep failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start_sweeper(self, interval: int = SWEEP_INTERVAL_SECONDS):
+        """Start the background sweeper on the running event loop."""
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.get_running_loop().create_task(self._run_sweeper(interval))
+
+    async def stop_sweeper(self):
+        """Cancel the background sweeper."""
+        if self._sweeper_task is not None:
+            self._sweeper_task.cancel()
+            try:
+                await self._sweeper_task
+            except asyncio.CancelledError:
+                pass
+            self._sweeper_task = None
+
+
+# Singleton instance
+stock_hold_ledger = StockHoldLedger()
@@ -78,6 +78,40 @@ async def upload_product_image(
         return False, f"Upload error: {str(e)}", None
 
 
+async def upload_file(
+    file_path: str,
+    file_bytes: bytes,
+    content_type: str = "application/octet-stream"
+) -> Tuple[bool, str, Optional[str]]:
+    """
+    Upload bytes to a fixed path in the bucket (used by the blob store).
+    
+    Returns:
+        Tuple of (success, message, public_url or None)
+    """
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        return False, "Supabase not configured", None
+    
+    storage_url = f"{get_storage_url()}/object/{BUCKET_NAME}/{file_path}"
+    headers = {
+        "Authorization": f"Bearer {SUPABASE_KEY}",
+        "Content-Type": content_type,
+        "x-upsert": "true",
+    }
+    
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.post(storage_url, content=file_bytes, headers=headers)
+            
+            if response.status_code in [200, 201]:
+                return True, "File uploaded successfully", get_public_url(file_path)
+            return False, f"Upload failed: {response.text}", None
+    except httpx.TimeoutException:
+        return False, "Upload timed out - file may be too large", None
+    except Exception as e:
+        return False, f"Upload error: {str(e)}", None
+
+
 async def delete_product_image(image_url: str) -> Tuple[bool, str]:
     """
     Delete a product image from Supabase Storage.
@@ -0,0 +1,165 @@
+"""
+Synonym Service for product search.
+
+Merges the built-in PRODUCT_SYNONYMS with each vendor's custom synonym lists
+(stored in the vendor_synonyms table) into a frozen word -> synonym-set map.
+Vendor tables are cached in-process and hot-reloaded: immediately after a
+write through this service, and at least every REFRESH_SECONDS so writes made
+by other workers are picked up too.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional
+
+from ..conversation import PRODUCT_SYNONYMS, build_synonym_table, get_synonym_table
+
+logger = logging.getLogger(__name__)
+
+# How long a vendor's merged table is trusted before re-reading the database
+REFRESH_SECONDS = 60
+
+
+class SynonymService:
+    """Per-vendor synonym tables with database-backed custom entries."""
+
+    def __init__(self, refresh_seconds: int = REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        # {vendor_id: (loaded_at, table)}
+        self._tables: Dict[str, tuple] = {}
+
+    def _load_custom(self, user_id: str) -> Dict[str, List[str]]:
+        """Read a vendor's custom synonym lists from the database."""
+        from ..database import SessionLocal
+        from ..models import VendorSynonym
+
+        db = SessionLocal()
+        try:
+            rows = db.query(VendorSynonym).filter(VendorSynonym.user_id == user_id).all()
+            custom = {}
+            for row in rows:
+                try:
+                    custom[row.term.lower()] = [s.lower() for s in json.loads(row.synonyms or "[]")]
+                except (json.JSONDecodeError, TypeError):
+                    logger.warning(f"Ignoring malformed synonyms for '{row.term}' (vendor {user_id})")
+            return custom
+        finally:
+            db.close()
+
+    def _build(self, user_id: str) -> Mapping[str, FrozenSet[str]]:
+        try:
+            custom = self._load_custom(user_id)
+        except Exception as e:
+            # Keep serving the built-in table; retry after the refresh interval
+            logger.warning(f"Could not load custom synonyms for vendor {user_id}: {e}")
+            return get_synonym_table()
+
+        if not custom:
+            return get_synonym_table()
+
+        merged = {key: list(values) for key, values in PRODUCT_SYNONYMS.items()}
+        for term, synonyms in custom.items():
+            merged.setdefault(term, [])
+            merged[term].extend(s for s in synonyms if s not in merged[term])
+        return build_synonym_table(merged)
+
+    def table_for(self, user_id: Optional[str]) -> Mapping[str, FrozenSet[str]]:
+        """Get the merged synonym table for a vendor (built-in table if no vendor)."""
+        if not user_id:
+            return get_synonym_table()
+
+        entry = self._tables.get(user_id)
+        if entry is not None and time.time() - entry[0] < self.refresh_seconds:
+            return entry[1]
+
+        table = self._build(user_id)
+        with self._lock:
+            self._tables[user_id] = (time.time(), table)
+        return table
+
+    def expand(self, user_id: Optional[str], words: Iterable[str]) -> Dict[str, FrozenSet[str]]:
+        """
+        Synonym sets for every query word, looked up once per query.
+
+        Words shorter than 3 characters are not expanded (same rule as search).
+        """
+        table = self.table_for(user_id)
+        expanded = {}
+        for word in words:
+            if len(word) < 3 or word in expanded:
+                continue
+            expanded[word] = table.get(word, frozenset((word,)))
+        return expanded
+
+    def reload(self, user_id: Optional[str] = None):
+        """Drop cached tables so they are rebuilt on next use."""
+        with self._lock:
+            if user_id is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(user_id, None)
+
+    def list_custom(self, user_id: str) -> Dict[str, List[str]]:
+        """Get a vendor's custom synonym lists."""
+        return self._load_custom(user_id)
+
+    def set_custom(self, user_id: str, term: str, synonyms: List[str]) -> dict:
+        """Create or replace a vendor's synonym list for one term."""
+        from ..database import SessionLocal
+        from ..models import VendorSynonym
+
+        term = term.strip().lower()
+        cleaned = sorted({s.strip().lower() for s in synonyms if s and s.strip() and s.strip().lower() != term})
+
+        db = SessionLocal()
+        try:
+            row = db.query(VendorSynonym).filter(
+                VendorSynonym.user_id == user_id,
+                VendorSynonym.term == term
+            ).first()
+            if row:
+                row.synonyms = json.dumps(cleaned)
+            else:
+                db.add(VendorSynonym(
+                    id=str(uuid.uuid4()),
+                    user_id=user_id,
+                    term=term,
+                    synonyms=json.dumps(cleaned)
+                ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self.reload(user_id)
+        return {"term": term, "synonyms": cleaned}
+
+    def delete_custom(self, user_id: str, term: str) -> bool:
+        """Delete a vendor's synonym list for one term."""
+        from ..database import SessionLocal
+        from ..models import VendorSynonym
+
+        db = SessionLocal()
+        try:
+            deleted = db.query(VendorSynonym).filter(
+                VendorSynonym.user_id == user_id,
+                VendorSynonym.term == term.strip().lower()
+            ).delete()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self.reload(user_id)
+        return deleted > 0
+
+
+# Singleton instance
+synonym_service = SynonymService()
@@ -1,44 +1,84 @@
 """Vendor bot state management service.
 
-Tracks bot pause state and auto-silence for each vendor.
+Tracks bot pause state and auto-silence for each vendor, in the shared state
+store so every worker sees the same pause and silences:
+- vendor:{vendor_id}  hash {"paused": "1", "paused_at": iso} (no expiry)
+- silence:{vendor_id} hash {customer_id: last_active_at iso}; the key expires
+  AUTO_SILENCE_DURATION_MINUTES after the vendor's last activity
+
+Request handlers use the *_async functions, which don't block the event loop
+on the store.
 """
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-import os
 
-# In-memory store (use Supabase in production)
-# Structure: {vendor_id: {is_paused, paused_at, customer_activity: {customer_id: last_active_at}}}
-VENDOR_STATE: Dict[str, dict] = {}
+from ..state_store import state_store
 
 # Auto-silence duration (30 minutes)
 AUTO_SILENCE_DURATION_MINUTES = 30
 
 
+def _state_key(vendor_id: str) -> str:
+    return f"vendor:{vendor_id}"
+
+
+def _silence_key(vendor_id: str) -> str:
+    return f"silence:{vendor_id}"
+
+
 def get_vendor_state(vendor_id: str = "default") -> dict:
-    """Get or create vendor state."""
-    if vendor_id not in VENDOR_STATE:
-        VENDOR_STATE[vendor_id] = {
-            "is_paused": False,
-            "paused_at": None,
-            "customer_activity": {}
-        }
-    return VENDOR_STATE[vendor_id]
+    """
+    Snapshot of vendor state:
+    {is_paused, paused_at, customer_activity: {customer_id: last_active_at}}.
+    """
+    return _vendor_state(state_store.get_fields(_state_key(vendor_id)), state_store.get_fields(_silence_key(vendor_id)))
+
+
+async def get_vendor_state_async(vendor_id: str = "default") -> dict:
+    return _vendor_state(
+        await state_store.get_fields_async(_state_key(vendor_id)),
+        await state_store.get_fields_async(_silence_key(vendor_id))
+    )
+
+
+def _vendor_state(state: dict, customer_activity: dict) -> dict:
+    return {
+        "is_paused": state.get("paused") == "1",
+        "paused_at": state.get("paused_at"),
+        "customer_activity": customer_activity
+    }
 
 
 def is_bot_paused(vendor_id: str = "default") -> bool:
     """Check if bot is globally paused for this vendor."""
-    state = get_vendor_state(vendor_id)
-    return state.get("is_paused", False)
+    return state_store.get_field(_state_key(vendor_id), "paused") == "1"
+
+
+async def is_bot_paused_async(vendor_id: str = "default") -> bool:
+    return await state_store.get_field_async(_state_key(vendor_id), "paused") == "1"
 
 
 def set_bot_paused(vendor_id: str = "default", paused: bool = True) -> dict:
     """Toggle global bot pause state."""
-    state = get_vendor_state(vendor_id)
-    state["is_paused"] = paused
-    state["paused_at"] = datetime.utcnow().isoformat() if paused else None
+    paused_at = datetime.utcnow().isoformat() if paused else None
+    if paused:
+        state_store.set_fields(_state_key(vendor_id), {"paused": "1", "paused_at": paused_at}, replace=True)
+    else:
+        state_store.delete(_state_key(vendor_id))
     return {
-        "is_paused": state["is_paused"],
-        "paused_at": state["paused_at"]
+        "is_paused": paused,
+        "paused_at": paused_at
+    }
+
+
+async def set_bot_paused_async(vendor_id: str = "default", paused: bool = True) -> dict:
+    paused_at = datetime.utcnow().isoformat() if paused else None
+    if paused:
+        await state_store.set_fields_async(_state_key(vendor_id), {"paused": "1", "paused_at": paused_at}, replace=True)
+    else:
+        await state_store.delete_async(_state_key(vendor_id))
+    return {
+        "is_paused": paused,
+        "paused_at": paused_at
     }
 
 
@@ -47,9 +87,23 @@ def record_vendor_activity(vendor_id: str, customer_id: str) -> dict:
     Record that vendor is active in a conversation.
     This triggers auto-silence for 30 minutes.
     """
-    state = get_vendor_state(vendor_id)
     now = datetime.utcnow()
-    state["customer_activity"][customer_id] = now.isoformat()
+    state_store.set_fields(
+        _silence_key(vendor_id), {customer_id: now.isoformat()},
+        ttl_seconds=AUTO_SILENCE_DURATION_MINUTES * 60
+    )
+    return {
+        "customer_id": customer_id,
+        "silenced_until": (now + timedelta(minutes=AUTO_SILENCE_DURATION_MINUTES)).isoformat()
+    }
+
+
+async def record_vendor_activity_async(vendor_id: str, customer_id: str) -> dict:
+    now = datetime.utcnow()
+    await state_store.set_fields_async(
+        _silence_key(vendor_id), {customer_id: now.isoformat()},
+        ttl_seconds=AUTO_SILENCE_DURATION_MINUTES * 60
+    )
     return {
         "customer_id": customer_id,
         "silenced_until": (now + timedelta(minutes=AUTO_SILENCE_DURATION_MINUTES)).isoformat()
@@ -61,13 +115,17 @@ def is_auto_silenced(vendor_id: str, customer_id: str) -> bool:
     Check if bot should be silent for this customer.
     Returns True if vendor was active in this conversation within the last 30 minutes.
     """
-    state = get_vendor_state(vendor_id)
-    activity = state.get("customer_activity", {})
-    
-    if customer_id not in activity:
+    return _still_silenced(state_store.get_field(_silence_key(vendor_id), customer_id))
+
+
+async def is_auto_silenced_async(vendor_id: str, customer_id: str) -> bool:
+    return _still_silenced(await state_store.get_field_async(_silence_key(vendor_id), customer_id))
+
+
+def _still_silenced(last_active_str: str) -> bool:
+    if last_active_str is None:
         return False
     
-    last_active_str = activity[customer_id]
     try:
         last_active = datetime.fromisoformat(last_active_str)
         silence_until = last_active + timedelta(minutes=AUTO_SILENCE_DURATION_MINUTES)
@@ -92,10 +150,27 @@ def should_bot_respond(vendor_id: str, customer_id: str) -> tuple[bool, str]:
     return True, "Bot is active"
 
 
+async def should_bot_respond_async(vendor_id: str, customer_id: str) -> tuple[bool, str]:
+    """should_bot_respond() for async handlers (every inbound message)."""
+    if await is_bot_paused_async(vendor_id):
+        return False, "Bot is globally paused"
+    
+    if await is_auto_silenced_async(vendor_id, customer_id):
+        return False, f"Auto-silenced (vendor was active within {AUTO_SILENCE_DURATION_MINUTES} mins)"
+    
+    return True, "Bot is active"
+
+
 def get_bot_status(vendor_id: str = "default") -> dict:
     """Get full bot status for dashboard display."""
-    state = get_vendor_state(vendor_id)
-    
+    return _bot_status(get_vendor_state(vendor_id))
+
+
+async def get_bot_status_async(vendor_id: str = "default") -> dict:
+    return _bot_status(await get_vendor_state_async(vendor_id))
+
+
+def _bot_status(state: dict) -> dict:
     # Count active silences
     active_silences = 0
     now = datetime.utcnow()
@@ -117,8 +192,7 @@ def get_bot_status(vendor_id: str = "default") -> dict:
 
 def clear_expired_silences(vendor_id: str = "default") -> int:
     """Clean up expired auto-silence entries. Returns count of cleared entries."""
-    state = get_vendor_state(vendor_id)
-    activity = state.get("customer_activity", {})
+    activity = state_store.get_fields(_silence_key(vendor_id))
     now = datetime.utcnow()
     
     expired = []
@@ -130,7 +204,6 @@ def clear_expired_silences(vendor_id: str = "default") -> int:
         except (ValueError, TypeError):
             expired.append(customer_id)
     
-    for customer_id in expired:
-        del activity[customer_id]
+    state_store.delete_fields(_silence_key(vendor_id), *expired)
     
     return len(expired)
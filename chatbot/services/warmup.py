@@ -0,0 +1,148 @@
+"""
+Cache warm-up for the most active vendors.
+
+After a deploy every worker starts cold, so the first messages for each vendor
+would pay for the catalog load, search index build and storefront lookup. At
+startup (and every WARMUP_INTERVAL_MINUTES if set) this picks the vendors with
+the most recent activity and loads those in the background, a few at a time.
+
+Activity is orders plus checkout holds placed by the chatbot over the last
+ACTIVITY_WINDOW_DAYS, both persisted so they survive the deploy. The default
+vendor, which handles unattributed WhatsApp traffic, is always included.
+
+The app is live as soon as it starts; it reports ready once the first warm-up
+run has finished (see /health).
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_WINDOW_DAYS = 7
+
+
+class CacheWarmer:
+    """Pre-loads per-vendor caches for the most active vendors."""
+
+    def __init__(self, max_vendors: int = None, concurrency: int = None, interval_minutes: int = None):
+        self.max_vendors = max_vendors if max_vendors is not None else settings.warmup_vendors
+        self.concurrency = max(1, concurrency if concurrency is not None else settings.warmup_concurrency)
+        self.interval_minutes = interval_minutes if interval_minutes is not None else settings.warmup_interval_minutes
+        self.state = "pending"  # pending -> warming -> ready
+        self.runs = 0
+        self.last_run: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """True once the first warm-up run has finished (or warm-up is disabled)."""
+        return self.state == "ready"
+
+    def active_vendors(self, db, limit: int) -> List[str]:
+        """Vendor ids by recent orders + chatbot checkout holds, most active first."""
+        from ..inventory import DEFAULT_USER_ID
+        from ..models import Order, StockHold
+
+        since = datetime.utcnow() - timedelta(days=ACTIVITY_WINDOW_DAYS)
+        scores: Dict[str, int] = {}
+        for model in (Order, StockHold):
+            rows = db.query(model.user_id, func.count(model.id)).filter(
+                model.created_at >= since
+            ).group_by(model.user_id).all()
+            for user_id, count in rows:
+                scores[str(user_id)] = scores.get(str(user_id), 0) + count
+
+        ranked = sorted(scores, key=lambda vendor_id: -scores[vendor_id])
+        vendors = [DEFAULT_USER_ID] + [v for v in ranked if v != DEFAULT_USER_ID]
+        return vendors[:limit]
+
+    async def warm_vendor(self, vendor_id: str):
+        """Load one vendor's catalog snapshot, search index and storefront."""
+        from ..inventory import InventoryManager
+        from ..routers.storefront import warm_storefront
+
+        manager = InventoryManager(user_id=vendor_id)
+        await manager.catalog_snapshot_async()
+        await manager.warm_search_index_async()
+        await warm_storefront(vendor_id)
+
+    async def run(self) -> dict:
+        """One warm-up pass. Failures for a vendor are logged and skipped."""
+        from ..database import run_db
+
+        started = time.perf_counter()
+        if not self.ready:
+            self.state = "warming"
+        result = {"vendors": 0, "warmed": 0, "failed": 0}
+        try:
+            if self.max_vendors > 0:
+                vendors = await run_db(self.active_vendors, self.max_vendors)
+                result["vendors"] = len(vendors)
+                semaphore = asyncio.Semaphore(self.concurrency)
+
+                async def warm(vendor_id: str) -> bool:
+                    async with semaphore:
+                        try:
+                            await self.warm_vendor(vendor_id)
+                            return True
+                        except Exception as e:
+                            logger.warning(f"Cache warm-up failed for vendor {vendor_id}: {e}")
+                            return False
+
+                outcomes = await asyncio.gather(*(warm(v) for v in vendors))
+                result["warmed"] = sum(outcomes)
+                result["failed"] = len(outcomes) - result["warmed"]
+        except Exception as e:
+            # Can't even list vendors (e.g. database down): serve cold rather than never be ready
+            logger.error(f"Cache warm-up failed: {e}")
+            result["error"] = str(e)
+        finally:
+            self.state = "ready"
+            self.runs += 1
+
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        result["finished_at"] = datetime.utcnow().isoformat()
+        self.last_run = result
+        logger.info(f"Cache warm-up: {result['warmed']}/{result['vendors']} vendors in {result['seconds']}s")
+        return result
+
+    async def _run_forever(self):
+        while True:
+            await self.run()
+            if self.interval_minutes <= 0:
+                return
+            await asyncio.sleep(self.interval_minutes * 60)
+
+    def start(self):
+        """Start warm-up in the background on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run_forever())
+
+    async def stop(self):
+        """Cancel a running or scheduled warm-up."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def readiness(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "runs": self.runs,
+            "last_run": self.last_run,
+        }
+
+
+# Singleton instance
+cache_warmer = CacheWarmer()
@@ -0,0 +1,379 @@
+"""
+Shared state store for chat sessions, vendor bot state, usage counters and
+customer history.
+
+These used to be module-level dicts, so with several uvicorn workers a
+customer's "2" could land on a worker that never saw the product list. A
+StateStore keeps them where every worker sees them:
+
+- MemoryStateStore: this process only (a single worker, tests, local dev).
+- RedisStateStore: Redis, shared by all workers and nodes. Used when
+  STATE_BACKEND=redis, or by default when REDIS_URL is set.
+
+Records are Redis hashes of short string fields (defaults left out) and
+capped lists, so each record is one key with its own TTL and counters are
+updated in place with HINCRBY instead of read-modify-write. Every call is one
+round trip; calls that need several commands are pipelined. Async handlers use
+the *_async methods, which go through the cache's pooled asyncio client
+instead of blocking the event loop on the sync one. If Redis goes
+away, RedisStateStore carries on with a per-process MemoryStateStore until it
+is back (state written meanwhile stays on that worker), like the cache's L1
+fallback.
+"""
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Union
+
+from . import cache
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Keeps state keys apart from cache keys in a shared Redis
+KEY_PREFIX = "state:"
+# MemoryStateStore drops expired keys every this many writes
+PURGE_EVERY_WRITES = 1000
+
+Number = Union[int, float]
+
+
+def parse_number(value: Optional[str]) -> Number:
+    """Value of a counter field written by incr_field (0 if missing)."""
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class StateStore(ABC):
+    """
+    Hashes of string fields and capped lists of strings, with per-key TTLs.
+
+    ttl_seconds=None leaves a key's expiry as it is (no expiry for a new key);
+    a TTL given on a write applies to the whole key from that write on.
+    """
+
+    shared = False  # True when other workers see the same state
+
+    @abstractmethod
+    def get_fields(self, key: str) -> Dict[str, str]:
+        """All fields of a hash ({} if missing or expired)."""
+
+    @abstractmethod
+    def get_field(self, key: str, field: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def set_fields(self, key: str, fields: Dict[str, str], ttl_seconds: int = None, replace: bool = False):
+        """Set fields of a hash; replace=True drops fields not given."""
+
+    @abstractmethod
+    def incr_field(self, key: str, field: str, amount: Number = 1, ttl_seconds: int = None) -> Number:
+        """Add amount to a numeric field atomically. Returns the new value."""
+
+    @abstractmethod
+    def delete_fields(self, key: str, *fields: str) -> int:
+        ...
+
+    @abstractmethod
+    def count_fields(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def push(self, key: str, value: str, max_len: int = None, ttl_seconds: int = None):
+        """Append to a list, keeping only the last max_len items."""
+
+    @abstractmethod
+    def get_list(self, key: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    # Async variants for request handlers. Process memory answers without
+    # waiting, so by default they are the sync calls; RedisStateStore
+    # overrides them to use the pooled asyncio client.
+
+    async def get_fields_async(self, key: str) -> Dict[str, str]:
+        return self.get_fields(key)
+
+    async def get_field_async(self, key: str, field: str) -> Optional[str]:
+        return self.get_field(key, field)
+
+    async def set_fields_async(self, key: str, fields: Dict[str, str], ttl_seconds: int = None, replace: bool = False):
+        return self.set_fields(key, fields, ttl_seconds, replace)
+
+    async def incr_field_async(self, key: str, field: str, amount: Number = 1, ttl_seconds: int = None) -> Number:
+        return self.incr_field(key, field, amount, ttl_seconds)
+
+    async def delete_fields_async(self, key: str, *fields: str) -> int:
+        return self.delete_fields(key, *fields)
+
+    async def count_fields_async(self, key: str) -> int:
+        return self.count_fields(key)
+
+    async def push_async(self, key: str, value: str, max_len: int = None, ttl_seconds: int = None):
+        return self.push(key, value, max_len, ttl_seconds)
+
+    async def get_list_async(self, key: str) -> List[str]:
+        return self.get_list(key)
+
+    async def delete_async(self, key: str):
+        return self.delete(key)
+
+
+class MemoryStateStore(StateStore):
+    """State in this process, with lazy per-key expiry."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Union[dict, list]] = {}
+        self._expires: Dict[str, float] = {}
+        self._writes = 0
+
+    def _live(self, key: str, now: float = None):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= (now or time.time()):
+            self._data.pop(key, None)
+            del self._expires[key]
+        return self._data.get(key)
+
+    def _written(self, key: str, ttl_seconds: Optional[int]):
+        now = time.time()
+        if ttl_seconds is not None:
+            self._expires[key] = now + ttl_seconds
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            for expired in [k for k, at in self._expires.items() if at <= now]:
+                self._live(expired, now)
+
+    def get_fields(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._live(key) or {})
+
+    def get_field(self, key: str, field: str) -> Optional[str]:
+        with self._lock:
+            return (self._live(key) or {}).get(field)
+
+    def set_fields(self, key: str, fields: Dict[str, str], ttl_seconds: int = None, replace: bool = False):
+        with self._lock:
+            current = self._live(key)
+            if replace or current is None:
+                current = self._data[key] = {}
+            current.update(fields)
+            self._written(key, ttl_seconds)
+
+    def incr_field(self, key: str, field: str, amount: Number = 1, ttl_seconds: int = None) -> Number:
+        with self._lock:
+            current = self._live(key)
+            if current is None:
+                current = self._data[key] = {}
+            value = parse_number(current.get(field)) + amount
+            current[field] = str(value)
+            self._written(key, ttl_seconds)
+            return value
+
+    def delete_fields(self, key: str, *fields: str) -> int:
+        with self._lock:
+            current = self._live(key) or {}
+            return sum(current.pop(field, None) is not None for field in fields)
+
+    def count_fields(self, key: str) -> int:
+        with self._lock:
+            return len(self._live(key) or {})
+
+    def push(self, key: str, value: str, max_len: int = None, ttl_seconds: int = None):
+        with self._lock:
+            items = self._live(key)
+            if items is None:
+                items = self._data[key] = []
+            items.append(value)
+            if max_len is not None and len(items) > max_len:
+                del items[:-max_len]
+            self._written(key, ttl_seconds)
+
+    def get_list(self, key: str) -> List[str]:
+        with self._lock:
+            return list(self._live(key) or [])
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+
+class RedisStateStore(StateStore):
+    """State in Redis, shared by all workers; falls back to process memory while Redis is down."""
+
+    shared = True
+
+    def __init__(self, client_factory=None, async_client_factory=None):
+        self._client_factory = client_factory or cache.redis_client
+        self._async_client_factory = async_client_factory or cache.async_redis_client
+        self._fallback = MemoryStateStore()
+
+    def _run(self, action: str, op, args: tuple, convert=None):
+        """op(client) against Redis, or the same call on the fallback store."""
+        client = self._client_factory()
+        if client is not None:
+            try:
+                result = op(client)
+                return convert(result) if convert else result
+            except Exception as e:
+                cache.report_redis_error(f"state {action}", e)
+        return getattr(self._fallback, action)(*args)
+
+    async def _run_async(self, action: str, op, args: tuple, convert=None):
+        """_run() on the pooled asyncio client: op(client) returns an awaitable."""
+        client = await self._async_client_factory()
+        if client is not None:
+            try:
+                result = await op(client)
+                return convert(result) if convert else result
+            except Exception as e:
+                cache.report_redis_error(f"state {action}", e)
+        return getattr(self._fallback, action)(*args)
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return KEY_PREFIX + key
+
+    # Each command is (action, op, args, convert), shared by the sync and async calls.
+    # op only issues commands, so the same op works on either client.
+
+    def _get_fields(self, key: str):
+        return "get_fields", lambda r: r.hgetall(self._key(key)), (key,), \
+            lambda raw: {_decode(f): _decode(v) for f, v in raw.items()}
+
+    def _get_field(self, key: str, field: str):
+        return "get_field", lambda r: r.hget(self._key(key), field), (key, field), \
+            lambda raw: _decode(raw) if raw is not None else None
+
+    def _set_fields(self, key: str, fields: Dict[str, str], ttl_seconds: int, replace: bool):
+        def op(r):
+            pipe = r.pipeline()
+            if replace:
+                pipe.delete(self._key(key))
+            if fields:
+                pipe.hset(self._key(key), mapping=fields)
+            if ttl_seconds is not None:
+                pipe.expire(self._key(key), int(ttl_seconds))
+            return pipe.execute()
+        return "set_fields", op, (key, fields, ttl_seconds, replace), lambda results: None
+
+    def _incr_field(self, key: str, field: str, amount: Number, ttl_seconds: int):
+        def op(r):
+            pipe = r.pipeline()
+            if isinstance(amount, int):
+                pipe.hincrby(self._key(key), field, amount)
+            else:
+                pipe.hincrbyfloat(self._key(key), field, amount)
+            if ttl_seconds is not None:
+                pipe.expire(self._key(key), int(ttl_seconds))
+            return pipe.execute()
+        return "incr_field", op, (key, field, amount, ttl_seconds), lambda results: results[0]
+
+    def _delete_fields(self, key: str, fields: tuple):
+        return "delete_fields", lambda r: r.hdel(self._key(key), *fields), (key, *fields), None
+
+    def _count_fields(self, key: str):
+        return "count_fields", lambda r: r.hlen(self._key(key)), (key,), None
+
+    def _push(self, key: str, value: str, max_len: int, ttl_seconds: int):
+        def op(r):
+            pipe = r.pipeline()
+            pipe.rpush(self._key(key), value)
+            if max_len is not None:
+                pipe.ltrim(self._key(key), -max_len, -1)
+            if ttl_seconds is not None:
+                pipe.expire(self._key(key), int(ttl_seconds))
+            return pipe.execute()
+        return "push", op, (key, value, max_len, ttl_seconds), lambda results: None
+
+    def _get_list(self, key: str):
+        return "get_list", lambda r: r.lrange(self._key(key), 0, -1), (key,), \
+            lambda raw: [_decode(v) for v in raw]
+
+    def _delete(self, key: str):
+        return "delete", lambda r: r.delete(self._key(key)), (key,), lambda deleted: None
+
+    def get_fields(self, key: str) -> Dict[str, str]:
+        return self._run(*self._get_fields(key))
+
+    def get_field(self, key: str, field: str) -> Optional[str]:
+        return self._run(*self._get_field(key, field))
+
+    def set_fields(self, key: str, fields: Dict[str, str], ttl_seconds: int = None, replace: bool = False):
+        return self._run(*self._set_fields(key, fields, ttl_seconds, replace))
+
+    def incr_field(self, key: str, field: str, amount: Number = 1, ttl_seconds: int = None) -> Number:
+        return self._run(*self._incr_field(key, field, amount, ttl_seconds))
+
+    def delete_fields(self, key: str, *fields: str) -> int:
+        if not fields:
+            return 0
+        return self._run(*self._delete_fields(key, fields))
+
+    def count_fields(self, key: str) -> int:
+        return self._run(*self._count_fields(key))
+
+    def push(self, key: str, value: str, max_len: int = None, ttl_seconds: int = None):
+        return self._run(*self._push(key, value, max_len, ttl_seconds))
+
+    def get_list(self, key: str) -> List[str]:
+        return self._run(*self._get_list(key))
+
+    def delete(self, key: str):
+        return self._run(*self._delete(key))
+
+    async def get_fields_async(self, key: str) -> Dict[str, str]:
+        return await self._run_async(*self._get_fields(key))
+
+    async def get_field_async(self, key: str, field: str) -> Optional[str]:
+        return await self._run_async(*self._get_field(key, field))
+
+    async def set_fields_async(self, key: str, fields: Dict[str, str], ttl_seconds: int = None, replace: bool = False):
+        return await self._run_async(*self._set_fields(key, fields, ttl_seconds, replace))
+
+    async def incr_field_async(self, key: str, field: str, amount: Number = 1, ttl_seconds: int = None) -> Number:
+        return await self._run_async(*self._incr_field(key, field, amount, ttl_seconds))
+
+    async def delete_fields_async(self, key: str, *fields: str) -> int:
+        if not fields:
+            return 0
+        return await self._run_async(*self._delete_fields(key, fields))
+
+    async def count_fields_async(self, key: str) -> int:
+        return await self._run_async(*self._count_fields(key))
+
+    async def push_async(self, key: str, value: str, max_len: int = None, ttl_seconds: int = None):
+        return await self._run_async(*self._push(key, value, max_len, ttl_seconds))
+
+    async def get_list_async(self, key: str) -> List[str]:
+        return await self._run_async(*self._get_list(key))
+
+    async def delete_async(self, key: str):
+        return await self._run_async(*self._delete(key))
+
+
+def _default_store() -> StateStore:
+    backend = settings.state_backend.lower()
+    if backend == "redis" or (not backend and cache.REDIS_URL):
+        if cache.redis is None:
+            logger.warning("STATE_BACKEND is redis but the redis package isn't installed; using process memory")
+            return MemoryStateStore()
+        return RedisStateStore()
+    return MemoryStateStore()
+
+
+# Singleton instance
+state_store = _default_store()
@@ -0,0 +1,12 @@
+-- Index for the order store's "latest pending order for a customer" lookup
+-- Run this manually on Azure SQL Database (or use create_tables.py)
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_orders_customer_status_created' AND object_id = OBJECT_ID('orders'))
+BEGIN
+    CREATE INDEX ix_orders_customer_status_created ON orders(customer_phone, status, created_at DESC);
+    PRINT 'Created index: ix_orders_customer_status_created';
+END
+ELSE
+BEGIN
+    PRINT 'Index already exists: ix_orders_customer_status_created';
+END
@@ -0,0 +1,12 @@
+-- Index for keyset pagination of GET /orders: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+-- Run this manually on Azure SQL Database (or use create_tables.py)
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'ix_orders_user_created_id' AND object_id = OBJECT_ID('orders'))
+BEGIN
+    CREATE INDEX ix_orders_user_created_id ON orders(user_id, created_at DESC, id DESC);
+    PRINT 'Created index: ix_orders_user_created_id';
+END
+ELSE
+BEGIN
+    PRINT 'Index already exists: ix_orders_user_created_id';
+END
@@ -0,0 +1,25 @@
+-- Create daily_vendor_rollup table: per-vendor, per-day sales and expenses for profit/loss reports
+-- Run this manually on Azure SQL Database (or use create_tables.py),
+-- then fill it from existing orders and expenses: python scripts/backfill_daily_rollup.py
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'daily_vendor_rollup')
+BEGIN
+    CREATE TABLE daily_vendor_rollup (
+        user_id NVARCHAR(36) NOT NULL,
+        day DATE NOT NULL,
+        order_count INT NOT NULL DEFAULT 0,  -- paid or fulfilled orders created that day
+        revenue FLOAT NOT NULL DEFAULT 0,
+        expenses FLOAT NOT NULL DEFAULT 0,
+        expense_breakdown NVARCHAR(MAX) NULL,  -- JSON {category: amount}
+        updated_at DATETIME DEFAULT GETUTCDATE(),
+        
+        CONSTRAINT PK_daily_vendor_rollup PRIMARY KEY (user_id, day),
+        CONSTRAINT FK_daily_vendor_rollup_users FOREIGN KEY (user_id) REFERENCES users(id)
+    );
+    
+    PRINT 'Daily vendor rollup table created successfully';
+END
+ELSE
+BEGIN
+    PRINT 'Daily vendor rollup table already exists';
+END
@@ -0,0 +1,27 @@
+-- Create idempotency_keys table: claimed Idempotency-Key headers and webhook event/message IDs with their stored responses
+-- Run this manually on Azure SQL Database (or use create_tables.py)
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'idempotency_keys')
+BEGIN
+    CREATE TABLE idempotency_keys (
+        scope NVARCHAR(50) NOT NULL,  -- endpoint, e.g. 'orders', 'paystack'
+        [key] NVARCHAR(255) NOT NULL,  -- Idempotency-Key header or provider event/message ID
+        fingerprint NVARCHAR(64) NULL,  -- SHA-256 of the request payload
+        status NVARCHAR(20) NOT NULL DEFAULT 'processing',
+        response NVARCHAR(MAX) NULL,  -- JSON response body, once completed
+        created_at DATETIME DEFAULT GETUTCDATE(),
+        expires_at DATETIME NOT NULL,
+        
+        CONSTRAINT PK_idempotency_keys PRIMARY KEY (scope, [key]),
+        CONSTRAINT check_idempotency_key_status CHECK (status IN ('processing', 'completed'))
+    );
+    
+    -- Background purge of expired keys
+    CREATE INDEX ix_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+    
+    PRINT 'Idempotency keys table created successfully';
+END
+ELSE
+BEGIN
+    PRINT 'Idempotency keys table already exists';
+END
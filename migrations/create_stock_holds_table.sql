@@ -0,0 +1,34 @@
+-- Create stock_holds table: TTL stock holds for unpaid chatbot orders
+-- Run this manually on Azure SQL Database (or use create_tables.py)
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'stock_holds')
+BEGIN
+    CREATE TABLE stock_holds (
+        id NVARCHAR(36) PRIMARY KEY,
+        user_id NVARCHAR(36) NOT NULL,
+        order_id NVARCHAR(36) NOT NULL,
+        product_id NVARCHAR(36) NOT NULL,
+        quantity INT NOT NULL,
+        status NVARCHAR(20) NOT NULL DEFAULT 'active',  -- active, committed, released
+        expires_at DATETIME NOT NULL,
+        created_at DATETIME DEFAULT GETUTCDATE(),
+        resolved_at DATETIME NULL,
+        
+        CONSTRAINT FK_stock_holds_users FOREIGN KEY (user_id) REFERENCES users(id),
+        CONSTRAINT FK_stock_holds_products FOREIGN KEY (product_id) REFERENCES products(id),
+        CONSTRAINT check_stock_hold_status CHECK (status IN ('active', 'committed', 'released'))
+    );
+    
+    CREATE INDEX IX_stock_holds_user_id ON stock_holds(user_id);
+    CREATE INDEX IX_stock_holds_order_id ON stock_holds(order_id);
+    -- Sweeper releases expired holds in bulk
+    CREATE INDEX ix_stock_holds_status_expires ON stock_holds(status, expires_at);
+    -- Availability check sums active holds per product
+    CREATE INDEX ix_stock_holds_product_status ON stock_holds(product_id, status);
+    
+    PRINT 'Stock holds table created successfully';
+END
+ELSE
+BEGIN
+    PRINT 'Stock holds table already exists';
+END
@@ -0,0 +1,31 @@
+-- Create vendor_counters table: per-vendor order and stock counters for /dashboard/summary and /widget/stats
+-- Run this manually on Azure SQL Database (or use create_tables.py)
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'vendor_counters')
+BEGIN
+    CREATE TABLE vendor_counters (
+        user_id NVARCHAR(36) PRIMARY KEY,
+        pending_orders INT NOT NULL DEFAULT 0,
+        paid_orders INT NOT NULL DEFAULT 0,
+        fulfilled_orders INT NOT NULL DEFAULT 0,
+        cancelled_orders INT NOT NULL DEFAULT 0,
+        total_orders INT NOT NULL DEFAULT 0,
+        total_revenue FLOAT NOT NULL DEFAULT 0,  -- paid + fulfilled
+        unique_customers INT NOT NULL DEFAULT 0,
+        product_count INT NOT NULL DEFAULT 0,
+        low_stock_count INT NOT NULL DEFAULT 0,
+        counters_day DATE NULL,  -- UTC day orders_today / revenue_today belong to
+        orders_today INT NOT NULL DEFAULT 0,
+        revenue_today FLOAT NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT GETUTCDATE(),
+        reconciled_at DATETIME NULL,
+        
+        CONSTRAINT FK_vendor_counters_users FOREIGN KEY (user_id) REFERENCES users(id)
+    );
+    
+    PRINT 'Vendor counters table created successfully';
+END
+ELSE
+BEGIN
+    PRINT 'Vendor counters table already exists';
+END
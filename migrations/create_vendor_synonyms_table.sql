@@ -0,0 +1,25 @@
+-- Create vendor_synonyms table for per-vendor custom search synonyms
+-- Run this manually on Azure SQL Database (or use create_tables.py)
+
+IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'vendor_synonyms')
+BEGIN
+    CREATE TABLE vendor_synonyms (
+        id NVARCHAR(36) PRIMARY KEY,
+        user_id NVARCHAR(36) NOT NULL,
+        term NVARCHAR(100) NOT NULL,
+        synonyms NVARCHAR(MAX) NOT NULL,  -- JSON list of strings
+        created_at DATETIME DEFAULT GETUTCDATE(),
+        updated_at DATETIME DEFAULT GETUTCDATE(),
+        
+        CONSTRAINT FK_vendor_synonyms_users FOREIGN KEY (user_id) REFERENCES users(id),
+        CONSTRAINT uq_vendor_synonyms_user_term UNIQUE (user_id, term)
+    );
+    
+    CREATE INDEX IX_vendor_synonyms_user_id ON vendor_synonyms(user_id);
+    
+    PRINT 'Vendor synonyms table created successfully';
+END
+ELSE
+BEGIN
+    PRINT 'Vendor synonyms table already exists';
+END
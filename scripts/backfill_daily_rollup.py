@@ -0,0 +1,72 @@
+"""
+Backfill: rebuild daily_vendor_rollup from the orders and expenses tables.
+
+Run once after creating the table (migrations/create_daily_vendor_rollup_table.sql),
+and again for a vendor or date range if the rollup ever needs repair. Works one
+vendor at a time and commits after each, so it can be stopped and re-run safely.
+
+Usage:
+    python scripts/backfill_daily_rollup.py [--vendor VENDOR_ID] [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+"""
+import argparse
+import os
+import sys
+from datetime import date
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatbot.models import Expense, Order
+from chatbot.services.sales_rollup import sales_rollup
+
+
+def backfill(session_factory, vendor_id: str = None, start: date = None, end: date = None) -> dict:
+    """
+    Rebuild rollup rows for one vendor or every vendor with orders or expenses.
+
+    Returns:
+        {vendor_id: rows written}
+    """
+    db = session_factory()
+    try:
+        if vendor_id:
+            vendor_ids = [vendor_id]
+        else:
+            vendor_ids = sorted({
+                str(user_id) for model in (Order, Expense) for (user_id,) in db.query(model.user_id).distinct()
+            })
+    finally:
+        db.close()
+
+    written = {}
+    for vid in vendor_ids:
+        db = session_factory()
+        try:
+            written[vid] = sales_rollup.rebuild(db, vid, start, end)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the daily per-vendor sales rollup")
+    parser.add_argument("--vendor", help="Only this vendor (default: all)")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day to rebuild (default: all time)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day to rebuild (default: all time)")
+    args = parser.parse_args()
+
+    from chatbot.database import SessionLocal
+
+    print("📊 Rebuilding daily_vendor_rollup...")
+    written = backfill(SessionLocal, args.vendor, args.start, args.end)
+    for vid, rows in written.items():
+        print(f"  {vid}: {rows} day(s)")
+    print(f"✅ {len(written)} vendor(s), {sum(written.values())} rollup row(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: blocking sync queries vs the async request path.
+
+Fires CONCURRENCY simultaneous requests at versions of the same endpoint:
+one calling InventoryManager.get_product_by_id() (sync session on the event
+loop, the old pattern), and ones awaiting get_product_by_id_async() through
+each path run_db can take: a worker thread (async driver not installed) and
+the native async engine (run_sync on an AsyncSession). Prints requests/s.
+
+By default it runs against a local SQLite file (the async engine through
+aiosqlite) with LATENCY_MS of simulated network round trip added to every
+statement, inside the driver's own thread as a real round trip would be, so
+it needs no database server. Set KOFA_BENCH_REAL_DB=1 to use the configured
+MySQL/SQL Server (aiomysql/aioodbc) instead.
+
+Usage:
+    python scripts/bench_async_db.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+REAL_DB = os.getenv("KOFA_BENCH_REAL_DB") == "1"
+if not REAL_DB:
+    # chatbot.database requires credentials at import; they're unused with SQLite
+    os.environ.setdefault("MYSQL_USER", "bench")
+    os.environ.setdefault("MYSQL_PASSWORD", "bench")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from chatbot import database, inventory
+from chatbot.inventory import InventoryManager, DEFAULT_USER_ID
+from chatbot.models import Base, Product as ProductModel, User as UserModel
+
+LATENCY_MS = 20
+CONCURRENCY = 100
+PRODUCT_ID = "bench-product"
+
+
+def _sleep_per_statement(statement):
+    time.sleep(LATENCY_MS / 1000)
+
+
+def use_sqlite_with_latency():
+    """Point both session factories at one SQLite file and add a fake network round trip."""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=20,
+        max_overflow=CONCURRENCY
+    )
+
+    # The trace callback runs in whichever thread executes the statement
+    @event.listens_for(engine, "connect")
+    def _network_latency(dbapi_connection, connection_record):
+        dbapi_connection.set_trace_callback(_sleep_per_statement)
+
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id=PRODUCT_ID, user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=10))
+    db.commit()
+    db.close()
+
+    database.SessionLocal = factory
+    inventory.SessionLocal = factory
+    database.AsyncSessionLocal = None
+
+    try:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        import aiosqlite  # noqa: F401
+        import greenlet  # noqa: F401
+    except ImportError as e:
+        print(f"Native async path skipped ({e}); pip install aiosqlite greenlet\n")
+        return None
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=20, max_overflow=CONCURRENCY)
+
+    # aiosqlite runs each connection's statements in its own thread
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _async_network_latency(dbapi_connection, connection_record):
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(_sleep_per_statement))
+
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    manager = InventoryManager()
+
+    @app.get("/sync/{product_id}")
+    async def blocking(product_id: str):
+        return manager.get_product_by_id(product_id)
+
+    @app.get("/async/{product_id}")
+    async def non_blocking(product_id: str):
+        return await manager.get_product_by_id_async(product_id)
+
+    return app
+
+
+async def run(client: httpx.AsyncClient, path: str) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.get(path) for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses)
+    return elapsed
+
+
+async def main():
+    if REAL_DB:
+        async_factory = database.AsyncSessionLocal
+        database.AsyncSessionLocal = None
+    else:
+        async_factory = use_sqlite_with_latency()
+
+    modes = [("thread pool", None)]
+    if async_factory is not None:
+        modes.append(("async engine", async_factory))
+
+    transport = httpx.ASGITransport(app=make_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up pools
+        await client.get(f"/sync/{PRODUCT_ID}")
+        sync_s = await run(client, f"/sync/{PRODUCT_ID}")
+
+        results = []
+        for label, factory in modes:
+            database.AsyncSessionLocal = factory
+            await client.get(f"/async/{PRODUCT_ID}")
+            results.append((label, await run(client, f"/async/{PRODUCT_ID}")))
+
+    print(f"{CONCURRENCY} concurrent requests, "
+          f"{'configured database' if REAL_DB else f'SQLite + {LATENCY_MS}ms simulated latency'}\n")
+    print(f"{'path':<28}{'total (s)':>12}{'req/s':>12}{'speedup':>10}")
+    print(f"{'sync session on event loop':<28}{sync_s:>12.3f}{CONCURRENCY / sync_s:>12,.0f}{'1.0x':>10}")
+    for label, elapsed in results:
+        print(f"{'async (' + label + ')':<28}{elapsed:>12.3f}{CONCURRENCY / elapsed:>12,.0f}{sync_s / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Benchmark: Business AI prompt size after 50 turns, by history strategy.
+
+- all turns: every message resent (history that is never trimmed)
+- last 10 messages: a fixed message window, whatever their length
+- token budget: BusinessAIMemory (recent window within the token budget plus
+  a rolling summary of older turns)
+
+Owner messages are short commands; assistant replies are reports of a few
+hundred characters, like the real ones. Tokens are the local estimate
+(~4 characters per token). The memory's own cost per turn (load + record
+through an in-memory state store) is timed too.
+
+With GROQ_API_KEY set, the turn-50 prompt of each strategy is also sent to
+Groq (LIVE_CALLS times each) and the median round trip reported, since model
+latency grows with prompt tokens.
+
+Usage:
+    python scripts/bench_business_ai_history.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("MYSQL_USER", "bench")
+os.environ.setdefault("MYSQL_PASSWORD", "bench")
+
+from chatbot.ai_brain import BUSINESS_AI_PROMPT
+from chatbot.services.business_ai_memory import BusinessAIMemory, estimate_tokens
+from chatbot.state_store import MemoryStateStore
+
+TURNS = 50
+REPORT_AT = (1, 10, 25, 50)
+LIVE_CALLS = 3
+
+
+def turn(i: int):
+    owner = f"How did product {i % 7} sell this week, and what should I restock?"
+    reply = (
+        f"Sales report for product {i % 7}: 14 units sold this week for ₦70,000, up 12% on last week. "
+        "Stock is down to 6 units, below your threshold of 10. Top buyers were repeat customers from Lagos. "
+        "I recommend restocking 30 units before the weekend, when orders usually peak. "
+        "Your other fast movers are red sneakers and canvas bags; both have more than 20 units left."
+    )
+    return owner, reply
+
+
+def tokens(messages) -> int:
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+def main():
+    memory = BusinessAIMemory(store=MemoryStateStore())
+    everything = []
+    system_tokens = estimate_tokens(BUSINESS_AI_PROMPT)
+    prompts = {}
+    overhead = []
+
+    print(f"Prompt tokens before the new message (system prompt of {system_tokens} not included)\n")
+    print(f"{'turn':>5}{'all turns':>12}{'last 10 msgs':>15}{'token budget':>15}")
+    for i in range(1, TURNS + 1):
+        strategies = {
+            "all turns": list(everything),
+            "last 10 messages": everything[-10:],
+        }
+        start = time.perf_counter()
+        strategies["token budget"] = memory.get_messages("bench")
+        owner, reply = turn(i)
+        memory.record("bench", owner, reply)
+        overhead.append(time.perf_counter() - start)
+        everything += [{"role": "user", "content": owner}, {"role": "assistant", "content": reply}]
+
+        if i in REPORT_AT:
+            sizes = [tokens(m) for m in strategies.values()]
+            print(f"{i:>5}{sizes[0]:>12,}{sizes[1]:>15,}{sizes[2]:>15,}")
+        prompts = strategies
+
+    print(f"\nmemory load + record: {statistics.median(overhead) * 1e6:.0f} µs median per turn")
+    print(f"turn {TURNS} prompt vs all turns: {tokens(prompts['all turns']) / tokens(prompts['token budget']):.1f}x smaller")
+
+    if os.getenv("GROQ_API_KEY"):
+        from chatbot.groq_client import send_to_groq
+
+        async def timed(messages):
+            start = time.perf_counter()
+            await send_to_groq(messages + [{"role": "user", "content": "Summarise my week."}],
+                               system_prompt=BUSINESS_AI_PROMPT, max_tokens=200, temperature=0.3)
+            return time.perf_counter() - start
+
+        print(f"\nGroq round trip at turn {TURNS} (median of {LIVE_CALLS}):")
+        for name, messages in prompts.items():
+            latencies = [asyncio.run(timed(messages)) for _ in range(LIVE_CALLS)]
+            print(f"  {name:<18}{statistics.median(latencies) * 1000:>8.0f} ms")
+    else:
+        print("\nSet GROQ_API_KEY to also time Groq round trips.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark: cache value codecs on a 5k-product catalog.
+
+Encodes and decodes a PRODUCTS-item product list (the shape list_products
+returns) with the old json.dumps/json.loads path and each available codec,
+and prints best-of-RUNS times and the stored size. With REDIS_URL set it also
+writes each encoding to Redis and reports MEMORY USAGE for the key.
+
+Usage:
+    python scripts/bench_cache_codec.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatbot import cache_codec
+from chatbot.cache_codec import CacheCodec
+
+PRODUCTS = 5000
+RUNS = 20
+
+WORDS = ["red", "blue", "canvas", "leather", "sneakers", "bag", "ankara", "gown", "shirt",
+         "wrist", "watch", "perfume", "oud", "rice", "50kg", "phone", "case", "charger"]
+CATEGORIES = ["Footwear", "Fashion", "Accessories", "Beauty", "Groceries", "Electronics"]
+
+
+def build_catalog():
+    random.seed(42)
+    catalog = []
+    for i in range(PRODUCTS):
+        name = " ".join(random.sample(WORDS, 3)).title()
+        catalog.append({
+            "id": f"{random.getrandbits(128):032x}",
+            "name": name,
+            "price_ngn": float(random.randint(500, 250000)),
+            "stock_level": random.randint(0, 200),
+            "voice_tags": random.sample(WORDS, 2),
+            "description": f"{name} - " + " ".join(random.choices(WORDS, k=12)),
+            "category": random.choice(CATEGORIES),
+            "image_url": f"https://shop.example/blobs/{random.getrandbits(256):064x}.jpg"
+        })
+    return catalog
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def codecs():
+    yield "json (old)", lambda v: json.dumps(v, default=str), json.loads
+    serializers = ["json"] + [name for name in ("orjson", "msgpack") if getattr(cache_codec, name) is not None]
+    compressions = ["none", "zlib"] + (["zstd"] if cache_codec.zstandard is not None else [])
+    for serializer in serializers:
+        for compression in compressions:
+            codec = CacheCodec(serializer, compression)
+            yield f"{serializer}+{compression}", codec.encode, codec.decode
+
+
+def redis_client():
+    url = os.getenv("REDIS_URL")
+    if not url:
+        return None
+    import redis
+    client = redis.from_url(url)
+    client.ping()
+    return client
+
+
+def main():
+    catalog = build_catalog()
+    client = redis_client()
+
+    print(f"{PRODUCTS} products, best of {RUNS} runs\n")
+    header = f"{'codec':<18}{'encode (ms)':>13}{'decode (ms)':>13}{'bytes':>13}"
+    print(header + (f"{'redis memory':>15}" if client else ""))
+
+    baseline = None
+    for name, encode, decode in codecs():
+        raw = encode(catalog)
+        assert decode(raw) == catalog
+        encode_s = best_of(lambda: encode(catalog))
+        decode_s = best_of(lambda: decode(raw))
+        size = len(raw)
+        line = f"{name:<18}{encode_s * 1000:>13.2f}{decode_s * 1000:>13.2f}{size:>13,}"
+        if client:
+            key = f"bench:codec:{name}"
+            client.set(key, raw)
+            line += f"{client.memory_usage(key):>15,}"
+            client.delete(key)
+        print(line)
+        if baseline is None:
+            baseline = (encode_s + decode_s, size)
+    default = CacheCodec()
+    raw = default.encode(catalog)
+    total_s = best_of(lambda: default.encode(catalog)) + best_of(lambda: default.decode(raw))
+    print(f"\ndefault ({default.serializer}+{default.compression}): "
+          f"{baseline[0] / total_s:.1f}x faster round trip, {baseline[1] / len(raw):.1f}x smaller than json")
+
+
+if __name__ == "__main__":
+    main()
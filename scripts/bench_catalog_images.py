@@ -0,0 +1,94 @@
+"""
+Benchmark: catalog load with inline base64 images vs blob-store URLs.
+
+Builds a SQLite catalog of PRODUCTS products, IMAGE_SHARE of them with an
+IMAGE_KB image stored the old way (data: URL in products.image_url), times a
+full catalog load (the query behind list_products / get_products) and measures
+the bytes it moves. Then runs the blob-store migration and measures again.
+
+Usage:
+    python scripts/bench_catalog_images.py
+"""
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# chatbot.database requires credentials at import; they're unused with SQLite
+os.environ.setdefault("MYSQL_USER", "bench")
+os.environ.setdefault("MYSQL_PASSWORD", "bench")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from chatbot import inventory
+from chatbot.inventory import InventoryManager, DEFAULT_USER_ID
+from chatbot.models import Base, Product, User
+from chatbot.services.blob_store import BlobStore, LocalBlobBackend
+from migrate_images_to_blob_store import migrate_images
+
+PRODUCTS = 500
+IMAGE_SHARE = 0.6
+IMAGE_KB = 150
+RUNS = 5
+
+
+def build_catalog(factory):
+    random.seed(42)
+    db = factory()
+    db.add(User(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    for i in range(PRODUCTS):
+        image_url = None
+        if random.random() < IMAGE_SHARE:
+            image = random.randbytes(IMAGE_KB * 1024)
+            image_url = f"data:image/jpeg;base64,{base64.b64encode(image).decode()}"
+        db.add(Product(
+            id=f"product-{i:05d}", user_id=DEFAULT_USER_ID, name=f"Product {i}",
+            price_ngn=1000 + i, stock_level=10, image_url=image_url
+        ))
+    db.commit()
+    db.close()
+
+
+def measure(manager: InventoryManager):
+    """Best-of-RUNS catalog load time and the JSON bytes of the result."""
+    best = float("inf")
+    products = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        products = manager._load_catalog()
+        best = min(best, time.perf_counter() - start)
+    return best, len(json.dumps(products, default=str).encode())
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    inventory.SessionLocal = factory
+    build_catalog(factory)
+
+    manager = InventoryManager()
+    before_s, before_bytes = measure(manager)
+
+    store = BlobStore(LocalBlobBackend(os.path.join(workdir, "blobs"), "https://shop.example/blobs"))
+    stats = asyncio.run(migrate_images(factory, store))
+
+    after_s, after_bytes = measure(manager)
+
+    print(f"{PRODUCTS} products, {stats['migrated']} with {IMAGE_KB} KB images\n")
+    print(f"{'catalog load':<24}{'time (ms)':>12}{'bytes':>16}")
+    print(f"{'inline base64':<24}{before_s * 1000:>12.1f}{before_bytes:>16,}")
+    print(f"{'blob-store URLs':<24}{after_s * 1000:>12.1f}{after_bytes:>16,}")
+    print(f"\n{before_s / after_s:.1f}x faster, {before_bytes / after_bytes:.0f}x fewer bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: memory of 1M chat sessions, old ConversationState vs the compact one.
+
+Every session has searched once and got LIST_SIZE products back, the common
+case after "show me sneakers". The old state kept full product dicts
+(description, tags, image URL) per session. Search results are loaded from
+the database per search, so every session gets fresh dicts and strings even
+when it looks at the same products as another (5,000 distinct products here).
+Inline base64 images are left out of the old figures, which would otherwise
+add tens of KB per product.
+
+The old state is measured on SAMPLE sessions and scaled to SESSIONS, since
+1M of them don't fit in memory on most machines. The compact state is
+measured at the full SESSIONS, through ConversationManager.
+
+Usage:
+    python scripts/bench_conversation_memory.py
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatbot.conversation import ConversationManager
+
+SESSIONS = 1_000_000
+SAMPLE = 50_000
+LIST_SIZE = 3
+
+
+def make_products(session: int) -> list:
+    return [
+        {
+            "id": f"{session % 5000:08d}-0000-0000-0000-{i:012d}",
+            "name": f"Red Canvas Sneakers {i}",
+            "price_ngn": 15000 + i * 500,
+            "stock_level": 4,
+            "description": "Lightweight canvas sneakers, unisex, sizes 38-45. Free delivery in Lagos.",
+            "category": "Footwear",
+            "voice_tags": ["kicks", "canvas", "sneakers"],
+            "image_url": f"/blobs/{session % 5000:064x}.jpg"
+        }
+        for i in range(LIST_SIZE)
+    ]
+
+
+class LegacyConversationState:
+    """ConversationState before it was made compact."""
+
+    def __init__(self):
+        self.last_products = []
+        self.current_product = None
+        self.awaiting_selection = False
+        self.last_query = ""
+        self.pending_order_id = None
+        self.last_updated = datetime.now()
+
+    def set_products(self, products, query):
+        self.last_products = products
+        self.last_query = query
+        self.awaiting_selection = len(products) > 1
+        self.current_product = products[0] if len(products) == 1 else None
+        self.last_updated = datetime.now()
+
+
+def measure(fill, sessions: int):
+    """Bytes allocated by fill(sessions) and the time it took."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = fill(sessions)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    gc.collect()
+    return size, elapsed
+
+
+def fill_legacy(sessions: int):
+    states = {}
+    for n in range(sessions):
+        state = states[f"+234810{n:07d}"] = LegacyConversationState()
+        state.set_products(make_products(n), "sneakers")
+    return states
+
+
+def fill_compact(sessions: int):
+    manager = ConversationManager(ttl_minutes=30, max_sessions=sessions)
+    for n in range(sessions):
+        manager.get_state(f"+234810{n:07d}").set_products(make_products(n), "sneakers")
+    return manager
+
+
+def main():
+    legacy_bytes, legacy_s = measure(fill_legacy, SAMPLE)
+    compact_bytes, compact_s = measure(fill_compact, SESSIONS)
+
+    legacy_per = legacy_bytes / SAMPLE
+    compact_per = compact_bytes / SESSIONS
+    print(f"{SESSIONS:,} sessions, {LIST_SIZE} products each (legacy measured on {SAMPLE:,} and scaled)\n")
+    print(f"{'state':<12}{'bytes/session':>15}{'total (MB)':>13}{'fill (s)':>11}")
+    print(f"{'legacy':<12}{legacy_per:>15,.0f}{legacy_per * SESSIONS / 2**20:>13,.0f}"
+          f"{legacy_s * SESSIONS / SAMPLE:>11.1f}")
+    print(f"{'compact':<12}{compact_per:>15,.0f}{compact_bytes / 2**20:>13,.0f}{compact_s:>11.1f}")
+    print(f"\n{legacy_per / compact_per:.1f}x less memory per session")
+
+    cap = 200_000
+    manager = ConversationManager(ttl_minutes=30, max_sessions=cap)
+    for n in range(SESSIONS):
+        manager.get_state(f"+234810{n:07d}")
+    print(f"with max_sessions={cap:,}: {len(manager):,} sessions held, {manager.stats()['evicted']['capacity']:,} evicted")
+
+
+if __name__ == "__main__":
+    main()
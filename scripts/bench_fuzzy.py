@@ -0,0 +1,58 @@
+"""
+Benchmark: per-pair fuzzywuzzy vs batch fuzzy scoring.
+
+Scores one customer query against 1k, 10k and 100k product names, the way
+smart_search_products (partial_ratio) and find_product_by_selection (ratio)
+do, and prints throughput for each engine.
+
+Usage:
+    python scripts/bench_fuzzy.py
+"""
+import os
+import random
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fuzzywuzzy import fuzz
+
+from chatbot.fuzzy import partial_ratio_scores, ratio_scores
+
+ADJECTIVES = ["red", "blue", "black", "white", "gold", "green", "leather", "canvas", "nike", "polo"]
+NOUNS = ["sneakers", "shoes", "shirt", "bag", "jeans", "charger", "wallet", "chain", "glasses", "trouser"]
+QUERY = "red sneekers"
+SIZES = [1_000, 10_000, 100_000]
+
+
+def make_names(n: int) -> list:
+    random.seed(42)
+    return [f"{random.choice(ADJECTIVES)} {random.choice(NOUNS)} {i}" for i in range(n)]
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"Query: {QUERY!r}\n")
+    print(f"{'scorer':<14}{'names':>9}{'per-pair (s)':>14}{'batch (s)':>12}{'batch x4 (s)':>14}"
+          f"{'per-pair /s':>14}{'batch /s':>14}{'speedup':>9}")
+    for scorer_name, per_pair, batch in (
+        ("ratio", fuzz.ratio, ratio_scores),
+        ("partial_ratio", fuzz.partial_ratio, partial_ratio_scores),
+    ):
+        for n in SIZES:
+            names = make_names(n)
+            loop_s = timed(lambda: [per_pair(QUERY, name) for name in names])
+            batch_s = timed(lambda: batch(QUERY, names))
+            parallel_s = timed(lambda: batch(QUERY, names, workers=4))
+            print(f"{scorer_name:<14}{n:>9,}{loop_s:>14.4f}{batch_s:>12.4f}{parallel_s:>14.4f}"
+                  f"{n / loop_s:>14,.0f}{n / batch_s:>14,.0f}{loop_s / batch_s:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: IntentRecognizer.recognize, per-list keyword matching vs the
+keyword automaton and keyword index.
+
+The legacy recognizer tests each keyword list in priority order, with a
+substring test per keyword and a batch fuzz.ratio of every word against the
+list. The current one finds every exact match in one automaton pass and
+looks each distinct word up once in the BK-tree keyword index.
+
+Messages are built from a customer vocabulary with one in four words
+misspelt, so words repeat as in real traffic; "unseen words" uses random
+letters, so every word is a first lookup. Both recognizers are checked to
+return the same intents.
+
+Usage:
+    python scripts/bench_intent.py
+"""
+import os
+import random
+import string
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatbot.intent import Intent, IntentRecognizer
+
+MESSAGES = 20_000
+VOCABULARY = (
+    "hello hi good morning how much price cost do you have available stock in get abeg you get "
+    "I paid transferred my order where is delivery tracking yes okay buy send link help what can "
+    "red blue black white sneakers canvas shoes bag jeans shirt charger polo size 42 43 for me please "
+    "the a of is it still wan want make I pay una dey sell"
+).split()
+
+
+class LegacyIntentRecognizer(IntentRecognizer):
+    """recognize() as it was: one substring and fuzzy pass per keyword list."""
+
+    def recognize(self, message: str) -> Intent:
+        m = message.lower().strip()
+        has_product_mention = any(word in m for word in self.PRODUCT_INDICATORS)
+        if any(q in m for q in self.HOW_QUESTIONS) or self._matches_keywords(m, self.HELP_KEYWORDS):
+            if not any(word in m for word in self.CONFIRMATION_WORDS):
+                return Intent.HELP
+        if any(signal in m for signal in self.CLEAR_PURCHASE_SIGNALS):
+            return Intent.PURCHASE
+        if ('i want' in m or 'i wan' in m) and 'buy' in m:
+            return Intent.PURCHASE
+        for intent, keywords in (
+            (Intent.PRICE_INQUIRY, self.PRICE_KEYWORDS),
+            (Intent.AVAILABILITY_CHECK, self.AVAILABILITY_KEYWORDS),
+            (Intent.PAYMENT_CONFIRMATION, self.PAYMENT_CONFIRMATION_KEYWORDS),
+            (Intent.ORDER_STATUS, self.ORDER_STATUS_KEYWORDS),
+        ):
+            if self._matches_keywords(m, keywords):
+                return intent
+        if self._matches_keywords(m, self.GREETING_KEYWORDS):
+            return Intent.AVAILABILITY_CHECK if has_product_mention else Intent.GREETING
+        return Intent.UNKNOWN
+
+
+def misspell(word: str) -> str:
+    if len(word) < 4 or random.random() > 0.25:
+        return word
+    i = random.randrange(len(word))
+    return word[:i] + word[i + 1:]
+
+
+def customer_messages(n: int) -> list:
+    random.seed(42)
+    return [" ".join(misspell(random.choice(VOCABULARY)) for _ in range(random.randint(1, 8))) for _ in range(n)]
+
+
+def unseen_messages(n: int) -> list:
+    random.seed(7)
+    return [
+        " ".join("".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(random.randint(1, 8)))
+        for _ in range(n)
+    ]
+
+
+def per_message_us(recognizer, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        recognizer.recognize(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    print(f"{'messages':<16}{'legacy (us)':>13}{'automaton (us)':>16}{'speedup':>9}")
+    for label, messages in (("customer", customer_messages(MESSAGES)), ("unseen words", unseen_messages(MESSAGES // 4))):
+        legacy, current = LegacyIntentRecognizer(), IntentRecognizer()
+        assert all(legacy.recognize(m) == current.recognize(m) for m in messages[:2000])
+        current = IntentRecognizer()  # start with an empty word cache
+        legacy_us, current_us = per_message_us(legacy, messages), per_message_us(current, messages)
+        print(f"{label:<16}{legacy_us:>13.1f}{current_us:>16.1f}{legacy_us / current_us:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
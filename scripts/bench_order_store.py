@@ -0,0 +1,178 @@
+"""
+Benchmark: order lookups with ORDERS-order linear scans vs the indexed order store.
+
+Fills the old ORDERS_STORE dict and the OrderStore with the same ORDERS orders
+(CUSTOMERS customers, DAYS days of history) and times the three hot paths:
+"I paid" (latest pending order for a customer), /dashboard/summary (counts and
+revenue by status) and /widget/stats (today's paid orders). Then writes the
+orders to SQLite and times the database fallback for a customer whose order
+isn't in memory, with and without the (customer_phone, status, created_at) index.
+
+Usage:
+    python scripts/bench_order_store.py
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# chatbot.database requires credentials at import; they're unused with SQLite
+os.environ.setdefault("MYSQL_USER", "bench")
+os.environ.setdefault("MYSQL_PASSWORD", "bench")
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from chatbot import database
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.models import Base, Order, User
+from chatbot.services.order_store import OrderStore
+
+ORDERS = 100_000
+CUSTOMERS = 20_000
+DAYS = 90
+LOOKUPS = 1000
+RUNS = 5
+
+
+def build_orders():
+    random.seed(42)
+    now = datetime.utcnow()
+    orders = []
+    for i in range(ORDERS):
+        created_at = now - timedelta(seconds=random.randint(0, DAYS * 86400))
+        amount = float(random.randint(1000, 100000))
+        orders.append({
+            "id": f"{i:08X}",
+            "customer_phone": f"+234810{random.randrange(CUSTOMERS):07d}",
+            "items": [],
+            "total_amount": amount,
+            "status": random.choices(["pending", "paid", "fulfilled", "cancelled"], [10, 30, 55, 5])[0],
+            "payment_ref": None,
+            "created_at": created_at.isoformat()
+        })
+    orders.sort(key=lambda o: o["created_at"])
+    return orders
+
+
+def best_of(fn):
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# ---------- the old ORDERS_STORE code paths ----------
+
+def scan_pending(orders_store, customer):
+    for oid, o in orders_store.items():
+        if o.get("customer_phone") == customer and o.get("status") == "pending":
+            return o
+    return None
+
+
+def scan_dashboard(orders_store):
+    pending = sum(1 for o in orders_store.values() if o.get("status") == "pending")
+    paid = sum(1 for o in orders_store.values() if o.get("status") == "paid")
+    fulfilled = sum(1 for o in orders_store.values() if o.get("status") == "fulfilled")
+    revenue = sum(o.get("total_amount", 0) for o in orders_store.values() if o.get("status") in ["paid", "fulfilled"])
+    return pending, paid, fulfilled, revenue
+
+
+def scan_widget(orders_store):
+    today = datetime.utcnow().date().isoformat()
+    return [
+        o for o in orders_store.values()
+        if o.get("created_at", "").startswith(today) and o.get("status") in ["paid", "fulfilled"]
+    ]
+
+
+# ---------- the order store ----------
+
+def store_dashboard(store):
+    return store.count("pending"), store.count("paid"), store.count("fulfilled"), store.revenue(["paid", "fulfilled"])
+
+
+def store_widget(store):
+    return store.created_on(datetime.utcnow().date(), statuses=["paid", "fulfilled"])
+
+
+def build_database(orders, workdir, with_index):
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, f'bench_{with_index}.db')}")
+    Base.metadata.create_all(engine)
+    if not with_index:
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_orders_customer_status_created"))
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": DEFAULT_USER_ID, "phone": "+2348000000000"}])
+        conn.execute(insert(Order), [{
+            "id": o["id"], "user_id": DEFAULT_USER_ID, "customer_phone": o["customer_phone"],
+            "total_amount": o["total_amount"], "status": o["status"],
+            "created_at": datetime.fromisoformat(o["created_at"])
+        } for o in orders])
+    return factory
+
+
+def time_database_lookups(factory, customers):
+    database.SessionLocal = factory
+    database.AsyncSessionLocal = None
+
+    async def lookups():
+        for customer in customers:
+            # A fresh store each time, so every lookup goes to the database
+            await OrderStore().find_pending_async(customer)
+
+    start = time.perf_counter()
+    asyncio.run(lookups())
+    return (time.perf_counter() - start) / len(customers)
+
+
+def main():
+    orders = build_orders()
+    orders_store = {o["id"]: o for o in orders}
+    store = OrderStore()
+    for o in orders:
+        store.add(o, persist=False)
+
+    random.seed(7)
+    customers = [f"+234810{random.randrange(CUSTOMERS):07d}" for _ in range(LOOKUPS)]
+    for customer in customers[:50]:
+        scanned, indexed = scan_pending(orders_store, customer), store.latest_pending_for_customer(customer)
+        assert (scanned is None) == (indexed is None)
+    assert store_dashboard(store)[:3] == scan_dashboard(orders_store)[:3]
+    assert abs(store_dashboard(store)[3] - scan_dashboard(orders_store)[3]) < 1e-3
+    assert len(store_widget(store)) == len(scan_widget(orders_store))
+
+    scan_pending_s = best_of(lambda: [scan_pending(orders_store, c) for c in customers[:20]]) / 20
+    store_pending_s = best_of(lambda: [store.latest_pending_for_customer(c) for c in customers]) / LOOKUPS
+
+    rows = [
+        ("latest pending (I paid)", scan_pending_s, store_pending_s),
+        ("dashboard summary", best_of(lambda: scan_dashboard(orders_store)), best_of(lambda: store_dashboard(store))),
+        ("widget stats (today)", best_of(lambda: scan_widget(orders_store)), best_of(lambda: store_widget(store))),
+    ]
+
+    print(f"{ORDERS:,} orders, {CUSTOMERS:,} customers, {DAYS} days\n")
+    print(f"{'operation':<26}{'scan (ms)':>12}{'indexed (ms)':>15}{'speedup':>10}")
+    for name, scan_s, store_s in rows:
+        print(f"{name:<26}{scan_s * 1000:>12.3f}{store_s * 1000:>15.4f}{scan_s / store_s:>9.0f}x")
+
+    workdir = tempfile.mkdtemp()
+    sample = customers[:200]
+    no_index_s = time_database_lookups(build_database(orders, workdir, with_index=False), sample)
+    index_s = time_database_lookups(build_database(orders, workdir, with_index=True), sample)
+    print(f"\ndatabase fallback (SQLite), per lookup:")
+    print(f"{'without composite index':<26}{no_index_s * 1000:>12.3f} ms")
+    print(f"{'with composite index':<26}{index_s * 1000:>12.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: per-stage cost of the message pipeline, each stage handed the raw
+string vs one shared PreprocessedMessage.
+
+Stages are the string work process_message does on a customer message:
+intent recognition, product-query extraction, language detection and list
+selection. The legacy stages lowercase, strip and split the message on their
+own (extract_product_query also rebuilt its filler set per call and
+detect_language ran one substring test per language keyword); the current
+ones read the tokens, product query and language off the shared message.
+Product search is handed the product query as a message of its own (no
+re-split) but needs a database, so it is not timed here.
+
+Messages are built from a customer vocabulary, Pidgin included. Both
+pipelines are checked to give the same answers, except the language: the
+shared message matches keywords as whole words, where the substring test
+also counted "make i" inside "make is".
+
+Usage:
+    python scripts/bench_preprocess.py
+"""
+import os
+import random
+import sys
+import time
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("MYSQL_USER", "bench")
+os.environ.setdefault("MYSQL_PASSWORD", "bench")
+
+from chatbot.intent import IntentRecognizer
+from chatbot.inventory import InventoryManager
+from chatbot.preprocess import preprocess
+from chatbot.services.localization import LANGUAGE_KEYWORDS, Language, localization_service
+
+MESSAGES = 20_000
+ROUNDS = 5
+VOCABULARY = (
+    "hello hi good morning how much price cost do you have available stock get abeg you get "
+    "I paid my order where is delivery yes okay buy send help wetin una dey sell oya make I "
+    "red blue black sneakers canvas shoes bag jeans shirt polo size 42 first second the one please"
+).split()
+PRODUCTS = [
+    {"name": "Red Sneakers", "voice_tags": ["red", "canvas"]},
+    {"name": "Blue Jeans", "voice_tags": ["denim"]},
+    {"name": "Black Polo Shirt", "voice_tags": ["polo"]},
+]
+
+
+class LegacyPipeline:
+    """The stages as they were: every one starts from the raw string."""
+
+    def __init__(self, recognizer: IntentRecognizer, inventory: InventoryManager):
+        self.recognizer = recognizer
+        self.inventory = inventory
+
+    def intent(self, text: str):
+        return self.recognizer.recognize(text)
+
+    def product_query(self, text: str):
+        message_lower = text.lower().strip()
+        nigerian_fillers = [
+            "abeg", "oya", "na", "wetin", "dey", "fit", "una", "am", "e", "o",
+            "that", "this", "my", "brother", "sister", "hope", "you", "me", "I",
+            "wan", "make", "for", "be", "go", "don"
+        ]
+        all_filters = set(["the", "a", "an", "?", ".", ",", "!", "get", "need", "have"] + nigerian_fillers)
+        product_words = []
+        for word in message_lower.split():
+            clean_word = word.strip("?.,!")
+            if clean_word not in all_filters and len(clean_word) > 1:
+                product_words.append(clean_word)
+        return " ".join(product_words) if product_words else None
+
+    def language(self, text: str):
+        text_lower = text.lower()
+        scores = {lang: 0 for lang in Language}
+        for lang, keywords in LANGUAGE_KEYWORDS.items():
+            for keyword in keywords:
+                if keyword in text_lower:
+                    scores[lang] += 1
+        max_lang = max(scores, key=scores.get)
+        return max_lang if scores[max_lang] > 0 else Language.ENGLISH
+
+    def selection(self, text: str):
+        return self.inventory.find_product_by_selection(text, PRODUCTS)
+
+
+class SharedPipeline:
+    """The current stages, all reading one PreprocessedMessage."""
+
+    def __init__(self, recognizer: IntentRecognizer, inventory: InventoryManager):
+        self.recognizer = recognizer
+        self.inventory = inventory
+
+    def intent(self, message):
+        return self.recognizer.recognize(message)
+
+    def product_query(self, message):
+        return self.recognizer.extract_product_query(message)
+
+    def language(self, message):
+        return message.language
+
+    def selection(self, message):
+        return self.inventory.find_product_by_selection(message, PRODUCTS)
+
+
+STAGES = ("intent", "product_query", "language", "selection")
+
+
+def customer_messages(n: int) -> list:
+    random.seed(42)
+    return [" ".join(random.choices(VOCABULARY, k=random.randint(1, 8))) + random.choice(["", "?", "!"]) for _ in range(n)]
+
+
+def per_stage_us(pipeline, texts, shared: bool) -> dict:
+    """Each message through every stage in turn, as process_message does; µs per message by stage."""
+    clock = time.perf_counter
+    stages = [(name, getattr(pipeline, name)) for name in STAGES]
+    totals = dict.fromkeys(("preprocess",) + STAGES, 0.0)
+    for text in texts:
+        start = clock()
+        message = preprocess(text) if shared else text
+        totals["preprocess"] += clock() - start
+        for name, stage in stages:
+            start = clock()
+            stage(message)
+            totals[name] += clock() - start
+    return {name: total / len(texts) * 1e6 for name, total in totals.items()}
+
+
+def main():
+    recognizer = IntentRecognizer()
+    inventory = InventoryManager(user_id="bench")
+    legacy, shared = LegacyPipeline(recognizer, inventory), SharedPipeline(recognizer, inventory)
+    texts = customer_messages(MESSAGES)
+
+    for text in texts[:2000]:
+        message = preprocess(text)
+        for name in STAGES:
+            if name != "language":
+                assert getattr(legacy, name)(text) == getattr(shared, name)(message), (name, text)
+    assert all(shared.language(preprocess(t)) == localization_service.detect_language(t) for t in texts[:2000])
+
+    # Warm the recognizer's word cache so both pipelines see the same state
+    for text in texts:
+        recognizer.recognize(text)
+
+    # Alternate the pipelines and keep each stage's best round, to even out noise
+    legacy_us, shared_us = {}, {}
+    for _ in range(ROUNDS):
+        for best, pipeline, is_shared in ((legacy_us, legacy, False), (shared_us, shared, True)):
+            for name, us in per_stage_us(pipeline, texts, is_shared).items():
+                best[name] = min(us, best.get(name, us))
+    print(f"{'stage':<16}{'string (us)':>13}{'shared (us)':>13}")
+    for name in ("preprocess",) + STAGES:
+        print(f"{name:<16}{legacy_us[name]:>13.2f}{shared_us[name]:>13.2f}")
+    legacy_total, shared_total = sum(legacy_us.values()), sum(shared_us.values())
+    print(f"{'total':<16}{legacy_total:>13.2f}{shared_total:>13.2f}   {legacy_total / shared_total:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
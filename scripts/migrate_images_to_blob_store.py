@@ -0,0 +1,95 @@
+"""
+Migration: move base64 product images out of products.image_url.
+
+Finds products whose image_url is an inline data: URL, stores the bytes in the
+content-addressed blob store (local disk or Supabase, same settings as the
+app) and replaces the column value with the blob URL. Works in small batches
+keyed by product id, loading only rows that still hold data: URLs, and commits
+after each batch so it can be stopped and re-run safely.
+
+Usage:
+    python scripts/migrate_images_to_blob_store.py [--dry-run] [--batch-size 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from chatbot.models import Product
+from chatbot.services.blob_store import (
+    BlobStore, BlobStoreError, blob_key, blob_store as default_blob_store, decode_data_url
+)
+
+
+async def migrate_images(session_factory, store: BlobStore, batch_size: int = 50, dry_run: bool = False) -> dict:
+    """
+    Move every inline image into the blob store.
+
+    Returns:
+        {"migrated", "failed", "bytes_before", "bytes_after"} totals
+    """
+    stats = {"migrated": 0, "failed": 0, "bytes_before": 0, "bytes_after": 0}
+    last_id = ""
+
+    while True:
+        db = session_factory()
+        try:
+            rows = db.query(Product.id, Product.image_url).filter(
+                Product.id > last_id,
+                Product.image_url.like("data:%")
+            ).order_by(Product.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            for product_id, image_url in rows:
+                last_id = product_id
+                try:
+                    data, content_type = decode_data_url(image_url)
+                    if dry_run:
+                        new_url = store.backend.url_for(blob_key(data, content_type))
+                    else:
+                        new_url = await store.put(data, content_type)
+                except BlobStoreError as e:
+                    print(f"  ✗ {product_id}: {e}")
+                    stats["failed"] += 1
+                    continue
+
+                stats["migrated"] += 1
+                stats["bytes_before"] += len(image_url)
+                stats["bytes_after"] += len(new_url)
+                if not dry_run:
+                    db.query(Product).filter(Product.id == product_id).update(
+                        {"image_url": new_url}, synchronize_session=False
+                    )
+
+            if not dry_run:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move base64 product images into the blob store")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without writing")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    from chatbot.database import SessionLocal
+
+    print(f"📦 Moving inline product images to the {default_blob_store.backend.name} blob store"
+          f"{' (dry run)' if args.dry_run else ''}...")
+    stats = asyncio.run(migrate_images(SessionLocal, default_blob_store, args.batch_size, args.dry_run))
+    print(f"✅ {stats['migrated']} image(s) moved, {stats['failed']} failed")
+    print(f"   image_url bytes: {stats['bytes_before']:,} -> {stats['bytes_after']:,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Tests for the non-blocking database path (run_db and async inventory variants)."""
+import asyncio
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot import database
+from chatbot.catalog import CatalogStore
+from chatbot.models import Base, Product as ProductModel, User as UserModel
+from chatbot.inventory import InventoryManager, DEFAULT_USER_ID, InsufficientStockError
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database used through the thread-pool fallback of run_db."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+    monkeypatch.setattr("chatbot.inventory.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.inventory.catalog_store", CatalogStore())
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=5))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def async_engine(session_factory, tmp_path, monkeypatch):
+    """The same SQLite file through the native async path (aiosqlite + run_sync)."""
+    pytest.importorskip("aiosqlite")
+    pytest.importorskip("greenlet")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'kofa.db'}")
+    monkeypatch.setattr(
+        "chatbot.database.AsyncSessionLocal",
+        async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    )
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+class TestRunDb:
+    """Test run_db keeps blocking queries off the event loop."""
+
+    def test_runs_off_the_event_loop_thread(self, session_factory):
+        """Test the fallback runs the query in a worker thread."""
+        async def go():
+            loop_thread = threading.get_ident()
+            query_thread = await database.run_db(lambda db: threading.get_ident())
+            return loop_thread, query_thread
+
+        loop_thread, query_thread = asyncio.run(go())
+        assert loop_thread != query_thread
+
+    def test_commit_and_rollback(self, session_factory):
+        """Test commit=True persists and errors roll back."""
+        def rename(db, name):
+            db.query(ProductModel).filter(ProductModel.id == "sneakers").update({"name": name})
+
+        def rename_then_fail(db):
+            rename(db, "Broken")
+            raise ValueError("boom")
+
+        asyncio.run(database.run_db(rename, "Blue Sneakers", commit=True))
+        with pytest.raises(ValueError):
+            asyncio.run(database.run_db(rename_then_fail, commit=True))
+
+        name = asyncio.run(database.run_db(
+            lambda db: db.query(ProductModel.name).filter(ProductModel.id == "sneakers").scalar()
+        ))
+        assert name == "Blue Sneakers"
+
+
+class TestNativeAsyncEngine:
+    """Test run_db through an AsyncSession (run_sync), not the thread pool."""
+
+    def test_runs_on_the_event_loop_through_the_async_driver(self, async_engine):
+        """Test the query runs on the loop's thread, on a session bound to the async engine."""
+        async def go():
+            loop_thread = threading.get_ident()
+            query_thread, dialect = await database.run_db(
+                lambda db: (threading.get_ident(), db.get_bind().dialect.driver)
+            )
+            return loop_thread, query_thread, dialect
+
+        loop_thread, query_thread, driver = asyncio.run(go())
+        assert query_thread == loop_thread
+        assert driver == "aiosqlite"
+
+    def test_commit_and_rollback(self, async_engine, session_factory):
+        """Test commit=True persists through the async session and errors roll back."""
+        def rename(db, name):
+            db.query(ProductModel).filter(ProductModel.id == "sneakers").update({"name": name})
+
+        def rename_then_fail(db):
+            rename(db, "Broken")
+            raise ValueError("boom")
+
+        async def go():
+            await database.run_db(rename, "Blue Sneakers", commit=True)
+            with pytest.raises(ValueError):
+                await database.run_db(rename_then_fail, commit=True)
+
+        asyncio.run(go())
+        db = session_factory()
+        try:
+            assert db.query(ProductModel.name).filter(ProductModel.id == "sneakers").scalar() == "Blue Sneakers"
+        finally:
+            db.close()
+
+    def test_reserve_and_release_async(self, async_engine):
+        """Test the async inventory variants work unchanged on the async engine."""
+        manager = InventoryManager()
+
+        async def go():
+            reserved = await manager.reserve_items_async([("sneakers", 2)])
+            with pytest.raises(InsufficientStockError):
+                await manager.reserve_items_async([("sneakers", 4)])
+            product = await manager.get_product_by_id_async("sneakers")
+            released = await manager.release_items_async([("sneakers", 2)])
+            return reserved, product, released
+
+        reserved, product, released = asyncio.run(go())
+        assert reserved["sneakers"]["stock_level"] == 3
+        assert product["stock_level"] == 3
+        assert released
+        assert manager.get_product_by_id("sneakers")["stock_level"] == 5
+
+
+class TestAsyncInventory:
+    """Test async InventoryManager variants match the sync API."""
+
+    def test_get_product_by_id_async(self, session_factory):
+        """Test async lookup returns the same dict as the sync one."""
+        manager = InventoryManager()
+        assert asyncio.run(manager.get_product_by_id_async("sneakers")) == manager.get_product_by_id("sneakers")
+
+    def test_reserve_and_release_async(self, session_factory):
+        """Test async reservation is all-or-nothing and release restores stock."""
+        manager = InventoryManager()
+        reserved = asyncio.run(manager.reserve_items_async([("sneakers", 2)]))
+        assert reserved["sneakers"]["stock_level"] == 3
+
+        with pytest.raises(InsufficientStockError):
+            asyncio.run(manager.reserve_items_async([("sneakers", 4)]))
+        assert manager.get_product_by_id("sneakers")["stock_level"] == 3
+
+        assert asyncio.run(manager.release_items_async([("sneakers", 2)]))
+        assert asyncio.run(manager.list_products_async())[0]["stock_level"] == 5
+
+    def test_concurrent_async_reads_share_one_catalog_load(self, session_factory):
+        """Test concurrent async catalog reads await a single load."""
+        manager = InventoryManager()
+        calls = []
+        original = manager._query_catalog
+
+        def counting_query(db):
+            calls.append(1)
+            return original(db)
+
+        manager._query_catalog = counting_query
+
+        async def burst():
+            return await asyncio.gather(*(manager.catalog_snapshot_async() for _ in range(20)))
+
+        snapshots = asyncio.run(burst())
+        assert len(calls) == 1
+        assert all(s is snapshots[0] for s in snapshots)
@@ -0,0 +1,111 @@
+"""Unit tests for the content-addressed image blob store."""
+import asyncio
+import base64
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot.models import Base, Product as ProductModel, User as UserModel
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.services.blob_store import (
+    BlobStore, BlobStoreError, LocalBlobBackend, blob_key, decode_data_url, is_data_url
+)
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"pixels" * 100
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Blob store backed by a temporary directory."""
+    return BlobStore(LocalBlobBackend(str(tmp_path / "blobs"), "https://shop.example/blobs"))
+
+
+def _data_url(data: bytes, content_type: str = "image/png") -> str:
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+
+
+class TestDataUrls:
+    """Test parsing of the legacy inline image format."""
+
+    def test_decode_base64_data_url(self):
+        """Test bytes and content type come back out of a data URL."""
+        assert decode_data_url(_data_url(PNG_BYTES)) == (PNG_BYTES, "image/png")
+
+    def test_rejects_bad_payload(self):
+        """Test corrupt base64 raises BlobStoreError."""
+        with pytest.raises(BlobStoreError):
+            decode_data_url("data:image/png;base64,@@@not-base64@@@")
+
+    def test_is_data_url(self):
+        """Test only data: URLs are treated as inline images."""
+        assert is_data_url("data:image/png;base64,AAAA")
+        assert not is_data_url("https://shop.example/blobs/x.png")
+        assert not is_data_url(None)
+
+
+class TestLocalBlobStore:
+    """Test storing and addressing blobs on local disk."""
+
+    def test_put_is_content_addressed(self, store):
+        """Test identical bytes map to one URL and one file."""
+        url1 = asyncio.run(store.put(PNG_BYTES, "image/png"))
+        url2 = asyncio.run(store.put(PNG_BYTES, "image/png"))
+        assert url1 == url2 == f"https://shop.example/blobs/{blob_key(PNG_BYTES, 'image/png')}"
+        path = store.backend.path_for(blob_key(PNG_BYTES, "image/png"))
+        with open(path, "rb") as f:
+            assert f.read() == PNG_BYTES
+
+    def test_put_data_url_returns_short_url(self, store):
+        """Test an inline image becomes a short blob URL; other URLs pass through."""
+        url = asyncio.run(store.put_data_url(_data_url(PNG_BYTES)))
+        assert store.owns(url)
+        assert len(url) < 120
+        assert asyncio.run(store.put_data_url("https://cdn.example/a.jpg")) == "https://cdn.example/a.jpg"
+
+    def test_delete(self, store):
+        """Test a stored blob can be deleted, foreign URLs are ignored."""
+        url = asyncio.run(store.put(PNG_BYTES, "image/png"))
+        assert asyncio.run(store.delete(url))
+        assert not os.path.exists(store.backend.path_for(blob_key(PNG_BYTES, "image/png")))
+        assert not asyncio.run(store.delete("https://cdn.example/a.jpg"))
+
+    def test_rejects_path_traversal_keys(self, store):
+        """Test only hash-shaped keys map to files."""
+        with pytest.raises(BlobStoreError):
+            store.backend.path_for("../../etc/passwd")
+        assert not store.owns("https://shop.example/blobs/../secret.png")
+
+
+class TestImageMigration:
+    """Test the base64-to-blob migration script."""
+
+    def test_moves_inline_images(self, tmp_path, store):
+        """Test data: URLs are replaced with blob URLs and other rows are untouched."""
+        import sys
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+        from migrate_images_to_blob_store import migrate_images
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'kofa.db'}")
+        Base.metadata.create_all(engine)
+        factory = sessionmaker(bind=engine)
+        db = factory()
+        db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+        db.add(ProductModel(id="a", user_id=DEFAULT_USER_ID, name="A", price_ngn=1, stock_level=1,
+                            image_url=_data_url(PNG_BYTES)))
+        db.add(ProductModel(id="b", user_id=DEFAULT_USER_ID, name="B", price_ngn=1, stock_level=1,
+                            image_url="https://cdn.example/b.jpg"))
+        db.add(ProductModel(id="c", user_id=DEFAULT_USER_ID, name="C", price_ngn=1, stock_level=1,
+                            image_url=_data_url(PNG_BYTES)))
+        db.commit()
+        db.close()
+
+        stats = asyncio.run(migrate_images(factory, store, batch_size=1))
+        assert stats["migrated"] == 2
+
+        db = factory()
+        urls = {p.id: p.image_url for p in db.query(ProductModel)}
+        db.close()
+        engine.dispose()
+        assert urls["a"] == urls["c"]  # Same image, one blob
+        assert store.owns(urls["a"])
+        assert urls["b"] == "https://cdn.example/b.jpg"
@@ -0,0 +1,105 @@
+"""Tests for the Business AI assistant's token-budgeted conversation memory."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+from chatbot.ai_brain import process_business_command
+from chatbot.services.business_ai_memory import BusinessAIMemory, estimate_tokens
+from chatbot.state_store import MemoryStateStore
+
+
+def memory(**kwargs):
+    return BusinessAIMemory(store=MemoryStateStore(), **kwargs)
+
+
+def prompt_tokens(messages):
+    return sum(estimate_tokens(m["content"]) for m in messages)
+
+
+class TestBusinessAIMemory:
+    """Test the window, the rolling summary and the token budget."""
+
+    def test_recent_turns_are_kept_verbatim(self):
+        """Test a short conversation is sent back as it was."""
+        mem = memory(token_budget=1000)
+        mem.record("c1", "Add 50 peppers at 500 naira each", "Added peppers.")
+
+        assert mem.get_messages("c1") == [
+            {"role": "user", "content": "Add 50 peppers at 500 naira each"},
+            {"role": "assistant", "content": "Added peppers."},
+        ]
+
+    def test_old_turns_move_into_the_summary(self):
+        """Test turns beyond the window become one summary line each."""
+        mem = memory(token_budget=10_000, window_messages=4)
+        for i in range(5):
+            mem.record("c1", f"How many shoes in stock? ({i})", f"You have {i} shoes.")
+
+        messages = mem.get_messages("c1")
+        assert messages[0]["role"] == "system"
+        assert messages[0]["content"].count("\n- ") == 3
+        assert "(0)" in messages[0]["content"] and "You have 0 shoes." in messages[0]["content"]
+        assert [m["content"] for m in messages[1:]] == [
+            "How many shoes in stock? (3)", "You have 3 shoes.", "How many shoes in stock? (4)", "You have 4 shoes."
+        ]
+
+    def test_prompt_stays_within_the_budget(self):
+        """Test 50 long turns still send about the budget, not the whole conversation."""
+        mem = memory(token_budget=600)
+        for i in range(50):
+            mem.record("c1", f"Report on product {i} " + "details " * 40, "Here is the report. " * 30)
+
+        messages = mem.get_messages("c1")
+        window = [m for m in messages if m["role"] != "system"]
+        assert prompt_tokens(window) <= 600
+        assert estimate_tokens(messages[0]["content"]) <= mem.summary_tokens + estimate_tokens("Earlier in this conversation:\n")
+        assert "product 49" in window[-2]["content"]
+
+    def test_conversations_expire_when_idle(self, monkeypatch):
+        """Test the conversation key carries the idle TTL."""
+        clock = [1_000_000.0]
+        monkeypatch.setattr("chatbot.state_store.time.time", lambda: clock[0])
+        mem = memory(ttl_hours=1)
+        mem.record("c1", "hi", "Hello!")
+
+        clock[0] += 3601
+        assert mem.get_messages("c1") == []
+
+    def test_async_calls_use_the_async_store(self):
+        """Test the handler's calls don't make blocking store round trips."""
+        class AsyncOnlyStore(MemoryStateStore):
+            def get_fields(self, key):
+                raise AssertionError("sync read from an async handler")
+
+            def set_fields(self, key, fields, ttl_seconds=None, replace=False):
+                raise AssertionError("sync write from an async handler")
+
+            async def get_fields_async(self, key):
+                return MemoryStateStore.get_fields(self, key)
+
+            async def set_fields_async(self, key, fields, ttl_seconds=None, replace=False):
+                MemoryStateStore.set_fields(self, key, fields, ttl_seconds, replace)
+
+        mem = BusinessAIMemory(store=AsyncOnlyStore(), token_budget=1000)
+
+        async def scenario():
+            await mem.record_async("c1", "Show low stock", "Peppers are low.")
+            return await mem.get_messages_async("c1")
+
+        assert asyncio.run(scenario()) == [
+            {"role": "user", "content": "Show low stock"},
+            {"role": "assistant", "content": "Peppers are low."},
+        ]
+
+
+class TestProcessBusinessCommand:
+    """Test the caller's history isn't changed."""
+
+    def test_history_is_not_mutated(self):
+        """Test the user message with inventory context isn't appended to the caller's list."""
+        history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+        inventory = MagicMock()
+        inventory.list_products.return_value = []
+        with patch("chatbot.ai_brain.send_to_groq", new=AsyncMock(return_value="Sure.")) as send:
+            asyncio.run(process_business_command("Show my stock", "vendor-1", inventory, history))
+
+        assert len(history) == 2
+        assert len(send.call_args.kwargs["messages"]) == 3
@@ -0,0 +1,702 @@
+"""Unit tests for the two-tier (L1 LRU + Redis) cache."""
+import asyncio
+import json
+import time
+import pytest
+from chatbot import cache
+from chatbot.cache import LRUCache
+
+
+class FakePipeline:
+    """Minimal redis pipeline: queues get/ttl and runs them on execute()."""
+
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def get(self, key):
+        self.ops.append(("get", key))
+        return self
+
+    def ttl(self, key):
+        self.ops.append(("ttl", key))
+        return self
+
+    def incr(self, key):
+        self.ops.append(("_incr", key))
+        return self
+
+    def setex(self, key, ttl, value):
+        self.ops.append(("_setex", (key, ttl, value)))
+        return self
+
+    def execute(self):
+        return [
+            getattr(self.client, op)(*arg) if isinstance(arg, tuple) else getattr(self.client, op)(arg)
+            for op, arg in self.ops
+        ]
+
+
+class AsyncFakePipeline(FakePipeline):
+    """FakePipeline with the redis.asyncio interface."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self):
+        return FakePipeline.execute(self)
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis client that counts round trips."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        self.round_trips += 1
+        return FakePipeline(self)
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self.data.get(key) for key in keys]
+
+    def _incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    def ttl(self, key):
+        return int(self.expires[key] - time.time()) if key in self.data else -2
+
+    def setex(self, key, ttl, value):
+        self.round_trips += 1
+        self._setex(key, ttl, value)
+
+    def _setex(self, key, ttl, value):
+        assert isinstance(ttl, int), "Redis TTLs are whole seconds"
+        self.data[key] = value
+        self.expires[key] = time.time() + ttl
+        return True
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        for key in keys:
+            self.data.pop(key, None)
+
+    def set(self, key, value, nx=False, px=None):
+        self.round_trips += 1
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        self.round_trips += 1
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+    def keys(self, pattern="*"):
+        raise AssertionError("KEYS scans the whole keyspace and must never be issued")
+
+    def scan_iter(self, *args, **kwargs):
+        raise AssertionError("invalidation must not enumerate keys")
+
+    def flushdb(self):
+        raise AssertionError("FLUSHDB would drop data the cache doesn't own")
+
+    def info(self):
+        return {"used_memory_human": "1K"}
+
+    def dbsize(self):
+        return len(self.data)
+
+
+class AsyncFakeRedis:
+    """redis.asyncio-style view of a FakeRedis, sharing its data and counters."""
+
+    def __init__(self, sync):
+        self.sync = sync
+
+    def pipeline(self, transaction=True):
+        self.sync.round_trips += 1
+        return AsyncFakePipeline(self.sync)
+
+    async def mget(self, keys):
+        return self.sync.mget(keys)
+
+    async def setex(self, key, ttl, value):
+        return self.sync.setex(key, ttl, value)
+
+    async def set(self, key, value, nx=False, px=None):
+        return self.sync.set(key, value, nx=nx, px=px)
+
+    async def delete(self, *keys):
+        return self.sync.delete(*keys)
+
+    async def eval(self, script, numkeys, key, token):
+        return self.sync.eval(script, numkeys, key, token)
+
+    async def keys(self, pattern="*"):
+        return self.sync.keys(pattern)
+
+    async def flushdb(self):
+        return self.sync.flushdb()
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    """Module cache with a fresh L1 and no Redis."""
+    monkeypatch.setattr(cache, "_l1", LRUCache(max_entries=100, max_bytes=1 << 20))
+    monkeypatch.setattr(cache, "_redis_available", False)
+    monkeypatch.setattr(cache, "_async_redis_loop", None)
+    monkeypatch.setattr(cache, "_l2_stats", {"hits": 0, "misses": 0, "errors": 0})
+    monkeypatch.setattr(cache, "_generations", {})
+    monkeypatch.setattr(cache, "_inflight", {})
+    monkeypatch.setattr(cache, "_function_stats", {})
+    monkeypatch.setattr(cache, "_load_stats", {"loads": 0, "coalesced": 0, "lock_waits": 0, "stale_served": 0})
+    return cache
+
+
+@pytest.fixture
+def redis_cache(memory_cache, monkeypatch):
+    """Module cache with a fresh L1 in front of a fake Redis."""
+    client = FakeRedis()
+    monkeypatch.setattr(cache, "_redis_client", client)
+    monkeypatch.setattr(cache, "_async_redis", AsyncFakeRedis(client))
+    monkeypatch.setattr(cache, "_async_redis_loop", None)
+    monkeypatch.setattr(cache, "_redis_available", True)
+    return client
+
+
+class TestLRUCache:
+    """Test L1 bounds, eviction and expiry."""
+
+    def test_entry_count_bound_evicts_least_recently_used(self):
+        """Test the oldest untouched entry goes first when full."""
+        lru = LRUCache(max_entries=2, max_bytes=1000)
+        lru.set("a", 1, 60, 1)
+        lru.set("b", 2, 60, 1)
+        lru.get("a")
+        lru.set("c", 3, 60, 1)
+        assert lru.get("b") == (False, None)
+        assert lru.get("a") == (True, 1)
+        assert lru.get("c") == (True, 3)
+        assert lru.stats()["evictions"] == 1
+
+    def test_byte_bound_evicts(self):
+        """Test total size stays under max_bytes."""
+        lru = LRUCache(max_entries=100, max_bytes=10)
+        for i in range(5):
+            lru.set(f"k{i}", i, 60, 4)
+        stats = lru.stats()
+        assert stats["bytes"] <= 10
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 3
+
+    def test_oversized_value_not_stored(self):
+        """Test a value bigger than the whole cache is skipped."""
+        lru = LRUCache(max_entries=100, max_bytes=10)
+        lru.set("big", "x", 60, 11)
+        assert lru.get("big") == (False, None)
+        assert lru.stats()["bytes"] == 0
+
+    def test_expired_entry_is_a_miss(self):
+        """Test TTL expiry on read."""
+        lru = LRUCache()
+        lru.set("k", "v", 0.01, 1)
+        time.sleep(0.02)
+        assert lru.get("k") == (False, None)
+        stats = lru.stats()
+        assert stats["expirations"] == 1
+        assert stats["entries"] == 0
+
+    def test_periodic_purge_drops_unread_keys(self):
+        """Test expired keys that are never read again don't accumulate."""
+        lru = LRUCache()
+        lru.PURGE_INTERVAL_SECONDS = 0
+        for i in range(10):
+            lru.set(f"old{i}", i, 0.01, 1)
+        time.sleep(0.02)
+        lru.set("new", 1, 60, 1)
+        stats = lru.stats()
+        assert stats["entries"] == 1
+        assert stats["bytes"] == 1
+        assert stats["expirations"] == 10
+
+    def test_replacing_key_keeps_byte_count(self):
+        """Test overwriting a key doesn't double count its size."""
+        lru = LRUCache()
+        lru.set("k", "v", 60, 5)
+        lru.set("k", "w", 60, 3)
+        assert lru.stats()["bytes"] == 3
+        assert lru.get("k") == (True, "w")
+
+
+class TestCachePolicies:
+    """Test per-prefix TTL policies."""
+
+    def test_longest_prefix_wins(self, monkeypatch):
+        """Test the most specific prefix policy applies."""
+        monkeypatch.setattr(cache, "CACHE_POLICIES", {"orders:": (60, 5), "orders:vip:": (300, 30)})
+        assert cache._policy_for("orders:user-1") == (60, 5)
+        assert cache._policy_for("orders:vip:user-1") == (300, 30)
+
+    def test_unknown_prefix_uses_defaults(self):
+        """Test keys without a policy fall back to the defaults."""
+        assert cache._policy_for("misc:key") == (cache.DEFAULT_TTL_SECONDS, cache.DEFAULT_L1_TTL_SECONDS)
+
+
+class TestMemoryOnly:
+    """Test the cache API with L1 as the only tier."""
+
+    def test_set_get_invalidate_key(self, memory_cache):
+        """Test a value round trips and is removed by key."""
+        memory_cache.set_cache("orders:u1", [{"id": 1}], ttl_seconds=60)
+        assert memory_cache.get_cache("orders:u1") == [{"id": 1}]
+
+        memory_cache.invalidate_cache(key="orders:u1")
+        assert memory_cache.get_cache("orders:u1") is None
+
+    def test_stats_expose_l1_counters(self, memory_cache):
+        """Test get_cache_stats reports hits, misses and evictions."""
+        memory_cache.set_cache("k", 1)
+        memory_cache.get_cache("k")
+        memory_cache.get_cache("missing")
+        stats = memory_cache.get_cache_stats()
+        assert stats["backend"] == "memory"
+        assert stats["l1"]["hits"] == 1
+        assert stats["l1"]["misses"] == 1
+        assert stats["l1"]["evictions"] == 0
+        assert stats["total_keys"] == 1
+
+
+class TestTagInvalidation:
+    """Test generation-based invalidation by tag."""
+
+    def test_tag_invalidates_only_its_values(self, memory_cache):
+        """Test bumping one tag leaves other tags' values cached."""
+        a, b = cache.orders_tag("vendor-a"), cache.orders_tag("vendor-b")
+        memory_cache.set_cache("orders:all", [1], tags=[a])
+        memory_cache.set_cache("orders:paid", [2], tags=[a])
+        memory_cache.set_cache("orders:all:b", [3], tags=[b])
+
+        memory_cache.invalidate_cache(tags=[a])
+        assert memory_cache.get_cache("orders:all", tags=[a]) is None
+        assert memory_cache.get_cache("orders:paid", tags=[a]) is None
+        assert memory_cache.get_cache("orders:all:b", tags=[b]) == [3]
+
+    def test_value_with_several_tags(self, memory_cache):
+        """Test a value is dropped when any of its tags is invalidated."""
+        tags = [cache.orders_tag("v1"), cache.vendor_products_tag("v1")]
+        memory_cache.set_cache("dashboard:v1", {"x": 1}, tags=tags)
+        assert memory_cache.get_cache("dashboard:v1", tags=tags) == {"x": 1}
+        memory_cache.invalidate_tags(cache.vendor_products_tag("v1"))
+        assert memory_cache.get_cache("dashboard:v1", tags=tags) is None
+
+    def test_new_value_after_invalidation(self, memory_cache):
+        """Test values set after a bump are served under the new generation."""
+        tag = cache.orders_tag("v1")
+        memory_cache.set_cache("orders:all", "old", tags=[tag])
+        memory_cache.invalidate_cache(tags=[tag])
+        memory_cache.set_cache("orders:all", "new", tags=[tag])
+        assert memory_cache.get_cache("orders:all", tags=[tag]) == "new"
+
+    def test_invalidate_everything(self, memory_cache):
+        """Test no-argument invalidation drops untagged and tagged values."""
+        memory_cache.set_cache("plain", 1)
+        memory_cache.set_cache("tagged", 2, tags=["t"])
+        memory_cache.invalidate_cache()
+        assert memory_cache.get_cache("plain") is None
+        assert memory_cache.get_cache("tagged", tags=["t"]) is None
+
+    def test_redis_never_sees_keys_or_flushdb(self, memory_cache, redis_cache):
+        """Test invalidation bumps a counter instead of enumerating keys."""
+        tag = cache.orders_tag("v1")
+        for status in ("all", "pending", "paid"):
+            memory_cache.set_cache(f"orders:{status}", [status], tags=[tag])
+
+        # FakeRedis.keys()/flushdb() raise, so any enumeration fails the test
+        memory_cache.invalidate_cache(tags=[tag])
+        memory_cache.invalidate_cache()
+        asyncio.run(memory_cache.invalidate_cache_async(tags=[tag]))
+        asyncio.run(memory_cache.invalidate_cache_async())
+
+        assert redis_cache.data[cache.TAG_KEY_PREFIX + tag] == "2"
+        for status in ("all", "pending", "paid"):
+            assert memory_cache.get_cache(f"orders:{status}", tags=[tag]) is None
+        assert memory_cache.get_cache_stats()["l2"]["errors"] == 0
+
+    def test_other_workers_see_bump_in_redis(self, memory_cache, redis_cache, monkeypatch):
+        """Test a bump made by another worker takes effect once local generations age out."""
+        monkeypatch.setattr(cache, "TAG_GENERATION_TTL_SECONDS", 0)
+        tag = cache.orders_tag("v1")
+        memory_cache.set_cache("orders:all", "old", tags=[tag])
+        # Another worker invalidates directly in Redis
+        redis_cache._incr(cache.TAG_KEY_PREFIX + tag)
+        assert memory_cache.get_cache("orders:all", tags=[tag]) is None
+
+
+class TestRedisTier:
+    """Test L1 in front of Redis."""
+
+    def test_l1_absorbs_repeat_reads(self, memory_cache, redis_cache):
+        """Test only the first read of a key written elsewhere goes to Redis."""
+        redis_cache.setex(cache._versioned_key("orders:u1"), 60, json.dumps([{"id": 1}]))
+        before = redis_cache.round_trips
+        for _ in range(50):
+            assert memory_cache.get_cache("orders:u1") == [{"id": 1}]
+        assert redis_cache.round_trips - before == 1
+
+        stats = memory_cache.get_cache_stats()
+        assert stats["backend"] == "redis"
+        assert stats["l2"]["hits"] == 1
+        assert stats["l1"]["hits"] == 49
+
+    def test_write_goes_to_both_tiers(self, memory_cache, redis_cache):
+        """Test set_cache writes Redis and serves the next read from L1."""
+        memory_cache.set_cache("orders:u1", {"total": 3})
+        assert cache._codec.decode(redis_cache.data[cache._versioned_key("orders:u1")]) == {"total": 3}
+        before = redis_cache.round_trips
+        assert memory_cache.get_cache("orders:u1") == {"total": 3}
+        assert redis_cache.round_trips == before
+
+    def test_l1_copy_lives_for_the_short_lifetime(self, memory_cache, redis_cache, monkeypatch):
+        """Test L1 copies expire per the prefix's L1 lifetime, not the full TTL."""
+        monkeypatch.setattr(cache, "CACHE_POLICIES", {"orders:": (60, 0.01)})
+        memory_cache.set_cache("orders:u1", 1)
+        time.sleep(0.02)
+        # Another worker updated Redis meanwhile
+        redis_cache.data[cache._versioned_key("orders:u1")] = json.dumps(2)
+        assert memory_cache.get_cache("orders:u1") == 2
+
+    def test_redis_miss_counted(self, memory_cache, redis_cache):
+        """Test misses in both tiers are counted per tier."""
+        assert memory_cache.get_cache("nothing") is None
+        stats = memory_cache.get_cache_stats()
+        assert stats["l1"]["misses"] == 1
+        assert stats["l2"]["misses"] == 1
+
+    def test_invalidate_clears_both_tiers(self, memory_cache, redis_cache):
+        """Test invalidating a key removes the L1 copy as well."""
+        memory_cache.set_cache("orders:u1", 1)
+        versioned = cache._versioned_key("orders:u1")
+        memory_cache.invalidate_cache(key="orders:u1")
+        assert versioned not in redis_cache.data
+        assert memory_cache.get_cache("orders:u1") is None
+
+
+class SlowLoader:
+    """Async loader that counts calls and takes a while, like a real query."""
+
+    def __init__(self, value="fresh", delay=0.05):
+        self.calls = 0
+        self.value = value
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.value
+
+
+class TestSingleFlight:
+    """Test request coalescing and stale-while-revalidate."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self, memory_cache):
+        """Test a burst of misses on one key runs the loader once."""
+        loader = SlowLoader()
+        results = await asyncio.gather(*(
+            memory_cache.get_or_load("orders:all", loader, ttl_seconds=60) for _ in range(20)
+        ))
+        assert results == ["fresh"] * 20
+        assert loader.calls == 1
+        assert memory_cache.get_cache_stats()["single_flight"]["coalesced"] == 19
+        # Later reads are plain cache hits
+        assert await memory_cache.get_or_load("orders:all", loader) == "fresh"
+        assert loader.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_loader_error_reaches_every_waiter(self, memory_cache):
+        """Test a failed load is reported to all coalesced callers and not cached."""
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(
+            *(memory_cache.get_or_load("k", failing) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert memory_cache.get_cache("k") is None
+
+    @pytest.mark.asyncio
+    async def test_waits_for_other_workers_load(self, memory_cache, redis_cache, monkeypatch):
+        """Test a worker that loses the Redis lock uses the winner's value."""
+        monkeypatch.setattr(cache, "LOAD_POLL_SECONDS", 0.01)
+        lock_key = cache.LOCK_KEY_PREFIX + cache._versioned_key("orders:all")
+        redis_cache.data[lock_key] = "other-worker"
+        loader = SlowLoader()
+
+        async def other_worker_finishes():
+            await asyncio.sleep(0.03)
+            redis_cache.setex(cache._versioned_key("orders:all"), 60, json.dumps("from-other-worker"))
+
+        result, _ = await asyncio.gather(
+            memory_cache.get_or_load("orders:all", loader), other_worker_finishes()
+        )
+        assert result == "from-other-worker"
+        assert loader.calls == 0
+        assert memory_cache.get_cache_stats()["single_flight"]["lock_waits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_lock_released_after_load(self, memory_cache, redis_cache):
+        """Test the cross-worker lock doesn't outlive the load."""
+        await memory_cache.get_or_load("orders:all", SlowLoader(delay=0))
+        assert not any(k.startswith(cache.LOCK_KEY_PREFIX) for k in redis_cache.data)
+
+    @pytest.mark.asyncio
+    async def test_stale_value_served_while_refreshing(self, memory_cache):
+        """Test an expired value is returned at once and refreshed once in the background."""
+        first = SlowLoader(value="v1", delay=0)
+        await memory_cache.get_or_load("orders:all", first, ttl_seconds=0.01, stale_seconds=60)
+        await asyncio.sleep(0.02)
+
+        refresh = SlowLoader(value="v2", delay=0.02)
+        results = await asyncio.gather(*(
+            memory_cache.get_or_load("orders:all", refresh, ttl_seconds=60, stale_seconds=60)
+            for _ in range(10)
+        ))
+        assert results == ["v1"] * 10
+        await asyncio.sleep(0.05)
+        assert refresh.calls == 1
+        assert await memory_cache.get_or_load("orders:all", refresh, ttl_seconds=60, stale_seconds=60) == "v2"
+        assert memory_cache.get_cache_stats()["single_flight"]["stale_served"] == 10
+
+    @pytest.mark.asyncio
+    async def test_cached_decorator_opt_in(self, memory_cache):
+        """Test @cached(single_flight=True) coalesces concurrent calls."""
+        calls = []
+
+        @memory_cache.cached(ttl_seconds=60, key_prefix="test:", single_flight=True)
+        async def load(vendor_id):
+            calls.append(vendor_id)
+            await asyncio.sleep(0.02)
+            return {"vendor": vendor_id}
+
+        results = await asyncio.gather(*(load("v1") for _ in range(5)))
+        assert results == [{"vendor": "v1"}] * 5
+        assert calls == ["v1"]
+
+
+class TestCachedKeys:
+    """Test @cached key building and per-function counters."""
+
+    def test_dict_argument_order_doesnt_matter(self, memory_cache):
+        """Test equal dicts build the same key whatever their insertion order."""
+        @memory_cache.cached()
+        def search(filters):
+            return filters
+
+        assert search.cache_key({"a": 1, "b": [1, 2]}) == search.cache_key({"b": [1, 2], "a": 1})
+        assert search.cache_key({"a": 1}) != search.cache_key({"a": 2})
+
+    def test_positional_and_keyword_calls_share_a_key(self, memory_cache):
+        """Test arguments are keyed by name, with defaults applied."""
+        @memory_cache.cached()
+        def orders(vendor_id, status="all"):
+            return []
+
+        assert orders.cache_key("v1") == orders.cache_key(vendor_id="v1", status="all")
+
+    def test_self_is_ignored(self, memory_cache):
+        """Test separate instances of a class share cache entries."""
+        calls = []
+
+        class Reports:
+            @memory_cache.cached()
+            def summary(self, vendor_id):
+                calls.append(vendor_id)
+                return {"vendor": vendor_id}
+
+        assert Reports().summary("v1") == Reports().summary("v1")
+        assert calls == ["v1"]
+
+    def test_argument_selector(self, memory_cache):
+        """Test key= limits the key to the named arguments."""
+        @memory_cache.cached(key=["vendor_id"])
+        def products(vendor_id, db=None):
+            return []
+
+        assert products.cache_key("v1", db=object()) == products.cache_key("v1", db=object())
+
+    def test_callable_selector(self, memory_cache):
+        """Test key= can compute the key value from the arguments."""
+        @memory_cache.cached(key=lambda request: request["vendor_id"])
+        def handle(request):
+            return []
+
+        assert handle.cache_key({"vendor_id": "v1", "trace": 1}) == handle.cache_key({"vendor_id": "v1", "trace": 2})
+
+    def test_unknown_selector_name_rejected(self, memory_cache):
+        """Test a typo in key= fails at decoration time."""
+        with pytest.raises(ValueError):
+            @memory_cache.cached(key=["vendorid"])
+            def products(vendor_id):
+                return []
+
+    def test_unstable_argument_rejected(self, memory_cache):
+        """Test objects without a stable form raise instead of never hitting."""
+        @memory_cache.cached()
+        def lookup(db):
+            return []
+
+        with pytest.raises(TypeError):
+            lookup(object())
+
+    def test_long_keys_are_hashed(self, memory_cache):
+        """Test keys stay bounded for large arguments."""
+        @memory_cache.cached()
+        def lookup(ids):
+            return []
+
+        key = lookup.cache_key([f"product-{i}" for i in range(1000)])
+        assert len(key) < len(lookup.cache_key.namespace) + 40
+        assert key != lookup.cache_key([f"product-{i}" for i in range(1001)])
+
+    def test_functions_get_separate_namespaces(self, memory_cache):
+        """Test same-named functions in different classes don't collide."""
+        class A:
+            @memory_cache.cached()
+            def load(self, x):
+                return "a"
+
+        class B:
+            @memory_cache.cached()
+            def load(self, x):
+                return "b"
+
+        assert A().load(1) == "a"
+        assert B().load(1) == "b"
+
+    def test_hit_rate_per_function(self, memory_cache):
+        """Test get_cache_stats reports hits and misses for each decorated function."""
+        @memory_cache.cached(namespace="reports")
+        def report(vendor_id):
+            return {"vendor": vendor_id}
+
+        for _ in range(3):
+            report("v1")
+        report("v2")
+        stats = memory_cache.get_cache_stats()["functions"]["reports"]
+        assert stats == {"hits": 2, "misses": 2, "hit_rate": 0.5}
+
+    @pytest.mark.asyncio
+    async def test_single_flight_counts_coalesced_calls_as_hits(self, memory_cache):
+        """Test only the call that ran the function counts as a miss."""
+        @memory_cache.cached(namespace="slow", single_flight=True)
+        async def slow(vendor_id):
+            await asyncio.sleep(0.02)
+            return vendor_id
+
+        await asyncio.gather(*(slow("v1") for _ in range(4)))
+        assert memory_cache.get_cache_stats()["functions"]["slow"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+class TestAsyncRedis:
+    """Test the asyncio Redis path, multi-key APIs and lazy connection."""
+
+    @pytest.mark.asyncio
+    async def test_async_round_trip_shares_data_with_sync(self, memory_cache, redis_cache):
+        """Test async and sync APIs read each other's entries."""
+        await memory_cache.set_cache_async("orders:all", [1], tags=["t"])
+        memory_cache._l1.clear()
+        assert memory_cache.get_cache("orders:all", tags=["t"]) == [1]
+        memory_cache.set_cache("orders:paid", [2], tags=["t"])
+        memory_cache._l1.clear()
+        assert await memory_cache.get_cache_async("orders:paid", tags=["t"]) == [2]
+
+    @pytest.mark.asyncio
+    async def test_get_many_is_one_round_trip(self, memory_cache, redis_cache):
+        """Test several L1 misses are fetched from Redis in one pipeline."""
+        await memory_cache.set_many({f"widget:{i}": i for i in range(10)}, ttl_seconds=60)
+        memory_cache._l1.clear()
+        await memory_cache.get_cache_async("warm-generations")
+        before = redis_cache.round_trips
+        found = await memory_cache.get_many([f"widget:{i}" for i in range(12)])
+        assert found == {f"widget:{i}": i for i in range(10)}
+        assert redis_cache.round_trips - before == 1
+        # Now served from L1 with no Redis traffic
+        assert await memory_cache.get_many(["widget:1", "widget:2"]) == {"widget:1": 1, "widget:2": 2}
+        assert redis_cache.round_trips - before == 1
+
+    @pytest.mark.asyncio
+    async def test_set_many_is_one_round_trip(self, memory_cache, redis_cache):
+        """Test several writes go out in one pipeline."""
+        await memory_cache.get_cache_async("warm-generations")
+        before = redis_cache.round_trips
+        await memory_cache.set_many({"a": 1, "b": 2, "c": 3}, ttl_seconds=60)
+        assert redis_cache.round_trips - before == 1
+        assert len([k for k in redis_cache.data if k[0] in "abc"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_memory_only_many(self, memory_cache):
+        """Test get_many/set_many work without Redis."""
+        await memory_cache.set_many({"a": 1, "b": 2})
+        assert await memory_cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+
+    @pytest.mark.asyncio
+    async def test_connection_failure_falls_back_and_retries_later(self, memory_cache, monkeypatch):
+        """Test an unreachable Redis leaves L1 working and isn't retried on every call."""
+        attempts = []
+
+        class Unreachable:
+            async def ping(self):
+                attempts.append(1)
+                raise cache.redis.ConnectionError("connection refused")
+
+        monkeypatch.setattr(cache, "REDIS_URL", "redis://unreachable:6379")
+        monkeypatch.setattr(cache, "_redis_retry_at", 0.0)
+        monkeypatch.setattr(cache, "_async_redis", None)
+        monkeypatch.setattr(cache.redis_asyncio, "from_url", lambda url, **kwargs: Unreachable())
+
+        await memory_cache.set_cache_async("k", 1)
+        assert await memory_cache.get_cache_async("k") == 1
+        assert await memory_cache.get_cache_async("other") is None
+        assert attempts == [1]
+        assert memory_cache.is_redis_available() is False
+
+    @pytest.mark.asyncio
+    async def test_lazy_connect_uses_pool_and_health_checks(self, memory_cache, monkeypatch):
+        """Test the first async call connects with a bounded pool and health checks."""
+        created = {}
+        fake = AsyncFakeRedis(FakeRedis())
+
+        async def ping():
+            return True
+
+        fake.ping = ping
+
+        def from_url(url, **kwargs):
+            created.update(kwargs)
+            return fake
+
+        monkeypatch.setattr(cache, "REDIS_URL", "redis://cache:6379")
+        monkeypatch.setattr(cache, "_redis_retry_at", 0.0)
+        monkeypatch.setattr(cache, "_async_redis", None)
+        monkeypatch.setattr(cache.redis_asyncio, "from_url", from_url)
+
+        await memory_cache.set_cache_async("k", 1)
+        assert created["max_connections"] == cache.REDIS_MAX_CONNECTIONS
+        assert created["health_check_interval"] == cache.REDIS_HEALTH_CHECK_SECONDS
+        assert memory_cache.is_redis_available() is True
+        assert any(k.startswith("k#") for k in fake.sync.data)
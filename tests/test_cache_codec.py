@@ -0,0 +1,96 @@
+"""Unit tests for cache value codecs."""
+import json
+import zlib
+from datetime import datetime
+import pytest
+from chatbot import cache_codec
+from chatbot.cache_codec import CacheCodec, CodecError
+
+CATALOG = [
+    {
+        "id": f"product-{i}",
+        "name": f"Red Sneakers {i}",
+        "price_ngn": 15000.0 + i,
+        "stock_level": i % 7,
+        "voice_tags": ["sneakers", "canvas"],
+        "description": "Comfortable canvas sneakers for everyday wear",
+        "category": "Footwear",
+        "image_url": None,
+    }
+    for i in range(200)
+]
+
+
+class TestRoundTrip:
+    """Test values survive encode/decode with each serializer."""
+
+    @pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+    def test_catalog_round_trip(self, serializer):
+        """Test a product list decodes to the same value."""
+        if serializer != "json" and getattr(cache_codec, serializer) is None:
+            pytest.skip(f"{serializer} not installed")
+        codec = CacheCodec(serializer, "none")
+        assert codec.serializer == serializer
+        assert codec.decode(codec.encode(CATALOG)) == CATALOG
+
+    def test_matches_json_default_str(self):
+        """Test datetimes and int keys come back as json.dumps(default=str) would give them."""
+        value = {"created_at": datetime(2025, 1, 2, 3, 4, 5), 7: "seven"}
+        expected = json.loads(json.dumps(value, default=str))
+        assert CacheCodec("auto", "none").decode(CacheCodec("auto", "none").encode(value)) == expected
+
+    def test_unencodable_value_raises_codec_error(self):
+        """Test encoding failures surface as CodecError."""
+        with pytest.raises(CodecError):
+            CacheCodec("json", "none").encode({("tuple", "key"): 1})
+
+
+class TestCompression:
+    """Test size-thresholded compression."""
+
+    def test_small_values_not_compressed(self):
+        """Test payloads under the threshold are stored as-is."""
+        codec = CacheCodec("json", "zlib", compress_min_bytes=1024)
+        raw = codec.encode({"a": 1})
+        assert raw[0] & 0x07 == cache_codec.COMPRESSION_IDS["none"]
+        assert raw[1:] == b'{"a": 1}'
+
+    def test_large_values_compressed(self):
+        """Test big lists shrink and still decode."""
+        codec = CacheCodec("json", "zlib", compress_min_bytes=1024)
+        raw = codec.encode(CATALOG)
+        assert raw[0] & 0x07 == cache_codec.COMPRESSION_IDS["zlib"]
+        assert len(raw) < len(json.dumps(CATALOG)) / 4
+        assert codec.decode(raw) == CATALOG
+
+    def test_unavailable_compression_falls_back(self, monkeypatch):
+        """Test asking for zstd without the library stores uncompressed, like the default."""
+        monkeypatch.setattr(cache_codec, "zstandard", None)
+        assert CacheCodec("json", "zstd").compression == "none"
+
+    def test_unknown_compression_falls_back(self):
+        """Test a misspelled CACHE_COMPRESSION doesn't turn on zlib."""
+        codec = CacheCodec("json", "lz4", compress_min_bytes=1)
+        assert codec.compression == "none"
+        assert codec.encode(CATALOG)[0] & 0x07 == cache_codec.COMPRESSION_IDS["none"]
+
+
+class TestCompatibility:
+    """Test decoding doesn't depend on the current settings."""
+
+    def test_legacy_json_entries_decode(self):
+        """Test entries written as plain JSON before codecs still read."""
+        codec = CacheCodec()
+        legacy = json.dumps(CATALOG[:3], default=str)
+        assert codec.decode(legacy) == CATALOG[:3]
+        assert codec.decode(legacy.encode()) == CATALOG[:3]
+
+    def test_reads_entries_written_with_other_settings(self):
+        """Test switching codec config keeps existing entries readable."""
+        old = CacheCodec("json", "zlib", compress_min_bytes=0).encode(CATALOG)
+        assert CacheCodec("orjson" if cache_codec.orjson else "json", "none").decode(old) == CATALOG
+
+    def test_unknown_header_raises(self):
+        """Test a corrupt header byte is reported, not misread."""
+        with pytest.raises(CodecError):
+            CacheCodec().decode(bytes((0xFF,)) + zlib.compress(b"{}"))
@@ -0,0 +1,132 @@
+"""Unit tests for the versioned per-vendor catalog snapshot."""
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot.catalog import CatalogStore
+from chatbot.models import Base, Product as ProductModel, User as UserModel
+from chatbot.inventory import InventoryManager, DEFAULT_USER_ID
+
+
+class CountingLoader:
+    """Loader that records how many times the database would be hit."""
+
+    def __init__(self, products=None, delay=0.0):
+        self.calls = 0
+        self.products = products or [{"id": "p1", "name": "Red Sneakers"}]
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return list(self.products)
+
+
+class TestCatalogStore:
+    """Test snapshot sharing and versioning."""
+
+    def test_reads_share_one_load(self):
+        """Test repeated reads reuse the same snapshot."""
+        store = CatalogStore()
+        loader = CountingLoader()
+        first = store.get("vendor-1", loader)
+        second = store.get("vendor-1", loader)
+        assert first is second
+        assert loader.calls == 1
+
+    def test_concurrent_burst_costs_one_load(self):
+        """Test a burst of concurrent reads triggers a single load."""
+        store = CatalogStore()
+        loader = CountingLoader(delay=0.05)
+        threads = [threading.Thread(target=store.get, args=("vendor-1", loader)) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert loader.calls == 1
+
+    def test_bump_increases_version_and_reloads(self):
+        """Test a write bumps the version monotonically and drops the snapshot."""
+        store = CatalogStore()
+        loader = CountingLoader()
+        before = store.get("vendor-1", loader)
+        v1 = store.bump("vendor-1")
+        v2 = store.bump("vendor-1")
+        assert before.version < v1 < v2
+        after = store.get("vendor-1", loader)
+        assert after.version == v2
+        assert loader.calls == 2
+
+    def test_vendors_are_isolated(self):
+        """Test bumping one vendor keeps another vendor's snapshot."""
+        store = CatalogStore()
+        loader = CountingLoader()
+        store.get("vendor-1", loader)
+        store.get("vendor-2", loader)
+        store.bump("vendor-1")
+        assert store.peek("vendor-2") is not None
+        assert store.peek("vendor-1") is None
+
+    def test_write_during_load_is_not_cached(self):
+        """Test a snapshot loaded across a write is served once but not kept."""
+        store = CatalogStore()
+
+        def loader():
+            store.bump("vendor-1")  # Simulates a write committing mid-load
+            return []
+
+        store.get("vendor-1", loader)
+        assert store.peek("vendor-1") is None
+
+    def test_snapshot_expires(self):
+        """Test snapshots older than the max age are reloaded."""
+        store = CatalogStore(max_age_seconds=0)
+        loader = CountingLoader()
+        store.get("vendor-1", loader)
+        time.sleep(0.01)
+        store.get("vendor-1", loader)
+        assert loader.calls == 2
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database patched into inventory, with a fresh catalog store."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'kofa.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.inventory.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.inventory.catalog_store", CatalogStore())
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=5))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+class TestInventorySnapshot:
+    """Test InventoryManager reads and writes keep the snapshot current."""
+
+    def test_writes_are_visible_to_next_read(self, session_factory):
+        """Test add, update and delete all invalidate the snapshot."""
+        manager = InventoryManager()
+        assert [p["name"] for p in manager.list_products()] == ["Red Sneakers"]
+
+        manager.add_product({"id": "bag", "name": "Leather Bag", "price_ngn": 20000, "stock_level": 2})
+        assert len(manager.list_products()) == 2
+
+        manager.update_stock("sneakers", -2)
+        stock = {p["id"]: p["stock_level"] for p in manager.list_products()}
+        assert stock["sneakers"] == 3
+
+        manager.delete_product("bag")
+        assert [p["id"] for p in manager.list_products()] == ["sneakers"]
+
+    def test_list_products_returns_copies(self, session_factory):
+        """Test callers can't mutate the shared snapshot."""
+        manager = InventoryManager()
+        manager.list_products()[0]["stock_level"] = 999
+        assert manager.list_products()[0]["stock_level"] == 5
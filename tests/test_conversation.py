@@ -0,0 +1,173 @@
+"""Tests for compact conversation states with idle expiry and a session cap."""
+import asyncio
+import sys
+from chatbot.conversation import MAX_SUMMARY_TAGS, ConversationManager, ConversationState, summarize_product
+
+IMAGE = "data:image/jpeg;base64," + "A" * 50_000
+
+
+def product(product_id="p1", name="Red Sneakers", image_url=IMAGE):
+    return {
+        "id": product_id,
+        "name": name,
+        "price_ngn": 15000,
+        "stock_level": 4,
+        "description": "Lightweight canvas sneakers " * 20,
+        "category": "Footwear",
+        "voice_tags": ["kicks", "canvas"],
+        "image_url": image_url
+    }
+
+
+class TestConversationState:
+    """Test states keep compact product summaries."""
+
+    def test_slots_and_no_full_product_dicts(self):
+        """Test a state has no __dict__ and drops descriptions and inline images."""
+        state = ConversationState()
+        state.set_products([product("p1"), product("p2", "Blue Sneakers")], "sneakers")
+
+        assert not hasattr(state, "__dict__")
+        assert state.awaiting_selection
+        assert state.last_products == [
+            {"id": "p1", "name": "Red Sneakers", "price_ngn": 15000, "stock_level": 4, "image_url": None,
+             "voice_tags": ["kicks", "canvas"]},
+            {"id": "p2", "name": "Blue Sneakers", "price_ngn": 15000, "stock_level": 4, "image_url": None,
+             "voice_tags": ["kicks", "canvas"]},
+        ]
+        assert sum(sys.getsizeof(s) for s in state._products) < 500
+
+    def test_single_result_is_selected(self):
+        """Test one search result becomes the current product, keeping a short image URL."""
+        state = ConversationState()
+        state.set_products([product(image_url="/blobs/abc.jpg")], "red sneakers")
+
+        assert not state.awaiting_selection
+        assert state.current_product["id"] == "p1"
+        assert state.current_product["image_url"] == "/blobs/abc.jpg"
+
+    def test_select_and_reset(self):
+        """Test selecting from a list, then reset clears context but not the pending order."""
+        state = ConversationState()
+        state.set_products([product("p1"), product("p2")], "sneakers")
+        state.select_product(state.last_products[1])
+        state.pending_order_id = "ABC12345"
+
+        assert state.current_product["id"] == "p2"
+        assert not state.awaiting_selection
+
+        state.reset()
+        assert (state.last_products, state.current_product, state.last_query) == ([], None, "")
+        assert state.pending_order_id == "ABC12345"
+
+    def test_summary_fields(self):
+        """Test the summary keeps what ordering needs."""
+        assert summarize_product(product(image_url="https://cdn/x.jpg")) == (
+            "p1", "Red Sneakers", 15000, 4, "https://cdn/x.jpg", ("kicks", "canvas")
+        )
+        many_tags = {**product(), "voice_tags": [f"tag{i}" for i in range(20)]}
+        assert len(summarize_product(many_tags)[-1]) == MAX_SUMMARY_TAGS
+
+    def test_selection_still_matches_voice_tags(self):
+        """Test "the canvas one" picks from the listed products by their tags."""
+        from chatbot.inventory import InventoryManager
+        state = ConversationState()
+        state.set_products([
+            {**product("p1", "Red Sneakers"), "voice_tags": ["leather"]},
+            {**product("p2", "Blue Sneakers"), "voice_tags": ["canvas"]},
+        ], "sneakers")
+
+        restored = ConversationState.from_fields(state.to_fields())
+        picked = InventoryManager(user_id="test").find_product_by_selection("the canvas one", restored.last_products)
+
+        assert picked["id"] == "p2"
+
+    def test_states_saved_without_tags_still_load(self):
+        """Test a state written before summaries kept voice tags decodes."""
+        fields = {"p": '[["p1","Red Sneakers",15000,4,null]]', "t": "1000"}
+        assert ConversationState.from_fields(fields).last_products[0]["voice_tags"] == []
+
+
+class TestConversationManager:
+    """Test idle sessions expire and the cap evicts the least recently used."""
+
+    def test_same_state_until_idle(self, monkeypatch):
+        """Test a returning customer keeps context, and loses it after the TTL."""
+        clock = [1_000_000.0]
+        monkeypatch.setattr("chatbot.conversation.time.time", lambda: clock[0])
+        manager = ConversationManager(ttl_minutes=30, max_sessions=100)
+
+        state = manager.get_state("+2348100000001")
+        state.set_products([product()], "sneakers")
+        clock[0] += 29 * 60
+        assert manager.get_state("+2348100000001") is state
+
+        clock[0] += 31 * 60
+        fresh = manager.get_state("+2348100000001")
+        assert fresh is not state
+        assert fresh.current_product is None
+
+    def test_idle_sessions_are_evicted_on_access(self, monkeypatch):
+        """Test other customers' idle sessions are dropped as traffic arrives."""
+        clock = [1_000_000.0]
+        monkeypatch.setattr("chatbot.conversation.time.time", lambda: clock[0])
+        manager = ConversationManager(ttl_minutes=30, max_sessions=100)
+        for i in range(10):
+            manager.get_state(f"+23481000000{i:02d}")
+        clock[0] += 10 * 60
+        manager.get_state("+2348100000005")
+
+        clock[0] += 25 * 60
+        manager.get_state("+2348199999999")
+
+        assert len(manager) == 2
+        assert manager.stats()["evicted"]["expired"] == 9
+
+    def test_sweep_evicts_without_traffic(self, monkeypatch):
+        """Test sweep() drops every idle session."""
+        clock = [1_000_000.0]
+        monkeypatch.setattr("chatbot.conversation.time.time", lambda: clock[0])
+        manager = ConversationManager(ttl_minutes=30, max_sessions=100)
+        for i in range(5):
+            manager.get_state(f"+23481000000{i:02d}")
+
+        assert manager.sweep(now=clock[0] + 31 * 60) == 5
+        assert len(manager) == 0
+
+    def test_background_sweeper(self, monkeypatch):
+        """Test the sweeper started with the app evicts idle sessions on its own, and stops."""
+        clock = [1_000_000.0]
+        monkeypatch.setattr("chatbot.conversation.time.time", lambda: clock[0])
+        manager = ConversationManager(ttl_minutes=30, max_sessions=100)
+        for i in range(5):
+            manager.get_state(f"+23481000000{i:02d}")
+
+        async def scenario():
+            manager.start(interval_seconds=0.01)
+            clock[0] += 31 * 60
+            await asyncio.sleep(0.05)
+            await manager.stop()
+
+        asyncio.run(scenario())
+        assert len(manager) == 0
+        assert manager._sweep_task is None
+
+    def test_cap_evicts_least_recently_used(self):
+        """Test the hard cap keeps the most recently active customers."""
+        manager = ConversationManager(ttl_minutes=30, max_sessions=3)
+        for user in ("a", "b", "c"):
+            manager.get_state(user)
+        manager.get_state("a")
+        manager.get_state("d")
+
+        assert list(manager._states) == ["c", "a", "d"]
+        assert manager.stats()["evicted"]["capacity"] == 1
+
+    def test_clear_state(self):
+        """Test clearing a customer's state forgets it."""
+        manager = ConversationManager(ttl_minutes=30, max_sessions=10)
+        state = manager.get_state("a")
+        state.pending_order_id = "ABC12345"
+        manager.clear_state("a")
+
+        assert manager.get_state("a").pending_order_id is None
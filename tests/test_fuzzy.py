@@ -0,0 +1,57 @@
+"""Unit tests for batch fuzzy scoring."""
+from fuzzywuzzy import fuzz
+from chatbot.fuzzy import (
+    BKTree, RatioIndex, indel_distance, ratio_scores, partial_ratio_scores, any_ratio_at_least, first_above_per_group
+)
+
+
+NAMES = ["red sneakers", "blue jeans", "leather bag", "gold chain", "phone charger"]
+
+
+class TestBatchScoring:
+    """Test batch scores line up with fuzzywuzzy's scale."""
+
+    def test_ratio_matches_fuzzywuzzy(self):
+        """Test batch ratio is identical to per-pair fuzzywuzzy ratio."""
+        scores = ratio_scores("red sneekers", NAMES)
+        assert [int(s) for s in scores] == [fuzz.ratio("red sneekers", n) for n in NAMES]
+
+    def test_partial_ratio_exact_substring(self):
+        """Test partial ratio gives 100 for substrings and stays in range."""
+        scores = partial_ratio_scores("jeans", NAMES)
+        assert int(scores[1]) == 100
+        assert all(0 <= int(s) <= 100 for s in scores)
+
+    def test_empty_choices(self):
+        """Test scoring against no candidates returns nothing."""
+        assert len(ratio_scores("bag", [])) == 0
+        assert not any_ratio_at_least(["bag"], [], 70)
+
+    def test_any_ratio_at_least(self):
+        """Test threshold check over every query/choice pair."""
+        assert any_ratio_at_least(["helo", "there"], ["hello", "hi"], 70)
+        assert not any_ratio_at_least(["xyz"], ["hello", "hi"], 70)
+
+    def test_first_above_per_group(self):
+        """Test first qualifying score is picked per group."""
+        assert first_above_per_group([50, 80, 90, 10, 75], 70, [0, 3, 3, 5]) == [80, 0, 75]
+
+
+class TestRatioIndex:
+    """Test BK-tree lookups agree with scoring every word."""
+
+    KEYWORDS = ["price", "cost", "how much", "hello", "hi", "help", "stock", "in stock", "delivery", "my order"]
+
+    def test_bk_tree_search_is_exact(self):
+        """Test search returns exactly the words within the radius."""
+        tree = BKTree(self.KEYWORDS)
+        for query in ["prise", "helo", "stok", "xyz"]:
+            expected = {(w, indel_distance(query, w)) for w in self.KEYWORDS if indel_distance(query, w) <= 3}
+            assert set(tree.search(query, 3)) == expected
+
+    def test_matches_equal_batch_ratio(self):
+        """Test the index finds the same words as ratio_scores at the threshold."""
+        index = RatioIndex(self.KEYWORDS, 70)
+        for query in ["prise", "helo", "hellp", "stok", "instock", "dilivery", "oder", "a", "howmuch"]:
+            scores = ratio_scores(query, self.KEYWORDS)
+            assert sorted(index.matches(query)) == sorted(w for w, s in zip(self.KEYWORDS, scores) if s >= 70)
@@ -0,0 +1,259 @@
+"""Tests for idempotency keys on order creation, imports and webhooks."""
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot.main import app
+from chatbot.models import Base, IdempotencyKey
+from chatbot.services import idempotency as idempotency_module
+from chatbot.services.idempotency import (
+    IdempotencyInProgress, IdempotencyKeyMismatch, IdempotencyStore, fingerprint
+)
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database for the idempotency_keys table."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+    monkeypatch.setattr("chatbot.main.idempotency_store", IdempotencyStore(ttl_hours=24))
+    monkeypatch.setattr(idempotency_module, "idempotency_store", IdempotencyStore(ttl_hours=24))
+    yield factory
+    engine.dispose()
+
+
+def counting_handler(result=None, error=None):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        if error:
+            raise error
+        return result if result is not None else {"call": len(calls)}
+
+    return handler, calls
+
+
+def key_rows(factory):
+    db = factory()
+    try:
+        return {(row.scope, row.key): row.status for row in db.query(IdempotencyKey)}
+    finally:
+        db.close()
+
+
+class TestIdempotencyStore:
+    """Test claiming keys and replaying stored responses."""
+
+    def test_duplicate_gets_the_stored_response(self, session_factory):
+        """Test the handler runs once and the retry replays its result."""
+        store = IdempotencyStore()
+        handler, calls = counting_handler()
+
+        first = asyncio.run(store.run_async("orders", "key-1", handler, fingerprint({"a": 1})))
+        second = asyncio.run(store.run_async("orders", "key-1", handler, fingerprint({"a": 1})))
+
+        assert first == ({"call": 1}, False)
+        assert second == ({"call": 1}, True)
+        assert len(calls) == 1
+        assert key_rows(session_factory) == {("orders", "key-1"): "completed"}
+
+    def test_keys_are_scoped_per_endpoint(self, session_factory):
+        """Test the same key in another scope is a different request."""
+        store = IdempotencyStore()
+        handler, calls = counting_handler()
+
+        asyncio.run(store.run_async("orders", "key-1", handler))
+        asyncio.run(store.run_async("products-import", "key-1", handler))
+
+        assert len(calls) == 2
+
+    def test_reusing_a_key_for_another_payload_is_rejected(self, session_factory):
+        """Test a different payload under the same key raises a mismatch."""
+        store = IdempotencyStore()
+        handler, calls = counting_handler()
+        asyncio.run(store.run_async("orders", "key-1", handler, fingerprint({"qty": 1})))
+
+        with pytest.raises(IdempotencyKeyMismatch):
+            asyncio.run(store.run_async("orders", "key-1", handler, fingerprint({"qty": 2})))
+        assert len(calls) == 1
+
+    def test_failed_request_releases_the_key(self, session_factory):
+        """Test a handler error isn't stored, so the retry runs again."""
+        store = IdempotencyStore()
+        failing, _ = counting_handler(error=RuntimeError("payment provider down"))
+        with pytest.raises(RuntimeError):
+            asyncio.run(store.run_async("orders", "key-1", failing))
+        assert key_rows(session_factory) == {}
+
+        handler, calls = counting_handler()
+        assert asyncio.run(store.run_async("orders", "key-1", handler)) == ({"call": 1}, False)
+
+    def test_duplicate_while_in_progress_is_rejected(self, session_factory):
+        """Test a retry arriving while the first request runs gets a conflict."""
+        store = IdempotencyStore()
+        handler, calls = counting_handler()
+
+        async def first_request():
+            async def slow():
+                with pytest.raises(IdempotencyInProgress):
+                    await store.run_async("orders", "key-1", handler)
+                return {"done": True}
+
+            return await store.run_async("orders", "key-1", slow)
+
+        assert asyncio.run(first_request()) == ({"done": True}, False)
+        assert calls == []
+
+    def test_abandoned_claim_is_taken_over(self, session_factory):
+        """Test a claim left by a worker that died is retried after the timeout."""
+        store = IdempotencyStore()
+        db = session_factory()
+        db.add(IdempotencyKey(
+            scope="orders", key="key-1", status="processing",
+            created_at=datetime.utcnow() - timedelta(seconds=idempotency_module.PROCESSING_TIMEOUT_SECONDS + 1),
+            expires_at=datetime.utcnow() + timedelta(hours=1)
+        ))
+        db.commit()
+        db.close()
+        handler, calls = counting_handler()
+
+        assert asyncio.run(store.run_async("orders", "key-1", handler)) == ({"call": 1}, False)
+
+    def test_expired_keys_run_again_and_are_purged(self, session_factory):
+        """Test keys past their TTL don't replay and the purge deletes them."""
+        store = IdempotencyStore(ttl_hours=1)
+        handler, calls = counting_handler()
+        asyncio.run(store.run_async("orders", "key-1", handler))
+        asyncio.run(store.run_async("orders", "key-2", handler))
+
+        db = session_factory()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == "key-1").update(
+                {"expires_at": datetime.utcnow() - timedelta(seconds=1)}
+            )
+            db.commit()
+            assert store.purge(db) == 1
+            db.commit()
+        finally:
+            db.close()
+
+        assert key_rows(session_factory) == {("orders", "key-2"): "completed"}
+        assert asyncio.run(store.run_async("orders", "key-1", handler)) == ({"call": 3}, False)
+
+    def test_unreachable_database_runs_unprotected(self, session_factory, monkeypatch):
+        """Test requests still succeed when the key table can't be reached."""
+        def broken_session():
+            raise ConnectionError("database unreachable")
+
+        monkeypatch.setattr("chatbot.database.SessionLocal", broken_session)
+        handler, calls = counting_handler()
+
+        assert asyncio.run(IdempotencyStore().run_async("orders", "key-1", handler)) == ({"call": 1}, False)
+
+
+@pytest.fixture
+def client(session_factory):
+    return TestClient(app)
+
+
+class TestOrderEndpoint:
+    """Test POST /orders with an Idempotency-Key header."""
+
+    @pytest.fixture
+    def order_mocks(self):
+        product = {"id": "product-123", "name": "Test Product", "price_ngn": 10000, "stock_level": 3}
+        with patch("chatbot.main.inventory_manager") as inventory, \
+                patch("chatbot.main.payment_manager") as payment, \
+                patch("chatbot.main.order_store") as store:
+            inventory.reserve_items_async = AsyncMock(return_value={"product-123": product})
+            inventory.user_id = "vendor-1"
+            payment.generate_payment_link.return_value = "https://payment.link/test"
+            store.add_async = AsyncMock()
+            yield inventory, payment
+
+    def test_retry_returns_the_same_order_without_reserving_again(self, client, order_mocks):
+        """Test a retried order replays the first response and leaves stock alone."""
+        inventory, payment = order_mocks
+        body = {"items": [{"product_id": "product-123", "quantity": 2}], "user_id": "+2348012345678"}
+
+        first = client.post("/orders", json=body, headers={"Idempotency-Key": "order-abc"})
+        second = client.post("/orders", json=body, headers={"Idempotency-Key": "order-abc"})
+
+        assert first.status_code == second.status_code == 200
+        assert second.json() == first.json()
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        inventory.reserve_items_async.assert_awaited_once()
+        payment.generate_payment_link.assert_called_once()
+
+    def test_key_reused_for_another_order_is_rejected(self, client, order_mocks):
+        """Test the same key with a different body gets 422."""
+        headers = {"Idempotency-Key": "order-abc"}
+        client.post("/orders", json={
+            "items": [{"product_id": "product-123", "quantity": 2}], "user_id": "+2348012345678"
+        }, headers=headers)
+
+        response = client.post("/orders", json={
+            "items": [{"product_id": "product-123", "quantity": 3}], "user_id": "+2348012345678"
+        }, headers=headers)
+
+        assert response.status_code == 422
+
+    def test_without_a_key_every_request_creates_an_order(self, client, order_mocks):
+        """Test requests without the header behave as before."""
+        inventory, _ = order_mocks
+        body = {"items": [{"product_id": "product-123", "quantity": 1}], "user_id": "+2348012345678"}
+
+        client.post("/orders", json=body)
+        client.post("/orders", json=body)
+
+        assert inventory.reserve_items_async.await_count == 2
+
+
+class TestWebhooks:
+    """Test redelivered webhooks are handled once."""
+
+    def test_paystack_redelivery_marks_the_order_paid_once(self, client):
+        """Test a redelivered charge.success doesn't repeat the payment handling."""
+        payload = {
+            "event": "charge.success",
+            "data": {"id": 4099260516, "reference": "ref-1", "amount": 2000000, "metadata": {"order_id": "O1"}}
+        }
+        with patch("chatbot.main.paystack_service.verify_webhook_signature", return_value=True), \
+                patch("chatbot.main.stock_hold_ledger") as ledger, \
+                patch("chatbot.main.order_store") as store, \
+                patch("chatbot.main.push_service") as push:
+            ledger.commit_order_async = AsyncMock(return_value=1)
+            store.set_status_async = AsyncMock(return_value={"id": "O1", "vendor_id": "vendor-1"})
+            push.notify_payment_received = AsyncMock()
+
+            responses = [client.post("/payments/webhook", json=payload) for _ in range(3)]
+
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert all(r.json() == {"status": "ok"} for r in responses)
+        ledger.commit_order_async.assert_awaited_once_with("O1")
+        store.set_status_async.assert_awaited_once_with("O1", "paid")
+        push.notify_payment_received.assert_awaited_once()
+
+    def test_whatsapp_message_is_processed_once(self, client):
+        """Test Meta redelivering a message doesn't answer the customer twice."""
+        payload = {"entry": [{"changes": [{"value": {"messages": [
+            {"from": "2348012345678", "id": "wamid.ABC", "type": "text", "text": {"body": "hi"}, "timestamp": "1"}
+        ]}}]}]}
+        with patch("chatbot.routers.whatsapp.process_whatsapp_message", new=AsyncMock()) as process:
+            first = client.post("/whatsapp/webhook", json=payload)
+            second = client.post("/whatsapp/webhook", json=payload)
+
+        assert first.json()["messages_processed"] == 1
+        assert second.json()["messages_processed"] == 0
+        process.assert_awaited_once()
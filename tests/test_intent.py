@@ -1,6 +1,7 @@
 """Unit tests for intent recognition."""
 import pytest
 from chatbot.intent import IntentRecognizer, Intent
+from chatbot.keyword_automaton import KeywordAutomaton
 
 
 @pytest.fixture
@@ -77,6 +78,85 @@ class TestIntentRecognition:
         for msg in messages:
             assert recognizer.recognize(msg) == Intent.UNKNOWN
 
+    
+    def test_fuzzy_typos(self, recognizer):
+        """Test misspelt keywords are still recognized."""
+        assert recognizer.recognize("prise of bag") == Intent.PRICE_INQUIRY
+        assert recognizer.recognize("hellp") == Intent.HELP
+        assert recognizer.recognize("transfered") == Intent.PAYMENT_CONFIRMATION
+
+
+class TestIntentPriority:
+    """Test which intent wins when a message matches several."""
+    
+    @pytest.mark.parametrize("message,intent", [
+        # Help comes first...
+        ("help me, how much is the bag", Intent.HELP),
+        ("how do I pay for the sneakers", Intent.HELP),
+        # ...unless the message also confirms a purchase
+        ("yes please help", Intent.PURCHASE),
+        ("how much? yes send link", Intent.PURCHASE),
+        # "I want" + "buy" is a purchase, "I want" alone is not
+        ("i want to buy shoes", Intent.PURCHASE),
+        ("i want shoes", Intent.UNKNOWN),
+        # Price before availability before payment before order status before greeting
+        ("how much do you have in stock", Intent.PRICE_INQUIRY),
+        ("hi, how much", Intent.PRICE_INQUIRY),
+        ("do you have my order", Intent.AVAILABILITY_CHECK),
+        ("I paid, where is my order", Intent.PAYMENT_CONFIRMATION),
+        ("good morning, my order", Intent.ORDER_STATUS),
+        # A greeting mentioning a product is an availability check
+        ("hello, canvas", Intent.AVAILABILITY_CHECK),
+        ("hello", Intent.GREETING),
+        # A fuzzy match to an earlier intent beats an exact match to a later one
+        ("helo", Intent.HELP),
+    ])
+    def test_priority_order(self, recognizer, message, intent):
+        """Test the priority order of intents."""
+        assert recognizer.recognize(message) == intent
+    
+    @pytest.mark.parametrize("message", [
+        "Hello", "how much is the red sneakers?", "abeg you get black bag", "I don transfer the money",
+        "wher is my ordr", "prise for jeans", "avalable?", "gud morning", "delivry to ikeja", "asdfghjkl"
+    ])
+    def test_same_matches_as_per_list_matching(self, recognizer, message):
+        """Test the automaton and keyword index agree with matching each keyword list separately."""
+        message = message.lower()
+        found = recognizer._automaton.groups_in(message)
+        fuzzy = frozenset().union(*map(recognizer._fuzzy_intents, message.split()))
+        for intent, keywords in [
+            (Intent.HELP, recognizer.HELP_KEYWORDS),
+            (Intent.PRICE_INQUIRY, recognizer.PRICE_KEYWORDS),
+            (Intent.AVAILABILITY_CHECK, recognizer.AVAILABILITY_KEYWORDS),
+            (Intent.PAYMENT_CONFIRMATION, recognizer.PAYMENT_CONFIRMATION_KEYWORDS),
+            (Intent.ORDER_STATUS, recognizer.ORDER_STATUS_KEYWORDS),
+            (Intent.GREETING, recognizer.GREETING_KEYWORDS),
+        ]:
+            assert (intent in found or intent in fuzzy) == recognizer._matches_keywords(message, keywords)
+
+
+class TestKeywordAutomaton:
+    """Test the multi-pattern matcher."""
+    
+    def test_finds_overlapping_and_nested_keywords(self):
+        """Test keywords inside other keywords and across group boundaries are all found."""
+        automaton = KeywordAutomaton({
+            "price": ["how much", "how much be"],
+            "greeting": ["how far", "hi"],
+            "order": ["my order", "order status"],
+        })
+        assert automaton.groups_in("this my order status") == {"greeting", "order"}
+        assert automaton.groups_in("how much be am") == {"price"}
+        assert automaton.groups_in("hoW far") == set()
+        assert automaton.groups_in("") == set()
+    
+    def test_matches_substring_search(self):
+        """Test the automaton agrees with `keyword in text` for every group."""
+        groups = {"a": ["she", "he", "hers"], "b": ["his", "is"], "c": ["sh", "ers"]}
+        automaton = KeywordAutomaton(groups)
+        for text in ["ushers", "this", "shis", "hhe", "h", "sse"]:
+            expected = {group for group, keywords in groups.items() if any(k in text for k in keywords)}
+            assert automaton.groups_in(text) == expected
 
 class TestProductExtraction:
     """Test product query extraction."""
@@ -0,0 +1,233 @@
+"""Tests for the incremental per-vendor dashboard/widget counters."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot import main
+from chatbot.catalog import CatalogStore
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.models import Base, Order, Product as ProductModel, User as UserModel, VendorCounters
+from chatbot.services import order_counters as counters_module
+from chatbot.services.order_counters import OrderCounters
+from chatbot.services.order_store import OrderStore
+
+
+def make_order(order_id, customer="+2348100000001", amount=10000.0):
+    return {
+        "id": order_id,
+        "customer_phone": customer,
+        "items": [],
+        "total_amount": amount,
+        "status": "pending",
+        "payment_ref": None,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database with 3 products, one of them low on stock."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+    monkeypatch.setattr("chatbot.services.order_store.order_counters", OrderCounters(low_stock_threshold=5))
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=20))
+    db.add(ProductModel(id="bag", user_id=DEFAULT_USER_ID, name="Leather Bag", price_ngn=20000, stock_level=2))
+    db.add(ProductModel(id="watch", user_id=DEFAULT_USER_ID, name="Wrist Watch", price_ngn=9000, stock_level=10))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def read_row(factory):
+    db = factory()
+    try:
+        row = db.query(VendorCounters).filter(VendorCounters.user_id == DEFAULT_USER_ID).one()
+        return {name: getattr(row, name) for name in counters_module.COUNTER_FIELDS}
+    finally:
+        db.close()
+
+
+class TestTransitions:
+    """Test order writes keep the counters row in step."""
+
+    def test_create_pay_fulfil_cancel(self, session_factory):
+        """Test every transition moves the right counters."""
+        store = OrderStore()
+        for i, customer in enumerate(["+2348100000001", "+2348100000001", "+2348100000002"]):
+            store.add(make_order(f"O{i}", customer), vendor_id=DEFAULT_USER_ID)
+
+        row = read_row(session_factory)
+        assert (row["pending_orders"], row["total_orders"], row["unique_customers"]) == (3, 3, 2)
+        assert (row["product_count"], row["low_stock_count"]) == (3, 1)
+
+        asyncio.run(store.set_status_async("O0", "paid"))
+        asyncio.run(store.set_status_async("O1", "paid"))
+        asyncio.run(store.set_status_async("O1", "fulfilled"))
+        asyncio.run(store.set_status_async("O2", "cancelled"))
+
+        row = read_row(session_factory)
+        assert row["pending_orders"] == 0
+        assert (row["paid_orders"], row["fulfilled_orders"], row["cancelled_orders"]) == (1, 1, 1)
+        assert row["total_revenue"] == 20000.0
+        assert (row["orders_today"], row["revenue_today"]) == (2, 20000.0)
+
+    def test_repeated_status_is_not_double_counted(self, session_factory):
+        """Test a redelivered "paid" doesn't count twice."""
+        store = OrderStore()
+        store.add(make_order("O0"), vendor_id=DEFAULT_USER_ID)
+        asyncio.run(store.set_status_async("O0", "paid"))
+        asyncio.run(OrderStore().set_status_async("O0", "paid"))
+
+        row = read_row(session_factory)
+        assert (row["paid_orders"], row["total_revenue"], row["orders_today"]) == (1, 10000.0, 1)
+
+    def test_old_order_paid_today_is_not_today(self, session_factory):
+        """Test today's numbers only count orders created today."""
+        store = OrderStore()
+        store.add(make_order("OLD"), vendor_id=DEFAULT_USER_ID)
+        db = session_factory()
+        db.query(Order).filter(Order.id == "OLD").update({"created_at": datetime.utcnow() - timedelta(days=2)})
+        db.commit()
+        db.close()
+
+        asyncio.run(store.set_status_async("OLD", "paid"))
+        row = read_row(session_factory)
+        assert row["total_revenue"] == 10000.0
+        assert row["orders_today"] == 0
+
+    def test_counter_failure_keeps_the_order(self, session_factory, monkeypatch):
+        """Test a broken counters update can't roll back the order write."""
+        def broken(self, db, vendor_id):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(OrderCounters, "_recount", broken)
+        OrderStore().add(make_order("O0"), vendor_id=DEFAULT_USER_ID)
+
+        db = session_factory()
+        try:
+            assert db.query(Order).filter(Order.id == "O0").count() == 1
+        finally:
+            db.close()
+
+
+class TestReads:
+    """Test the O(1) read path."""
+
+    def test_missing_row_is_built(self, session_factory):
+        """Test a vendor with no row gets one by recount."""
+        counters = asyncio.run(OrderCounters().get_async(DEFAULT_USER_ID))
+        assert counters["product_count"] == 3
+        assert counters["counters_day"] == datetime.utcnow().date()
+        assert read_row(session_factory)["product_count"] == 3
+
+    def test_yesterdays_numbers_read_as_zero(self, session_factory):
+        """Test today's counters reset when the stored day is over."""
+        store = OrderStore()
+        store.add(make_order("O0"), vendor_id=DEFAULT_USER_ID)
+        asyncio.run(store.set_status_async("O0", "paid"))
+        db = session_factory()
+        db.query(VendorCounters).update({"counters_day": datetime.utcnow().date() - timedelta(days=1)})
+        db.commit()
+        db.close()
+
+        counters = asyncio.run(OrderCounters().get_async(DEFAULT_USER_ID))
+        assert (counters["orders_today"], counters["revenue_today"]) == (0, 0)
+        assert counters["paid_orders"] == 1
+
+    def test_database_down(self, monkeypatch):
+        """Test a failed read returns None so endpoints can fall back."""
+        def broken():
+            raise RuntimeError("database unreachable")
+
+        monkeypatch.setattr("chatbot.database.SessionLocal", broken)
+        monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+        assert asyncio.run(OrderCounters().get_async(DEFAULT_USER_ID)) is None
+
+    def test_widget_and_dashboard_read_counters(self, session_factory, monkeypatch):
+        """Test the endpoints serve the counters row without loading the catalog."""
+        monkeypatch.setattr(main, "order_counters", OrderCounters(low_stock_threshold=5))
+        store = OrderStore()
+        store.add(make_order("O0"), vendor_id=DEFAULT_USER_ID)
+        store.add(make_order("O1"), vendor_id=DEFAULT_USER_ID)
+        asyncio.run(store.set_status_async("O0", "paid"))
+
+        async def no_catalog():
+            raise AssertionError("widget loaded the catalog")
+
+        monkeypatch.setattr(main.inventory_manager, "list_products_async", no_catalog)
+        widget = asyncio.run(main.get_widget_stats())
+        assert widget["orders_today"] == 1
+        assert widget["revenue_today"] == 10000.0
+        assert widget["pending_orders"] == 1
+        assert widget["low_stock_alerts"] == 1
+
+        summary = asyncio.run(main.get_dashboard_summary())
+        assert summary["total_products"] == 3
+        assert summary["total_orders"] == 2
+        assert summary["unique_customers"] == 1
+
+
+class TestStockChanges:
+    """Test catalog writes refresh the stock counters."""
+
+    def test_catalog_write_recounts_low_stock(self, session_factory, monkeypatch):
+        """Test a bump schedules one recount shortly after."""
+        monkeypatch.setattr(counters_module, "catalog_store", CatalogStore())
+        monkeypatch.setattr(counters_module, "STOCK_REFRESH_DELAY_SECONDS", 0.01)
+        counters = OrderCounters(low_stock_threshold=5)
+        asyncio.run(counters.get_async(DEFAULT_USER_ID))
+
+        db = session_factory()
+        db.query(ProductModel).filter(ProductModel.id == "watch").update({"stock_level": 1})
+        db.commit()
+        db.close()
+
+        async def go():
+            counters.start()
+            try:
+                # From a worker thread, like InventoryManager writes under run_db
+                await asyncio.to_thread(counters_module.catalog_store.bump, DEFAULT_USER_ID)
+                counters_module.catalog_store.bump(DEFAULT_USER_ID)
+                await asyncio.sleep(0.2)
+            finally:
+                await counters.stop()
+
+        asyncio.run(go())
+        assert read_row(session_factory)["low_stock_count"] == 2
+
+
+class TestReconciliation:
+    """Test the reconciliation job repairs drift."""
+
+    def test_reconcile_fixes_drift(self, session_factory):
+        """Test a corrupted row is recomputed and the drift reported."""
+        store = OrderStore()
+        store.add(make_order("O0"), vendor_id=DEFAULT_USER_ID)
+        asyncio.run(store.set_status_async("O0", "paid"))
+        db = session_factory()
+        db.query(VendorCounters).update({"paid_orders": 7, "total_revenue": 1.0})
+        db.commit()
+        db.close()
+
+        drifted = asyncio.run(OrderCounters(low_stock_threshold=5).reconcile_async())
+        assert drifted[DEFAULT_USER_ID]["paid_orders"] == (7, 1)
+        row = read_row(session_factory)
+        assert (row["paid_orders"], row["total_revenue"]) == (1, 10000.0)
+
+    def test_reconcile_creates_rows_and_is_quiet_when_correct(self, session_factory):
+        """Test missing rows are created and a correct row reports no drift."""
+        counters = OrderCounters(low_stock_threshold=5)
+        assert asyncio.run(counters.reconcile_async()) == {}
+        assert read_row(session_factory)["product_count"] == 3
+        assert asyncio.run(counters.reconcile_async()) == {}
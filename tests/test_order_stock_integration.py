@@ -1,8 +1,9 @@
 """Integration tests for order creation and stock management - critical for preventing overselling."""
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from chatbot.main import app
+from chatbot.inventory import InsufficientStockError, ProductNotFoundError
 
 
 @pytest.fixture
@@ -15,6 +16,8 @@ def client():
 def mock_inventory():
     """Mock inventory manager."""
     with patch('chatbot.main.inventory_manager') as mock:
+        # The request path awaits the async search; answer it from the sync mock
+        mock.smart_search_products_async = AsyncMock(side_effect=lambda query: mock.smart_search_products(query))
         yield mock
 
 
@@ -61,16 +64,14 @@ class TestOrderCreationWithStock:
     """Test order creation with stock validation and decrement."""
 
     def test_create_order_successful_stock_decrement(self, client, mock_inventory, mock_payment):
-        """Test successful order creation decrements stock."""
-        # Mock product lookup
+        """Test successful order creation reserves stock in one call."""
         mock_product = {
             "id": "product-123",
             "name": "Test Product",
             "price_ngn": 10000,
-            "stock_level": 5
+            "stock_level": 3
         }
-        mock_inventory.get_product_by_id.return_value = mock_product
-        mock_inventory.decrement_stock.return_value = True
+        mock_inventory.reserve_items_async = AsyncMock(return_value={"product-123": mock_product})
         mock_payment.generate_payment_link.return_value = "https://payment.link/test"
 
         response = client.post("/orders", json={
@@ -82,17 +83,15 @@ class TestOrderCreationWithStock:
         data = response.json()
         assert "order_id" in data
         assert data["amount_ngn"] == 20000  # 2 * 10000
-        mock_inventory.decrement_stock.assert_called_once_with("product-123", 2)
+        mock_inventory.reserve_items_async.assert_awaited_once()
+        assert mock_inventory.reserve_items_async.call_args[0][0] == [("product-123", 2)]
+        mock_inventory.decrement_stock.assert_not_called()
 
     def test_create_order_insufficient_stock(self, client, mock_inventory):
         """Test order creation fails with insufficient stock."""
-        mock_product = {
-            "id": "product-123",
-            "name": "Test Product",
-            "price_ngn": 10000,
-            "stock_level": 1  # Only 1 available
-        }
-        mock_inventory.get_product_by_id.return_value = mock_product
+        mock_inventory.reserve_items_async = AsyncMock(side_effect=InsufficientStockError(
+            "product-123", "Test Product", available=1, requested=5
+        ))
 
         response = client.post("/orders", json={
             "items": [{"product_id": "product-123", "quantity": 5}],  # Request 5
@@ -104,15 +103,8 @@ class TestOrderCreationWithStock:
         assert "insufficient stock" in data["detail"].lower()
 
     def test_create_order_stock_decrement_failure_rollback(self, client, mock_inventory, mock_payment):
-        """Test stock decrement failure rolls back payment link."""
-        mock_product = {
-            "id": "product-123",
-            "name": "Test Product",
-            "price_ngn": 10000,
-            "stock_level": 5
-        }
-        mock_inventory.get_product_by_id.return_value = mock_product
-        mock_inventory.decrement_stock.return_value = False  # Stock decrement fails
+        """Test a failed reservation never generates a payment link."""
+        mock_inventory.reserve_items_async = AsyncMock(side_effect=Exception("deadlock detected"))
         mock_payment.generate_payment_link.return_value = "https://payment.link/test"
 
         response = client.post("/orders", json={
@@ -121,7 +113,7 @@ class TestOrderCreationWithStock:
         })
 
         assert response.status_code == 500
-        # Should not have called payment generation if stock decrement failed
+        # Should not have called payment generation if stock reservation failed
         mock_payment.generate_payment_link.assert_not_called()
 
 
@@ -259,16 +251,16 @@ class TestErrorHandling:
     """Test error handling in order creation and stock management."""
 
     def test_order_creation_handles_payment_link_failure(self, client, mock_inventory, mock_payment):
-        """Test order creation handles payment link generation failure."""
+        """Test order creation releases stock when payment link generation fails."""
         mock_product = {
             "id": "product-123",
             "name": "Test Product",
             "price_ngn": 10000,
-            "stock_level": 5
+            "stock_level": 4
         }
 
-        mock_inventory.get_product_by_id.return_value = mock_product
-        mock_inventory.decrement_stock.return_value = True
+        mock_inventory.reserve_items_async = AsyncMock(return_value={"product-123": mock_product})
+        mock_inventory.release_items_async = AsyncMock(return_value=True)
         mock_payment.generate_payment_link.return_value = None  # Payment link fails
 
         response = client.post("/orders", json={
@@ -279,10 +271,11 @@ class TestErrorHandling:
         assert response.status_code == 500
         data = response.json()
         assert "payment link" in data["detail"].lower()
+        mock_inventory.release_items_async.assert_awaited_once_with([("product-123", 1)])
 
     def test_invalid_product_id_handled(self, client, mock_inventory):
         """Test invalid product ID is handled gracefully."""
-        mock_inventory.get_product_by_id.return_value = None
+        mock_inventory.reserve_items_async = AsyncMock(side_effect=ProductNotFoundError("invalid-id"))
 
         response = client.post("/orders", json={
             "items": [{"product_id": "invalid-id", "quantity": 1}],
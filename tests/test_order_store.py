@@ -0,0 +1,211 @@
+"""Tests for the indexed order store."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.models import Base, Order, OrderItem, Product as ProductModel, User as UserModel
+from chatbot.services.order_store import OrderStore
+
+
+def make_order(order_id, customer="+2348100000001", status="pending", amount=15000.0, created_at=None):
+    return {
+        "id": order_id,
+        "customer_phone": customer,
+        "items": [{
+            "product_id": "sneakers",
+            "product_name": "Red Sneakers",
+            "quantity": 1,
+            "price": amount,
+            "total": amount
+        }],
+        "total_amount": amount,
+        "status": status,
+        "payment_ref": None,
+        "created_at": (created_at or datetime.utcnow()).isoformat()
+    }
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database used through the thread-pool fallback of run_db."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=5))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def no_database(monkeypatch):
+    """Every database call fails."""
+    def broken():
+        raise RuntimeError("database unreachable")
+
+    monkeypatch.setattr("chatbot.database.SessionLocal", broken)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+
+
+class TestIndexes:
+    """Test the in-memory secondary indexes."""
+
+    def test_latest_pending_for_customer(self):
+        """Test the newest pending order wins and other customers don't leak in."""
+        store = OrderStore()
+        store.add(make_order("A1"), persist=False)
+        store.add(make_order("B1", customer="+2348100000002"), persist=False)
+        store.add(make_order("A2"), persist=False)
+
+        assert store.latest_pending_for_customer("+2348100000001")["id"] == "A2"
+        assert store.latest_pending_for_customer("+2348100000002")["id"] == "B1"
+        assert store.latest_pending_for_customer("+2348100000009") is None
+
+    def test_status_change_moves_indexes(self, no_database):
+        """Test paying an order takes it out of pending and into paid."""
+        store = OrderStore()
+        store.add(make_order("A1"), persist=False)
+        store.add(make_order("A2"), persist=False)
+
+        order = asyncio.run(store.set_status_async("A2", "paid"))
+        assert order["status"] == "paid"
+        assert order["paid_at"]
+        assert store.latest_pending_for_customer("+2348100000001")["id"] == "A1"
+        assert (store.count("pending"), store.count("paid")) == (1, 1)
+
+        asyncio.run(store.set_status_async("A1", "paid"))
+        assert store.latest_pending_for_customer("+2348100000001") is None
+        assert store.revenue() == 30000.0
+
+    def test_created_on(self):
+        """Test the day index filters by day and status."""
+        store = OrderStore()
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        store.add(make_order("T1", status="paid"), persist=False)
+        store.add(make_order("T2"), persist=False)
+        store.add(make_order("Y1", status="paid", created_at=yesterday), persist=False)
+
+        assert {o["id"] for o in store.created_on(datetime.utcnow().date())} == {"T1", "T2"}
+        assert [o["id"] for o in store.created_on(datetime.utcnow().date(), statuses=["paid"])] == ["T1"]
+        assert [o["id"] for o in store.created_on(yesterday.date())] == ["Y1"]
+
+    def test_prune_keeps_pending_and_recent_orders(self):
+        """Test pruning evicts only settled orders older than the window."""
+        store = OrderStore()
+        old = datetime.utcnow() - timedelta(days=10)
+        store.add(make_order("OLD-PAID", status="paid", created_at=old), persist=False)
+        store.add(make_order("OLD-PENDING", created_at=old), persist=False)
+        store.add(make_order("NEW-PAID", status="paid", created_at=datetime.utcnow()), persist=False)
+
+        assert store.prune() == 1
+        assert "OLD-PAID" not in store
+        assert "OLD-PENDING" in store and "NEW-PAID" in store
+        assert store.created_on(old.date()) == [store.get("OLD-PENDING")]
+        assert store.revenue() == 15000.0
+        assert store.latest_pending_for_customer("+2348100000001")["id"] == "OLD-PENDING"
+
+    def test_day_rollover_evicts_old_orders(self, monkeypatch):
+        """Test the first write of a new UTC day prunes orders that fell out of the window."""
+        store = OrderStore()
+        start = datetime.utcnow()
+        store.add(make_order("DAY1", status="paid", created_at=start), persist=False)
+        store.add(make_order("DAY1-PENDING", created_at=start), persist=False)
+
+        later = start.date() + timedelta(days=2)
+        monkeypatch.setattr("chatbot.services.order_store.utc_today", lambda: later)
+        store.add(make_order("DAY3", status="paid", created_at=start + timedelta(days=2)), persist=False)
+
+        assert "DAY1" not in store
+        assert "DAY1-PENDING" in store and "DAY3" in store
+        assert len(store) == 2
+
+    def test_unknown_order(self, no_database):
+        """Test an order nobody has returns None."""
+        assert asyncio.run(OrderStore().set_status_async("missing", "paid")) is None
+
+
+class TestPersistence:
+    """Test the store writes through to the orders table."""
+
+    def test_add_persists_order_and_items(self, session_factory):
+        """Test add() writes the order and its items."""
+        OrderStore().add(make_order("A1"), vendor_id=DEFAULT_USER_ID)
+
+        db = session_factory()
+        try:
+            order = db.query(Order).filter(Order.id == "A1").one()
+            assert order.status == "pending"
+            assert order.user_id == DEFAULT_USER_ID
+            assert db.query(OrderItem).filter(OrderItem.order_id == "A1").count() == 1
+        finally:
+            db.close()
+
+    def test_add_async_and_status_persist(self, session_factory):
+        """Test status changes reach the database."""
+        store = OrderStore()
+        asyncio.run(store.add_async(make_order("A1"), vendor_id=DEFAULT_USER_ID))
+        asyncio.run(store.set_status_async("A1", "paid"))
+
+        db = session_factory()
+        try:
+            order = db.query(Order).filter(Order.id == "A1").one()
+            assert order.status == "paid"
+            assert order.paid_at is not None
+        finally:
+            db.close()
+
+    def test_database_failure_keeps_order_in_memory(self, no_database):
+        """Test checkout isn't blocked by a failed write."""
+        store = OrderStore()
+        store.add(make_order("A1"), vendor_id=DEFAULT_USER_ID)
+        assert store.latest_pending_for_customer("+2348100000001")["id"] == "A1"
+
+    def test_find_pending_falls_back_to_database(self, session_factory):
+        """Test an order placed by another worker is found and then indexed."""
+        OrderStore().add(make_order("A1"), vendor_id=DEFAULT_USER_ID)
+        store = OrderStore()
+
+        order = asyncio.run(store.find_pending_async("+2348100000001"))
+        assert order["id"] == "A1"
+        assert order["items"][0]["product_name"] == "Red Sneakers"
+        assert store.latest_pending_for_customer("+2348100000001")["id"] == "A1"
+
+    def test_status_change_for_order_from_another_worker(self, session_factory):
+        """Test updating an order this worker never saw loads it."""
+        OrderStore().add(make_order("A1"), vendor_id=DEFAULT_USER_ID)
+        store = OrderStore()
+
+        order = asyncio.run(store.set_status_async("A1", "fulfilled"))
+        assert order["status"] == "fulfilled"
+        assert store.count("fulfilled") == 1
+
+    def test_load_hydrates_pending_and_recent(self, session_factory):
+        """Test startup loads pending orders of any age and today's orders."""
+        writer = OrderStore()
+        writer.add(make_order("OLD-PENDING"), vendor_id=DEFAULT_USER_ID)
+        writer.add(make_order("OLD-PAID", status="paid"), vendor_id=DEFAULT_USER_ID)
+        writer.add(make_order("NEW-PAID", status="paid"), vendor_id=DEFAULT_USER_ID)
+        db = session_factory()
+        old = datetime.utcnow() - timedelta(days=10)
+        db.query(Order).filter(Order.id.in_(["OLD-PENDING", "OLD-PAID"])).update(
+            {"created_at": old}, synchronize_session=False
+        )
+        db.commit()
+        db.close()
+
+        store = OrderStore()
+        assert asyncio.run(store.load_async()) == 2
+        assert "OLD-PENDING" in store and "NEW-PAID" in store
+        assert "OLD-PAID" not in store
+        assert store.latest_pending_for_customer("+2348100000001")["id"] == "OLD-PENDING"
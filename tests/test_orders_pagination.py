@@ -0,0 +1,129 @@
+"""Tests for the vendor-scoped, keyset-paginated GET /orders."""
+import asyncio
+from datetime import date, datetime, timedelta
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot import cache, main
+from chatbot.cache import LRUCache
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.models import Base, Order, OrderItem, Product as ProductModel, User as UserModel
+from chatbot.services.order_store import OrderStore
+
+OTHER_VENDOR = "bbbbbbbb-0000-0000-0000-000000000002"
+START = datetime(2026, 3, 1, 9, 0, 0)
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database with 7 orders for the default vendor and 2 for another."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+    monkeypatch.setattr(cache, "_l1", LRUCache())
+    monkeypatch.setattr(cache, "_redis_available", False)
+    monkeypatch.setattr(cache, "_generations", {})
+    monkeypatch.setattr(main, "order_store", OrderStore())
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(UserModel(id=OTHER_VENDOR, phone="+2348000000002"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=5))
+    for i in range(7):
+        # Orders 3 and 4 share a timestamp: the id breaks the tie
+        created_at = START + timedelta(days=min(i, 3) if i < 5 else i)
+        status = "paid" if i % 2 else "pending"
+        db.add(Order(id=f"A{i}", user_id=DEFAULT_USER_ID, customer_phone="+2348100000001",
+                     total_amount=15000, status=status, created_at=created_at))
+        db.add(OrderItem(order_id=f"A{i}", product_id="sneakers", product_name="Red Sneakers",
+                         quantity=1, price=15000, total=15000))
+    for i in range(2):
+        db.add(Order(id=f"B{i}", user_id=OTHER_VENDOR, customer_phone="+2348100000002",
+                     total_amount=5000, status="paid", created_at=START + timedelta(days=i)))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def fetch(**params):
+    response = Response()
+    params.setdefault("limit", main.ORDERS_PAGE_SIZE)
+    orders = asyncio.run(main.get_orders(response, **params))
+    return orders, response.headers.get("X-Next-Cursor")
+
+
+class TestOrdersPagination:
+    """Test keyset pagination over (created_at, id)."""
+
+    def test_scoped_to_vendor(self, session_factory):
+        """Test only the requested vendor's orders come back, newest first."""
+        orders, cursor = fetch()
+        assert [o["id"] for o in orders] == ["A6", "A5", "A4", "A3", "A2", "A1", "A0"]
+        assert cursor is None
+        assert orders[0]["items"][0]["product_name"] == "Red Sneakers"
+
+        orders, _ = fetch(user_id=OTHER_VENDOR)
+        assert [o["id"] for o in orders] == ["B1", "B0"]
+
+    def test_cursor_walks_every_order_once(self, session_factory):
+        """Test pages don't skip or repeat orders, including timestamp ties."""
+        seen = []
+        cursor = None
+        while True:
+            orders, cursor = fetch(limit=2, cursor=cursor)
+            seen.extend(o["id"] for o in orders)
+            if cursor is None:
+                break
+        assert seen == ["A6", "A5", "A4", "A3", "A2", "A1", "A0"]
+
+    def test_status_and_date_filters(self, session_factory):
+        """Test status and inclusive date range filters."""
+        orders, _ = fetch(status="PAID")
+        assert [o["id"] for o in orders] == ["A5", "A3", "A1"]
+
+        orders, _ = fetch(since=date(2026, 3, 2), until=date(2026, 3, 4))
+        assert [o["id"] for o in orders] == ["A4", "A3", "A2", "A1"]
+
+    def test_invalid_cursor(self, session_factory):
+        """Test a garbled cursor is a 400, not a 500."""
+        with pytest.raises(HTTPException) as exc:
+            fetch(cursor="not-a-cursor")
+        assert exc.value.status_code == 400
+
+    def test_write_invalidates_vendor_pages(self, session_factory):
+        """Test a status change shows up on the next read."""
+        orders, _ = fetch(status="paid")
+        assert len(orders) == 3
+
+        asyncio.run(main.update_order_status("A0", main.OrderStatusUpdate(status="paid")))
+        orders, _ = fetch(status="paid")
+        assert [o["id"] for o in orders] == ["A5", "A3", "A1", "A0"]
+
+    def test_memory_fallback_pages(self, session_factory, monkeypatch):
+        """Test the same paging works from memory when the database is down."""
+        for i in range(3):
+            main.order_store.add({
+                "id": f"M{i}",
+                "customer_phone": "+2348100000001",
+                "items": [],
+                "total_amount": 1000,
+                "status": "pending",
+                "created_at": (START + timedelta(hours=i)).isoformat()
+            }, persist=False)
+
+        def broken():
+            raise RuntimeError("database unreachable")
+
+        monkeypatch.setattr("chatbot.database.SessionLocal", broken)
+        orders, cursor = fetch(limit=2)
+        assert [o["id"] for o in orders] == ["M2", "M1"]
+        orders, cursor = fetch(limit=2, cursor=cursor)
+        assert [o["id"] for o in orders] == ["M0"]
+        assert cursor is None
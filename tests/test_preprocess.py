@@ -0,0 +1,107 @@
+"""Unit tests for the shared message preprocessing."""
+from unittest.mock import MagicMock
+from chatbot.intent import IntentRecognizer, Intent
+from chatbot.preprocess import PreprocessedMessage, preprocess
+from chatbot.response_formatter import ResponseFormatter
+from chatbot.routers.whatsapp import generate_chatbot_response
+from chatbot.services.localization import Language, localization_service
+
+
+class TestPreprocessedMessage:
+    """Test the parts worked out once per message."""
+
+    def test_normalized_and_tokens(self):
+        """Test the text is lowercased, stripped and split once."""
+        message = preprocess("  Do you have RED Sneakers?  ")
+        assert message.text == "  Do you have RED Sneakers?  "
+        assert message.normalized == "do you have red sneakers?"
+        assert message.tokens == ["do", "you", "have", "red", "sneakers?"]
+        assert message.clean_tokens == ["do", "you", "have", "red", "sneakers"]
+
+    def test_preprocess_reuses_a_preprocessed_message(self):
+        """Test stages handed a PreprocessedMessage don't build another."""
+        message = PreprocessedMessage("hello")
+        assert preprocess(message) is message
+
+    def test_pidgin_fillers(self):
+        """Test Pidgin filler words are flagged."""
+        assert preprocess("Abeg, you get red shoe?").pidgin_fillers == {"abeg", "you"}
+        assert preprocess("Abeg, you get red shoe?").has_pidgin_fillers
+        assert not preprocess("red shoes").has_pidgin_fillers
+
+    def test_language(self):
+        """Test the language comes from whole words and word pairs, once per message."""
+        message = preprocess("Wetin be the price abeg")
+        assert message.language == Language.PIDGIN
+        assert message.language is message.language
+        assert preprocess("Sannu, yaya").language == Language.HAUSA
+        assert preprocess("No vex, I dey come").language == Language.PIDGIN
+        assert preprocess("How much is it").language == Language.ENGLISH
+        # Keywords inside other words don't count
+        assert preprocess("I want banana").language == Language.ENGLISH
+
+    def test_product_query(self):
+        """Test the product query drops fillers, punctuation and single letters."""
+        message = preprocess("Abeg una get the blue jeans?")
+        assert message.product_query_tokens == ["blue", "jeans"]
+        assert message.product_query == "blue jeans"
+        assert preprocess("hi").product_query == "hi"
+        assert preprocess("you get am?").product_query is None
+
+    def test_product_query_message_reuses_the_query_tokens(self):
+        """Test search gets the query as a message without it being split again."""
+        message = preprocess("Abeg una get the BLUE jeans?")
+        query = message.product_query_message
+        assert query is message.product_query_message
+        assert query.tokens is message.product_query_tokens
+        assert (query.normalized, query.tokens) == (PreprocessedMessage("blue jeans").normalized, ["blue", "jeans"])
+        assert preprocess(query) is query
+        assert preprocess("you get am?").product_query_message is None
+
+
+class TestPipelineStages:
+    """Test stages give the same answer for a string and its PreprocessedMessage."""
+
+    def test_intent_and_product_query(self):
+        """Test recognize() and extract_product_query() accept either."""
+        recognizer = IntentRecognizer()
+        for text in ["How much is the blue jeans?", "I paid", "abeg you get sneakers", "hello"]:
+            message = preprocess(text)
+            assert recognizer.recognize(message) == recognizer.recognize(text)
+            assert recognizer.extract_product_query(message) == recognizer.extract_product_query(text)
+            for keywords in (recognizer.PRICE_KEYWORDS, recognizer.GREETING_KEYWORDS):
+                assert recognizer._matches_keywords(message, keywords) == \
+                    recognizer._matches_keywords(message.normalized, keywords)
+
+    def test_language_detection(self):
+        """Test detect_language() accepts either and reads the message's language."""
+        for text in ["Wetin be the price abeg", "Sannu, yaya", "How much is it"]:
+            message = preprocess(text)
+            assert localization_service.detect_language(message) == localization_service.detect_language(text)
+            assert localization_service.detect_language(text) == message.language
+
+    def test_whatsapp_response_searches_the_product_query(self):
+        """Test the WhatsApp reply looks up the message's product query."""
+        inventory = MagicMock()
+        inventory.smart_search_products.return_value = [
+            {"name": "Red Sneakers", "price_ngn": 25000, "stock_level": 3}
+        ]
+        message = preprocess("Abeg, how much be red sneakers?")
+
+        response = generate_chatbot_response(
+            Intent.PRICE_INQUIRY, message, inventory, ResponseFormatter()
+        )
+
+        inventory.smart_search_products.assert_called_once_with(message.product_query_message)
+        assert message.product_query_message.tokens == ["how", "much", "red", "sneakers"]
+        assert "Red Sneakers" in response
+
+    def test_replies_in_the_customers_language(self):
+        """Test greetings and fallbacks follow the message's language."""
+        formatter = ResponseFormatter()
+        assert generate_chatbot_response(
+            Intent.GREETING, preprocess("Sannu, yaya"), MagicMock(), formatter
+        ).startswith("Sannu!")
+        assert generate_chatbot_response(
+            Intent.GREETING, preprocess("hello"), MagicMock(), formatter
+        ).startswith(formatter.format_greeting())
@@ -0,0 +1,267 @@
+"""Tests for the daily per-vendor sales rollup behind profit/loss reports."""
+import asyncio
+import json
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot import cache
+from chatbot.cache import LRUCache
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.models import Base, DailyVendorRollup, Expense, Order, User as UserModel
+from chatbot.routers.expenses import ExpenseCreate, log_expense
+from chatbot.services.order_counters import OrderCounters
+from chatbot.services.order_store import OrderStore
+from chatbot.services.profit_loss import ProfitLossService, ReportPeriod
+from chatbot.services.sales_rollup import SalesRollup, sales_rollup
+from scripts.backfill_daily_rollup import backfill
+
+OTHER_VENDOR = "vendor-2"
+
+
+def make_order(order_id, amount=10000.0, customer="+2348100000001"):
+    return {
+        "id": order_id,
+        "customer_phone": customer,
+        "items": [],
+        "total_amount": amount,
+        "status": "pending",
+        "payment_ref": None,
+        "created_at": datetime.utcnow().isoformat()
+    }
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database with two vendors and a memory-only cache."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+    monkeypatch.setattr("chatbot.services.order_store.order_counters", OrderCounters(low_stock_threshold=5))
+    monkeypatch.setattr(cache, "_l1", LRUCache(max_entries=100, max_bytes=1 << 20))
+    monkeypatch.setattr(cache, "_redis_available", False)
+    monkeypatch.setattr(cache, "_generations", {})
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(UserModel(id=OTHER_VENDOR, phone="+2348000000001"))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def rollup_rows(factory):
+    db = factory()
+    try:
+        return {
+            (row.user_id, row.day): (row.order_count, row.revenue, row.expenses, json.loads(row.expense_breakdown or "{}"))
+            for row in db.query(DailyVendorRollup)
+        }
+    finally:
+        db.close()
+
+
+def add_history(factory, vendor_id, day, amount, status="paid", expense=None):
+    """Insert an order (and optionally an expense) on a past day, bypassing the rollup."""
+    db = factory()
+    created_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+    db.add(Order(
+        id=f"{vendor_id}-{day.isoformat()}-{amount}", user_id=vendor_id, customer_phone="+2348100000009",
+        total_amount=amount, status=status, created_at=created_at
+    ))
+    if expense:
+        category, expense_amount = expense
+        db.add(Expense(
+            id=f"E-{vendor_id}-{day.isoformat()}", user_id=vendor_id, amount=expense_amount,
+            description="", category=category, date=created_at
+        ))
+    db.commit()
+    db.close()
+    return created_at
+
+
+def write(factory, fn, *args):
+    db = factory()
+    try:
+        fn(db, *args)
+        db.commit()
+    finally:
+        db.close()
+
+
+class TestIncrementalRollup:
+    """Test order and expense writes keep the rollup in step."""
+
+    def test_paid_orders_are_counted_once(self, session_factory):
+        """Test only paid/fulfilled orders count, and fulfilment doesn't double count."""
+        store = OrderStore()
+        store.add(make_order("O1", 10000.0), vendor_id=DEFAULT_USER_ID)
+        store.add(make_order("O2", 5000.0), vendor_id=DEFAULT_USER_ID)
+        assert rollup_rows(session_factory) == {}
+
+        asyncio.run(store.set_status_async("O1", "paid"))
+        asyncio.run(store.set_status_async("O1", "fulfilled"))
+        asyncio.run(store.set_status_async("O2", "paid"))
+
+        today = datetime.utcnow().date()
+        assert rollup_rows(session_factory) == {(DEFAULT_USER_ID, today): (2, 15000.0, 0.0, {})}
+
+    def test_cancelling_a_paid_order_takes_it_back_out(self, session_factory):
+        """Test paid -> cancelled decrements the day."""
+        store = OrderStore()
+        store.add(make_order("O1", 10000.0), vendor_id=DEFAULT_USER_ID)
+        asyncio.run(store.set_status_async("O1", "paid"))
+        asyncio.run(store.set_status_async("O1", "cancelled"))
+
+        today = datetime.utcnow().date()
+        assert rollup_rows(session_factory)[(DEFAULT_USER_ID, today)][:2] == (0, 0.0)
+
+    def test_logged_expenses_are_added_by_category(self, session_factory):
+        """Test POST /expenses/log updates the expense total and breakdown."""
+        for amount, category in [(2000.0, "transport"), (500.0, "transport"), (3000.0, "rent")]:
+            asyncio.run(log_expense(ExpenseCreate(
+                amount=amount, description="", category=category, user_id=DEFAULT_USER_ID,
+                date="2026-01-15T09:00:00"
+            )))
+
+        assert rollup_rows(session_factory) == {
+            (DEFAULT_USER_ID, date(2026, 1, 15)): (0, 0.0, 5500.0, {"transport": 2500.0, "rent": 3000.0})
+        }
+
+
+class TestReports:
+    """Test profit/loss reports read the rollup."""
+
+    def test_week_report_sums_the_vendors_days(self, session_factory):
+        """Test a week report adds up rollup days for that vendor only."""
+        today = datetime.utcnow().date()
+        for days_ago, amount in [(1, 10000.0), (3, 20000.0), (20, 40000.0)]:
+            add_history(session_factory, DEFAULT_USER_ID, today - timedelta(days=days_ago), amount,
+                        expense=("rent", 1000.0))
+        add_history(session_factory, OTHER_VENDOR, today - timedelta(days=2), 99000.0)
+        backfill(session_factory)
+
+        report = ProfitLossService().get_profit_loss_report(ReportPeriod.WEEK, user_id=DEFAULT_USER_ID)
+
+        assert (report.order_count, report.total_revenue_ngn) == (2, 30000.0)
+        assert report.total_expenses_ngn == 2000.0
+        assert report.expense_breakdown == {"rent": 2000.0}
+        assert report.net_profit_ngn == 30000.0 * 0.5 - 2000.0
+
+    def test_custom_period_matches_raw_tables(self, session_factory):
+        """Test a custom period gives the same totals as aggregating orders and expenses."""
+        start = date(2026, 3, 1)
+        for offset in range(10):
+            add_history(session_factory, DEFAULT_USER_ID, start + timedelta(days=offset), 1000.0 * (offset + 1),
+                        expense=("stock", 100.0))
+        add_history(session_factory, DEFAULT_USER_ID, start + timedelta(days=4), 777.0, status="cancelled")
+        backfill(session_factory)
+
+        report = ProfitLossService().get_profit_loss_report(
+            ReportPeriod.CUSTOM, datetime(2026, 3, 3), datetime(2026, 3, 5, 23, 59, 59), user_id=DEFAULT_USER_ID
+        )
+
+        assert (report.order_count, report.total_revenue_ngn, report.total_expenses_ngn) == (3, 12000.0, 300.0)
+
+    def test_daily_summary_compares_today_with_yesterday(self, session_factory):
+        """Test the daily summary reads both days in one go and reports the trend."""
+        store = OrderStore()
+        store.add(make_order("O1", 30000.0), vendor_id=DEFAULT_USER_ID)
+        asyncio.run(store.set_status_async("O1", "paid"))
+        add_history(session_factory, DEFAULT_USER_ID, datetime.utcnow().date() - timedelta(days=1), 10000.0)
+        backfill(session_factory, DEFAULT_USER_ID)
+
+        summary = ProfitLossService().get_daily_summary(user_id=DEFAULT_USER_ID)
+
+        assert (summary.order_count, summary.revenue_ngn, summary.profit_ngn) == (1, 30000.0, 15000.0)
+        assert summary.profit_trend == "up"
+
+
+class TestClosedPeriodCache:
+    """Test closed periods are cached until a late write to them."""
+
+    def test_closed_period_is_served_from_cache(self, session_factory, monkeypatch):
+        """Test the second read of a closed period doesn't touch the rollup table."""
+        day = datetime.utcnow().date() - timedelta(days=10)
+        add_history(session_factory, DEFAULT_USER_ID, day, 5000.0)
+        backfill(session_factory)
+        rollup = SalesRollup()
+        sums = []
+        original_sum = rollup._sum
+        monkeypatch.setattr(rollup, "_sum", lambda *args: sums.append(args) or original_sum(*args))
+
+        db = session_factory()
+        try:
+            first = rollup.totals(db, DEFAULT_USER_ID, day, day)
+            second = rollup.totals(db, DEFAULT_USER_ID, day, day)
+        finally:
+            db.close()
+
+        assert first == second
+        assert first["revenue"] == 5000.0
+        assert len(sums) == 1
+
+    def test_late_write_to_a_past_day_drops_the_cached_period(self, session_factory):
+        """Test an old order paid today updates its creation day and the cached report."""
+        day = datetime.utcnow().date() - timedelta(days=10)
+        created_at = add_history(session_factory, DEFAULT_USER_ID, day, 5000.0)
+        backfill(session_factory)
+
+        def totals():
+            db = session_factory()
+            try:
+                return sales_rollup.totals(db, DEFAULT_USER_ID, day, day)
+            finally:
+                db.close()
+
+        assert totals()["revenue"] == 5000.0
+        write(session_factory, sales_rollup.record_order, DEFAULT_USER_ID, created_at, "pending", "paid", 2000.0)
+        assert totals()["revenue"] == 7000.0
+        write(session_factory, sales_rollup.record_expense, DEFAULT_USER_ID, day, "rent", 800.0)
+        assert totals()["expenses"] == 800.0
+
+    def test_uncommitted_write_keeps_the_cache(self, session_factory):
+        """Test a rolled-back write doesn't invalidate the cached period."""
+        day = datetime.utcnow().date() - timedelta(days=10)
+        created_at = add_history(session_factory, DEFAULT_USER_ID, day, 5000.0)
+        backfill(session_factory)
+        generations = dict(cache._generations)
+
+        db = session_factory()
+        try:
+            sales_rollup.record_order(db, DEFAULT_USER_ID, created_at, None, "paid", 2000.0)
+            db.rollback()
+        finally:
+            db.close()
+
+        # (The row itself isn't checked: pysqlite commits on SAVEPOINT release)
+        assert cache._generations == generations
+
+
+class TestRebuild:
+    """Test the backfill recomputes what incremental updates produce."""
+
+    def test_rebuild_matches_incremental(self, session_factory):
+        """Test rebuilding the rollup from raw tables gives the same rows."""
+        store = OrderStore()
+        for i, status in enumerate(["paid", "fulfilled", "cancelled", "pending", "paid"]):
+            store.add(make_order(f"O{i}", 1000.0 * (i + 1)), vendor_id=DEFAULT_USER_ID if i % 2 else OTHER_VENDOR)
+            if status != "pending":
+                asyncio.run(store.set_status_async(f"O{i}", "paid"))
+                asyncio.run(store.set_status_async(f"O{i}", status))
+        asyncio.run(log_expense(ExpenseCreate(amount=700.0, description="", category="fuel", user_id=OTHER_VENDOR)))
+
+        incremental = rollup_rows(session_factory)
+        written = backfill(session_factory)
+
+        assert written == {DEFAULT_USER_ID: 1, OTHER_VENDOR: 1}
+        rebuilt = rollup_rows(session_factory)
+        assert rebuilt.keys() == incremental.keys()
+        for key, (orders, revenue, expenses, breakdown) in incremental.items():
+            assert rebuilt[key] == (orders, revenue, expenses, breakdown)
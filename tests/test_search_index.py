@@ -0,0 +1,83 @@
+"""Unit tests for the in-memory product search index."""
+import pytest
+from chatbot.search_index import ProductSearchIndex, score_product
+
+
+@pytest.fixture
+def index():
+    """Create a small indexed catalog."""
+    idx = ProductSearchIndex("vendor-1")
+    idx.rebuild([
+        {"id": "p1", "name": "Red Sneakers", "voice_tags": '["red shoes", "kicks"]',
+         "description": "Nice running shoes", "category": "Footwear"},
+        {"id": "p2", "name": "Blue Jeans", "voice_tags": ["denim"],
+         "description": "", "category": "Clothing"},
+        {"id": "p3", "name": "Leather Bag", "voice_tags": None,
+         "description": "Brown handbag", "category": "Accessories"},
+    ])
+    return idx
+
+
+def _ids(docs):
+    return [d.product_id for d in docs]
+
+
+class TestCandidateRetrieval:
+    """Test candidate retrieval from postings."""
+
+    def test_name_substring_is_candidate(self, index):
+        """Test a word inside the product name finds the product."""
+        assert "p1" in _ids(index.candidates("sneak", ["sneak"]))
+
+    def test_voice_tag_is_candidate(self, index):
+        """Test voice tags stored as JSON text are indexed."""
+        assert "p1" in _ids(index.candidates("kicks", ["kicks"]))
+
+    def test_typo_still_finds_candidate(self, index):
+        """Test shared trigrams surface products despite typos."""
+        assert "p1" in _ids(index.candidates("sneekers", ["sneekers"]))
+
+    def test_category_term_pulls_in_category(self, index):
+        """Test category fallback products are always candidates."""
+        assert "p1" in _ids(index.candidates("any shoe", ["any", "shoe"]))
+
+    def test_unrelated_query_has_no_candidates(self, index):
+        """Test nothing is returned for unrelated queries."""
+        assert index.candidates("xyz", ["xyz"]) == []
+
+
+class TestIncrementalUpdates:
+    """Test the index follows product writes."""
+
+    def test_upsert_adds_product(self, index):
+        """Test a new product becomes searchable."""
+        index.upsert({"id": "p4", "name": "Phone Charger", "category": "Electronics"})
+        assert "p4" in _ids(index.candidates("charger", ["charger"]))
+        assert len(index) == 4
+
+    def test_upsert_reindexes_renamed_product(self, index):
+        """Test renaming a product drops its old terms."""
+        index.upsert({"id": "p3", "name": "Gold Chain", "category": "Jewelry"})
+        assert "p3" not in _ids(index.candidates("leather", ["leather"]))
+        assert "p3" in _ids(index.candidates("chain", ["chain"]))
+        assert len(index) == 3
+
+    def test_remove_product(self, index):
+        """Test a deleted product is no longer a candidate."""
+        index.remove("p2")
+        assert "p2" not in _ids(index.candidates("jeans", ["jeans"]))
+        assert len(index) == 2
+
+
+class TestScoring:
+    """Test scoring keeps the original strategy weights."""
+
+    def test_exact_name_outranks_tag_only_match(self, index):
+        """Test name matches score above voice-tag-only matches."""
+        docs = {d.product_id: d for d in index.candidates("red", ["red"])}
+        assert score_product(docs["p1"], "red", ["red"]) >= 100
+
+    def test_substring_fallback(self, index):
+        """Test the last-resort fallback checks name and tags exactly."""
+        assert _ids(index.substring_matches(["denim"])) == ["p2"]
+        assert index.substring_matches(["zzz"]) == []
@@ -0,0 +1,383 @@
+"""Tests for the shared state store behind chat sessions, vendor state and usage counters."""
+import asyncio
+import pytest
+from chatbot import cache
+from chatbot.conversation import ConversationManager, ConversationState
+from chatbot.services import vendor_state
+from chatbot.state_store import KEY_PREFIX, MemoryStateStore, RedisStateStore, StateStore
+
+
+class FakeRedis:
+    """In-memory stand-in for the hash and list commands the state store uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.fail = False
+
+    def _check(self):
+        if self.fail:
+            raise ConnectionError("redis down")
+
+    def pipeline(self):
+        self._check()
+        return FakePipeline(self)
+
+    def hgetall(self, key):
+        self._check()
+        return {f.encode(): v.encode() for f, v in self.data.get(key, {}).items()}
+
+    def hget(self, key, field):
+        self._check()
+        value = self.data.get(key, {}).get(field)
+        return value.encode() if value is not None else None
+
+    def hset(self, key, mapping):
+        self.data.setdefault(key, {}).update({f: str(v) for f, v in mapping.items()})
+
+    def hincrby(self, key, field, amount):
+        fields = self.data.setdefault(key, {})
+        fields[field] = str(int(fields.get(field, 0)) + amount)
+        return int(fields[field])
+
+    def hincrbyfloat(self, key, field, amount):
+        fields = self.data.setdefault(key, {})
+        value = float(fields.get(field, 0)) + amount
+        fields[field] = str(int(value)) if value.is_integer() else str(value)
+        return value
+
+    def hdel(self, key, *fields):
+        self._check()
+        return sum(self.data.get(key, {}).pop(f, None) is not None for f in fields)
+
+    def hlen(self, key):
+        self._check()
+        return len(self.data.get(key, {}))
+
+    def rpush(self, key, value):
+        self.data.setdefault(key, []).append(value)
+
+    def ltrim(self, key, start, end):
+        self.data[key] = self.data[key][start:] if end == -1 else self.data[key][start:end + 1]
+
+    def lrange(self, key, start, end):
+        self._check()
+        return [v.encode() for v in self.data.get(key, [])]
+
+    def expire(self, key, seconds):
+        assert isinstance(seconds, int), "Redis TTLs are whole seconds"
+        self.expires[key] = seconds
+
+    def delete(self, key):
+        self._check()
+        self.data.pop(key, None)
+        self.expires.pop(key, None)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeAsyncRedis:
+    """The asyncio client's shape over a FakeRedis: commands are awaited, pipelines are executed with await."""
+
+    def __init__(self, redis):
+        self.redis = redis
+
+    def pipeline(self):
+        self.redis._check()
+        return FakeAsyncPipeline(self.redis)
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, name)
+
+        async def call(*args, **kwargs):
+            return command(*args, **kwargs)
+        return call
+
+
+class FakeAsyncPipeline(FakePipeline):
+    async def execute(self):
+        return super().execute()
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
+
+
+@pytest.fixture
+def redis_store(redis_client, monkeypatch):
+    monkeypatch.setattr(cache, "report_redis_error", lambda action, e: None)
+
+    async def async_client():
+        return FakeAsyncRedis(redis_client)
+    return RedisStateStore(client_factory=lambda: redis_client, async_client_factory=async_client)
+
+
+def product(product_id, name):
+    return {"id": product_id, "name": name, "price_ngn": 15000, "stock_level": 4, "image_url": None,
+            "description": "Lightweight canvas sneakers"}
+
+
+class TestStateStoreInterface:
+    """Test backends must implement the whole interface."""
+
+    def test_incomplete_backend_fails_at_instantiation(self):
+        """Test a backend missing a method can't be created."""
+        class HashesOnly(StateStore):
+            def get_fields(self, key):
+                return {}
+
+        with pytest.raises(TypeError):
+            HashesOnly()
+        MemoryStateStore()
+        RedisStateStore(client_factory=lambda: None)
+
+
+class TestMemoryStateStore:
+    """Test the in-process backend."""
+
+    def test_fields_counters_and_lists(self):
+        """Test hashes, counters and capped lists."""
+        store = MemoryStateStore()
+        store.set_fields("vendor:1", {"paused": "1", "paused_at": "2026-01-01"})
+        store.set_fields("vendor:1", {"paused": "0"})
+        assert store.get_fields("vendor:1") == {"paused": "0", "paused_at": "2026-01-01"}
+        store.set_fields("vendor:1", {"paused": "1"}, replace=True)
+        assert store.get_fields("vendor:1") == {"paused": "1"}
+
+        assert store.incr_field("usage:2026-01", "orders") == 1
+        assert store.incr_field("usage:2026-01", "orders", 2) == 3
+        assert store.incr_field("customers:spent", "+234", 1500.5) == 1500.5
+
+        for i in range(5):
+            store.push("bizai:c1", f"u{i}", max_len=3)
+        assert store.get_list("bizai:c1") == ["u2", "u3", "u4"]
+
+    def test_keys_expire(self, monkeypatch):
+        """Test a key with a TTL is gone once it passes."""
+        clock = [1_000_000.0]
+        monkeypatch.setattr("chatbot.state_store.time.time", lambda: clock[0])
+        store = MemoryStateStore()
+        store.set_fields("conv:a", {"q": "shoes"}, ttl_seconds=60)
+        store.set_fields("vendor:1", {"paused": "1"})
+
+        clock[0] += 61
+        assert store.get_fields("conv:a") == {}
+        assert store.get_fields("vendor:1") == {"paused": "1"}
+
+
+class TestRedisStateStore:
+    """Test the Redis backend's encoding and its fallback."""
+
+    def test_hash_and_list_commands(self, redis_store, redis_client):
+        """Test records are prefixed hashes and capped lists with TTLs on the key."""
+        redis_store.set_fields("conv:a", {"q": "shoes", "a": "1"}, ttl_seconds=1800, replace=True)
+        redis_store.incr_field("usage:2026-01", "orders", 1, ttl_seconds=3600)
+        for i in range(12):
+            redis_store.push("bizai:c1", f"u{i}", max_len=10, ttl_seconds=60)
+
+        assert redis_client.data[KEY_PREFIX + "conv:a"] == {"q": "shoes", "a": "1"}
+        assert redis_client.expires[KEY_PREFIX + "conv:a"] == 1800
+        assert redis_store.get_fields("usage:2026-01") == {"orders": "1"}
+        assert redis_store.get_list("bizai:c1") == [f"u{i}" for i in range(2, 12)]
+        assert redis_store.count_fields("conv:a") == 2
+
+    def test_falls_back_to_memory_while_redis_is_down(self, redis_store, redis_client):
+        """Test calls keep working on process memory when Redis errors."""
+        redis_client.fail = True
+        redis_store.set_fields("vendor:1", {"paused": "1"})
+
+        assert redis_store.get_field("vendor:1", "paused") == "1"
+        assert redis_client.data == {}
+
+
+class TestAsyncRedisStateStore:
+    """Test the async methods go through the asyncio client, not the sync one."""
+
+    def test_async_commands_share_the_sync_encoding(self, redis_store, redis_client, monkeypatch):
+        """Test async writes are read back by sync calls and the other way round."""
+        monkeypatch.setattr(redis_store, "_client_factory", lambda: redis_client)
+
+        async def scenario():
+            await redis_store.set_fields_async("conv:a", {"q": "shoes"}, ttl_seconds=1800, replace=True)
+            assert await redis_store.incr_field_async("usage:2026-01", "orders", 2, ttl_seconds=3600) == 2
+            for i in range(4):
+                await redis_store.push_async("bizai:c1", f"u{i}", max_len=3)
+            redis_store.set_fields("vendor:1", {"paused": "1"})
+            return (
+                await redis_store.get_field_async("vendor:1", "paused"),
+                await redis_store.get_list_async("bizai:c1"),
+                await redis_store.count_fields_async("conv:a"),
+                await redis_store.delete_fields_async("vendor:1", "paused", "missing"),
+            )
+
+        assert asyncio.run(scenario()) == ("1", ["u1", "u2", "u3"], 1, 1)
+        assert redis_store.get_fields("conv:a") == {"q": "shoes"}
+        assert redis_client.expires[KEY_PREFIX + "usage:2026-01"] == 3600
+
+    def test_async_calls_never_touch_the_sync_client(self, redis_store, redis_client, monkeypatch):
+        """Test handlers on the event loop don't make blocking round trips."""
+        def sync_client():
+            raise AssertionError("sync Redis client used from an async call")
+        monkeypatch.setattr(redis_store, "_client_factory", sync_client)
+
+        async def scenario():
+            await redis_store.set_fields_async("conv:a", {"q": "shoes"})
+            return await redis_store.get_fields_async("conv:a")
+
+        assert asyncio.run(scenario()) == {"q": "shoes"}
+
+    def test_async_falls_back_to_memory_while_redis_is_down(self, redis_store, redis_client):
+        """Test async calls keep working on process memory when Redis errors."""
+        redis_client.fail = True
+
+        async def scenario():
+            await redis_store.set_fields_async("vendor:1", {"paused": "1"})
+            return await redis_store.get_field_async("vendor:1", "paused")
+
+        assert asyncio.run(scenario()) == "1"
+        assert redis_store.get_field("vendor:1", "paused") == "1"
+
+    def test_memory_store_async_methods(self):
+        """Test the in-process store answers the async calls too."""
+        store = MemoryStateStore()
+
+        async def scenario():
+            await store.incr_field_async("usage:2026-01", "orders")
+            return await store.get_fields_async("usage:2026-01")
+
+        assert asyncio.run(scenario()) == {"orders": "1"}
+
+
+class TestCustomerHistory:
+    """Test customer purchase history is per customer and expires."""
+
+    def test_history_keys_carry_a_ttl(self, redis_store, redis_client, monkeypatch):
+        """Test no customer record is kept forever."""
+        from chatbot import main
+        monkeypatch.setattr(main, "state_store", redis_store)
+
+        async def scenario():
+            await main.record_customer_order("+234", "O1", 1500)
+            await main.record_customer_order("+234", {"order_id": "O2"}, 500.5)
+            return await main.get_customer_history("+234"), await main.get_customer_history("+999")
+
+        history, unknown = asyncio.run(scenario())
+
+        assert history == {"order_count": 2, "total_spent": 2000.5, "orders": ["O1", {"order_id": "O2"}]}
+        assert unknown is None
+        for key in ("customer:+234", "customer:+234:orders"):
+            assert redis_client.expires[KEY_PREFIX + key] == main.CUSTOMER_HISTORY_TTL_SECONDS
+        assert not any(key.startswith(KEY_PREFIX + "customers:") for key in redis_client.data)
+
+
+class TestSharedConversations:
+    """Test chat context follows the customer across workers."""
+
+    def test_state_round_trips_through_the_store(self):
+        """Test encoding keeps products, selection and the pending order."""
+        state = ConversationState()
+        state.set_products([product("p1", "Red Sneakers"), product("p2", "Blue Sneakers")], "sneakers")
+        state.select_product(state.last_products[1])
+        state.pending_order_id = "ABC12345"
+
+        fields = state.to_fields()
+        restored = ConversationState.from_fields(fields)
+
+        assert fields["c"] == "1"
+        assert restored.last_products == state.last_products
+        assert restored.current_product == state.current_product
+        assert (restored.last_query, restored.pending_order_id, restored.awaiting_selection) == ("sneakers", "ABC12345", False)
+
+    def test_selection_on_another_worker(self, redis_store, redis_client):
+        """Test a product list shown by one worker can be picked from on another."""
+        worker_1 = ConversationManager(ttl_minutes=30, store=redis_store)
+        worker_2 = ConversationManager(ttl_minutes=30, store=redis_store)
+
+        state = worker_1.get_state("+2348100000001")
+        state.set_products([product("p1", "Red Sneakers"), product("p2", "Blue Sneakers")], "sneakers")
+        worker_1.save_state("+2348100000001", state)
+
+        other = worker_2.get_state("+2348100000001")
+        assert other.awaiting_selection
+        assert [p["id"] for p in other.last_products] == ["p1", "p2"]
+        assert redis_client.expires[KEY_PREFIX + "conv:+2348100000001"] == 30 * 60
+
+        worker_2.clear_state("+2348100000001")
+        assert worker_1.get_state("+2348100000001").last_products == []
+
+    def test_async_state_round_trip(self, redis_store, redis_client):
+        """Test the async get/save used by the message handler share the sync encoding."""
+        manager = ConversationManager(ttl_minutes=30, store=redis_store)
+
+        async def scenario():
+            state = await manager.get_state_async("+2348100000001")
+            state.set_products([product("p1", "Red Sneakers")], "sneakers")
+            await manager.save_state_async("+2348100000001", state)
+
+        asyncio.run(scenario())
+        assert [p["id"] for p in manager.get_state("+2348100000001").last_products] == ["p1"]
+        assert redis_client.expires[KEY_PREFIX + "conv:+2348100000001"] == 30 * 60
+
+    def test_process_local_store_keeps_live_states(self):
+        """Test a memory store leaves the manager's own LRU in charge."""
+        manager = ConversationManager(ttl_minutes=30, store=MemoryStateStore())
+        state = manager.get_state("a")
+        assert manager.get_state("a") is state
+
+
+class TestSharedVendorState:
+    """Test pause and auto-silence are seen by every worker."""
+
+    def test_pause_and_silence(self, redis_store, redis_client, monkeypatch):
+        """Test vendor state lives in the store with a TTL on silences."""
+        monkeypatch.setattr(vendor_state, "state_store", redis_store)
+
+        vendor_state.set_bot_paused("v1", True)
+        assert vendor_state.should_bot_respond("v1", "+234")[0] is False
+        vendor_state.set_bot_paused("v1", False)
+        assert vendor_state.should_bot_respond("v1", "+234") == (True, "Bot is active")
+
+        vendor_state.record_vendor_activity("v1", "+234")
+        assert vendor_state.should_bot_respond("v1", "+234")[0] is False
+        assert vendor_state.get_bot_status("v1")["active_silences"] == 1
+        assert redis_client.expires[KEY_PREFIX + "silence:v1"] == vendor_state.AUTO_SILENCE_DURATION_MINUTES * 60
+
+    def test_async_pause_and_silence(self, redis_store, redis_client, monkeypatch):
+        """Test the async calls used by the webhooks see the same state."""
+        monkeypatch.setattr(vendor_state, "state_store", redis_store)
+
+        async def scenario():
+            await vendor_state.set_bot_paused_async("v1", True)
+            paused = await vendor_state.should_bot_respond_async("v1", "+234")
+            await vendor_state.set_bot_paused_async("v1", False)
+            await vendor_state.record_vendor_activity_async("v1", "+234")
+            return paused, await vendor_state.should_bot_respond_async("v1", "+234"), \
+                await vendor_state.should_bot_respond_async("v1", "+999"), await vendor_state.get_bot_status_async("v1")
+
+        paused, silenced, active, status = asyncio.run(scenario())
+
+        assert paused == (False, "Bot is globally paused")
+        assert silenced[0] is False
+        assert active == (True, "Bot is active")
+        assert (status["is_paused"], status["active_silences"]) == (False, 1)
+        assert vendor_state.is_auto_silenced("v1", "+234")
+
+    def test_expired_silences_are_cleared(self, monkeypatch):
+        """Test clearing drops only silences past their duration."""
+        store = MemoryStateStore()
+        monkeypatch.setattr(vendor_state, "state_store", store)
+        store.set_fields("silence:v1", {"old": "2020-01-01T00:00:00", "new": "2999-01-01T00:00:00"})
+
+        assert vendor_state.clear_expired_silences("v1") == 1
+        assert list(vendor_state.get_vendor_state("v1")["customer_activity"]) == ["new"]
@@ -0,0 +1,207 @@
+"""Stock hold ledger tests against a real (SQLite) database."""
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot.models import Base, Product as ProductModel, User as UserModel, StockHold
+from chatbot.inventory import DEFAULT_USER_ID, InsufficientStockError, ProductNotFoundError
+from chatbot.services.stock_holds import StockHoldLedger
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """File-backed SQLite database patched in as the app's SessionLocal."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'kofa.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=5))
+    db.add(ProductModel(id="bag", user_id=DEFAULT_USER_ID, name="Leather Bag", price_ngn=20000, stock_level=1))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def ledger(session_factory):
+    """Fresh ledger with a 15 minute hold TTL."""
+    return StockHoldLedger(ttl_minutes=15)
+
+
+def _stock(factory, product_id):
+    db = factory()
+    try:
+        return db.query(ProductModel).filter(ProductModel.id == product_id).first().stock_level
+    finally:
+        db.close()
+
+
+def _statuses(factory, order_id):
+    db = factory()
+    try:
+        return sorted(h.status for h in db.query(StockHold).filter(StockHold.order_id == order_id))
+    finally:
+        db.close()
+
+
+class TestPlacingHolds:
+    """Test holds reduce available stock without touching stock_level."""
+
+    def test_hold_reduces_available_not_stock_level(self, session_factory, ledger):
+        """Test available = stock_level - active holds."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 2)])
+        assert ledger.held("sneakers") == 2
+        assert ledger.available({"id": "sneakers", "stock_level": 5}) == 3
+        assert _stock(session_factory, "sneakers") == 5
+
+    def test_with_available_rewrites_stock_level(self, ledger):
+        """Test chatbot product dicts show available stock."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 4)])
+        products = ledger.with_available([
+            {"id": "sneakers", "stock_level": 5},
+            {"id": "bag", "stock_level": 1}
+        ])
+        assert [p["stock_level"] for p in products] == [1, 1]
+
+    def test_cannot_hold_more_than_available(self, ledger):
+        """Test held stock can't be held again by another order."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("bag", 1)])
+        with pytest.raises(InsufficientStockError) as exc:
+            ledger.place("ORDER2", DEFAULT_USER_ID, [("bag", 1)])
+        assert exc.value.available == 0
+
+    def test_short_item_holds_nothing(self, session_factory, ledger):
+        """Test a multi-item hold is all-or-nothing."""
+        with pytest.raises(InsufficientStockError):
+            ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 1), ("bag", 2)])
+        assert ledger.held("sneakers") == 0
+        assert _statuses(session_factory, "ORDER1") == []
+
+    def test_unknown_product(self, ledger):
+        """Test holding a missing product raises ProductNotFoundError."""
+        with pytest.raises(ProductNotFoundError):
+            ledger.place("ORDER1", DEFAULT_USER_ID, [("nope", 1)])
+
+
+class TestResolvingHolds:
+    """Test holds are committed on payment or released on expiry."""
+
+    def test_commit_decrements_stock(self, session_factory, ledger):
+        """Test paying converts the hold into a sale."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 2)])
+        assert ledger.commit_order("ORDER1") == 1
+        assert _stock(session_factory, "sneakers") == 3
+        assert ledger.held("sneakers") == 0
+        assert _statuses(session_factory, "ORDER1") == ["committed"]
+        # Committing twice doesn't sell twice
+        assert ledger.commit_order("ORDER1") == 0
+        assert _stock(session_factory, "sneakers") == 3
+
+    def test_sweep_releases_expired_holds(self, session_factory, ledger):
+        """Test the sweeper releases expired holds in bulk."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 2)])
+        ledger.place("ORDER2", DEFAULT_USER_ID, [("bag", 1)])
+
+        assert ledger.sweep(datetime.utcnow()) == 0
+        assert ledger.held("sneakers") == 2
+
+        assert ledger.sweep(datetime.utcnow() + timedelta(minutes=16)) == 2
+        assert ledger.held("sneakers") == 0
+        assert ledger.held("bag") == 0
+        assert _statuses(session_factory, "ORDER1") == ["released"]
+        assert _stock(session_factory, "sneakers") == 5
+
+    def test_late_payment_still_commits(self, session_factory, ledger):
+        """Test paying after the hold lapsed still records the sale."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 2)])
+        ledger.sweep(datetime.utcnow() + timedelta(minutes=16))
+        assert ledger.commit_order("ORDER1") == 1
+        assert _stock(session_factory, "sneakers") == 3
+
+    def test_uncovered_late_payment_alerts_the_vendor(self, session_factory, ledger):
+        """Test a lapsed hold whose stock was sold meanwhile is reported, not just logged."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("bag", 1)])
+        ledger.sweep(datetime.utcnow() + timedelta(minutes=16))
+        db = session_factory()
+        db.query(ProductModel).filter(ProductModel.id == "bag").update({"stock_level": 0})
+        db.commit()
+        db.close()
+
+        with patch("chatbot.services.push_notifications.push_service.send_stock_shortfall_alert",
+                   new=AsyncMock()) as alert:
+            assert asyncio.run(ledger.commit_order_async("ORDER1")) == 1
+
+        alert.assert_awaited_once_with(
+            order_id="ORDER1", vendor_id=DEFAULT_USER_ID, product_name="Leather Bag", quantity=1, stock_level=0
+        )
+        assert _statuses(session_factory, "ORDER1") == ["committed"]
+
+    def test_release_order(self, session_factory, ledger):
+        """Test cancelling an order frees its holds."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("bag", 1)])
+        assert ledger.release_order("ORDER1") == 1
+        assert ledger.held("bag") == 0
+        ledger.place("ORDER2", DEFAULT_USER_ID, [("bag", 1)])
+
+    def test_load_rebuilds_totals(self, ledger):
+        """Test a new worker picks up active holds from the database."""
+        ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 3)])
+        other_worker = StockHoldLedger(ttl_minutes=15)
+        other_worker.load()
+        assert other_worker.held("sneakers") == 3
+
+
+class TestVendorStatusUpdates:
+    """Test order status changes from the dashboard resolve the order's holds."""
+
+    @pytest.fixture
+    def app_ledger(self, ledger, monkeypatch):
+        """The app wired to the test ledger, with the orders table and cache stubbed out."""
+        import chatbot.main as main
+        monkeypatch.setattr(main, "stock_hold_ledger", ledger)
+        monkeypatch.setattr(main.order_store, "set_status_async", AsyncMock(
+            side_effect=lambda order_id, status: {"id": order_id, "status": status, "vendor_id": DEFAULT_USER_ID}
+        ))
+        monkeypatch.setattr(main, "invalidate_cache_async", AsyncMock())
+        return ledger
+
+    @staticmethod
+    def _set_status(order_id, status):
+        from chatbot.main import OrderStatusUpdate, update_order_status
+        return asyncio.run(update_order_status(order_id, OrderStatusUpdate(status=status)))
+
+    def test_vendor_confirmed_payment_decrements_stock(self, session_factory, app_ledger):
+        """Test a bank transfer the vendor marks paid is sold, and the sweeper leaves it alone."""
+        app_ledger.place("ORDER1", DEFAULT_USER_ID, [("sneakers", 2)])
+
+        self._set_status("ORDER1", "paid")
+        assert _stock(session_factory, "sneakers") == 3
+        assert _statuses(session_factory, "ORDER1") == ["committed"]
+        assert app_ledger.held("sneakers") == 0
+
+        self._set_status("ORDER1", "fulfilled")
+        app_ledger.sweep(datetime.utcnow() + timedelta(minutes=16))
+        assert _stock(session_factory, "sneakers") == 3
+        assert _statuses(session_factory, "ORDER1") == ["committed"]
+
+    def test_fulfilled_without_paid_commits(self, session_factory, app_ledger):
+        """Test going straight to fulfilled still records the sale."""
+        app_ledger.place("ORDER1", DEFAULT_USER_ID, [("bag", 1)])
+        self._set_status("ORDER1", "fulfilled")
+        assert _stock(session_factory, "bag") == 0
+
+    def test_cancelled_order_releases_holds(self, session_factory, app_ledger):
+        """Test cancelling gives the held stock back without selling it."""
+        app_ledger.place("ORDER1", DEFAULT_USER_ID, [("bag", 1)])
+        response = self._set_status("ORDER1", "cancelled")
+
+        assert response["order"]["status"] == "cancelled"
+        assert _statuses(session_factory, "ORDER1") == ["released"]
+        assert _stock(session_factory, "bag") == 1
+        app_ledger.place("ORDER2", DEFAULT_USER_ID, [("bag", 1)])
@@ -0,0 +1,168 @@
+"""Stock reservation tests against a real (SQLite) database - proves no overselling."""
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from chatbot.models import Base, Product as ProductModel, User as UserModel, StockHold
+from chatbot.inventory import (
+    InventoryManager, DEFAULT_USER_ID, InsufficientStockError, ProductNotFoundError
+)
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """File-backed SQLite database shared by threads, patched into inventory."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False, "timeout": 30}
+    )
+
+    # SQLite ignores FOR UPDATE; BEGIN IMMEDIATE gives the same writer serialization
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.inventory.SessionLocal", factory)
+
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000"))
+    db.add(ProductModel(id="sneakers", user_id=DEFAULT_USER_ID, name="Red Sneakers", price_ngn=15000, stock_level=10))
+    db.add(ProductModel(id="bag", user_id=DEFAULT_USER_ID, name="Leather Bag", price_ngn=20000, stock_level=2))
+    db.commit()
+    db.close()
+    yield factory
+    engine.dispose()
+
+
+def _stock(factory, product_id):
+    db = factory()
+    try:
+        return db.query(ProductModel).filter(ProductModel.id == product_id).first().stock_level
+    finally:
+        db.close()
+
+
+class TestReserveItems:
+    """Test multi-item reservations are all-or-nothing."""
+
+    def test_reserves_all_items(self, session_factory):
+        """Test every item is decremented together."""
+        reserved = InventoryManager().reserve_items([("sneakers", 3), ("bag", 1)])
+        assert reserved["sneakers"]["stock_level"] == 7
+        assert _stock(session_factory, "sneakers") == 7
+        assert _stock(session_factory, "bag") == 1
+
+    def test_repeated_product_ids_are_combined(self, session_factory):
+        """Test the same product twice is checked against its combined quantity."""
+        with pytest.raises(InsufficientStockError):
+            InventoryManager().reserve_items([("bag", 1), ("bag", 2)])
+        assert _stock(session_factory, "bag") == 2
+
+    def test_one_short_item_aborts_whole_order(self, session_factory):
+        """Test nothing is decremented when any item lacks stock."""
+        with pytest.raises(InsufficientStockError) as exc:
+            InventoryManager().reserve_items([("sneakers", 3), ("bag", 5)])
+        assert exc.value.available == 2
+        assert _stock(session_factory, "sneakers") == 10
+
+    def test_missing_product_aborts_whole_order(self, session_factory):
+        """Test an unknown product aborts the reservation."""
+        with pytest.raises(ProductNotFoundError):
+            InventoryManager().reserve_items([("sneakers", 1), ("nope", 1)])
+        assert _stock(session_factory, "sneakers") == 10
+
+    def test_validation_failure_aborts(self, session_factory):
+        """Test a failing validate hook rolls everything back."""
+        def reject(product):
+            raise ValueError("bad price")
+
+        with pytest.raises(ValueError):
+            InventoryManager().reserve_items([("sneakers", 1)], validate=reject)
+        assert _stock(session_factory, "sneakers") == 10
+
+    def test_stock_held_by_another_worker_is_not_sold(self, session_factory):
+        """Test active holds in the database count, even ones this worker never saw."""
+        db = session_factory()
+        db.add(StockHold(
+            id="hold-1", user_id=DEFAULT_USER_ID, order_id="CHAT1", product_id="bag", quantity=2,
+            status="active", expires_at=datetime.utcnow() + timedelta(minutes=15), created_at=datetime.utcnow()
+        ))
+        db.commit()
+        db.close()
+
+        with pytest.raises(InsufficientStockError) as exc:
+            InventoryManager().reserve_items([("bag", 1)])
+        assert exc.value.available == 0
+        assert _stock(session_factory, "bag") == 2
+
+    def test_release_items_restores_stock(self, session_factory):
+        """Test released stock is given back."""
+        manager = InventoryManager()
+        manager.reserve_items([("sneakers", 4), ("bag", 2)])
+        assert manager.release_items([("sneakers", 4), ("bag", 2)])
+        assert _stock(session_factory, "sneakers") == 10
+        assert _stock(session_factory, "bag") == 2
+
+
+class TestConcurrentReservations:
+    """Stress test: many buyers racing for limited stock."""
+
+    def test_no_oversell_under_concurrency(self, session_factory):
+        """Test 40 concurrent 1-item orders never sell more than is in stock."""
+        results = []
+        results_lock = threading.Lock()
+        start = threading.Barrier(40)
+
+        def buyer():
+            start.wait()
+            try:
+                InventoryManager().reserve_items([("sneakers", 1)])
+                outcome = "ok"
+            except InsufficientStockError:
+                outcome = "sold_out"
+            with results_lock:
+                results.append(outcome)
+
+        threads = [threading.Thread(target=buyer) for _ in range(40)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results.count("ok") == 10
+        assert results.count("sold_out") == 30
+        assert _stock(session_factory, "sneakers") == 0
+
+    def test_multi_item_orders_stay_consistent(self, session_factory):
+        """Test concurrent multi-item orders keep every product's stock consistent."""
+        sold = {"sneakers": 0, "bag": 0}
+        sold_lock = threading.Lock()
+        start = threading.Barrier(20)
+
+        def buyer():
+            start.wait()
+            try:
+                InventoryManager().reserve_items([("sneakers", 1), ("bag", 1)])
+            except InsufficientStockError:
+                return
+            with sold_lock:
+                sold["sneakers"] += 1
+                sold["bag"] += 1
+
+        threads = [threading.Thread(target=buyer) for _ in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # Only 2 bags exist, so only 2 two-item orders can succeed
+        assert sold == {"sneakers": 2, "bag": 2}
+        assert _stock(session_factory, "bag") == 0
+        assert _stock(session_factory, "sneakers") == 8
@@ -0,0 +1,51 @@
+"""Unit tests for the synonym table and per-vendor synonym service."""
+from unittest.mock import patch
+from chatbot.conversation import build_synonym_table, get_all_synonyms
+from chatbot.services.synonyms import SynonymService
+
+
+class TestSynonymTable:
+    """Test the precomputed bidirectional synonym table."""
+
+    def test_forward_lookup(self):
+        """Test a key maps to its listed synonyms."""
+        assert {"sneakers", "kicks"} <= set(get_all_synonyms("shoes"))
+
+    def test_reverse_lookup(self):
+        """Test a listed synonym maps back to its key and siblings."""
+        table = build_synonym_table({"purse": ["bag", "wallet"]})
+        assert table["wallet"] == frozenset({"wallet", "purse", "bag"})
+
+    def test_unknown_word_maps_to_itself(self):
+        """Test words without synonyms are returned on their own."""
+        assert get_all_synonyms("Xyz") == ["xyz"]
+
+
+class TestSynonymService:
+    """Test vendor custom synonyms merged over the built-in table."""
+
+    def test_custom_synonyms_are_merged(self):
+        """Test vendor entries expand in both directions."""
+        service = SynonymService()
+        with patch.object(service, "_load_custom", return_value={"ankara": ["wax print"]}):
+            expanded = service.expand("vendor-1", ["ankara", "shoes", "ab"])
+        assert "wax print" in expanded["ankara"]
+        assert "sneakers" in expanded["shoes"]
+        assert "ab" not in expanded
+
+    def test_tables_are_cached_until_reload(self):
+        """Test the database is read once per refresh period, and again after reload."""
+        service = SynonymService()
+        with patch.object(service, "_load_custom", return_value={}) as load:
+            service.table_for("vendor-1")
+            service.table_for("vendor-1")
+            assert load.call_count == 1
+            service.reload("vendor-1")
+            service.table_for("vendor-1")
+            assert load.call_count == 2
+
+    def test_database_failure_falls_back_to_builtin(self):
+        """Test search keeps working if custom synonyms can't be loaded."""
+        service = SynonymService()
+        with patch.object(service, "_load_custom", side_effect=Exception("db down")):
+            assert "sneakers" in service.expand("vendor-1", ["shoes"])["shoes"]
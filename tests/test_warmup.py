@@ -0,0 +1,186 @@
+"""Tests for the startup cache warm-up and readiness reporting."""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from chatbot import cache
+from chatbot.cache import LRUCache
+from chatbot.catalog import CatalogStore
+from chatbot.inventory import DEFAULT_USER_ID
+from chatbot.models import Base, Order, Product as ProductModel, StockHold, User as UserModel
+from chatbot.routers import storefront
+from chatbot.search_index import drop_search_index, peek_search_index
+from chatbot.services.warmup import CacheWarmer
+
+VENDOR_A = "aaaaaaaa-0000-0000-0000-000000000001"
+VENDOR_B = "bbbbbbbb-0000-0000-0000-000000000002"
+VENDOR_C = "cccccccc-0000-0000-0000-000000000003"
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    """SQLite database with three vendors of different recent activity."""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'kofa.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr("chatbot.database.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+    monkeypatch.setattr("chatbot.inventory.SessionLocal", factory)
+    monkeypatch.setattr("chatbot.inventory.catalog_store", CatalogStore())
+    monkeypatch.setattr(cache, "_l1", LRUCache())
+    monkeypatch.setattr(cache, "_redis_available", False)
+    monkeypatch.setattr(cache, "_generations", {})
+    drop_search_index()
+
+    now = datetime.utcnow()
+    old = now - timedelta(days=30)
+    db = factory()
+    db.add(UserModel(id=DEFAULT_USER_ID, phone="+2348000000000", business_name="Kofa Demo"))
+    db.add(UserModel(id=VENDOR_A, phone="+2348000000001", business_name="Ada Shoes", first_name="Ada"))
+    db.add(UserModel(id=VENDOR_B, phone="+2348000000002", business_name="Bola Bags"))
+    db.add(UserModel(id=VENDOR_C, phone="+2348000000003", business_name="Chidi Gadgets"))
+    db.add(ProductModel(id="a-sneakers", user_id=VENDOR_A, name="Red Sneakers", price_ngn=15000, stock_level=5))
+    db.add(ProductModel(id="a-boots", user_id=VENDOR_A, name="Brown Boots", price_ngn=25000, stock_level=0))
+    db.add(ProductModel(id="a-sandals", user_id=VENDOR_A, name="Anklet Sandals", price_ngn=8000, stock_level=2))
+    db.add(ProductModel(id="b-bag", user_id=VENDOR_B, name="Leather Bag", price_ngn=20000, stock_level=1))
+    for i in range(3):
+        db.add(Order(user_id=VENDOR_A, customer_phone="+2348100000000", total_amount=15000, created_at=now))
+    db.add(Order(user_id=VENDOR_B, customer_phone="+2348100000000", total_amount=20000, created_at=now))
+    db.add(StockHold(user_id=VENDOR_B, order_id="chat-1", product_id="b-bag", quantity=1,
+                     expires_at=now + timedelta(minutes=15), created_at=now))
+    for i in range(5):
+        db.add(Order(user_id=VENDOR_C, customer_phone="+2348100000000", total_amount=1000, created_at=old))
+    db.commit()
+    db.close()
+    yield factory
+    drop_search_index()
+    engine.dispose()
+
+
+class TestActiveVendors:
+    """Test which vendors get warmed."""
+
+    def test_ranked_by_recent_orders_and_holds(self, session_factory):
+        """Test default vendor first, then by recent activity; stale activity ignored."""
+        db = session_factory()
+        try:
+            vendors = CacheWarmer().active_vendors(db, limit=10)
+        finally:
+            db.close()
+        assert vendors == [DEFAULT_USER_ID, VENDOR_A, VENDOR_B]
+
+    def test_limit(self, session_factory):
+        """Test only the top vendors are returned."""
+        db = session_factory()
+        try:
+            assert CacheWarmer().active_vendors(db, limit=2) == [DEFAULT_USER_ID, VENDOR_A]
+        finally:
+            db.close()
+
+
+class TestWarmup:
+    """Test a warm-up run fills the per-vendor caches."""
+
+    def test_run_warms_catalog_index_and_storefront(self, session_factory):
+        """Test snapshot, search index and storefront profile are loaded."""
+        from chatbot import inventory
+
+        result = asyncio.run(CacheWarmer(max_vendors=10, concurrency=2).run())
+        assert result["vendors"] == 3
+        assert result["warmed"] == 3
+        assert result["failed"] == 0
+
+        assert inventory.catalog_store.peek(VENDOR_A) is not None
+        assert peek_search_index(VENDOR_A) is not None
+        assert cache.get_cache(storefront._shop_profile_key("Ada Shoes"))["vendor_id"] == VENDOR_A
+
+    def test_storefront_served_from_warm_caches(self, session_factory, monkeypatch):
+        """Test the shop page needs no database query once warmed."""
+        asyncio.run(CacheWarmer(max_vendors=10).run())
+
+        def no_database():
+            raise AssertionError("storefront hit the database after warm-up")
+
+        monkeypatch.setattr("chatbot.database.SessionLocal", no_database)
+        monkeypatch.setattr("chatbot.inventory.SessionLocal", no_database)
+        shop = asyncio.run(storefront.get_public_shop("ada%20shoes"))
+        assert shop.business_name == "Ada Shoes"
+        assert shop.display_name == "Ada"
+        # In-stock only, by name
+        assert [p.id for p in shop.products] == ["a-sandals", "a-sneakers"]
+
+    def test_concurrency_is_bounded(self, session_factory, monkeypatch):
+        """Test no more than `concurrency` vendors warm at once."""
+        running = []
+        peak = []
+
+        async def slow_warm(self, vendor_id):
+            running.append(vendor_id)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(vendor_id)
+
+        monkeypatch.setattr(CacheWarmer, "warm_vendor", slow_warm)
+        result = asyncio.run(CacheWarmer(max_vendors=10, concurrency=2).run())
+        assert result["warmed"] == 3
+        assert max(peak) == 2
+
+    def test_vendor_failure_is_skipped(self, session_factory, monkeypatch):
+        """Test one failing vendor doesn't stop the others."""
+        original = CacheWarmer.warm_vendor
+
+        async def flaky(self, vendor_id):
+            if vendor_id == VENDOR_B:
+                raise RuntimeError("boom")
+            await original(self, vendor_id)
+
+        monkeypatch.setattr(CacheWarmer, "warm_vendor", flaky)
+        warmer = CacheWarmer(max_vendors=10)
+        result = asyncio.run(warmer.run())
+        assert (result["warmed"], result["failed"]) == (2, 1)
+        assert warmer.ready
+
+
+class TestReadiness:
+    """Test readiness is reported separately from liveness."""
+
+    def test_not_ready_until_first_run_finishes(self, session_factory):
+        """Test the state moves pending -> ready."""
+        warmer = CacheWarmer(max_vendors=10)
+        assert warmer.readiness()["ready"] is False
+        asyncio.run(warmer.run())
+        readiness = warmer.readiness()
+        assert readiness["ready"] is True
+        assert readiness["runs"] == 1
+        assert readiness["last_run"]["warmed"] == 3
+
+    def test_ready_even_if_database_is_down(self, monkeypatch):
+        """Test a failed warm-up still lets the worker take traffic (cold)."""
+        def broken():
+            raise RuntimeError("database unreachable")
+
+        monkeypatch.setattr("chatbot.database.SessionLocal", broken)
+        monkeypatch.setattr("chatbot.database.AsyncSessionLocal", None)
+        warmer = CacheWarmer(max_vendors=10)
+        result = asyncio.run(warmer.run())
+        assert "error" in result
+        assert warmer.ready
+
+    def test_health_endpoints(self, monkeypatch):
+        """Test /health stays live while /health/ready is 503 until warmed."""
+        from chatbot import main
+
+        warmer = CacheWarmer(max_vendors=0)
+        monkeypatch.setattr(main, "cache_warmer", warmer)
+
+        health = asyncio.run(main.health_check())
+        assert health["status"] == "healthy"
+        assert health["readiness"]["ready"] is False
+        assert asyncio.run(main.readiness_check()).status_code == 503
+
+        asyncio.run(warmer.run())
+        assert asyncio.run(main.readiness_check())["ready"] is True